@@ -55,8 +55,10 @@ echo 使用项目自带的 Python: %PYTHON_PATH%
 
 :start
 REM 检查 runtime/.initialized 文件是否存在.
+REM runtime/first_run.json 存在说明初始化已由 main.py 接管，会从未完成的步骤继续，不再重复更新.
 set "INITIALIZED_PATH=%~dp0runtime\.initialized"
-if not exist "%INITIALIZED_PATH%" (
+set "LEDGER_PATH=%~dp0runtime\first_run.json"
+if not exist "%INITIALIZED_PATH%" if not exist "%LEDGER_PATH%" (
     echo 检测到 runtime/.initialized 不存在，正在执行模块更新...
     "%PYTHON_PATH%" update_modules.py
 ) else (
@@ -0,0 +1,407 @@
+# -*- coding: utf-8 -*-
+"""
+适配器分片脚本
+功能：将群聊白名单拆分给多个 MaiBot-Napcat-Adapter 进程，分散单个适配器的处理压力
+
+原理：
+- NapCat 会把每条消息推送给 OneBot11 配置中的每一个反向WebSocket连接
+- 每个分片只在白名单中保留自己负责的群，其余群的消息在分片内直接丢弃
+- 群号按 群号 % 分片数 分配，新增或删除群不会移动其他群
+- 私聊只由 0 号分片处理；任何分片都可以通过同一个QQ账号回复消息
+
+分片的源配置仍然是实例自己的适配器 config.toml（WebUI 和 config_qq_adapter.py 修改的文件），
+白名单变化后执行 rebalance 重新生成各分片配置
+
+用法：
+- python adapter_shards.py configure --count <分片数> [--instance <实例名>]
+- python adapter_shards.py rebalance [--instance <实例名>]
+- python adapter_shards.py status [--instance <实例名>]
+- python adapter_shards.py disable [--instance <实例名>]
+"""
+
+import argparse
+import os
+import shutil
+import sys
+from pathlib import Path
+from typing import Optional
+
+import tomlkit
+
+from config_qq_adapter import collapse_list_arrays, read_qq_lists, update_config_preserve_comments
+from init_napcat import create_onebot_config
+from safe_io import atomic_write_text, config_lock
+from instance_manager import (
+    ADAPTER_DIR,
+    ADAPTER_PRIVATE_ENTRIES,
+    DEFAULT_PORTS,
+    INSTANCES_DIR,
+    SCRIPT_DIR,
+    allocate_port,
+    get_instance_dir,
+    get_used_ports,
+    load_instance,
+    remove_entry,
+    sync_overlay,
+)
+
+try:
+    from modules.MaiBot.src.common.logger import get_logger
+    logger = get_logger("adapter_shards")
+except ImportError:
+    import logging as logger
+    logger.basicConfig(level=logger.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    logger = logger.getLogger("adapter_shards")
+
+
+# 默认实例的分片目录；命名实例的分片位于 instances/<名称>/adapter_shards
+DEFAULT_SHARD_ROOT = SCRIPT_DIR / 'runtime' / 'adapter_shards'
+MAX_SHARDS = 32
+
+
+def get_shard_root(instance: Optional[str] = None) -> Path:
+    """获取分片根目录"""
+    if instance:
+        return get_instance_dir(instance) / 'adapter_shards'
+    return DEFAULT_SHARD_ROOT
+
+
+def get_base_adapter_config(instance: Optional[str] = None) -> Path:
+    """获取分片的源适配器配置"""
+    if instance:
+        return get_instance_dir(instance) / 'MaiBot-Napcat-Adapter' / 'config.toml'
+    return ADAPTER_DIR / 'config.toml'
+
+
+def get_base_ws_port(instance: Optional[str] = None) -> int:
+    """获取实例的适配器端口（0 号分片沿用该端口）"""
+    if instance:
+        profile = load_instance(instance)
+        if not profile:
+            raise ValueError(f"实例不存在: {instance}")
+        return int(profile['ports']['napcat_ws'])
+    return DEFAULT_PORTS['napcat_ws']
+
+
+def get_qq_account(instance: Optional[str] = None) -> Optional[str]:
+    """获取实例使用的QQ号"""
+    if instance:
+        profile = load_instance(instance)
+        return str(profile['qq_account']) if profile else None
+    config_path = SCRIPT_DIR / 'modules' / 'MaiBot' / 'config' / 'bot_config.toml'
+    try:
+        with open(config_path, 'r', encoding='utf-8') as f:
+            return str(tomlkit.load(f)['bot']['qq_account'])
+    except (OSError, KeyError, tomlkit.exceptions.TOMLKitError):
+        return None
+
+
+def load_shard_settings(instance: Optional[str] = None) -> Optional[dict]:
+    """读取分片设置（shards.toml）
+
+    Returns:
+        dict: {'count': 分片数, 'ports': 各分片端口}，未启用分片时返回None
+    """
+    settings_path = get_shard_root(instance) / 'shards.toml'
+    if not settings_path.exists():
+        return None
+    try:
+        with open(settings_path, 'r', encoding='utf-8') as f:
+            settings = tomlkit.load(f).unwrap()
+        if settings.get('count', 1) <= 1:
+            return None
+        return settings
+    except Exception as e:
+        logger.error(f"读取分片设置失败 {settings_path}: {e}")
+        return None
+
+
+def _save_shard_settings(instance: Optional[str], settings: dict) -> None:
+    root = get_shard_root(instance)
+    root.mkdir(parents=True, exist_ok=True)
+    doc = tomlkit.document()
+    doc.add(tomlkit.comment("由 adapter_shards.py 生成，修改分片数请使用 configure 命令"))
+    doc['count'] = settings['count']
+    doc['ports'] = settings['ports']
+    atomic_write_text(root / 'shards.toml', tomlkit.dumps(doc))
+
+
+def get_shard_ports(instance: Optional[str] = None) -> list[int]:
+    """获取各分片端口，未启用分片时返回空列表"""
+    settings = load_shard_settings(instance)
+    return list(settings['ports']) if settings else []
+
+
+def get_shard_dirs(instance: Optional[str] = None) -> list[Path]:
+    """获取各分片的适配器目录，未启用分片时返回空列表"""
+    settings = load_shard_settings(instance)
+    if not settings:
+        return []
+    root = get_shard_root(instance)
+    return [root / f'shard_{index}' for index in range(settings['count'])]
+
+
+def get_all_shard_ports() -> set[int]:
+    """获取所有实例（含默认实例）分片占用的端口"""
+    ports = set(get_shard_ports(None))
+    if INSTANCES_DIR.exists():
+        for entry in INSTANCES_DIR.iterdir():
+            if (entry / 'adapter_shards' / 'shards.toml').exists():
+                ports.update(get_shard_ports(entry.name))
+    return ports
+
+
+def partition_groups(group_list: list[int], count: int) -> list[list[int]]:
+    """按 群号 % 分片数 拆分群列表（去重并保持原有顺序）"""
+    partitions = [[] for _ in range(count)]
+    seen = set()
+    for group_id in group_list:
+        group_id = int(group_id)
+        if group_id in seen:
+            continue
+        seen.add(group_id)
+        partitions[group_id % count].append(group_id)
+    return partitions
+
+
+def _read_shard_groups(shard_dir: Path) -> list[int]:
+    """读取现有分片配置中的群列表"""
+    try:
+        return read_qq_lists(shard_dir / 'config.toml')[1]['group_list']
+    except (OSError, ValueError):
+        return []
+
+
+def write_shard_configs(instance: Optional[str], settings: dict) -> Optional[list[list[int]]]:
+    """根据源配置生成各分片的目录和 config.toml
+
+    Returns:
+        list: 各分片负责的群列表，失败时返回None
+    """
+    base_config = get_base_adapter_config(instance)
+    if not base_config.exists():
+        logger.error(f"找不到适配器配置文件: {base_config}")
+        return None
+    # 名单可能有数万个群，使用 config_qq_adapter 的快速读写
+    content, lists = read_qq_lists(base_config)
+    skeleton, _ = collapse_list_arrays(content)
+    chat = tomlkit.parse(skeleton).get('chat', {})
+    if chat.get('group_list_type', 'whitelist') != 'whitelist':
+        logger.error("群聊名单为黑名单模式，无法按群分片，请先切换为白名单模式")
+        return None
+
+    partitions = partition_groups(lists['group_list'], settings['count'])
+    root = get_shard_root(instance)
+    for index, (port, groups) in enumerate(zip(settings['ports'], partitions)):
+        shard_dir = root / f'shard_{index}'
+        sync_overlay(ADAPTER_DIR, shard_dir, ADAPTER_PRIVATE_ENTRIES)
+        (shard_dir / 'data').mkdir(exist_ok=True)
+
+        shard_lists = {'group_list': groups}
+        overrides = {'napcat_server': {'port': int(port)}}
+        if index > 0:
+            # 私聊只交给 0 号分片处理
+            shard_lists['private_list'] = []
+            overrides['chat'] = {'private_list_type': 'whitelist'}
+        if not update_config_preserve_comments(shard_dir / 'config.toml', shard_lists, content, overrides):
+            return None
+    return partitions
+
+
+def _update_onebot(instance: Optional[str], ports: list[int]) -> None:
+    """让 NapCat 为每个分片建立一条反向WebSocket连接"""
+    qq_account = get_qq_account(instance)
+    if not qq_account:
+        logger.warning("未找到QQ号，跳过 OneBot11 配置更新，请稍后通过“添加/修改QQ号”重新生成")
+        return
+    cwd = os.getcwd()
+    try:
+        # init_napcat 使用相对路径
+        os.chdir(SCRIPT_DIR)
+        create_onebot_config(qq_account, ws_port=ports[0], ws_ports=ports)
+    finally:
+        os.chdir(cwd)
+
+
+def configure_shards(count: int, instance: Optional[str] = None) -> bool:
+    """设置分片数，分配端口并生成各分片配置
+
+    Args:
+        count: 分片数，1 表示关闭分片
+        instance: 实例名称，None 表示默认实例
+
+    Returns:
+        bool: 是否成功
+    """
+    if not 1 <= count <= MAX_SHARDS:
+        logger.error(f"分片数必须在 1 到 {MAX_SHARDS} 之间")
+        return False
+    if count == 1:
+        return disable_shards(instance)
+
+    try:
+        base_port = get_base_ws_port(instance)
+    except ValueError as e:
+        logger.error(str(e))
+        return False
+
+    # 分配端口到写入分片设置期间持有配置锁，避免与其他启动器分配到相同端口
+    with config_lock():
+        # 保留已分配的端口，只为新增分片分配端口
+        old_settings = load_shard_settings(instance)
+        ports = list(old_settings['ports'][:count]) if old_settings else [base_port]
+        used = get_used_ports()
+        used.update(ports)
+        while len(ports) < count:
+            ports.append(allocate_port(max(ports), used))
+
+        settings = {'count': count, 'ports': ports}
+        partitions = write_shard_configs(instance, settings)
+        if partitions is None:
+            return False
+
+        # 移除多余的分片目录
+        root = get_shard_root(instance)
+        for index in range(count, old_settings['count'] if old_settings else 0):
+            _remove_shard_dir(root / f'shard_{index}')
+
+        _save_shard_settings(instance, settings)
+        _update_onebot(instance, ports)
+    _print_partitions(settings, partitions)
+    logger.info(f"适配器分片已配置为 {count} 个，请重启 NapCat 和适配器使其生效")
+    return True
+
+
+def rebalance_shards(instance: Optional[str] = None) -> bool:
+    """白名单变化后重新分配各分片负责的群"""
+    with config_lock():
+        settings = load_shard_settings(instance)
+        if not settings:
+            logger.error("未启用适配器分片，请先使用 configure 设置分片数")
+            return False
+        root = get_shard_root(instance)
+        old_owner = {}
+        for index in range(settings['count']):
+            for group_id in _read_shard_groups(root / f'shard_{index}'):
+                old_owner[group_id] = index
+
+        partitions = write_shard_configs(instance, settings)
+        if partitions is None:
+            return False
+
+    new_owner = {group_id: index for index, groups in enumerate(partitions) for group_id in groups}
+    added = new_owner.keys() - old_owner.keys()
+    removed = old_owner.keys() - new_owner.keys()
+    moved = [g for g in new_owner.keys() & old_owner.keys() if new_owner[g] != old_owner[g]]
+    _print_partitions(settings, partitions)
+    logger.info(f"重新分配完成：新增 {len(added)} 个群，移除 {len(removed)} 个群，迁移 {len(moved)} 个群")
+    if added or removed or moved:
+        logger.info("请重启适配器使新的分片配置生效")
+    return True
+
+
+def _remove_shard_dir(shard_dir: Path) -> None:
+    """删除分片目录（先移除指向共享代码的链接）"""
+    if not shard_dir.exists():
+        return
+    for entry in shard_dir.iterdir():
+        if entry.name not in ADAPTER_PRIVATE_ENTRIES:
+            remove_entry(entry)
+    shutil.rmtree(shard_dir)
+
+
+def disable_shards(instance: Optional[str] = None) -> bool:
+    """关闭分片，恢复为单个适配器"""
+    with config_lock():
+        root = get_shard_root(instance)
+        settings = load_shard_settings(instance)
+        if settings:
+            for index in range(settings['count']):
+                _remove_shard_dir(root / f'shard_{index}')
+        settings_path = root / 'shards.toml'
+        if settings_path.exists():
+            settings_path.unlink()
+        try:
+            _update_onebot(instance, [get_base_ws_port(instance)])
+        except ValueError as e:
+            logger.error(str(e))
+            return False
+    logger.info("已关闭适配器分片，恢复为单个适配器")
+    return True
+
+
+def _print_partitions(settings: dict, partitions: list[list[int]]) -> None:
+    print(f"{'分片':<8}{'端口':<8}群数量")
+    for index, (port, groups) in enumerate(zip(settings['ports'], partitions)):
+        note = "（含私聊）" if index == 0 else ""
+        print(f"{index:<8}{port:<8}{len(groups)}{note}")
+    if any(not groups for groups in partitions[1:]):
+        logger.warning("存在没有分配到任何群的分片，分片数可能大于实际需要")
+
+
+def print_shard_status(instance: Optional[str] = None) -> None:
+    """打印分片状态"""
+    settings = load_shard_settings(instance)
+    if not settings:
+        print("未启用适配器分片（单个适配器运行）")
+        return
+    root = get_shard_root(instance)
+    partitions = [_read_shard_groups(root / f'shard_{index}') for index in range(settings['count'])]
+    _print_partitions(settings, partitions)
+
+
+def interactive_shard_menu() -> bool:
+    """适配器分片交互菜单（默认实例）"""
+    while True:
+        print("\n=== 适配器分片管理 ===")
+        print_shard_status()
+        print("1. 设置分片数")
+        print("2. 白名单变化后重新分配")
+        print("3. 关闭分片")
+        print("0. 返回主菜单")
+        choice = input("请选择操作: ").strip()
+        if choice == '0':
+            return True
+        if choice == '1':
+            count = input(f"请输入分片数 (1-{MAX_SHARDS}): ").strip()
+            if count.isdigit():
+                configure_shards(int(count))
+            else:
+                logger.error("分片数必须为数字")
+        elif choice == '2':
+            rebalance_shards()
+        elif choice == '3':
+            disable_shards()
+        else:
+            logger.error("无效选择")
+
+
+def main() -> int:
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description="适配器分片管理")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    configure_parser = subparsers.add_parser('configure', help="设置分片数")
+    configure_parser.add_argument('--count', type=int, required=True)
+    subparsers.add_parser('rebalance', help="白名单变化后重新分配")
+    subparsers.add_parser('status', help="查看分片状态")
+    subparsers.add_parser('disable', help="关闭分片")
+    for sub in subparsers.choices.values():
+        sub.add_argument('--instance', help="实例名称，不指定表示默认实例")
+    args = parser.parse_args()
+
+    if args.command == 'configure':
+        return 0 if configure_shards(args.count, args.instance) else 1
+    if args.command == 'rebalance':
+        return 0 if rebalance_shards(args.instance) else 1
+    if args.command == 'disable':
+        return 0 if disable_shards(args.instance) else 1
+    print_shard_status(args.instance)
+    return 0
+
+
+if __name__ == "__main__":
+    try:
+        sys.exit(main())
+    except KeyboardInterrupt:
+        print("\n用户取消操作")
+        sys.exit(1)
@@ -0,0 +1,578 @@
+# -*- coding: utf-8 -*-
+"""
+启动器操作基准测试
+功能：在临时目录中构建合成的一键包目录树，测量模块更新、配置生成、token 查找、菜单渲染和数据库维护的耗时，
+结果保存为 JSON，并可与之前的结果对比找出性能回退
+
+合成目录树包含：
+- modules/napcat 和 modules/napcatframework 下的 N 个 QQ 版本目录（每个版本带 webui.json）
+- 代替 REMOTE_URLS 镜像的本地裸仓库，以及克隆出的 MaiBot 和适配器仓库
+- 大体积的 bot_config.toml 和适配器 config.toml
+- 合成的 MaiBot.db
+
+所有操作只读写临时目录（配置锁除外），不会访问网络，也不会修改真实的模块和数据库
+
+用法：
+    python benchmark.py                                  # 运行全部基准测试并保存结果
+    python benchmark.py run --only update_noop db_report --repeat 10
+    python benchmark.py run --versions 20 --db-rows 500000 --compare latest
+    python benchmark.py compare BASE.json [NEW.json] --threshold 0.2
+    python benchmark.py list                             # 列出基准测试和已保存的结果
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import logging
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import closing
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Optional
+
+try:
+    from modules.MaiBot.src.common.logger import get_logger
+    logger = get_logger("benchmark")
+except ImportError:
+    import logging as logger
+    logger.basicConfig(level=logger.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    logger = logger.getLogger("benchmark")
+
+import tracing
+from safe_io import atomic_write_json
+from toolchain import RUNTIME_DIR, SCRIPT_DIR, resolve_tool
+
+RESULTS_DIR = RUNTIME_DIR / 'benchmarks'
+RESULT_VERSION = 1
+
+DEFAULT_REPEAT = 5
+DEFAULT_VERSIONS = 8
+DEFAULT_REPO_FILES = 300
+DEFAULT_CONFIG_KEYS = 2000
+DEFAULT_DB_ROWS = 100000
+DEFAULT_THRESHOLD = 0.2
+# 中位数变化小于该值（毫秒）时不算回退，避免毫秒级操作的抖动被误报
+DEFAULT_MIN_DELTA_MS = 2.0
+
+BENCH_QQ = '1234567890'
+GIT_IDENTITY = ['-c', 'user.name=benchmark', '-c', 'user.email=benchmark@localhost']
+
+
+# ---------------------------------------------------------------------------
+# 合成目录树
+# ---------------------------------------------------------------------------
+
+def _git(git: str, args: list[str], cwd: Path) -> None:
+    subprocess.run([git, *GIT_IDENTITY, *args], cwd=str(cwd), stdin=subprocess.DEVNULL,
+                   capture_output=True, check=True)
+
+
+def _write_repo_files(root: Path, count: int, revision: int = 0) -> None:
+    """在仓库中写入 count 个合成的 Python 源文件"""
+    for index in range(count):
+        package = root / 'src' / f"pkg{index % 10}"
+        package.mkdir(parents=True, exist_ok=True)
+        lines = [f"# revision {revision}"]
+        lines.extend(f"def func_{index}_{line}(value):\n    return value * {line} + {revision}\n" for line in range(20))
+        (package / f"module_{index}.py").write_text('\n'.join(lines), encoding='utf-8')
+
+
+def _create_remote(git: str, fixture: Path, name: str, files: int) -> tuple[Path, Path]:
+    """创建一个裸仓库（代替远程镜像）和用于推送新提交的工作副本
+
+    Returns:
+        tuple: (裸仓库路径, 工作副本路径)
+    """
+    bare = fixture / 'remotes' / f"{name}.git"
+    seed = fixture / 'seeds' / name
+    bare.mkdir(parents=True)
+    seed.mkdir(parents=True)
+    _git(git, ['init', '-q', '--bare'], bare)
+    _git(git, ['symbolic-ref', 'HEAD', 'refs/heads/main'], bare)
+    _git(git, ['init', '-q'], seed)
+    _git(git, ['checkout', '-q', '-b', 'main'], seed)
+    _write_repo_files(seed, files)
+    (seed / 'requirements.txt').write_text('', encoding='utf-8')
+    _git(git, ['add', '-A'], seed)
+    _git(git, ['commit', '-q', '-m', 'initial'], seed)
+    _git(git, ['remote', 'add', 'origin', str(bare)], seed)
+    _git(git, ['push', '-q', 'origin', 'main'], seed)
+    return bare, seed
+
+
+def push_change(git: str, seed: Path, revision: int, files: int) -> None:
+    """向远程推送一个修改了 files 个文件的提交"""
+    _write_repo_files(seed, files, revision)
+    _git(git, ['commit', '-q', '-a', '-m', f"revision {revision}"], seed)
+    _git(git, ['push', '-q', 'origin', 'main'], seed)
+
+
+def build_bot_config(keys: int) -> str:
+    """生成带注释的大体积 bot_config.toml"""
+    lines = ['[inner]', 'version = "6.0.0"', '', '[bot]', 'qq_account = 10000', 'nickname = "麦麦"', '']
+    per_section = 50
+    for section in range(max(1, keys // per_section)):
+        lines.append(f"[section_{section}]")
+        for key in range(per_section):
+            value = random.choice([str(key), f'"value_{section}_{key}"', 'true', f"{key / 7:.4f}"])
+            lines.append(f"# 配置项 {section}.{key} 的说明")
+            lines.append(f"key_{key} = {value}")
+        lines.append('')
+    return '\n'.join(lines)
+
+
+def build_adapter_config(ids: int) -> str:
+    """生成带长名单的适配器 config.toml"""
+    group_list = ', '.join(str(100000 + index) for index in range(ids))
+    return (
+        '[napcat_server]\nhost = "localhost"\nport = 8095\n\n'
+        '[chat]\ngroup_list_type = "whitelist"\n'
+        f"group_list = [{group_list}]\n"
+        'private_list_type = "whitelist"\nprivate_list = []\n'
+    )
+
+
+def build_database(db_path: Path, rows: int) -> None:
+    """生成与 MaiBot 表结构相近的合成数据库"""
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    with closing(sqlite3.connect(db_path)) as conn:
+        conn.executescript("""
+            CREATE TABLE messages (
+                id INTEGER PRIMARY KEY, message_id TEXT, chat_id TEXT, time REAL,
+                user_id TEXT, processed_plain_text TEXT
+            );
+            CREATE INDEX messages_chat_time ON messages (chat_id, time);
+            CREATE TABLE chat_streams (id INTEGER PRIMARY KEY, stream_id TEXT UNIQUE, platform TEXT, last_active_time REAL);
+        """)
+        now = time.time()
+        conn.executemany(
+            "INSERT INTO messages (message_id, chat_id, time, user_id, processed_plain_text) VALUES (?, ?, ?, ?, ?)",
+            ((f"msg{index}", f"chat{index % 200}", now - index * 30, f"user{index % 5000}",
+              f"这是第 {index} 条合成消息 " + 'x' * (index % 120)) for index in range(rows)),
+        )
+        conn.executemany("INSERT INTO chat_streams (stream_id, platform, last_active_time) VALUES (?, ?, ?)",
+                         ((f"chat{index}", 'qq', now) for index in range(200)))
+        # 删除一部分消息，让 VACUUM 有空间可以回收
+        conn.execute("DELETE FROM messages WHERE id % 10 = 0")
+        conn.commit()
+
+
+def build_fixture(root: Path, git: str, versions: int = DEFAULT_VERSIONS, repo_files: int = DEFAULT_REPO_FILES,
+                  config_keys: int = DEFAULT_CONFIG_KEYS, db_rows: int = DEFAULT_DB_ROWS) -> dict:
+    """在 root 下构建合成的一键包目录树
+
+    Args:
+        root: 空目录
+        git: git 可执行文件路径
+        versions: QQ 版本目录数量
+        repo_files: 每个合成仓库中的 Python 文件数量
+        config_keys: bot_config.toml 中的配置项数量
+        db_rows: MaiBot.db 中的消息行数
+
+    Returns:
+        dict: 目录树中各部分的路径
+    """
+    random.seed(0)
+    for index in range(versions):
+        version = f"9.9.{index}-{30000 + index}"
+        layouts = (
+            ('napcat', ('resources', 'app', 'napcat', 'config')),
+            ('napcatframework', ('resources', 'app', 'LiteLoader', 'plugins', 'NapCat', 'config')),
+        )
+        for module, config_parts in layouts:
+            config_dir = root.joinpath('modules', module, 'versions', version, *config_parts)
+            config_dir.mkdir(parents=True)
+            (config_dir / 'webui.json').write_text(json.dumps({'port': 6099, 'token': f"token{index:08x}"}),
+                                                   encoding='utf-8')
+
+    repos = {}
+    for name, directory in (('maibot', 'MaiBot'), ('adapter', 'MaiBot-Napcat-Adapter')):
+        bare, seed = _create_remote(git, root, name, repo_files)
+        clone = root / 'modules' / directory
+        subprocess.run([git, 'clone', '-q', str(bare), str(clone)], stdin=subprocess.DEVNULL,
+                       capture_output=True, check=True)
+        repos[name] = {'bare': bare, 'seed': seed, 'clone': clone}
+
+    maibot = repos['maibot']['clone']
+    bot_config = build_bot_config(config_keys)
+    for path in (maibot / 'config' / 'bot_config.toml', maibot / 'template' / 'bot_config_template.toml'):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(bot_config, encoding='utf-8')
+    adapter_config = repos['adapter']['clone'] / 'config.toml'
+    adapter_config.write_text(build_adapter_config(config_keys), encoding='utf-8')
+
+    db_path = maibot / 'data' / 'MaiBot.db'
+    build_database(db_path, db_rows)
+    return {'root': root, 'git': git, 'repos': repos, 'adapter_config': adapter_config, 'db_path': db_path}
+
+
+# ---------------------------------------------------------------------------
+# 基准测试
+# ---------------------------------------------------------------------------
+
+def _update(fixture: dict) -> None:
+    import update_modules
+    update_modules.GIT_COMMAND = fixture['git']
+    repo = fixture['repos']['maibot']
+    if not update_modules.update_repository(str(repo['clone']), 'MaiBot', [str(repo['bare'])]):
+        raise RuntimeError("update_repository 返回失败")
+
+
+def _push_change(fixture: dict, files: int = 20) -> None:
+    fixture['revision'] = fixture.get('revision', 0) + 1
+    push_change(fixture['git'], fixture['repos']['maibot']['seed'], fixture['revision'], files)
+
+
+def _provision_configs(fixture: dict) -> None:
+    from config_qq_adapter import save_qq_lists
+    from init_napcat import create_napcat_configs, update_bot_qq
+    # init_napcat 使用相对于一键包根目录的路径
+    previous = os.getcwd()
+    os.chdir(fixture['root'])
+    try:
+        create_napcat_configs(BENCH_QQ)
+        update_bot_qq(int(BENCH_QQ))
+    finally:
+        os.chdir(previous)
+    groups = list(range(200000, 200000 + 500))
+    if not save_qq_lists(groups, [int(BENCH_QQ)], fixture['adapter_config']):
+        raise RuntimeError("save_qq_lists 返回失败")
+
+
+def _discover_token(fixture: dict) -> None:
+    from start import load_napcat_token
+    if load_napcat_token(str(fixture['root'])) == 'napcat':
+        raise RuntimeError("未找到 webui.json 中的 token")
+
+
+def _render_menu(fixture: dict) -> None:
+    import start
+    start.menu_manager.setup_default_menu()
+    start.menu_manager._display_menu_items()
+
+
+def _db_report(fixture: dict) -> None:
+    from db_maintenance import build_report
+    build_report(fixture['db_path'])
+
+
+def _db_operation(operation: str) -> Callable[[dict], None]:
+    def run(fixture: dict) -> None:
+        from db_maintenance import run_maintenance
+        if run_maintenance(fixture['db_path'], [operation]) is None:
+            raise RuntimeError(f"数据库 {operation} 失败")
+    return run
+
+
+# 名称 -> (说明, 每次运行前的准备（不计时）, 被测操作)
+BENCHMARKS: dict[str, tuple[str, Optional[Callable[[dict], None]], Callable[[dict], None]]] = {
+    'update_noop': ('更新仓库（无新提交）', None, _update),
+    'update_changes': ('更新仓库（远程有新提交）', _push_change, _update),
+    'config_provision': ('生成 NapCat/OneBot 配置并写入 QQ 号和白名单', None, _provision_configs),
+    'token_discovery': ('查找 NapCat WebUI token', None, _discover_token),
+    'menu_render': ('构建并渲染主菜单', None, _render_menu),
+    'db_report': ('数据库报告', None, _db_report),
+    'db_analyze': ('数据库 ANALYZE', None, _db_operation('analyze')),
+    'db_vacuum': ('数据库 VACUUM', None, _db_operation('vacuum')),
+}
+
+
+@contextlib.contextmanager
+def _quiet():
+    """屏蔽被测操作的输出和日志，同时不写入操作追踪"""
+    tracing_enabled = tracing.ENABLED
+    tracing.ENABLED = False
+    logging.disable(logging.WARNING)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            yield
+    finally:
+        logging.disable(logging.NOTSET)
+        tracing.ENABLED = tracing_enabled
+
+
+def time_benchmark(name: str, fixture: dict, repeat: int = DEFAULT_REPEAT, warmup: int = 1) -> dict:
+    """多次运行一个基准测试
+
+    Args:
+        name: 基准测试名称
+        fixture: build_fixture 的返回值
+        repeat: 计时的运行次数
+        warmup: 计时前的预热次数
+
+    Returns:
+        dict: 各次耗时（毫秒）及中位数、最小值、最大值
+    """
+    label, setup, operation = BENCHMARKS[name]
+    timings = []
+    for index in range(warmup + repeat):
+        with _quiet():
+            if setup:
+                setup(fixture)
+            started = time.perf_counter()
+            operation(fixture)
+            elapsed = (time.perf_counter() - started) * 1000
+        if index >= warmup:
+            timings.append(elapsed)
+    return {
+        'label': label,
+        'runs_ms': [round(timing, 3) for timing in timings],
+        'median_ms': round(statistics.median(timings), 3),
+        'min_ms': round(min(timings), 3),
+        'max_ms': round(max(timings), 3),
+    }
+
+
+def _onekey_commit() -> Optional[str]:
+    try:
+        result = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=str(SCRIPT_DIR), stdin=subprocess.DEVNULL,
+                                capture_output=True, text=True, timeout=10)
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+    if result.returncode != 0:
+        return None
+    return result.stdout.strip() or None
+
+
+def run_benchmarks(names: list[str], params: dict, repeat: int = DEFAULT_REPEAT, keep: bool = False) -> Optional[dict]:
+    """构建合成目录树并运行基准测试
+
+    Args:
+        names: 要运行的基准测试名称
+        params: build_fixture 的规模参数
+        repeat: 每个基准测试的计时次数
+        keep: 保留临时目录，便于排查
+
+    Returns:
+        Optional[dict]: 测试结果，找不到 git 时返回 None
+    """
+    entry = resolve_tool('git')
+    if not entry:
+        logger.error("未找到 Git，无法构建合成仓库")
+        return None
+
+    root = Path(tempfile.mkdtemp(prefix='onekey-bench-'))
+    results = {}
+    try:
+        logger.info(f"正在构建合成目录树: {root}")
+        started = time.perf_counter()
+        fixture = build_fixture(root, entry['path'], **params)
+        logger.info(f"目录树构建完成，耗时 {time.perf_counter() - started:.1f} 秒")
+        for name in names:
+            try:
+                results[name] = time_benchmark(name, fixture, repeat)
+            except Exception as e:
+                logger.error(f"{name} 运行失败: {e}")
+                results[name] = {'label': BENCHMARKS[name][0], 'error': str(e)}
+                continue
+            logger.info(f"{name}: 中位数 {results[name]['median_ms']:.1f} ms "
+                        f"（{results[name]['min_ms']:.1f} ~ {results[name]['max_ms']:.1f}）")
+    finally:
+        if keep:
+            logger.info(f"已保留临时目录: {root}")
+        else:
+            shutil.rmtree(root, ignore_errors=True)
+
+    return {
+        'version': RESULT_VERSION,
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'commit': _onekey_commit(),
+        'host': {'python': platform.python_version(), 'platform': platform.platform(), 'cpus': os.cpu_count()},
+        'params': dict(params, repeat=repeat),
+        'results': results,
+    }
+
+
+# ---------------------------------------------------------------------------
+# 结果保存与对比
+# ---------------------------------------------------------------------------
+
+def save_result(result: dict, output: Optional[Path] = None) -> Path:
+    """保存结果，默认写入 runtime/benchmarks/<时间>.json"""
+    path = output or RESULTS_DIR / f"{datetime.now():%Y%m%d-%H%M%S}.json"
+    atomic_write_json(path, result, indent=2, ensure_ascii=False)
+    return path
+
+
+def list_results() -> list[Path]:
+    """已保存的结果，按时间排序"""
+    return sorted(RESULTS_DIR.glob('*.json')) if RESULTS_DIR.exists() else []
+
+
+def resolve_result(reference: str) -> Path:
+    """把 latest / previous 或文件名解析为结果路径"""
+    saved = list_results()
+    if reference in ('latest', 'previous'):
+        needed = 1 if reference == 'latest' else 2
+        if len(saved) < needed:
+            raise FileNotFoundError(f"已保存的结果不足 {needed} 个")
+        return saved[-needed]
+    path = Path(reference)
+    if not path.exists() and (RESULTS_DIR / reference).exists():
+        path = RESULTS_DIR / reference
+    return path
+
+
+def load_result(path: Path) -> dict:
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def compare_results(base: dict, new: dict, threshold: float = DEFAULT_THRESHOLD,
+                    min_delta_ms: float = DEFAULT_MIN_DELTA_MS) -> list[dict]:
+    """对比两次结果的中位数
+
+    Args:
+        base: 基准结果
+        new: 新结果
+        threshold: 变慢超过该比例视为回退
+        min_delta_ms: 变慢的绝对值不超过该毫秒数时不视为回退
+
+    Returns:
+        list: 每个基准测试一项，包含 base_ms、new_ms、change 和 status（regression / improved / ok / missing / error）
+    """
+    names = set(base['results']) | set(new['results'])
+    rows = []
+    for name in [name for name in BENCHMARKS if name in names] + sorted(names - set(BENCHMARKS)):
+        before = base['results'].get(name)
+        after = new['results'].get(name)
+        row = {'name': name, 'base_ms': None, 'new_ms': None, 'change': None}
+        if before is None or after is None:
+            row['status'] = 'missing'
+        elif 'error' in before or 'error' in after:
+            row['status'] = 'error'
+        else:
+            row['base_ms'], row['new_ms'] = before['median_ms'], after['median_ms']
+            delta = row['new_ms'] - row['base_ms']
+            row['change'] = delta / row['base_ms'] if row['base_ms'] else None
+            if row['change'] is not None and row['change'] > threshold and delta > min_delta_ms:
+                row['status'] = 'regression'
+            elif row['change'] is not None and row['change'] < -threshold and -delta > min_delta_ms:
+                row['status'] = 'improved'
+            else:
+                row['status'] = 'ok'
+        rows.append(row)
+    return rows
+
+
+STATUS_LABELS = {'regression': '回退', 'improved': '提升', 'ok': '', 'missing': '缺少数据', 'error': '运行失败'}
+
+
+def print_comparison(base: dict, new: dict, rows: list[dict]) -> None:
+    print(f"基准: {base['created_at']} ({base.get('commit') or '未知提交'})")
+    print(f"当前: {new['created_at']} ({new.get('commit') or '未知提交'})")
+    if base.get('params') != new.get('params'):
+        print(f"注意：两次测试的规模参数不同，对比结果仅供参考\n  基准: {base.get('params')}\n  当前: {new.get('params')}")
+    print("基准测试" + ' ' * 18 + "基准(ms)    当前(ms)      变化  状态")
+    for row in rows:
+        base_text = '-' if row['base_ms'] is None else f"{row['base_ms']:.1f}"
+        new_text = '-' if row['new_ms'] is None else f"{row['new_ms']:.1f}"
+        change_text = '-' if row['change'] is None else f"{row['change']:+.0%}"
+        print(f"{row['name']:<22}{base_text:>12}{new_text:>12}{change_text:>10}  {STATUS_LABELS[row['status']]}")
+
+
+def print_results(result: dict) -> None:
+    # 表头中的中文占两列宽度，按显示宽度手工对齐
+    print("基准测试" + ' ' * 16 + "中位数(ms)    最小(ms)    最大(ms)  说明")
+    for name, record in result['results'].items():
+        if 'error' in record:
+            print(f"{name:<22}{'运行失败':>12}  {record['error']}")
+            continue
+        print(f"{name:<22}{record['median_ms']:>12.1f}{record['min_ms']:>12.1f}{record['max_ms']:>12.1f}  {record['label']}")
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='启动器操作基准测试')
+    subparsers = parser.add_subparsers(dest='command')
+
+    run_parser = subparsers.add_parser('run', help='运行基准测试（默认）')
+    run_parser.add_argument('--only', nargs='+', choices=list(BENCHMARKS), help='只运行指定的基准测试')
+    run_parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT, help='每个基准测试的计时次数')
+    run_parser.add_argument('--versions', type=int, default=DEFAULT_VERSIONS, help='合成的 QQ 版本目录数量')
+    run_parser.add_argument('--repo-files', type=int, default=DEFAULT_REPO_FILES, help='合成仓库中的文件数量')
+    run_parser.add_argument('--config-keys', type=int, default=DEFAULT_CONFIG_KEYS, help='合成配置文件的配置项数量')
+    run_parser.add_argument('--db-rows', type=int, default=DEFAULT_DB_ROWS, help='合成数据库的消息行数')
+    run_parser.add_argument('--output', type=Path, help='结果文件路径，默认保存到 runtime/benchmarks')
+    run_parser.add_argument('--compare', metavar='BASE', help='运行后与指定结果对比（可用 latest / previous）')
+    run_parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD, help='视为回退的变慢比例')
+    run_parser.add_argument('--keep', action='store_true', help='保留合成目录树')
+
+    compare_parser = subparsers.add_parser('compare', help='对比两次结果，有回退时返回非零退出码')
+    compare_parser.add_argument('base', help='基准结果（文件路径或 latest / previous）')
+    compare_parser.add_argument('new', nargs='?', default='latest', help='新结果，默认为最近一次')
+    compare_parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD, help='视为回退的变慢比例')
+    compare_parser.add_argument('--min-delta-ms', type=float, default=DEFAULT_MIN_DELTA_MS,
+                                help='变慢不超过该毫秒数时不视为回退')
+
+    subparsers.add_parser('list', help='列出基准测试和已保存的结果')
+    args = parser.parse_args(argv)
+
+    if args.command == 'list':
+        for name, (label, _, _) in BENCHMARKS.items():
+            print(f"{name:<20}{label}")
+        saved = list_results()
+        print(f"\n已保存 {len(saved)} 个结果" + (f"，最近一次: {saved[-1].name}" if saved else ''))
+        return 0
+
+    if args.command == 'compare':
+        try:
+            base_path, new_path = resolve_result(args.base), resolve_result(args.new)
+            base, new = load_result(base_path), load_result(new_path)
+        except (OSError, ValueError) as e:
+            logger.error(f"读取结果失败: {e}")
+            return 1
+        rows = compare_results(base, new, args.threshold, args.min_delta_ms)
+        print_comparison(base, new, rows)
+        return 1 if any(row['status'] == 'regression' for row in rows) else 0
+
+    if args.command is None:
+        args = parser.parse_args(['run'])
+    base_path = None
+    if args.compare:
+        # 先解析基准，避免 latest 指向本次刚保存的结果
+        try:
+            base_path = resolve_result(args.compare)
+        except FileNotFoundError as e:
+            logger.error(str(e))
+            return 1
+
+    params = {'versions': args.versions, 'repo_files': args.repo_files,
+              'config_keys': args.config_keys, 'db_rows': args.db_rows}
+    result = run_benchmarks(args.only or list(BENCHMARKS), params, args.repeat, args.keep)
+    if result is None:
+        return 1
+    path = save_result(result, args.output)
+    print()
+    print_results(result)
+    logger.info(f"结果已保存: {path}")
+
+    failed = any('error' in record for record in result['results'].values())
+    if base_path:
+        print()
+        try:
+            base = load_result(base_path)
+        except (OSError, ValueError) as e:
+            logger.error(f"读取基准结果失败: {e}")
+            return 1
+        rows = compare_results(base, result, args.threshold)
+        print_comparison(base, result, rows)
+        failed = failed or any(row['status'] == 'regression' for row in rows)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    try:
+        sys.exit(main())
+    except KeyboardInterrupt:
+        print("\n用户取消操作")
+        sys.exit(1)
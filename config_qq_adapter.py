@@ -1,11 +1,26 @@
 # -*- coding: utf-8 -*-
 """
 QQ适配器配置脚本
-用于首次运行时配置QQ适配器相关设置
+用于首次运行时配置QQ适配器相关设置，也可用于批量管理群聊/私聊白名单
+
+用法：
+- python config_qq_adapter.py: 首次运行配置向导
+- python config_qq_adapter.py import group|private <文件> [--replace]: 从 txt/csv/json 文件批量导入
+- python config_qq_adapter.py export group|private <文件>: 导出到 txt/csv/json 文件
+- python config_qq_adapter.py add|remove group|private <号码 ...>: 增量添加/移除
+- 以上命令均可附加 --instance <实例名> 操作指定实例的适配器配置
 """
+import argparse
+import csv
+import json
+import re
 import sys
 from pathlib import Path
-import toml
+from typing import Iterable, Iterator, Optional
+
+import tomlkit
+
+from safe_io import atomic_write_text, config_lock
 
 try:
     from modules.MaiBot.src.common.logger import get_logger
@@ -16,143 +31,516 @@ except ImportError:
     logger = logger.getLogger("qq_adapter_config")
 
 
-def get_config_path() -> Path:
-    """获取配置文件路径"""
+LIST_KEYS = {'group': 'group_list', 'private': 'private_list'}
+# QQ号/群号为 5 到 10 位数字
+QQ_ID_MIN = 10000
+QQ_ID_MAX = 9999999999
+ID_SEPARATORS = re.compile(r'[,，;；\s]+')
+# CSV 中优先识别的列名
+CSV_ID_COLUMNS = ('qq', 'id', 'group_id', 'user_id', 'qq号', '群号')
+
+
+def get_config_path(instance: Optional[str] = None) -> Path:
+    """获取配置文件路径
+
+    Args:
+        instance: 实例名称，None 表示默认实例
+    """
     script_dir = Path(__file__).parent
+    if instance:
+        return script_dir / "instances" / instance / "MaiBot-Napcat-Adapter" / "config.toml"
     config_path = script_dir / "modules" / "MaiBot-Napcat-Adapter" / "config.toml"
     return config_path
 
 
-def read_config_with_comments(file_path: Path) -> tuple[dict, list[str]]:
-    """读取配置文件,保留注释
-    
+_ARRAY_TOKEN = re.compile(r'[\[\]#"\']')
+
+
+def find_list_spans(text: str, section: str = 'chat') -> dict[str, tuple[int, int]]:
+    """在TOML文本中定位 [section] 下各名单数组的位置
+
+    逐行扫描，遇到数组时直接跳到数组末尾，支持跨多行的数组和数组内的注释，
+    不依赖完整解析，因此在数万个元素时依然很快
+
     Returns:
-        tuple: (配置字典, 原始文件行列表)
+        dict: 名单字段名 -> (起始位置, 结束位置)，包含两侧方括号；找不到的字段不出现
+    """
+    key_pattern = re.compile(r'\s*(' + '|'.join(map(re.escape, LIST_KEYS.values())) + r')\s*=\s*\[')
+    spans = {}
+    current_section = None
+    pos = 0
+    length = len(text)
+    while pos < length:
+        line_end = text.find('\n', pos)
+        if line_end == -1:
+            line_end = length
+        line = text[pos:line_end]
+        stripped = line.strip()
+        if stripped.startswith('['):
+            current_section = stripped.split('#', 1)[0].strip().strip('[]').strip()
+        elif current_section == section:
+            match = key_pattern.match(line)
+            if match:
+                start = pos + match.end() - 1
+                end = _find_array_end(text, start)
+                if end is None:
+                    break
+                spans[match.group(1)] = (start, end)
+                line_end = text.find('\n', end)
+                if line_end == -1:
+                    break
+        pos = line_end + 1
+    return spans
+
+
+def _find_array_end(text: str, start: int) -> Optional[int]:
+    """从 start 处的 '[' 开始查找与之匹配的 ']'，跳过字符串和注释"""
+    depth = 0
+    pos = start
+    while True:
+        match = _ARRAY_TOKEN.search(text, pos)
+        if not match:
+            return None
+        pos = match.start()
+        char = match.group()
+        if char == '#':
+            pos = text.find('\n', pos)
+            if pos == -1:
+                return None
+            continue
+        if char in ('"', "'"):
+            pos = text.find(char, pos + 1)
+            if pos == -1:
+                return None
+        elif char == '[':
+            depth += 1
+        else:
+            depth -= 1
+            if depth == 0:
+                return pos + 1
+        pos += 1
+
+
+def _parse_int_array(fragment: str) -> list[int]:
+    """解析只包含整数的TOML数组文本"""
+    body = re.sub(r'#[^\n]*', '', fragment)[1:-1]
+    values = []
+    for token in body.split(','):
+        token = token.strip()
+        if token:
+            values.append(int(token.replace('_', '')))
+    return values
+
+
+def read_qq_lists(file_path: Path) -> tuple[str, dict[str, list[int]]]:
+    """读取适配器配置中的群聊和私聊名单
+
+    Returns:
+        tuple: (原始文件内容, {'group_list': [...], 'private_list': [...]})
     """
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            lines = f.readlines()
-        
-        config = toml.load(file_path)
-        return config, lines
-        
+        text = file_path.read_text(encoding='utf-8')
+        spans = find_list_spans(text)
+        lists = {}
+        for key in LIST_KEYS.values():
+            span = spans.get(key)
+            lists[key] = _parse_int_array(text[span[0]:span[1]]) if span else []
+        return text, lists
+    except ValueError as e:
+        logger.error(f"名单中存在非数字的内容: {e}")
+        raise
     except Exception as e:
         logger.error(f"读取配置文件失败: {e}")
         raise
 
 
-def update_config_preserve_comments(file_path: Path, config: dict, original_lines: list[str]) -> bool:
-    """更新配置文件,保留注释
-    
+def parse_array_comments(fragment: str) -> tuple[dict[int, tuple[list[str], Optional[str]]], list[str]]:
+    """提取号码数组中的注释，重新生成数组时写回
+
+    单独一行的注释归属于其后的第一个号码，行尾注释归属于该行最后一个号码
+
+    Returns:
+        tuple: ({号码: (前置注释行, 行尾注释)}, 最后一个号码之后的注释行)
+    """
+    notes = {}
+    pending = []
+    for line in fragment[1:-1].split('\n'):
+        code, has_comment, comment = line.partition('#')
+        comment = f"#{comment}".rstrip() if has_comment else None
+        numbers = [int(token.replace('_', '')) for token in code.split(',') if token.strip()]
+        if not numbers:
+            if comment:
+                pending.append(comment)
+            continue
+        for number in numbers[:-1]:
+            notes[number] = (pending, None)
+            pending = []
+        notes[numbers[-1]] = (pending, comment)
+        pending = []
+    return notes, pending
+
+
+def render_int_array(values: list[int], comments: Optional[tuple[dict, list[str]]] = None) -> str:
+    """将号码列表渲染为每行一个元素的多行数组
+
+    Args:
+        values: 号码列表
+        comments: parse_array_comments 的结果，仍在名单中的号码保留原有注释
+    """
+    notes, tail = comments or ({}, [])
+    if not values and not tail:
+        return '[]'
+    lines = ['[']
+    for value in values:
+        leading, inline = notes.get(value, ((), None))
+        lines.extend(f'    {comment}' for comment in leading)
+        lines.append(f'    {value},  {inline}' if inline else f'    {value},')
+    lines.extend(f'    {comment}' for comment in tail)
+    return '\n'.join(lines) + '\n]'
+
+
+def collapse_list_arrays(text: str) -> tuple[str, dict[str, str]]:
+    """将配置文本中的名单数组替换为空数组
+
+    Returns:
+        tuple: (替换后的文本, 名单字段名 -> 原数组文本)
+    """
+    spans = find_list_spans(text)
+    fragments = {key: text[span[0]:span[1]] for key, span in spans.items()}
+    skeleton = text
+    for start, end in sorted(spans.values(), reverse=True):
+        skeleton = skeleton[:start] + '[]' + skeleton[end:]
+    return skeleton, fragments
+
+
+def update_config_preserve_comments(file_path: Path, lists: dict[str, list[int]], original_text: str,
+                                    overrides: Optional[dict[str, dict]] = None) -> bool:
+    """更新配置文件中的名单,保留注释
+
+    先把原文件中的名单数组替换为空数组，再交由 tomlkit 修改文档结构（保留注释和其他配置），
+    最后把占位值替换为多行数组文本，避免 tomlkit 逐个处理数万个元素；
+    数组内的注释跟随对应的号码保留，号码被移除时其注释一并移除
+
     Args:
         file_path: 配置文件路径
-        config: 更新后的配置字典
-        original_lines: 原始文件行列表
-        
+        lists: 要写入的名单，键为 group_list / private_list，未指定的名单保持原样
+        original_text: 原始文件内容
+        overrides: 需要同时修改的其他配置项，格式为 {section: {key: value}}
+
     Returns:
         bool: 是否成功
     """
     try:
-        new_lines = []
-        in_section = None
-        
-        for line in original_lines:
-            stripped = line.strip()
-            
-            # 检测section
-            if stripped.startswith('[') and stripped.endswith(']'):
-                section_name = stripped[1:-1].strip()
-                in_section = section_name
-                new_lines.append(line)
-                continue
-            
-            # 保留注释和空行
-            if stripped.startswith('#') or not stripped:
-                new_lines.append(line)
-                continue
-            
-            # 处理配置项
-            if '=' in line and in_section:
-                key = line.split('=')[0].strip()
-                
-                # 更新特定的配置项
-                if in_section == 'chat':
-                    if key == 'group_list':
-                        indent = len(line) - len(line.lstrip())
-                        group_list = config.get('chat', {}).get('group_list', [])
-                        new_lines.append(' ' * indent + f'group_list = {group_list}\n')
-                        continue
-                    elif key == 'private_list':
-                        indent = len(line) - len(line.lstrip())
-                        private_list = config.get('chat', {}).get('private_list', [])
-                        new_lines.append(' ' * indent + f'private_list = {private_list}\n')
-                        continue
-            
-            # 保留其他行
-            new_lines.append(line)
-        
-        # 写入文件
-        with open(file_path, 'w', encoding='utf-8') as f:
-            f.writelines(new_lines)
-        
+        skeleton, rendered = collapse_list_arrays(original_text)
+        rendered.update({key: render_int_array(values, parse_array_comments(rendered.get(key, '[]')))
+                         for key, values in lists.items()})
+
+        doc = tomlkit.parse(skeleton)
+        for section, values in (overrides or {}).items():
+            if section not in doc:
+                doc[section] = tomlkit.table()
+            for key, value in values.items():
+                doc[section][key] = value
+        if 'chat' not in doc:
+            doc['chat'] = tomlkit.table()
+        placeholders = {}
+        for key, text in rendered.items():
+            placeholder = f'__ONEKEY_{key.upper()}__'
+            doc['chat'][key] = placeholder
+            placeholders[f'"{placeholder}"'] = text
+
+        content = tomlkit.dumps(doc)
+        for placeholder, text in placeholders.items():
+            content = content.replace(placeholder, text, 1)
+
+        # 原子写入，并保留一份 .bak
+        atomic_write_text(file_path, content, backups=1)
+
         logger.info("配置文件已更新,注释已保留")
         return True
-        
+
     except Exception as e:
         logger.error(f"更新配置文件失败: {e}")
         return False
 
 
-def input_qq_list(prompt: str) -> list[int]:
+def validate_qq_id(value) -> Optional[int]:
+    """校验并转换单个QQ号/群号，无效时返回None"""
+    try:
+        qq_num = int(str(value).strip())
+    except ValueError:
+        return None
+    return qq_num if QQ_ID_MIN <= qq_num <= QQ_ID_MAX else None
+
+
+def _iter_text_tokens(lines: Iterable[str]) -> Iterator[str]:
+    for line in lines:
+        line = line.split('#', 1)[0]
+        yield from (token for token in ID_SEPARATORS.split(line) if token)
+
+
+def _iter_csv_tokens(f) -> Iterator[str]:
+    reader = csv.reader(f)
+    column = 0
+    for row_index, row in enumerate(reader):
+        if not row:
+            continue
+        if row_index == 0:
+            header = [cell.strip().lower() for cell in row]
+            matched = [i for i, cell in enumerate(header) if cell in CSV_ID_COLUMNS]
+            if matched:
+                column = matched[0]
+                continue
+            if validate_qq_id(row[column]) is None:
+                # 无法识别的表头，跳过
+                continue
+        if column < len(row):
+            yield row[column]
+
+
+def _iter_json_tokens(f, list_key: str, chunk_size: int = 1 << 16) -> Iterator:
+    """流式读取JSON数组中的元素；顶层为对象时读取其中的 list_key 字段"""
+    decoder = json.JSONDecoder()
+    buffer = f.read(chunk_size).lstrip()
+    if buffer.startswith('{'):
+        data = json.loads(buffer + f.read())
+        if list_key not in data:
+            raise ValueError(f"JSON 对象中没有 {list_key} 字段")
+        yield from data[list_key]
+        return
+    if not buffer.startswith('['):
+        raise ValueError("JSON 文件必须是号码数组，或包含名单字段的对象")
+    buffer = buffer[1:]
+    while True:
+        buffer = buffer.lstrip().lstrip(',').lstrip()
+        if buffer.startswith(']'):
+            return
+        try:
+            value, end = decoder.raw_decode(buffer)
+        except ValueError:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                raise ValueError("JSON 文件不完整")
+            buffer += chunk
+            continue
+        if end == len(buffer):
+            # 数字可能被分块截断，补充数据后重新解析
+            chunk = f.read(chunk_size)
+            if chunk:
+                buffer += chunk
+                continue
+        if isinstance(value, dict):
+            value = next((value[k] for k in CSV_ID_COLUMNS if k in value), None)
+        yield value
+        buffer = buffer[end:]
+
+
+def iter_ids_from_file(file_path: Path, list_key: str, stats: dict) -> Iterator[int]:
+    """按文件类型流式读取号码，跳过无效项
+
+    支持 .txt（任意分隔符，# 开头为注释）、.csv（识别 qq/id/群号 等列名，否则取第一列）、
+    .json（号码数组、对象数组，或包含 group_list/private_list 字段的对象）
+
+    Args:
+        file_path: 文件路径
+        list_key: 名单字段名，读取 JSON 对象时使用
+        stats: 统计信息，会累加 read 和 invalid 计数
+    """
+    suffix = file_path.suffix.lower()
+    with open(file_path, 'r', encoding='utf-8-sig', newline='') as f:
+        if suffix == '.csv':
+            tokens = _iter_csv_tokens(f)
+        elif suffix in ('.json', '.jsonl'):
+            tokens = _iter_json_tokens(f, list_key) if suffix == '.json' else (
+                json.loads(line) for line in f if line.strip()
+            )
+        else:
+            tokens = _iter_text_tokens(f)
+        for token in tokens:
+            stats['read'] += 1
+            qq_num = validate_qq_id(token)
+            if qq_num is None:
+                stats['invalid'] += 1
+                if len(stats['invalid_samples']) < 5:
+                    stats['invalid_samples'].append(str(token))
+                continue
+            yield qq_num
+
+
+def apply_list_diff(current: list[int], add: Iterable[int] = (), remove: Iterable[int] = ()) -> tuple[list[int], int, int]:
+    """对名单做增量修改，保持原有顺序并去重
+
+    Returns:
+        tuple: (新名单, 实际新增数量, 实际移除数量)
+    """
+    remove_set = set(remove)
+    result = []
+    seen = set()
+    for qq_num in current:
+        if qq_num in remove_set or qq_num in seen:
+            continue
+        seen.add(qq_num)
+        result.append(qq_num)
+    removed = len(set(current) & remove_set)
+    added = 0
+    for qq_num in add:
+        if qq_num not in seen and qq_num not in remove_set:
+            seen.add(qq_num)
+            result.append(qq_num)
+            added += 1
+    return result, added, removed
+
+
+def _new_stats() -> dict:
+    return {'read': 0, 'invalid': 0, 'invalid_samples': []}
+
+
+def modify_qq_list(list_name: str, add: Iterable[int] = (), remove: Iterable[int] = (),
+                   replace: bool = False, instance: Optional[str] = None) -> bool:
+    """修改适配器名单并写回配置
+
+    Args:
+        list_name: group 或 private
+        add: 要添加的号码
+        remove: 要移除的号码
+        replace: 为 True 时用 add 的内容整体替换原名单
+        instance: 实例名称，None 表示默认实例
+
+    Returns:
+        bool: 是否成功
+    """
+    key = LIST_KEYS[list_name]
+    config_path = get_config_path(instance)
+    if not config_path.exists():
+        logger.error(f"配置文件不存在: {config_path}")
+        return False
+    # 持有配置锁完成“读取-修改-写回”，避免与其他启动器或分片重新分配同时修改
+    with config_lock():
+        original_text, lists = read_qq_lists(config_path)
+        current = [] if replace else lists[key]
+        new_list, added, removed = apply_list_diff(current, add, remove)
+        if replace:
+            removed = len(set(lists[key]) - set(new_list))
+            added = len(set(new_list) - set(lists[key]))
+        if new_list == lists[key]:
+            logger.info(f"{key} 没有变化（共 {len(new_list)} 个）")
+            return True
+        if not update_config_preserve_comments(config_path, {key: new_list}, original_text):
+            return False
+    logger.info(f"{key} 已更新：新增 {added} 个，移除 {removed} 个，当前共 {len(new_list)} 个")
+    if list_name == 'group':
+        _rebalance_shards_if_enabled(instance)
+    return True
+
+
+def _rebalance_shards_if_enabled(instance: Optional[str]) -> None:
+    """群名单变化后，如启用了适配器分片则重新分配"""
+    from adapter_shards import get_shard_dirs, rebalance_shards
+    if get_shard_dirs(instance):
+        rebalance_shards(instance)
+
+
+def import_qq_list(list_name: str, file_path: Path, replace: bool = False,
+                   instance: Optional[str] = None) -> bool:
+    """从文件批量导入名单"""
+    if not file_path.exists():
+        logger.error(f"找不到文件: {file_path}")
+        return False
+    stats = _new_stats()
+    try:
+        ids = list(iter_ids_from_file(file_path, LIST_KEYS[list_name], stats))
+    except (ValueError, UnicodeDecodeError) as e:
+        logger.error(f"读取 {file_path} 失败: {e}")
+        return False
+    logger.info(f"从 {file_path.name} 读取 {stats['read']} 项，有效 {len(ids)} 项，"
+                f"去重后 {len(set(ids))} 项，无效 {stats['invalid']} 项")
+    if stats['invalid_samples']:
+        logger.warning(f"无效内容示例: {', '.join(stats['invalid_samples'])}")
+    return modify_qq_list(list_name, add=ids, replace=replace, instance=instance)
+
+
+def export_qq_list(list_name: str, file_path: Path, instance: Optional[str] = None) -> bool:
+    """将名单导出到文件，格式由扩展名决定（.txt/.csv/.json）"""
+    key = LIST_KEYS[list_name]
+    config_path = get_config_path(instance)
+    if not config_path.exists():
+        logger.error(f"配置文件不存在: {config_path}")
+        return False
+    _, lists = read_qq_lists(config_path)
+    values = lists[key]
+    suffix = file_path.suffix.lower()
+    with open(file_path, 'w', encoding='utf-8', newline='') as f:
+        if suffix == '.csv':
+            writer = csv.writer(f)
+            writer.writerow(['qq'])
+            writer.writerows([value] for value in values)
+        elif suffix == '.json':
+            json.dump(values, f)
+        else:
+            f.writelines(f'{value}\n' for value in values)
+    logger.info(f"已导出 {len(values)} 个号码到 {file_path}")
+    return True
+
+
+def input_qq_list(prompt: str, list_name: str) -> list[int]:
     """交互式输入QQ号列表
-    
+
+    支持一次粘贴多行，以空行结束；输入 @文件路径 可从 txt/csv/json 文件导入
+
     Args:
         prompt: 提示信息
-        
+        list_name: group 或 private，从 JSON 对象导入时读取对应的 group_list / private_list 字段
+
     Returns:
         list: QQ号列表
     """
     print(f"\n{prompt}")
-    print("请输入QQ号,多个号码用逗号或空格分隔")
+    print("请输入QQ号,多个号码用逗号、空格或换行分隔,输入空行结束")
+    print("也可以输入 @文件路径 从 txt/csv/json 文件导入")
     print("直接按回车跳过此项配置")
     print("-" * 50)
-    
-    user_input = input(">>> ").strip()
-    
-    if not user_input:
+
+    lines = []
+    while True:
+        line = input(">>> " if not lines else "... ").strip()
+        if not line:
+            break
+        lines.append(line)
+
+    if not lines:
         logger.info("用户跳过此项配置")
         return []
-    
-    # 支持逗号和空格分隔
+
+    stats = _new_stats()
     qq_list = []
-    separators = [',', '，', ' ', '\t']
-    
-    # 替换所有分隔符为空格
-    for sep in separators:
-        user_input = user_input.replace(sep, ' ')
-    
-    # 分割并转换为整数
-    parts = user_input.split()
-    for part in parts:
-        try:
-            qq_num = int(part.strip())
-            if qq_num > 0:
-                qq_list.append(qq_num)
+    for line in lines:
+        if line.startswith('@'):
+            file_path = Path(line[1:].strip().strip('"').strip("'"))
+            try:
+                qq_list.extend(iter_ids_from_file(file_path, LIST_KEYS[list_name], stats))
+            except (OSError, ValueError, UnicodeDecodeError) as e:
+                print(f"警告: 无法读取文件 '{file_path}': {e}")
+            continue
+        for token in _iter_text_tokens([line]):
+            stats['read'] += 1
+            qq_num = validate_qq_id(token)
+            if qq_num is None:
+                stats['invalid'] += 1
+                print(f"警告: 忽略无效的输入 '{token}'")
             else:
-                print(f"警告: 忽略无效的QQ号 '{part}'")
-        except ValueError:
-            print(f"警告: 忽略无效的输入 '{part}'")
-    
+                qq_list.append(qq_num)
+
+    qq_list, _, _ = apply_list_diff([], add=qq_list)
     if qq_list:
-        logger.info(f"已添加 {len(qq_list)} 个QQ号: {qq_list}")
+        logger.info(f"已添加 {len(qq_list)} 个QQ号")
         print(f"✓ 已添加 {len(qq_list)} 个号码")
-    
+
     return qq_list
 
 
 def configure_qq_adapter() -> bool:
     """配置QQ适配器
-    
+
     Returns:
         bool: 配置是否成功
     """
@@ -163,52 +551,109 @@ def configure_qq_adapter() -> bool:
         print("=" * 50)
         print("\n本向导将帮助您配置群聊和私聊白名单")
         print("白名单模式: 只有在名单中的群组/用户可以与机器人聊天")
-        
+
         # 获取配置文件路径
         config_path = get_config_path()
-        
+
         if not config_path.exists():
             logger.error(f"配置文件不存在: {config_path}")
             print(f"\n错误: 配置文件不存在")
             return False
-        
-        # 读取配置文件
-        config, original_lines = read_config_with_comments(config_path)
-        
-        # 确保chat section存在
-        if 'chat' not in config:
-            config['chat'] = {}
-        
+
         # 配置群聊白名单
-        group_list = input_qq_list("【群聊白名单配置】")
-        config['chat']['group_list'] = group_list
-        
+        group_list = input_qq_list("【群聊白名单配置】", 'group')
+
         # 配置私聊白名单
-        private_list = input_qq_list("【私聊白名单配置】")
-        config['chat']['private_list'] = private_list
-        
-        # 保存配置
-        print("\n正在保存配置...")
-        if update_config_preserve_comments(config_path, config, original_lines):
-            print("✓ 配置已保存")
-            print(f"\n配置文件位置: {config_path}")
-            print(f"群聊白名单: {len(group_list)} 个群组")
-            print(f"私聊白名单: {len(private_list)} 个用户")
-            logger.info("QQ适配器配置完成")
-            return True
-        else:
-            print("✗ 保存配置失败")
-            return False
-        
+        private_list = input_qq_list("【私聊白名单配置】", 'private')
+
+        return save_qq_lists(group_list, private_list, config_path)
+
     except Exception as e:
         logger.error(f"配置QQ适配器时发生错误: {e}")
         print(f"\n错误: {e}")
         return False
 
 
+def save_qq_lists(group_list: list[int], private_list: list[int], config_path: Optional[Path] = None) -> bool:
+    """保存向导中输入的群聊/私聊白名单
+
+    Args:
+        group_list: 群聊白名单
+        private_list: 私聊白名单
+        config_path: 适配器配置文件路径，默认为默认实例的配置
+
+    Returns:
+        bool: 是否保存成功
+    """
+    config_path = config_path or get_config_path()
+    if not config_path.exists():
+        logger.error(f"配置文件不存在: {config_path}")
+        print("\n错误: 配置文件不存在")
+        return False
+
+    print("\n正在保存配置...")
+    lists = {'group_list': group_list, 'private_list': private_list}
+    with config_lock():
+        # 输入完成后再读取配置文件，期间其他程序做的修改不会被覆盖
+        original_text, _ = read_qq_lists(config_path)
+        saved = update_config_preserve_comments(config_path, lists, original_text)
+    if saved:
+        print("✓ 配置已保存")
+        print(f"\n配置文件位置: {config_path}")
+        print(f"群聊白名单: {len(group_list)} 个群组")
+        print(f"私聊白名单: {len(private_list)} 个用户")
+        logger.info("QQ适配器配置完成")
+        return True
+    print("✗ 保存配置失败")
+    return False
+
+
+def run_list_command(argv: list[str]) -> bool:
+    """处理名单管理子命令"""
+    parser = argparse.ArgumentParser(description="QQ适配器名单管理")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    commands = {
+        'import': "从 txt/csv/json 文件导入",
+        'export': "导出到 txt/csv/json 文件",
+        'add': "添加号码",
+        'remove': "移除号码",
+    }
+    for command, help_text in commands.items():
+        sub = subparsers.add_parser(command, help=help_text)
+        sub.add_argument('list_name', choices=LIST_KEYS.keys(), help="group 为群聊名单，private 为私聊名单")
+        if command in ('import', 'export'):
+            sub.add_argument('file', type=Path)
+        else:
+            sub.add_argument('ids', nargs='+')
+        if command == 'import':
+            sub.add_argument('--replace', action='store_true', help="替换原名单而不是合并")
+        sub.add_argument('--instance', help="实例名称，不指定表示默认实例")
+    args = parser.parse_args(argv)
+
+    if args.command == 'import':
+        return import_qq_list(args.list_name, args.file, args.replace, args.instance)
+    if args.command == 'export':
+        return export_qq_list(args.list_name, args.file, args.instance)
+    stats = _new_stats()
+    ids = []
+    for token in _iter_text_tokens(args.ids):
+        qq_num = validate_qq_id(token)
+        if qq_num is None:
+            stats['invalid'] += 1
+            logger.warning(f"忽略无效的号码 '{token}'")
+        else:
+            ids.append(qq_num)
+    if args.command == 'add':
+        return modify_qq_list(args.list_name, add=ids, instance=args.instance)
+    return modify_qq_list(args.list_name, remove=ids, instance=args.instance)
+
+
 def main() -> None:
     """主函数"""
     try:
+        if len(sys.argv) > 1:
+            sys.exit(0 if run_list_command(sys.argv[1:]) else 1)
+
         if configure_qq_adapter():
             logger.info("QQ适配器配置成功")
             print("\nQQ适配器配置成功!")
@@ -216,7 +661,7 @@ def main() -> None:
             logger.error("QQ适配器配置失败")
             print("\nQQ适配器配置失败,请检查日志")
             sys.exit(1)
-            
+
     except KeyboardInterrupt:
         logger.info("用户中断配置过程")
         print("\n配置已被用户中断")
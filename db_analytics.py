@@ -0,0 +1,336 @@
+# -*- coding: utf-8 -*-
+"""
+数据库统计报表
+功能：以只读方式查询麦麦数据库，直接在命令行输出常用统计，不再需要打开数据库图形界面
+
+- chats: 最近 N 天每个聊天每天的消息数
+- users: 最近 N 天最活跃的用户
+- growth: 每天新增的记录数和数据库大小变化（大小来自备份清单）
+- query: 执行自定义只读 SQL
+- indexes: 查看上述报表的查询计划，--create 时创建推荐的覆盖索引并对比前后的查询计划
+
+报表使用 mode=ro 和 query_only 打开数据库，不会修改数据，可以在麦麦运行时执行
+
+用法：
+    python db_analytics.py chats [--days 7] [--json]
+    python db_analytics.py users [--days 7] [--limit 20]
+    python db_analytics.py growth [--days 30]
+    python db_analytics.py query "SELECT ..."
+    python db_analytics.py indexes [--create]
+    以上命令均支持 --instance NAME 或 --db PATH
+"""
+
+import argparse
+import json
+import sqlite3
+import sys
+from contextlib import closing
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+try:
+    from modules.MaiBot.src.common.logger import get_logger
+    logger = get_logger("db_analytics")
+except ImportError:
+    import logging as logger
+    logger.basicConfig(level=logger.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    logger = logger.getLogger("db_analytics")
+
+from db_maintenance import connect_db, format_size, is_db_in_use, quote_identifier, resolve_db_path
+from db_retention import discover_targets, get_cutoff_value
+
+USER_COLUMNS = ('user_id', 'sender_id', 'person_id')
+USER_NAME_COLUMNS = ('user_nickname', 'user_cardname', 'nickname')
+CHAT_NAME_COLUMNS = ('chat_info_group_name', 'group_name', 'chat_name')
+MESSAGE_TABLES = ('messages', 'message', 'chat_messages')
+INDEX_PREFIX = 'idx_onekey'
+
+
+def find_message_table(conn: sqlite3.Connection) -> Optional[dict]:
+    """识别消息表及报表用到的列
+
+    Returns:
+        Optional[dict]: discover_targets 的结果加上 user_column、user_name_column、chat_name_column，找不到返回 None
+    """
+    targets = discover_targets(conn)
+    if not targets:
+        return None
+    target = next((t for name in MESSAGE_TABLES for t in targets if t['table'].lower() == name), targets[0])
+    columns = {row[1].lower(): row[1] for row in conn.execute(f"PRAGMA table_info({quote_identifier(target['table'])})")}
+
+    def pick(candidates):
+        return next((columns[name] for name in candidates if name in columns), None)
+
+    target.update(user_column=pick(USER_COLUMNS), user_name_column=pick(USER_NAME_COLUMNS),
+                  chat_name_column=pick(CHAT_NAME_COLUMNS))
+    return target
+
+
+def _day_expression(target: dict) -> str:
+    column = quote_identifier(target['time_column'])
+    if target['time_format'] == 'epoch_ms':
+        return f"date({column} / 1000, 'unixepoch', 'localtime')"
+    if target['time_format'] == 'text':
+        return f"date({column})"
+    return f"date({column}, 'unixepoch', 'localtime')"
+
+
+def _chats_sql(target: dict) -> str:
+    table, time_column = quote_identifier(target['table']), quote_identifier(target['time_column'])
+    chat_column = quote_identifier(target['chat_column'])
+    name = f"MAX({quote_identifier(target['chat_name_column'])})" if target['chat_name_column'] else "''"
+    return (f"SELECT {chat_column} AS chat, {name} AS name, {_day_expression(target)} AS day, COUNT(*) AS messages "
+            f"FROM {table} WHERE {time_column} >= ? GROUP BY {chat_column}, day ORDER BY day DESC, messages DESC")
+
+
+def _users_sql(target: dict) -> str:
+    table, time_column = quote_identifier(target['table']), quote_identifier(target['time_column'])
+    user_column = quote_identifier(target['user_column'])
+    name = f"MAX({quote_identifier(target['user_name_column'])})" if target['user_name_column'] else "''"
+    chats = f"COUNT(DISTINCT {quote_identifier(target['chat_column'])})" if target['chat_column'] else "0"
+    return (f"SELECT {user_column} AS user, {name} AS name, COUNT(*) AS messages, {chats} AS chats "
+            f"FROM {table} WHERE {time_column} >= ? GROUP BY {user_column} ORDER BY messages DESC LIMIT ?")
+
+
+def _growth_sql(target: dict) -> str:
+    table, time_column = quote_identifier(target['table']), quote_identifier(target['time_column'])
+    return (f"SELECT {_day_expression(target)} AS day, COUNT(*) AS messages "
+            f"FROM {table} WHERE {time_column} >= ? GROUP BY day ORDER BY day")
+
+
+def report_chats(conn: sqlite3.Connection, target: dict, days: float) -> list[dict]:
+    """每个聊天每天的消息数"""
+    cutoff = get_cutoff_value(target['time_format'], days)
+    return [dict(row) for row in conn.execute(_chats_sql(target), (cutoff,))]
+
+
+def report_users(conn: sqlite3.Connection, target: dict, days: float, limit: int) -> list[dict]:
+    """最活跃的用户"""
+    if not target['user_column']:
+        logger.error(f"表 {target['table']} 没有可识别的用户列")
+        return []
+    cutoff = get_cutoff_value(target['time_format'], days)
+    return [dict(row) for row in conn.execute(_users_sql(target), (cutoff, limit))]
+
+
+def report_growth(conn: sqlite3.Connection, target: dict, db_path: Path, days: float) -> list[dict]:
+    """每天新增消息数、累计消息数，以及当天最后一次备份记录的数据库大小"""
+    from db_backup import get_backup_dir, load_manifest
+
+    cutoff = get_cutoff_value(target['time_format'], days)
+    table, time_column = quote_identifier(target['table']), quote_identifier(target['time_column'])
+    total = conn.execute(f"SELECT COUNT(*) FROM {table} WHERE {time_column} < ?", (cutoff,)).fetchone()[0]
+    sizes = {}
+    for entry in sorted(load_manifest(get_backup_dir(db_path)), key=lambda e: e['created_at']):
+        if not entry['file'].startswith(f"{db_path.stem}-"):
+            continue
+        sizes[datetime.fromtimestamp(entry['created_at']).strftime('%Y-%m-%d')] = entry['size']
+
+    rows = []
+    for row in conn.execute(_growth_sql(target), (cutoff,)):
+        total += row['messages']
+        rows.append({'day': row['day'], 'messages': row['messages'], 'total': total,
+                     'db_size': format_size(sizes[row['day']]) if row['day'] in sizes else '-'})
+    return rows
+
+
+def run_query(conn: sqlite3.Connection, sql: str, params: tuple = ()) -> list[dict]:
+    """执行只读 SQL（连接为 query_only，任何写操作都会被 SQLite 拒绝）"""
+    return [dict(row) for row in conn.execute(sql, params)]
+
+
+def recommended_indexes(target: dict) -> list[tuple[str, list[str]]]:
+    """报表查询的推荐覆盖索引：(索引名, 列)"""
+    indexes = []
+    if target['chat_column']:
+        indexes.append([target['time_column'], target['chat_column']]
+                       + ([target['chat_name_column']] if target['chat_name_column'] else []))
+    if target['user_column']:
+        indexes.append([target['time_column'], target['user_column']]
+                       + [c for c in (target['user_name_column'], target['chat_column']) if c])
+    return [(f"{INDEX_PREFIX}_{target['table']}_{'_'.join(columns)}", columns) for columns in indexes]
+
+
+def explain_reports(conn: sqlite3.Connection, target: dict) -> dict:
+    """获取各报表的查询计划"""
+    cutoff = get_cutoff_value(target['time_format'], 7)
+    queries = {'chats': (_chats_sql(target), (cutoff,)), 'growth': (_growth_sql(target), (cutoff,))}
+    if target['user_column']:
+        queries['users'] = (_users_sql(target), (cutoff, 20))
+    return {name: [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params)]
+            for name, (sql, params) in queries.items()}
+
+
+def create_indexes(db_path: Path, target: dict, force: bool = False) -> Optional[list[str]]:
+    """创建推荐的覆盖索引
+
+    建索引期间会持有写锁，麦麦运行时需要 --force
+
+    Returns:
+        Optional[list[str]]: 新建的索引名，失败返回 None
+    """
+    if is_db_in_use(db_path) and not force:
+        logger.error("麦麦正在使用数据库，建索引会阻塞麦麦写入，请先停止麦麦或加 --force")
+        return None
+    created = []
+    with closing(connect_db(db_path)) as conn:
+        existing = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+        for name, columns in recommended_indexes(target):
+            if name in existing:
+                continue
+            column_sql = ', '.join(quote_identifier(column) for column in columns)
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {quote_identifier(name)} "
+                         f"ON {quote_identifier(target['table'])} ({column_sql})")
+            created.append(name)
+        conn.execute("PRAGMA optimize")
+    return created
+
+
+def print_rows(rows: list[dict]) -> None:
+    """以对齐的表格输出查询结果"""
+    if not rows:
+        print("没有数据")
+        return
+    columns = list(rows[0].keys())
+    cells = [[('' if row[c] is None else str(row[c])) for c in columns] for row in rows]
+    widths = [max(len(str(c)), *(len(cell[i]) for cell in cells)) for i, c in enumerate(columns)]
+    print('  '.join(str(c).ljust(w) for c, w in zip(columns, widths)))
+    print('  '.join('-' * w for w in widths))
+    for cell in cells:
+        print('  '.join(value.ljust(w) for value, w in zip(cell, widths)))
+
+
+def _print_plans(plans: dict) -> None:
+    for name, steps in plans.items():
+        print(f"[{name}]")
+        for step in steps:
+            print(f"  {step}")
+
+
+def _open_readonly(db_path: Path) -> sqlite3.Connection:
+    conn = connect_db(db_path, readonly=True)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def interactive_analytics_menu() -> bool:
+    """数据库统计交互菜单（默认实例）"""
+    db_path = resolve_db_path()
+    if not db_path.exists():
+        logger.error(f"数据库文件不存在: {db_path}")
+        return False
+    while True:
+        print("\n=== 数据库统计 ===")
+        print("1. 最近 7 天每个聊天每天的消息数")
+        print("2. 最近 7 天最活跃的用户")
+        print("3. 最近 30 天数据增长")
+        print("4. 执行只读 SQL")
+        print("0. 返回主菜单")
+        choice = input("请选择操作: ").strip()
+        if choice == '0':
+            return True
+        try:
+            with closing(_open_readonly(db_path)) as conn:
+                target = find_message_table(conn)
+                if not target:
+                    logger.error("没有找到消息表")
+                    return False
+                if choice == '1':
+                    print_rows(report_chats(conn, target, 7))
+                elif choice == '2':
+                    print_rows(report_users(conn, target, 7, 20))
+                elif choice == '3':
+                    print_rows(report_growth(conn, target, db_path, 30))
+                elif choice == '4':
+                    sql = input("请输入 SQL: ").strip()
+                    if sql:
+                        print_rows(run_query(conn, sql))
+                else:
+                    logger.error("无效选择")
+        except sqlite3.Error as e:
+            logger.error(f"查询失败: {e}")
+
+
+def main() -> int:
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description="麦麦数据库统计报表（只读）")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    chats_parser = subparsers.add_parser('chats', help="每个聊天每天的消息数")
+    chats_parser.add_argument('--days', type=float, default=7)
+    users_parser = subparsers.add_parser('users', help="最活跃的用户")
+    users_parser.add_argument('--days', type=float, default=7)
+    users_parser.add_argument('--limit', type=int, default=20)
+    growth_parser = subparsers.add_parser('growth', help="数据增长")
+    growth_parser.add_argument('--days', type=float, default=30)
+    query_parser = subparsers.add_parser('query', help="执行只读 SQL")
+    query_parser.add_argument('sql')
+    indexes_parser = subparsers.add_parser('indexes', help="查看查询计划并可创建推荐索引")
+    indexes_parser.add_argument('--create', action='store_true', help="创建推荐的覆盖索引")
+    indexes_parser.add_argument('--force', action='store_true', help="麦麦运行时也创建索引")
+    for sub in subparsers.choices.values():
+        sub.add_argument('--json', action='store_true', help="以 JSON 格式输出")
+        sub.add_argument('--instance', help="实例名称，不指定表示默认实例")
+        sub.add_argument('--db', help="直接指定数据库文件路径")
+    args = parser.parse_args()
+
+    db_path = resolve_db_path(args.db, args.instance)
+    if not db_path.exists():
+        logger.error(f"数据库文件不存在: {db_path}")
+        return 1
+
+    try:
+        with closing(_open_readonly(db_path)) as conn:
+            if args.command == 'query':
+                rows = run_query(conn, args.sql)
+            else:
+                target = find_message_table(conn)
+                if not target:
+                    logger.error("没有找到消息表")
+                    return 1
+                if args.command == 'chats':
+                    rows = report_chats(conn, target, args.days)
+                elif args.command == 'users':
+                    rows = report_users(conn, target, args.days, args.limit)
+                elif args.command == 'growth':
+                    rows = report_growth(conn, target, db_path, args.days)
+                else:
+                    before = explain_reports(conn, target)
+        if args.command == 'indexes':
+            result = {'indexes': [{'name': name, 'columns': columns} for name, columns in recommended_indexes(target)],
+                      'before': before}
+            if args.create:
+                created = create_indexes(db_path, target, args.force)
+                if created is None:
+                    return 1
+                with closing(_open_readonly(db_path)) as conn:
+                    result.update(created=created, after=explain_reports(conn, target))
+            if args.json:
+                print(json.dumps(result, indent=2, ensure_ascii=False))
+                return 0
+            print("推荐索引:")
+            for index in result['indexes']:
+                print(f"  {index['name']} ({', '.join(index['columns'])})")
+            print("\n当前查询计划:")
+            _print_plans(before)
+            if args.create:
+                print(f"\n已创建 {len(result['created'])} 个索引，新的查询计划:")
+                _print_plans(result['after'])
+            return 0
+    except sqlite3.Error as e:
+        logger.error(f"查询失败: {e}")
+        return 1
+
+    if args.json:
+        print(json.dumps(rows, indent=2, ensure_ascii=False))
+    else:
+        print_rows(rows)
+    return 0
+
+
+if __name__ == "__main__":
+    try:
+        sys.exit(main())
+    except KeyboardInterrupt:
+        print("\n用户取消操作")
+        sys.exit(1)
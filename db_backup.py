@@ -0,0 +1,404 @@
+# -*- coding: utf-8 -*-
+"""
+数据库备份工具
+功能：在线备份麦麦的 SQLite 数据库，压缩保存到 data/backups/，按保留策略清理旧备份，并支持快速恢复
+
+- 使用 SQLite 在线备份 API 分批复制页面，每批之间释放锁，不会长时间阻塞正在运行的麦麦
+- 在线备份先写入备份目录中的未压缩临时文件，再流式计算内容哈希并用 gzip 压缩，压缩完成后立即删除临时文件；
+  SQLite 的在线备份只能写入另一个数据库文件，因此备份期间需要约"数据库大小 + 压缩后大小"的空闲空间，不足时不会开始备份
+- 内容与最近一次备份相同时不重复保存
+- 保留策略：最近 N 小时每小时一份、最近 N 天每天一份、最近 N 周每周一份；删库前等操作自动生成的快照会被固定保留
+- 恢复时先校验哈希，再原子替换数据库文件，恢复前会为当前数据库再做一次快照
+
+用法：
+    python db_backup.py create [--reason 说明]
+    python db_backup.py list [--json]
+    python db_backup.py restore [文件名|latest]
+    python db_backup.py prune [--hourly 24] [--daily 7] [--weekly 4]
+    以上命令均支持 --instance NAME（多实例）或 --db PATH（指定数据库文件）
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from contextlib import closing
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+try:
+    from modules.MaiBot.src.common.logger import get_logger
+    logger = get_logger("db_backup")
+except ImportError:
+    import logging as logger
+    logger.basicConfig(level=logger.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    logger = logger.getLogger("db_backup")
+
+from db_maintenance import connect_db, format_size, is_db_in_use, resolve_db_path
+from safe_io import atomic_write_json, config_lock
+
+BACKUP_DIR_NAME = 'backups'
+MANIFEST_NAME = 'backups.json'
+# 在线备份每批复制的页数及批间休眠，批间会释放读锁让麦麦写入
+BACKUP_PAGES_PER_STEP = 1024
+BACKUP_STEP_SLEEP = 0.005
+CHUNK_SIZE = 1024 * 1024
+COMPRESS_LEVEL = 6
+# 没有历史备份可参考时估计的压缩率，用于检查空闲空间
+DEFAULT_COMPRESS_RATIO = 0.5
+DEFAULT_RETENTION = {'hourly': 24, 'daily': 7, 'weekly': 4}
+
+
+def get_backup_dir(db_path: Path) -> Path:
+    """备份目录：数据库所在 data 目录下的 backups/"""
+    return Path(db_path).parent / BACKUP_DIR_NAME
+
+
+def _manifest_lock(backup_dir: Path):
+    return config_lock(backup_dir / '.lock')
+
+
+def load_manifest(backup_dir: Path) -> list[dict]:
+    """读取备份清单，按创建时间从新到旧排列（只保留文件仍存在的记录）"""
+    try:
+        with open(backup_dir / MANIFEST_NAME, 'r', encoding='utf-8') as f:
+            entries = json.load(f).get('backups', [])
+    except (OSError, ValueError):
+        entries = []
+    entries = [entry for entry in entries if (backup_dir / entry['file']).exists()]
+    return sorted(entries, key=lambda entry: entry['created_at'], reverse=True)
+
+
+def _save_manifest(backup_dir: Path, entries: list[dict]) -> None:
+    atomic_write_json(backup_dir / MANIFEST_NAME, {'backups': entries}, indent=2, ensure_ascii=False)
+
+
+def online_copy(db_path: Path, target: Path) -> None:
+    """用在线备份 API 分批复制数据库到临时文件"""
+    def progress(status, remaining, total):
+        if total:
+            print(f"\r正在复制数据库页面: {total - remaining}/{total}", end='', flush=True)
+
+    with closing(connect_db(db_path, readonly=True)) as src, closing(sqlite3.connect(str(target))) as dst:
+        src.backup(dst, pages=BACKUP_PAGES_PER_STEP, progress=progress, sleep=BACKUP_STEP_SLEEP)
+        # 备份文件统一使用回滚日志模式，恢复后由麦麦自行切换
+        dst.execute("PRAGMA journal_mode = DELETE")
+    print()
+
+
+def _compress(source: Path, target: Path) -> tuple[str, int]:
+    """流式压缩并计算原始内容的 sha256
+
+    Returns:
+        tuple: (sha256, 原始大小)
+    """
+    digest = hashlib.sha256()
+    size = 0
+    with open(source, 'rb') as src, open(target, 'wb') as raw:
+        with gzip.GzipFile(filename='', mode='wb', fileobj=raw, compresslevel=COMPRESS_LEVEL, mtime=0) as dst:
+            while chunk := src.read(CHUNK_SIZE):
+                digest.update(chunk)
+                size += len(chunk)
+                dst.write(chunk)
+        raw.flush()
+        os.fsync(raw.fileno())
+    return digest.hexdigest(), size
+
+
+def check_free_space(db_path: Path, backup_dir: Path) -> bool:
+    """检查备份目录所在磁盘是否放得下临时快照和压缩后的备份
+
+    压缩后的大小按最近一次备份的压缩率估计
+    """
+    size = sum(path.stat().st_size for path in (db_path, db_path.with_name(db_path.name + '-wal')) if path.exists())
+    latest = next(iter(load_manifest(backup_dir)), None)
+    ratio = latest['compressed_size'] / latest['size'] if latest and latest['size'] else DEFAULT_COMPRESS_RATIO
+    required = int(size * (1 + ratio))
+    free = shutil.disk_usage(backup_dir).free
+    if free < required:
+        logger.error(f"磁盘空间不足：备份约需 {format_size(required)}（临时快照 {format_size(size)} + 压缩文件），"
+                     f"{backup_dir} 所在磁盘仅剩 {format_size(free)}")
+        return False
+    return True
+
+
+def create_backup(db_path: Path, reason: str = 'manual', pinned: bool = False) -> Optional[dict]:
+    """创建一份压缩备份
+
+    先在线备份到临时文件再压缩，开始前检查空闲空间
+
+    Args:
+        db_path: 数据库路径
+        reason: 备份原因，记录在清单中
+        pinned: 是否固定保留（不参与保留策略清理）
+
+    Returns:
+        Optional[dict]: 备份记录；数据库不存在或备份失败返回 None
+    """
+    db_path = Path(db_path)
+    if not db_path.exists():
+        logger.error(f"数据库文件不存在: {db_path}")
+        return None
+    backup_dir = get_backup_dir(db_path)
+    backup_dir.mkdir(parents=True, exist_ok=True)
+    if not check_free_space(db_path, backup_dir):
+        return None
+
+    start = time.perf_counter()
+    created_at = time.time()
+    name = f"{db_path.stem}-{datetime.fromtimestamp(created_at).strftime('%Y%m%d-%H%M%S')}.db.gz"
+    fd, tmp_db = tempfile.mkstemp(prefix='.snapshot-', suffix='.db', dir=backup_dir)
+    os.close(fd)
+    tmp_gz = backup_dir / f".{name}.tmp"
+    try:
+        online_copy(db_path, Path(tmp_db))
+        sha256, size = _compress(Path(tmp_db), tmp_gz)
+        Path(tmp_db).unlink()  # 压缩完成后立即释放临时快照占用的空间
+        with _manifest_lock(backup_dir):
+            entries = load_manifest(backup_dir)
+            latest = entries[0] if entries else None
+            if latest and latest['sha256'] == sha256 and not pinned:
+                logger.info(f"数据库内容与最近的备份 {latest['file']} 相同，跳过本次备份")
+                return latest
+            if (backup_dir / name).exists():
+                name = name.replace('.db.gz', f"-{sha256[:8]}.db.gz")
+            os.replace(tmp_gz, backup_dir / name)
+            entry = {
+                'file': name,
+                'created_at': created_at,
+                'sha256': sha256,
+                'size': size,
+                'compressed_size': (backup_dir / name).stat().st_size,
+                'reason': reason,
+                'pinned': pinned,
+            }
+            entries.insert(0, entry)
+            _save_manifest(backup_dir, entries)
+    except (sqlite3.Error, OSError) as e:
+        logger.error(f"备份数据库失败: {e}")
+        return None
+    finally:
+        for leftover in (Path(tmp_db), tmp_gz):
+            if leftover.exists():
+                leftover.unlink()
+
+    logger.info(f"已备份到 {backup_dir / name}（{format_size(size)} → {format_size(entry['compressed_size'])}，"
+                f"耗时 {time.perf_counter() - start:.2f} 秒）")
+    return entry
+
+
+def select_expired(entries: list[dict], hourly: int, daily: int, weekly: int, now: Optional[float] = None) -> list[dict]:
+    """按保留策略挑出应删除的备份
+
+    每个时间段（小时/天/周）只保留最新的一份，最新备份和固定备份始终保留
+
+    Args:
+        entries: 备份记录，从新到旧排列
+        hourly: 保留最近多少小时的每小时备份
+        daily: 保留最近多少天的每日备份
+        weekly: 保留最近多少周的每周备份
+        now: 当前时间戳，默认 time.time()
+
+    Returns:
+        list[dict]: 应删除的备份记录
+    """
+    now = time.time() if now is None else now
+    keep = set()
+    seen_buckets = set()
+    for index, entry in enumerate(entries):
+        if entry.get('pinned'):
+            keep.add(entry['file'])
+            continue
+        if index == 0:
+            keep.add(entry['file'])
+        age = now - entry['created_at']
+        moment = datetime.fromtimestamp(entry['created_at'])
+        year, week, _ = moment.isocalendar()
+        for kind, limit, span, bucket in (
+            ('hourly', hourly, 3600, moment.strftime('%Y%m%d%H')),
+            ('daily', daily, 86400, moment.strftime('%Y%m%d')),
+            ('weekly', weekly, 7 * 86400, f"{year}W{week}"),
+        ):
+            if age < limit * span and (kind, bucket) not in seen_buckets:
+                seen_buckets.add((kind, bucket))
+                keep.add(entry['file'])
+    return [entry for entry in entries if entry['file'] not in keep]
+
+
+def prune_backups(db_path: Path, hourly: int = DEFAULT_RETENTION['hourly'], daily: int = DEFAULT_RETENTION['daily'],
+                  weekly: int = DEFAULT_RETENTION['weekly']) -> int:
+    """按保留策略删除旧备份
+
+    Returns:
+        int: 删除的备份数量
+    """
+    backup_dir = get_backup_dir(db_path)
+    with _manifest_lock(backup_dir):
+        entries = load_manifest(backup_dir)
+        expired = select_expired(entries, hourly, daily, weekly)
+        for entry in expired:
+            (backup_dir / entry['file']).unlink(missing_ok=True)
+        expired_files = {entry['file'] for entry in expired}
+        _save_manifest(backup_dir, [entry for entry in entries if entry['file'] not in expired_files])
+    freed = sum(entry['compressed_size'] for entry in expired)
+    logger.info(f"已清理 {len(expired)} 份旧备份，释放 {format_size(freed)}，剩余 {len(entries) - len(expired)} 份")
+    return len(expired)
+
+
+def find_backup(db_path: Path, name: str = 'latest') -> Optional[dict]:
+    """按文件名查找备份，latest 表示最新一份"""
+    entries = load_manifest(get_backup_dir(db_path))
+    if not entries:
+        return None
+    if name == 'latest':
+        return entries[0]
+    return next((entry for entry in entries if entry['file'] == name), None)
+
+
+def restore_backup(db_path: Path, name: str = 'latest', force: bool = False) -> bool:
+    """从备份恢复数据库
+
+    Args:
+        db_path: 数据库路径
+        name: 备份文件名，latest 表示最新一份
+        force: 数据库正被使用时也强制恢复
+
+    Returns:
+        bool: 是否成功
+    """
+    db_path = Path(db_path)
+    entry = find_backup(db_path, name)
+    if not entry:
+        logger.error(f"找不到备份: {name}")
+        return False
+    if db_path.exists() and is_db_in_use(db_path) and not force:
+        logger.error("麦麦正在使用数据库，请先停止麦麦再恢复备份")
+        return False
+
+    backup_dir = get_backup_dir(db_path)
+    # 恢复前为当前数据库做快照，恢复操作本身也可以撤销
+    if db_path.exists() and not create_backup(db_path, reason=f"恢复 {entry['file']} 前的快照", pinned=True):
+        logger.error("为当前数据库创建快照失败，已取消恢复")
+        return False
+
+    start = time.perf_counter()
+    fd, tmp_path = tempfile.mkstemp(prefix=f'.{db_path.name}.', suffix='.restore', dir=db_path.parent)
+    digest = hashlib.sha256()
+    try:
+        with gzip.open(backup_dir / entry['file'], 'rb') as src, os.fdopen(fd, 'wb') as dst:
+            while chunk := src.read(CHUNK_SIZE):
+                digest.update(chunk)
+                dst.write(chunk)
+            dst.flush()
+            os.fsync(dst.fileno())
+        if digest.hexdigest() != entry['sha256']:
+            logger.error(f"备份文件校验失败，可能已损坏: {entry['file']}")
+            return False
+        # 旧的 WAL 属于被替换的数据库，必须删除，否则会被错误地应用到恢复后的数据库
+        for suffix in ('-wal', '-shm'):
+            Path(str(db_path) + suffix).unlink(missing_ok=True)
+        os.replace(tmp_path, db_path)
+    except (OSError, EOFError, gzip.BadGzipFile) as e:
+        logger.error(f"恢复备份失败: {e}")
+        return False
+    finally:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+
+    logger.info(f"已从 {entry['file']} 恢复数据库，耗时 {time.perf_counter() - start:.2f} 秒")
+    return True
+
+
+def print_backups(entries: list[dict]) -> None:
+    if not entries:
+        print("暂无备份")
+        return
+    print(f"{'文件名':<36}{'创建时间':<22}{'原始大小':>12}{'压缩后':>12}  原因")
+    for entry in entries:
+        created = datetime.fromtimestamp(entry['created_at']).strftime('%Y-%m-%d %H:%M:%S')
+        pinned = ' [固定]' if entry.get('pinned') else ''
+        print(f"{entry['file']:<36}{created:<22}{format_size(entry['size']):>12}"
+              f"{format_size(entry['compressed_size']):>12}  {entry['reason']}{pinned}")
+
+
+def interactive_backup_menu() -> bool:
+    """数据库备份交互菜单（默认实例）"""
+    db_path = resolve_db_path()
+    while True:
+        print("\n=== 数据库备份与恢复 ===")
+        print("1. 立即备份")
+        print("2. 查看备份列表")
+        print("3. 从备份恢复")
+        print("4. 按保留策略清理旧备份")
+        print("0. 返回主菜单")
+        choice = input("请选择操作: ").strip()
+        if choice == '0':
+            return True
+        if choice == '1':
+            create_backup(db_path)
+        elif choice == '2':
+            print_backups(load_manifest(get_backup_dir(db_path)))
+        elif choice == '3':
+            entries = load_manifest(get_backup_dir(db_path))
+            print_backups(entries)
+            if not entries:
+                continue
+            name = input("请输入要恢复的备份文件名（直接回车恢复最新一份）: ").strip() or 'latest'
+            confirm = input("恢复会覆盖当前数据库（当前数据库会先自动备份），确定吗？(y/N): ").strip().lower()
+            if confirm == 'y':
+                restore_backup(db_path, name)
+        elif choice == '4':
+            prune_backups(db_path)
+        else:
+            logger.error("无效选择")
+
+
+def main() -> int:
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description="麦麦数据库备份与恢复")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    create_parser = subparsers.add_parser('create', help="立即备份")
+    create_parser.add_argument('--reason', default='manual', help="备份说明")
+    create_parser.add_argument('--pin', action='store_true', help="固定保留，不参与自动清理")
+    list_parser = subparsers.add_parser('list', help="查看备份列表")
+    list_parser.add_argument('--json', action='store_true', help="以 JSON 格式输出")
+    restore_parser = subparsers.add_parser('restore', help="从备份恢复")
+    restore_parser.add_argument('name', nargs='?', default='latest', help="备份文件名，默认最新一份")
+    restore_parser.add_argument('--force', action='store_true', help="数据库正被使用时也强制恢复")
+    prune_parser = subparsers.add_parser('prune', help="按保留策略清理旧备份")
+    for kind, default in DEFAULT_RETENTION.items():
+        prune_parser.add_argument(f'--{kind}', type=int, default=default)
+    for sub in subparsers.choices.values():
+        sub.add_argument('--instance', help="实例名称，不指定表示默认实例")
+        sub.add_argument('--db', help="直接指定数据库文件路径")
+    args = parser.parse_args()
+
+    db_path = resolve_db_path(args.db, args.instance)
+    if args.command == 'create':
+        return 0 if create_backup(db_path, args.reason, args.pin) else 1
+    if args.command == 'restore':
+        return 0 if restore_backup(db_path, args.name, args.force) else 1
+    if args.command == 'prune':
+        prune_backups(db_path, args.hourly, args.daily, args.weekly)
+        return 0
+    entries = load_manifest(get_backup_dir(db_path))
+    if args.json:
+        print(json.dumps(entries, indent=2, ensure_ascii=False))
+    else:
+        print_backups(entries)
+    return 0
+
+
+if __name__ == "__main__":
+    try:
+        sys.exit(main())
+    except KeyboardInterrupt:
+        print("\n用户取消操作")
+        sys.exit(1)
@@ -0,0 +1,462 @@
+# -*- coding: utf-8 -*-
+"""
+数据库维护工具
+功能：检查和优化麦麦的 SQLite 数据库（modules/MaiBot/data/MaiBot.db）
+
+- report: 页数、空闲页、碎片率，各表行数和占用空间（SQLite 支持 dbstat 时统计到表和索引）
+- analyze: 执行 ANALYZE 和 PRAGMA optimize 更新查询计划统计信息
+- vacuum: 整理数据库文件，支持完整 VACUUM 和增量 VACUUM
+- checkpoint: 把 WAL 日志合并回数据库文件
+
+麦麦正在运行时只执行不阻塞麦麦的在线操作（限量 ANALYZE、PASSIVE 检查点、分批增量 VACUUM），
+完整 VACUUM 会被拒绝，除非使用 --force
+
+用法：
+    python db_maintenance.py report [--json]
+    python db_maintenance.py analyze
+    python db_maintenance.py vacuum [--incremental [PAGES]] [--enable-incremental] [--force]
+    python db_maintenance.py checkpoint
+    python db_maintenance.py all
+    以上命令均支持 --instance NAME（多实例）或 --db PATH（指定数据库文件）
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import time
+from contextlib import closing
+from pathlib import Path
+from typing import Optional
+
+try:
+    from modules.MaiBot.src.common.logger import get_logger
+    logger = get_logger("db_maintenance")
+except ImportError:
+    import logging as logger
+    logger.basicConfig(level=logger.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    logger = logger.getLogger("db_maintenance")
+
+from instance_manager import MAIBOT_DIR, get_instance_dir
+
+DB_RELATIVE_PATH = Path('data') / 'MaiBot.db'
+# 在线操作时等待麦麦释放写锁的最长时间（毫秒）
+BUSY_TIMEOUT_MS = 5000
+# 在线 ANALYZE 每个索引最多采样的行数
+ONLINE_ANALYSIS_LIMIT = 1000
+# 增量 VACUUM 每个事务释放的页数，控制单次持有写锁的时间
+INCREMENTAL_VACUUM_STEP = 1000
+AUTO_VACUUM_MODES = {0: 'NONE', 1: 'FULL', 2: 'INCREMENTAL'}
+
+
+def get_db_path(instance: Optional[str] = None) -> Path:
+    """获取麦麦数据库路径
+
+    Args:
+        instance: 实例名称，None 表示默认实例
+
+    Returns:
+        Path: 数据库文件路径
+    """
+    maibot_dir = get_instance_dir(instance) / 'MaiBot' if instance else MAIBOT_DIR
+    return maibot_dir / DB_RELATIVE_PATH
+
+
+def resolve_db_path(db: Optional[str] = None, instance: Optional[str] = None) -> Path:
+    """命令行参数 --db 优先，其次为实例数据库"""
+    return Path(db).absolute() if db else get_db_path(instance)
+
+
+def connect_db(db_path: Path, readonly: bool = False) -> sqlite3.Connection:
+    """打开数据库连接
+
+    Args:
+        db_path: 数据库文件路径
+        readonly: 是否以只读模式打开（mode=ro，并开启 query_only）
+
+    Returns:
+        sqlite3.Connection: 自动提交模式的连接，由调用方自行管理事务
+    """
+    uri = Path(db_path).absolute().as_uri() + ('?mode=ro' if readonly else '?mode=rw')
+    conn = sqlite3.connect(uri, uri=True, isolation_level=None, timeout=BUSY_TIMEOUT_MS / 1000)
+    conn.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+    if readonly:
+        conn.execute("PRAGMA query_only = ON")
+    return conn
+
+
+def quote_identifier(name: str) -> str:
+    """给表名、列名加双引号，用于拼接 SQL"""
+    return '"' + name.replace('"', '""') + '"'
+
+
+def format_size(size: float) -> str:
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if size < 1024 or unit == 'GB':
+            return f"{size:.0f} {unit}" if unit == 'B' else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GB"
+
+
+def _processes_holding(db_path: Path) -> Optional[list[int]]:
+    """返回打开了数据库文件的进程，psutil 不可用时返回 None"""
+    try:
+        import psutil
+    except ImportError:
+        return None
+    target = os.path.normcase(str(Path(db_path).resolve()))
+    holders = []
+    for proc in psutil.process_iter(['pid', 'name']):
+        if proc.info['pid'] == os.getpid() or 'python' not in (proc.info['name'] or '').lower():
+            continue
+        try:
+            if any(os.path.normcase(f.path) == target for f in proc.open_files()):
+                holders.append(proc.info['pid'])
+        except (psutil.Error, OSError):
+            continue
+    return holders
+
+
+def is_db_in_use(db_path: Path) -> bool:
+    """判断数据库是否正被其他进程（通常是麦麦）使用
+
+    优先用 psutil 检查打开该文件的进程；不可用时根据 WAL 共享内存文件和写锁探测判断
+    """
+    holders = _processes_holding(db_path)
+    if holders:
+        return True
+    if holders is None and Path(str(db_path) + '-shm').exists():
+        return True
+    # 探测是否有进行中的写事务
+    try:
+        uri = Path(db_path).absolute().as_uri() + '?mode=rw'
+        with closing(sqlite3.connect(uri, uri=True, isolation_level=None, timeout=0)) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("ROLLBACK")
+    except sqlite3.OperationalError:
+        return True
+    return False
+
+
+def _file_size(db_path: Path) -> int:
+    size = 0
+    for suffix in ('', '-wal'):
+        path = Path(str(db_path) + suffix)
+        if path.exists():
+            size += path.stat().st_size
+    return size
+
+
+def get_db_stats(conn: sqlite3.Connection, db_path: Path) -> dict:
+    """获取数据库整体统计：页大小、页数、空闲页、碎片率、日志模式"""
+    page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+    page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+    freelist = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    auto_vacuum = conn.execute("PRAGMA auto_vacuum").fetchone()[0]
+    return {
+        'path': str(db_path),
+        'file_size': _file_size(db_path),
+        'page_size': page_size,
+        'page_count': page_count,
+        'freelist_count': freelist,
+        'fragmentation': round(freelist / page_count * 100, 2) if page_count else 0.0,
+        'journal_mode': conn.execute("PRAGMA journal_mode").fetchone()[0],
+        'auto_vacuum': AUTO_VACUUM_MODES.get(auto_vacuum, str(auto_vacuum)),
+    }
+
+
+def list_tables(conn: sqlite3.Connection) -> list[str]:
+    """列出用户表（不含 SQLite 内部表）"""
+    rows = conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%' ORDER BY name"
+    ).fetchall()
+    return [row[0] for row in rows]
+
+
+def get_table_stats(conn: sqlite3.Connection) -> tuple[list[dict], bool]:
+    """统计各表行数和占用空间
+
+    Returns:
+        tuple: (各表统计列表, 是否通过 dbstat 统计了空间)
+    """
+    tables = {name: {'table': name, 'rows': 0, 'table_bytes': None, 'index_bytes': None, 'unused_bytes': None}
+              for name in list_tables(conn)}
+    for name, stat in tables.items():
+        stat['rows'] = conn.execute(f"SELECT COUNT(*) FROM {quote_identifier(name)}").fetchone()[0]
+
+    has_dbstat = True
+    try:
+        rows = conn.execute(
+            "SELECT m.tbl_name, m.type, SUM(s.pgsize), SUM(s.unused) "
+            "FROM dbstat s JOIN sqlite_master m ON m.name = s.name "
+            "GROUP BY m.tbl_name, m.type"
+        ).fetchall()
+    except sqlite3.OperationalError:
+        # 当前 SQLite 未编译 dbstat 虚拟表
+        has_dbstat = False
+        rows = []
+    for tbl_name, kind, size, unused in rows:
+        stat = tables.get(tbl_name)
+        if not stat:
+            continue
+        key = 'table_bytes' if kind == 'table' else 'index_bytes'
+        stat[key] = (stat[key] or 0) + size
+        stat['unused_bytes'] = (stat['unused_bytes'] or 0) + unused
+    if has_dbstat:
+        for stat in tables.values():
+            stat['table_bytes'] = stat['table_bytes'] or 0
+            stat['index_bytes'] = stat['index_bytes'] or 0
+            stat['unused_bytes'] = stat['unused_bytes'] or 0
+
+    result = sorted(tables.values(), key=lambda s: (s['table_bytes'] or 0) + (s['index_bytes'] or 0), reverse=True)
+    return result, has_dbstat
+
+
+def build_report(db_path: Path) -> dict:
+    """生成数据库报告（只读打开，不影响正在运行的麦麦）"""
+    with closing(connect_db(db_path, readonly=True)) as conn:
+        stats = get_db_stats(conn, db_path)
+        tables, has_dbstat = get_table_stats(conn)
+    stats['in_use'] = is_db_in_use(db_path)
+    return {'database': stats, 'tables': tables, 'dbstat': has_dbstat}
+
+
+def print_report(report: dict) -> None:
+    db = report['database']
+    print(f"\n数据库: {db['path']}")
+    print(f"文件大小: {format_size(db['file_size'])}    页大小: {db['page_size']}    页数: {db['page_count']}")
+    print(f"空闲页: {db['freelist_count']} ({db['fragmentation']}%)    "
+          f"日志模式: {db['journal_mode']}    自动整理: {db['auto_vacuum']}")
+    print(f"麦麦正在使用: {'是' if db['in_use'] else '否'}")
+    print()
+    if report['dbstat']:
+        print(f"{'表名':<32}{'行数':>12}{'数据':>12}{'索引':>12}{'页内空闲':>12}")
+        for stat in report['tables']:
+            print(f"{stat['table']:<32}{stat['rows']:>12}{format_size(stat['table_bytes']):>12}"
+                  f"{format_size(stat['index_bytes']):>12}{format_size(stat['unused_bytes']):>12}")
+    else:
+        print("当前 SQLite 不支持 dbstat，仅统计行数")
+        print(f"{'表名':<32}{'行数':>12}")
+        for stat in report['tables']:
+            print(f"{stat['table']:<32}{stat['rows']:>12}")
+
+
+def _run_timed(conn: sqlite3.Connection, db_path: Path, title: str, action) -> dict:
+    """执行维护操作并记录前后对比"""
+    before = get_db_stats(conn, db_path)
+    start = time.perf_counter()
+    detail = action()
+    elapsed = time.perf_counter() - start
+    after = get_db_stats(conn, db_path)
+    logger.info(f"{title}完成，耗时 {elapsed:.2f} 秒：文件 {format_size(before['file_size'])} → "
+                f"{format_size(after['file_size'])}，空闲页 {before['freelist_count']} → {after['freelist_count']}")
+    return {'operation': title, 'seconds': round(elapsed, 3), 'before': before, 'after': after, 'detail': detail}
+
+
+def analyze_db(db_path: Path, online: bool) -> dict:
+    """更新统计信息
+
+    Args:
+        db_path: 数据库路径
+        online: 麦麦正在运行时为 True，此时限制 ANALYZE 的采样量以缩短写锁时间
+    """
+    with closing(connect_db(db_path)) as conn:
+        def action():
+            if online:
+                conn.execute(f"PRAGMA analysis_limit = {ONLINE_ANALYSIS_LIMIT}")
+            conn.execute("ANALYZE")
+            conn.execute("PRAGMA optimize")
+            return {'analysis_limit': ONLINE_ANALYSIS_LIMIT if online else None}
+        return _run_timed(conn, db_path, "ANALYZE", action)
+
+
+def checkpoint_db(db_path: Path, online: bool) -> dict:
+    """WAL 检查点，在线时使用 PASSIVE 模式，不等待读者"""
+    mode = 'PASSIVE' if online else 'TRUNCATE'
+    with closing(connect_db(db_path)) as conn:
+        def action():
+            busy, log_frames, checkpointed = conn.execute(f"PRAGMA wal_checkpoint({mode})").fetchone()
+            return {'mode': mode, 'busy': bool(busy), 'log_frames': log_frames, 'checkpointed': checkpointed}
+        return _run_timed(conn, db_path, f"WAL检查点({mode})", action)
+
+
+def incremental_vacuum_db(db_path: Path, max_pages: Optional[int] = None) -> Optional[dict]:
+    """增量 VACUUM，分批释放空闲页，每批单独提交，可以在麦麦运行时执行
+
+    Args:
+        db_path: 数据库路径
+        max_pages: 最多释放的页数，None 表示释放全部空闲页
+
+    Returns:
+        Optional[dict]: 操作结果，数据库未开启增量模式时返回 None
+    """
+    with closing(connect_db(db_path)) as conn:
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+            logger.error("数据库未开启增量整理模式 (auto_vacuum=INCREMENTAL)，"
+                         "请在麦麦停止时执行 vacuum --enable-incremental 开启")
+            return None
+
+        def action():
+            released = 0
+            while max_pages is None or released < max_pages:
+                freelist = conn.execute("PRAGMA freelist_count").fetchone()[0]
+                step = min(INCREMENTAL_VACUUM_STEP, freelist)
+                if max_pages is not None:
+                    step = min(step, max_pages - released)
+                if step <= 0:
+                    break
+                # incremental_vacuum 每一步只释放一页，execute 只执行一步，需用 executescript 执行到底
+                conn.executescript(f"PRAGMA incremental_vacuum({step});")
+                released += step
+            return {'released_pages': released}
+        return _run_timed(conn, db_path, "增量VACUUM", action)
+
+
+def full_vacuum_db(db_path: Path, enable_incremental: bool = False) -> dict:
+    """完整 VACUUM，会重写整个数据库文件并持有排他锁，只能在麦麦停止时执行
+
+    Args:
+        db_path: 数据库路径
+        enable_incremental: 是否同时把 auto_vacuum 切换为 INCREMENTAL，之后可在线增量整理
+    """
+    with closing(connect_db(db_path)) as conn:
+        def action():
+            if enable_incremental:
+                conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            conn.execute("VACUUM")
+            # WAL 模式下 VACUUM 的结果先写入 WAL，合并回数据库文件后才能看到实际大小
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchall()
+            return {'auto_vacuum': AUTO_VACUUM_MODES.get(conn.execute("PRAGMA auto_vacuum").fetchone()[0])}
+        return _run_timed(conn, db_path, "VACUUM", action)
+
+
+def run_maintenance(db_path: Path, operations: list[str], force: bool = False,
+                    incremental_pages: Optional[int] = None, enable_incremental: bool = False,
+                    incremental: bool = False) -> Optional[list[dict]]:
+    """按顺序执行维护操作
+
+    Args:
+        db_path: 数据库路径
+        operations: 操作列表，取值 analyze / vacuum / checkpoint
+        force: 麦麦运行时也执行完整 VACUUM
+        incremental_pages: 增量 VACUUM 最多释放的页数
+        enable_incremental: 完整 VACUUM 时开启增量整理模式
+        incremental: vacuum 使用增量模式
+
+    Returns:
+        Optional[list[dict]]: 各操作结果，失败时返回 None
+    """
+    if not db_path.exists():
+        logger.error(f"数据库文件不存在: {db_path}")
+        return None
+    online = is_db_in_use(db_path)
+    if online:
+        logger.info("检测到麦麦正在使用数据库，将只执行在线安全的操作")
+
+    results = []
+    try:
+        for operation in operations:
+            if operation == 'analyze':
+                results.append(analyze_db(db_path, online))
+            elif operation == 'checkpoint':
+                results.append(checkpoint_db(db_path, online))
+            elif operation == 'vacuum':
+                if incremental:
+                    result = incremental_vacuum_db(db_path, incremental_pages)
+                    if result is None:
+                        return None
+                    results.append(result)
+                elif online and not force:
+                    logger.error("麦麦正在运行，完整 VACUUM 会长时间锁住数据库，已拒绝执行。"
+                                 "请先停止麦麦，或使用 --incremental，或加 --force 强制执行")
+                    return None
+                else:
+                    results.append(full_vacuum_db(db_path, enable_incremental))
+    except sqlite3.OperationalError as e:
+        logger.error(f"数据库维护失败: {e}")
+        return None
+    return results
+
+
+def interactive_db_maintenance_menu() -> bool:
+    """数据库维护交互菜单（默认实例）"""
+    db_path = get_db_path()
+    while True:
+        print("\n=== 数据库维护 ===")
+        print("1. 查看数据库报告")
+        print("2. 更新统计信息 (ANALYZE)")
+        print("3. 整理数据库 (VACUUM)")
+        print("4. WAL 检查点")
+        print("5. 全部执行")
+        print("0. 返回主菜单")
+        choice = input("请选择操作: ").strip()
+        if choice == '0':
+            return True
+        if not db_path.exists() and choice in ('1', '2', '3', '4', '5'):
+            logger.error(f"数据库文件不存在: {db_path}")
+            continue
+        if choice == '1':
+            print_report(build_report(db_path))
+        elif choice == '2':
+            run_maintenance(db_path, ['analyze'])
+        elif choice == '3':
+            run_maintenance(db_path, ['vacuum'])
+        elif choice == '4':
+            run_maintenance(db_path, ['checkpoint'])
+        elif choice == '5':
+            run_maintenance(db_path, ['checkpoint', 'analyze', 'vacuum'])
+        else:
+            logger.error("无效选择")
+
+
+def main() -> int:
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description="麦麦数据库维护")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    report_parser = subparsers.add_parser('report', help="查看数据库报告")
+    report_parser.add_argument('--json', action='store_true', help="以 JSON 格式输出")
+    subparsers.add_parser('analyze', help="更新统计信息")
+    vacuum_parser = subparsers.add_parser('vacuum', help="整理数据库")
+    vacuum_parser.add_argument('--incremental', nargs='?', type=int, const=0, metavar='PAGES',
+                               help="增量整理（需开启 auto_vacuum=INCREMENTAL），可指定最多释放的页数")
+    vacuum_parser.add_argument('--enable-incremental', action='store_true', help="完整整理并开启增量整理模式")
+    subparsers.add_parser('checkpoint', help="WAL 检查点")
+    subparsers.add_parser('all', help="依次执行检查点、ANALYZE 和 VACUUM")
+    for sub in subparsers.choices.values():
+        sub.add_argument('--instance', help="实例名称，不指定表示默认实例")
+        sub.add_argument('--db', help="直接指定数据库文件路径")
+        if sub is not report_parser:
+            sub.add_argument('--force', action='store_true', help="麦麦运行时也执行完整 VACUUM")
+    args = parser.parse_args()
+
+    db_path = resolve_db_path(args.db, args.instance)
+    if not db_path.exists():
+        logger.error(f"数据库文件不存在: {db_path}")
+        return 1
+
+    if args.command == 'report':
+        report = build_report(db_path)
+        if args.json:
+            print(json.dumps(report, indent=2, ensure_ascii=False))
+        else:
+            print_report(report)
+        return 0
+
+    operations = ['checkpoint', 'analyze', 'vacuum'] if args.command == 'all' else [args.command]
+    incremental = getattr(args, 'incremental', None)
+    results = run_maintenance(
+        db_path, operations, force=args.force,
+        incremental_pages=incremental or None,
+        enable_incremental=getattr(args, 'enable_incremental', False),
+        incremental=incremental is not None,
+    )
+    return 0 if results is not None else 1
+
+
+if __name__ == "__main__":
+    try:
+        sys.exit(main())
+    except KeyboardInterrupt:
+        print("\n用户取消操作")
+        sys.exit(1)
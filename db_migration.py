@@ -0,0 +1,593 @@
+# -*- coding: utf-8 -*-
+"""
+旧版数据库迁移工具
+功能：把 0.6.x 的 MongoDB 数据分批迁移到新版 SQLite 数据库（MaiBot.db），可断点续传
+
+- 按集合分批读取，每批写入与检查点更新在同一个事务中提交，中断后从上次提交的位置继续
+- 迁移期间启用快速导入参数（WAL、synchronous=OFF、独占锁、大缓存、大事务），结束后恢复原设置
+- 实时显示每个集合的进度和速度，结束后逐个集合核对源记录数与写入行数
+- 数据源可以是 MongoDB（需要 pymongo），也可以是 mongoexport 导出的 JSON 目录（每个集合一个 .json/.jsonl 文件）
+- 文档中的嵌套字段按 "父_子" 展开后与目标表的列名匹配，目标表需已存在（先启动一次新版麦麦即可建表）；
+  messages、chat_streams 中 user_info、group_info 等字段与列名不一致，按 FIELD_MAPPINGS 对应
+- 核对时除了条数，还检查 REQUIRED_COLUMNS 中的列是否写入了数据，字段没有对应上时核对不通过
+
+用法：
+    python db_migration.py run [--source mongodb://127.0.0.1:27017] [--database MegBot] [--collection messages]
+    python db_migration.py run --source-dir 导出目录
+    python db_migration.py status
+    python db_migration.py verify [--source ... | --source-dir ...]
+    python db_migration.py reset [--collection messages]
+    以上命令均支持 --instance NAME 或 --db PATH
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Iterator, Optional
+
+try:
+    from modules.MaiBot.src.common.logger import get_logger
+    logger = get_logger("db_migration")
+except ImportError:
+    import logging as logger
+    logger.basicConfig(level=logger.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    logger = logger.getLogger("db_migration")
+
+from db_backup import create_backup
+from db_maintenance import connect_db, is_db_in_use, list_tables, quote_identifier, resolve_db_path
+from jobs import submit_job
+from toolchain import get_python_path
+
+CHECKPOINT_TABLE = 'onekey_migration'
+DEFAULT_MONGO_URI = 'mongodb://127.0.0.1:27017'
+DEFAULT_DATABASE = 'MegBot'
+DEFAULT_BATCH_SIZE = 5000
+# 快速导入参数；synchronous=OFF 在断电时可能损坏数据库，因此迁移前会先做一份固定备份
+FAST_PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = OFF",
+    "PRAGMA locking_mode = EXCLUSIVE",
+    "PRAGMA cache_size = -262144",
+    "PRAGMA temp_store = MEMORY",
+)
+NUMERIC_AFFINITY = ('INT', 'REAL', 'FLOA', 'DOUB', 'NUM', 'DEC')
+# 展开后的字段名与新版列名不一致的字段（对应麦麦 mongodb_to_sqlite.py 中的字段映射），其余字段按同名列匹配
+FIELD_MAPPINGS = {
+    'messages': {
+        'chat_info_user_info_platform': 'chat_info_user_platform',
+        'chat_info_user_info_user_id': 'chat_info_user_id',
+        'chat_info_user_info_user_nickname': 'chat_info_user_nickname',
+        'chat_info_user_info_user_cardname': 'chat_info_user_cardname',
+        'chat_info_group_info_platform': 'chat_info_group_platform',
+        'chat_info_group_info_group_id': 'chat_info_group_id',
+        'chat_info_group_info_group_name': 'chat_info_group_name',
+        'user_info_platform': 'user_platform',
+        'user_info_user_id': 'user_id',
+        'user_info_user_nickname': 'user_nickname',
+        'user_info_user_cardname': 'user_cardname',
+    },
+    'chat_streams': {
+        'group_info_platform': 'group_platform',
+        'group_info_group_id': 'group_id',
+        'group_info_group_name': 'group_name',
+        'user_info_platform': 'user_platform',
+        'user_info_user_id': 'user_id',
+        'user_info_user_nickname': 'user_nickname',
+        'user_info_user_cardname': 'user_cardname',
+    },
+}
+# 迁移后必须有数据的列，目标表中存在该列但一条都没写入时核对不通过
+REQUIRED_COLUMNS = {
+    'messages': ('message_id', 'time', 'chat_id', 'user_id', 'chat_info_platform', 'processed_plain_text'),
+    'chat_streams': ('stream_id', 'platform', 'create_time', 'last_active_time', 'user_id'),
+    'person_info': ('person_id', 'platform', 'user_id'),
+}
+
+
+def _mongo_hook(obj: dict):
+    """把 mongoexport 的扩展 JSON（$oid、$date、$numberLong 等）还原为普通值"""
+    if len(obj) == 1:
+        key, value = next(iter(obj.items()))
+        if key == '$oid':
+            return value
+        if key == '$date':
+            if isinstance(value, dict):
+                value = int(value.get('$numberLong', 0))
+            if isinstance(value, (int, float)):
+                return datetime.fromtimestamp(value / 1000, tz=timezone.utc)
+            return datetime.fromisoformat(value.replace('Z', '+00:00'))
+        if key in ('$numberLong', '$numberInt'):
+            return int(value)
+        if key in ('$numberDouble', '$numberDecimal'):
+            return float(value)
+    return obj
+
+
+class JsonDirSource:
+    """mongoexport 导出目录数据源，也用作本地测试的替身数据源；位置为已读取的文档数"""
+
+    def __init__(self, directory: Path):
+        self.directory = Path(directory)
+        self.files = {}
+        for path in sorted(self.directory.iterdir()):
+            if path.suffix in ('.json', '.jsonl') and path.is_file():
+                self.files[path.stem] = path
+
+    def collections(self) -> list[str]:
+        return list(self.files)
+
+    def _lines(self, name: str) -> Iterator[str]:
+        with open(self.files[name], 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    yield line
+
+    def count(self, name: str) -> int:
+        return sum(1 for _ in self._lines(name))
+
+    def iter_batches(self, name: str, position: Optional[str], batch_size: int) -> Iterator[tuple[list, str]]:
+        consumed = int(position or 0)
+        batch = []
+        for index, line in enumerate(self._lines(name)):
+            if index < consumed:
+                continue
+            batch.append(json.loads(line, object_hook=_mongo_hook))
+            if len(batch) >= batch_size:
+                consumed = index + 1
+                yield batch, str(consumed)
+                batch = []
+        if batch:
+            yield batch, str(consumed + len(batch))
+
+    def close(self) -> None:
+        pass
+
+
+class MongoSource:
+    """MongoDB 数据源，按 _id 升序读取；位置为上一批最后一个文档的 _id"""
+
+    def __init__(self, uri: str, database: str):
+        try:
+            import pymongo
+            from bson import json_util
+        except ImportError:
+            raise RuntimeError("未安装 pymongo，无法连接 MongoDB；可用 mongoexport 导出后使用 --source-dir")
+        self.json_util = json_util
+        self.client = pymongo.MongoClient(uri, serverSelectionTimeoutMS=5000)
+        self.db = self.client[database]
+        self.db.command('ping')
+
+    def collections(self) -> list[str]:
+        return sorted(name for name in self.db.list_collection_names() if not name.startswith('system.'))
+
+    def count(self, name: str) -> int:
+        return self.db[name].estimated_document_count()
+
+    def iter_batches(self, name: str, position: Optional[str], batch_size: int) -> Iterator[tuple[list, str]]:
+        query = {'_id': {'$gt': self.json_util.loads(position)}} if position else {}
+        batch = []
+        for doc in self.db[name].find(query).sort('_id', 1).batch_size(batch_size):
+            batch.append(doc)
+            if len(batch) >= batch_size:
+                yield batch, self.json_util.dumps(batch[-1]['_id'])
+                batch = []
+        if batch:
+            yield batch, self.json_util.dumps(batch[-1]['_id'])
+
+    def close(self) -> None:
+        self.client.close()
+
+
+def open_source(uri: Optional[str] = None, database: Optional[str] = None, directory: Optional[str] = None):
+    """按参数打开数据源，未指定 MongoDB 地址时读取环境变量 MONGODB_URI / DATABASE_NAME"""
+    if directory:
+        return JsonDirSource(Path(directory))
+    return MongoSource(uri or os.environ.get('MONGODB_URI', DEFAULT_MONGO_URI),
+                       database or os.environ.get('DATABASE_NAME', DEFAULT_DATABASE))
+
+
+def flatten(doc: dict, prefix: str = '') -> dict:
+    """把嵌套字段展开为 "父_子" 形式，同时保留原字段名，便于匹配 chat_info_platform 这类列"""
+    flat = {}
+    for key, value in doc.items():
+        name = f"{prefix}{key}"
+        flat[name] = value
+        if isinstance(value, dict):
+            flat.update(flatten(value, f"{name}_"))
+    return flat
+
+
+def map_fields(flat: dict, collection: str) -> dict:
+    """按 FIELD_MAPPINGS 把展开后的字段改为新版列名，已有同名字段时保留原值"""
+    for field, column in FIELD_MAPPINGS.get(collection, {}).items():
+        if field in flat:
+            flat.setdefault(column, flat.pop(field))
+    return flat
+
+
+def convert_value(value, column_type: str):
+    """转换为 SQLite 可存储的值：时间转为时间戳，复杂结构转为 JSON 文本"""
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return value.timestamp() if any(t in column_type for t in NUMERIC_AFFINITY) else value.isoformat()
+    if isinstance(value, bool):
+        return int(value)
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False, default=str)
+    if value is None or isinstance(value, (int, float, str, bytes)):
+        return value
+    return str(value)
+
+
+def get_columns(conn: sqlite3.Connection, table: str) -> dict[str, str]:
+    """目标表可写入的列 {列名: 类型}，排除自增主键"""
+    columns = {}
+    for _, name, column_type, _, _, pk in conn.execute(f"PRAGMA table_info({quote_identifier(table)})"):
+        if pk and column_type.upper() == 'INTEGER' and name == 'id':
+            continue
+        columns[name] = column_type.upper()
+    return columns
+
+
+def _ensure_checkpoint_table(conn: sqlite3.Connection) -> None:
+    conn.execute(f"""CREATE TABLE IF NOT EXISTS {CHECKPOINT_TABLE} (
+        collection TEXT PRIMARY KEY, target TEXT, status TEXT, position TEXT,
+        source_total INTEGER, base_rows INTEGER, migrated INTEGER DEFAULT 0, failed INTEGER DEFAULT 0,
+        unmatched TEXT, started_at REAL, updated_at REAL, duration REAL DEFAULT 0, filled TEXT)""")
+    # 早期版本的检查点表没有 filled 列
+    if 'filled' not in {row[1] for row in conn.execute(f"PRAGMA table_info({CHECKPOINT_TABLE})")}:
+        conn.execute(f"ALTER TABLE {CHECKPOINT_TABLE} ADD COLUMN filled TEXT")
+
+
+def load_checkpoints(conn: sqlite3.Connection) -> dict[str, dict]:
+    if CHECKPOINT_TABLE not in list_tables(conn):
+        return {}
+    conn.row_factory = sqlite3.Row
+    try:
+        return {row['collection']: dict(row) for row in conn.execute(f"SELECT * FROM {CHECKPOINT_TABLE}")}
+    finally:
+        conn.row_factory = None
+
+
+def _insert_rows(conn: sqlite3.Connection, table: str, groups: dict[tuple, list]) -> int:
+    """按列组合分组批量插入，批量失败时逐行重试；返回失败行数"""
+    failed = 0
+    for columns, rows in groups.items():
+        sql = (f"INSERT INTO {quote_identifier(table)} ({', '.join(quote_identifier(c) for c in columns)}) "
+               f"VALUES ({', '.join('?' * len(columns))})")
+        conn.execute("SAVEPOINT batch_group")
+        try:
+            conn.executemany(sql, rows)
+            conn.execute("RELEASE batch_group")
+        except sqlite3.Error:
+            conn.execute("ROLLBACK TO batch_group")
+            conn.execute("RELEASE batch_group")
+            for row in rows:
+                try:
+                    conn.execute(sql, row)
+                except sqlite3.Error:
+                    failed += 1
+    return failed
+
+
+def _print_progress(collection: str, done: int, total: int, rate: float) -> None:
+    percent = done * 100 / total if total else 100
+    remaining = (total - done) / rate if rate and total > done else 0
+    print(f"\r  [{collection}] {done}/{total} ({percent:.1f}%)  {rate:.0f} 条/秒  预计剩余 {remaining:.0f} 秒   ",
+          end='', flush=True)
+
+
+def migrate_collection(conn: sqlite3.Connection, source, collection: str, table: str,
+                       checkpoint: Optional[dict], batch_size: int) -> dict:
+    """迁移单个集合，从检查点位置继续
+
+    Returns:
+        dict: 该集合的检查点记录
+    """
+    columns = get_columns(conn, table)
+    now = time.time()
+    if not checkpoint:
+        checkpoint = {
+            'collection': collection, 'target': table, 'status': 'running', 'position': None,
+            'source_total': source.count(collection),
+            'base_rows': conn.execute(f"SELECT COUNT(*) FROM {quote_identifier(table)}").fetchone()[0],
+            'migrated': 0, 'failed': 0, 'unmatched': '[]', 'started_at': now, 'updated_at': now, 'duration': 0,
+            'filled': '[]',
+        }
+    else:
+        checkpoint = dict(checkpoint, status='running', source_total=source.count(collection))
+        logger.info(f"[{collection}] 从上次中断处继续，已迁移 {checkpoint['migrated']} 条")
+    unmatched = set(json.loads(checkpoint['unmatched'] or '[]'))
+    # 写入过非空值的列，用于核对必需列
+    filled = set(json.loads(checkpoint.get('filled') or '[]'))
+
+    start = time.monotonic()
+    base_duration = checkpoint['duration']
+    done_before = checkpoint['migrated'] + checkpoint['failed']
+    for docs, position in source.iter_batches(collection, checkpoint['position'], batch_size):
+        groups: dict[tuple, list] = {}
+        for doc in docs:
+            flat = map_fields(flatten(doc), collection)
+            row = {name: convert_value(flat[name], columns[name]) for name in columns if name in flat}
+            filled.update(name for name, value in row.items() if value is not None)
+            # 已整体写入某列（JSON 文本）的嵌套字段，其子字段不算未匹配
+            stored = [f"{name}_" for name in row if isinstance(flat[name], dict)]
+            unmatched.update(key for key, value in flat.items()
+                             if key not in columns and key != '_id' and not isinstance(value, dict)
+                             and not any(key.startswith(prefix) for prefix in stored))
+            key = tuple(row)
+            groups.setdefault(key, []).append(tuple(row.values()))
+        # 本批数据与检查点在同一事务中提交，中断后不会重复或遗漏
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            failed = _insert_rows(conn, table, groups)
+            checkpoint.update(position=position, migrated=checkpoint['migrated'] + len(docs) - failed,
+                              failed=checkpoint['failed'] + failed, unmatched=json.dumps(sorted(unmatched)),
+                              filled=json.dumps(sorted(filled)),
+                              updated_at=time.time(), duration=base_duration + time.monotonic() - start)
+            _save_checkpoint(conn, checkpoint)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        elapsed = time.monotonic() - start
+        done = checkpoint['migrated'] + checkpoint['failed']
+        _print_progress(collection, done, checkpoint['source_total'], (done - done_before) / elapsed if elapsed else 0)
+    print()
+    checkpoint.update(status='done', duration=base_duration + time.monotonic() - start, updated_at=time.time())
+    _save_checkpoint(conn, checkpoint)
+    return checkpoint
+
+
+def _save_checkpoint(conn: sqlite3.Connection, checkpoint: dict) -> None:
+    names = list(checkpoint)
+    conn.execute(f"INSERT OR REPLACE INTO {CHECKPOINT_TABLE} ({', '.join(names)}) "
+                 f"VALUES ({', '.join('?' * len(names))})", [checkpoint[n] for n in names])
+
+
+def _read_pragmas(conn: sqlite3.Connection) -> dict:
+    return {name: conn.execute(f"PRAGMA {name}").fetchone()[0] for name in ('journal_mode', 'synchronous')}
+
+
+def _restore_pragmas(conn: sqlite3.Connection, original: dict) -> None:
+    """恢复迁移前的日志模式，并执行完整同步的检查点把数据落盘"""
+    conn.execute("PRAGMA synchronous = FULL")
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    conn.execute(f"PRAGMA journal_mode = {original['journal_mode']}")
+    conn.execute(f"PRAGMA synchronous = {original['synchronous']}")
+    conn.execute("PRAGMA locking_mode = NORMAL")
+    # 切回普通锁模式后需要一次读操作才会真正释放独占锁
+    conn.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()
+
+
+def run_migration(db_path: Path, source, collections: Optional[list[str]] = None,
+                  mapping: Optional[dict[str, str]] = None, batch_size: int = DEFAULT_BATCH_SIZE,
+                  force: bool = False, backup: bool = True) -> Optional[dict]:
+    """执行迁移
+
+    Args:
+        db_path: 目标数据库
+        source: 数据源（JsonDirSource 或 MongoSource）
+        collections: 只迁移指定集合，默认迁移目标库中有同名表的全部集合
+        mapping: 集合名到表名的映射，未列出的集合使用同名表
+        batch_size: 每批（每个事务）的文档数
+        force: 数据库被占用时仍然执行
+        backup: 迁移前是否创建固定备份
+
+    Returns:
+        Optional[dict]: 校验结果 {集合: {...}}，无法执行时返回 None
+    """
+    if not db_path.exists():
+        logger.error(f"数据库文件不存在: {db_path}，请先启动一次新版麦麦以创建数据库")
+        return None
+    if is_db_in_use(db_path) and not force:
+        logger.error("数据库正在被使用，请先关闭麦麦再迁移（或使用 --force）")
+        return None
+    mapping = mapping or {}
+    conn = connect_db(db_path)
+    try:
+        tables = set(list_tables(conn))
+        plan = []
+        for collection in collections or source.collections():
+            table = mapping.get(collection, collection)
+            if table not in tables:
+                logger.warning(f"[{collection}] 目标数据库中没有表 {table}，跳过")
+                continue
+            plan.append((collection, table))
+        if not plan:
+            logger.error("没有可迁移的集合")
+            return None
+        _ensure_checkpoint_table(conn)
+        checkpoints = load_checkpoints(conn)
+        pending = [(c, t) for c, t in plan if checkpoints.get(c, {}).get('status') != 'done']
+        if not pending:
+            logger.info("所有集合均已迁移完成")
+        elif backup and not checkpoints:
+            conn.close()
+            if not create_backup(db_path, reason='before-migration', pinned=True):
+                logger.error("迁移前备份失败，已取消迁移")
+                return None
+            conn = connect_db(db_path)
+
+        original = _read_pragmas(conn)
+        for pragma in FAST_PRAGMAS:
+            conn.execute(pragma)
+        start = time.perf_counter()
+        try:
+            for index, (collection, table) in enumerate(pending, 1):
+                logger.info(f"({index}/{len(pending)}) 迁移 {collection} → {table}")
+                migrate_collection(conn, source, collection, table, checkpoints.get(collection), batch_size)
+        finally:
+            _restore_pragmas(conn, original)
+        if pending:
+            logger.info(f"迁移完成，耗时 {time.perf_counter() - start:.1f} 秒，正在核对...")
+        return verify_migration(conn, source, [c for c, _ in plan])
+    finally:
+        conn.close()
+
+
+def verify_migration(conn: sqlite3.Connection, source, collections: Optional[list[str]] = None) -> dict:
+    """核对每个集合的源记录数、写入行数、目标表实际增加的行数，以及必需列是否写入了数据"""
+    checkpoints = load_checkpoints(conn)
+    results = {}
+    for collection in collections or list(checkpoints):
+        checkpoint = checkpoints.get(collection)
+        if not checkpoint:
+            results[collection] = {'ok': False, 'reason': '尚未迁移'}
+            continue
+        source_total = source.count(collection) if source else checkpoint['source_total']
+        rows = conn.execute(f"SELECT COUNT(*) FROM {quote_identifier(checkpoint['target'])}").fetchone()[0]
+        added = rows - checkpoint['base_rows']
+        filled = set(json.loads(checkpoint.get('filled') or '[]'))
+        columns = get_columns(conn, checkpoint['target'])
+        empty = [column for column in REQUIRED_COLUMNS.get(collection, ())
+                 if column in columns and column not in filled] if checkpoint['migrated'] else []
+        ok = (checkpoint['status'] == 'done' and checkpoint['failed'] == 0 and not empty
+              and checkpoint['migrated'] == source_total and added == checkpoint['migrated'])
+        results[collection] = {'ok': ok, 'target': checkpoint['target'], 'source': source_total,
+                               'migrated': checkpoint['migrated'], 'failed': checkpoint['failed'],
+                               'added_rows': added, 'empty_columns': empty,
+                               'unmatched': json.loads(checkpoint['unmatched'] or '[]')}
+    print_verification(results)
+    return results
+
+
+def print_verification(results: dict) -> None:
+    print(f"\n{'集合':<24}{'源记录':>10}{'已迁移':>10}{'失败':>8}{'新增行':>10}  结果")
+    for collection, result in results.items():
+        if 'source' not in result:
+            print(f"{collection:<24}{'':>38}  {result['reason']}")
+            continue
+        status = '✅ 一致' if result['ok'] else '❌ 不一致'
+        print(f"{collection:<24}{result['source']:>10}{result['migrated']:>10}{result['failed']:>8}"
+              f"{result['added_rows']:>10}  {status}")
+        if result['empty_columns']:
+            print(f"{'':<24}必需列没有写入任何数据: {', '.join(result['empty_columns'])}")
+        if result['unmatched']:
+            print(f"{'':<24}未匹配到列的字段: {', '.join(result['unmatched'])}")
+
+
+def print_status(db_path: Path) -> None:
+    conn = connect_db(db_path, readonly=True)
+    try:
+        checkpoints = load_checkpoints(conn)
+    finally:
+        conn.close()
+    if not checkpoints:
+        print("尚未开始迁移")
+        return
+    labels = {'done': '已完成', 'running': '未完成'}
+    for collection, cp in checkpoints.items():
+        total = cp['source_total'] or 0
+        done = cp['migrated'] + cp['failed']
+        percent = done * 100 / total if total else 100
+        print(f"{collection:<24}{labels.get(cp['status'], cp['status']):<6}{done:>10}/{total:<10}"
+              f"{percent:>6.1f}%  耗时 {cp['duration']:.1f} 秒")
+
+
+def reset_checkpoints(db_path: Path, collections: Optional[list[str]] = None) -> None:
+    """清除检查点（不会删除已迁移的数据）"""
+    conn = connect_db(db_path)
+    try:
+        if CHECKPOINT_TABLE not in list_tables(conn):
+            return
+        if collections:
+            conn.executemany(f"DELETE FROM {CHECKPOINT_TABLE} WHERE collection = ?", [(c,) for c in collections])
+        else:
+            conn.execute(f"DROP TABLE {CHECKPOINT_TABLE}")
+        logger.info("已清除迁移检查点")
+    finally:
+        conn.close()
+
+
+def interactive_migration_menu() -> bool:
+    """旧版数据库迁移交互流程（默认实例），迁移本身作为后台任务执行"""
+    print("\n=== 从旧版(0.6.x)迁移数据库 ===")
+    db_path = resolve_db_path()
+    if db_path.exists():
+        print_status(db_path)
+    print("数据源：1. 本机 MongoDB    2. mongoexport 导出的 JSON 目录")
+    choice = input("请选择（默认 1）: ").strip() or '1'
+    command = [get_python_path(), str(Path(__file__).with_name('db_migration.py')), 'run']
+    if choice == '2':
+        directory = input("请输入导出目录: ").strip().strip('"')
+        if not Path(directory).is_dir():
+            logger.error(f"目录不存在: {directory}")
+            return False
+        command += ['--source-dir', directory]
+    else:
+        uri = input(f"MongoDB 地址（直接回车使用 {DEFAULT_MONGO_URI}）: ").strip()
+        database = input(f"数据库名（直接回车使用 {DEFAULT_DATABASE}）: ").strip()
+        command += (['--source', uri] if uri else []) + (['--database', database] if database else [])
+    submit_job('旧版数据库迁移', command)
+    logger.info("迁移已在后台开始，可在\"后台任务\"中查看进度；中断后再次迁移会从检查点继续")
+    return True
+
+
+def main() -> int:
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description="旧版 MongoDB 数据迁移到 SQLite")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    run_parser = subparsers.add_parser('run', help="执行或继续迁移")
+    run_parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help="每个事务写入的文档数")
+    run_parser.add_argument('--map', action='append', default=[], metavar='集合=表', help="集合与表名不同时指定映射")
+    run_parser.add_argument('--force', action='store_true', help="数据库被占用时仍然执行")
+    run_parser.add_argument('--no-backup', action='store_true', help="迁移前不备份")
+    verify_parser = subparsers.add_parser('verify', help="核对迁移结果")
+    subparsers.add_parser('status', help="查看迁移进度")
+    reset_parser = subparsers.add_parser('reset', help="清除检查点")
+    for sub in (run_parser, verify_parser):
+        sub.add_argument('--source', help=f"MongoDB 地址，默认 {DEFAULT_MONGO_URI}")
+        sub.add_argument('--database', help=f"MongoDB 数据库名，默认 {DEFAULT_DATABASE}")
+        sub.add_argument('--source-dir', help="mongoexport 导出目录，替代 MongoDB")
+    for sub in (run_parser, verify_parser, reset_parser):
+        sub.add_argument('--collection', action='append', help="指定集合，可重复")
+    for sub in subparsers.choices.values():
+        sub.add_argument('--instance', help="实例名称，不指定表示默认实例")
+        sub.add_argument('--db', help="直接指定数据库文件路径")
+    args = parser.parse_args()
+
+    db_path = resolve_db_path(args.db, args.instance)
+    if args.command in ('status', 'reset', 'verify') and not db_path.exists():
+        logger.error(f"数据库文件不存在: {db_path}")
+        return 1
+    if args.command == 'status':
+        print_status(db_path)
+        return 0
+    if args.command == 'reset':
+        reset_checkpoints(db_path, args.collection)
+        return 0
+
+    try:
+        source = open_source(args.source, args.database, args.source_dir)
+    except Exception as e:
+        logger.error(f"打开数据源失败: {e}")
+        return 1
+    try:
+        if args.command == 'verify':
+            conn = connect_db(db_path, readonly=True)
+            try:
+                results = verify_migration(conn, source, args.collection)
+            finally:
+                conn.close()
+        else:
+            mapping = dict(item.split('=', 1) for item in args.map if '=' in item)
+            results = run_migration(db_path, source, args.collection, mapping, args.batch_size,
+                                    args.force, not args.no_backup)
+    finally:
+        source.close()
+    return 0 if results and all(r['ok'] for r in results.values()) else 1
+
+
+if __name__ == "__main__":
+    try:
+        sys.exit(main())
+    except KeyboardInterrupt:
+        print("\n用户取消操作")
+        sys.exit(1)
@@ -0,0 +1,383 @@
+# -*- coding: utf-8 -*-
+"""
+聊天记录保留策略
+功能：按时间或每个聊天的条数上限清理麦麦数据库中的旧聊天记录，可以在麦麦运行时执行
+
+- 运行时读取数据库结构，自动识别带时间列和聊天列的表（如 messages、action_records），不写死麦麦的表名
+- 带最后活跃时间列的登记表（如 chat_streams）不会被自动识别；用 --table 指定时按最后活跃时间清理，不按创建时间
+- 通过外键引用这些表的记录会一起删除
+- 每批删除少量记录并单独提交，批间休眠，避免长时间持有写锁影响麦麦
+- 清理完成后可选执行增量 VACUUM，清理前可选自动备份；交互菜单在数据库未开启增量整理时询问是否完整 VACUUM
+
+用法：
+    python db_retention.py targets                       # 查看会被清理的表
+    python db_retention.py run --days 30 [--dry-run]     # 删除 30 天前的记录
+    python db_retention.py run --per-chat 5000           # 每个聊天最多保留 5000 条
+    以上命令均支持 --table 指定表、--instance NAME 或 --db PATH
+"""
+
+import argparse
+import sqlite3
+import sys
+import time
+from contextlib import closing
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Callable, Optional
+
+try:
+    from modules.MaiBot.src.common.logger import get_logger
+    logger = get_logger("db_retention")
+except ImportError:
+    import logging as logger
+    logger.basicConfig(level=logger.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    logger = logger.getLogger("db_retention")
+
+from db_maintenance import (connect_db, incremental_vacuum_db, list_tables, quote_identifier, resolve_db_path,
+                            run_maintenance)
+
+# 按优先级识别时间列和聊天列
+TIME_COLUMNS = ('time', 'timestamp', 'created_at', 'create_time', 'created', 'time_stamp')
+CHAT_COLUMNS = ('chat_id', 'stream_id', 'chat_stream_id', 'session_id', 'group_id')
+# 登记表（聊天流、表达方式等）的最后活跃时间列，创建时间早不代表已不再使用
+ACTIVITY_COLUMNS = ('last_active_time', 'last_active', 'last_active_at', 'last_seen')
+DEFAULT_BATCH_SIZE = 500
+DEFAULT_BATCH_SLEEP = 0.05
+# 毫秒时间戳的下限（约 2001 年），用于区分秒和毫秒
+EPOCH_MS_THRESHOLD = 1e12
+
+
+def _columns(conn: sqlite3.Connection, table: str) -> list[str]:
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({quote_identifier(table)})")]
+
+
+def _has_rowid(conn: sqlite3.Connection, table: str) -> bool:
+    sql = conn.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)).fetchone()
+    return not (sql and sql[0] and 'WITHOUT ROWID' in sql[0].upper())
+
+
+def _detect_time_format(conn: sqlite3.Connection, table: str, column: str) -> Optional[str]:
+    """根据样本值判断时间列格式：epoch_s / epoch_ms / text，表为空时返回 None"""
+    column = quote_identifier(column)
+    row = conn.execute(f"SELECT {column}, typeof({column}) FROM {quote_identifier(table)} "
+                       f"WHERE {column} IS NOT NULL LIMIT 1").fetchone()
+    if not row:
+        return None
+    value, kind = row
+    if kind == 'text':
+        return 'text'
+    return 'epoch_ms' if value >= EPOCH_MS_THRESHOLD else 'epoch_s'
+
+
+def _find_references(conn: sqlite3.Connection, table: str) -> list[dict]:
+    """找出通过单列外键引用该表的子表"""
+    references = []
+    for child in list_tables(conn):
+        foreign_keys = {}
+        for row in conn.execute(f"PRAGMA foreign_key_list({quote_identifier(child)})"):
+            fk_id, _, parent, from_column, to_column = row[:5]
+            if parent == table:
+                foreign_keys.setdefault(fk_id, []).append((from_column, to_column))
+        for columns in foreign_keys.values():
+            if len(columns) == 1 and child != table:
+                from_column, to_column = columns[0]
+                references.append({'table': child, 'column': from_column, 'parent_column': to_column})
+    return references
+
+
+def discover_targets(conn: sqlite3.Connection, tables: Optional[list[str]] = None) -> list[dict]:
+    """识别需要执行保留策略的表
+
+    Args:
+        conn: 数据库连接
+        tables: 指定表名；None 表示自动识别同时具有时间列和聊天列、且没有最后活跃时间列的表
+
+    Returns:
+        list[dict]: 每项包含 table、time_column、chat_column（可能为 None）、time_format、references
+    """
+    targets = []
+    for table in tables or list_tables(conn):
+        columns = _columns(conn, table)
+        if not columns:
+            logger.warning(f"表不存在: {table}")
+            continue
+        lowered = {column.lower(): column for column in columns}
+        time_column = next((lowered[name] for name in TIME_COLUMNS if name in lowered), None)
+        chat_column = next((lowered[name] for name in CHAT_COLUMNS if name in lowered), None)
+        activity_column = next((lowered[name] for name in ACTIVITY_COLUMNS if name in lowered), None)
+        if activity_column:
+            if tables is None:
+                continue
+            time_column = activity_column
+        if not time_column or (tables is None and not chat_column):
+            if tables is not None:
+                logger.warning(f"表 {table} 没有可识别的时间列，已跳过")
+            continue
+        if not _has_rowid(conn, table):
+            logger.warning(f"表 {table} 为 WITHOUT ROWID 表，暂不支持清理，已跳过")
+            continue
+        targets.append({
+            'table': table,
+            'time_column': time_column,
+            'chat_column': chat_column,
+            'time_format': _detect_time_format(conn, table, time_column),
+            'references': _find_references(conn, table),
+        })
+    return targets
+
+
+def get_cutoff_value(time_format: str, max_age_days: float, now: Optional[float] = None):
+    """计算 max_age_days 天前的时间点，按时间列格式返回可直接比较的值"""
+    now = time.time() if now is None else now
+    cutoff = now - max_age_days * 86400
+    if time_format == 'epoch_ms':
+        return cutoff * 1000
+    if time_format == 'text':
+        return (datetime.fromtimestamp(now) - timedelta(days=max_age_days)).strftime('%Y-%m-%d %H:%M:%S')
+    return cutoff
+
+
+def _delete_batch(conn: sqlite3.Connection, target: dict, rowids: list[int]) -> int:
+    """在一个短事务中删除一批记录及其引用记录"""
+    table = quote_identifier(target['table'])
+    placeholders = ','.join('?' * len(rowids))
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        for ref in target['references']:
+            parent_column = quote_identifier(ref['parent_column']) if ref['parent_column'] else 'rowid'
+            conn.execute(
+                f"DELETE FROM {quote_identifier(ref['table'])} WHERE {quote_identifier(ref['column'])} IN "
+                f"(SELECT {parent_column} FROM {table} WHERE rowid IN ({placeholders}))", rowids)
+        deleted = conn.execute(f"DELETE FROM {table} WHERE rowid IN ({placeholders})", rowids).rowcount
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    return deleted
+
+
+def _drain(conn: sqlite3.Connection, target: dict, select_sql: str, params: tuple, batch_size: int,
+           sleep: float, progress: Optional[Callable[[str, int], None]]) -> int:
+    """反复选出一批待删记录并删除，直到没有符合条件的记录"""
+    total = 0
+    while True:
+        rowids = [row[0] for row in conn.execute(select_sql, params + (batch_size,))]
+        if not rowids:
+            return total
+        total += _delete_batch(conn, target, rowids)
+        if progress:
+            progress(target['table'], total)
+        if sleep:
+            time.sleep(sleep)
+
+
+def prune_by_age(conn: sqlite3.Connection, target: dict, max_age_days: float, batch_size: int = DEFAULT_BATCH_SIZE,
+                 sleep: float = DEFAULT_BATCH_SLEEP, dry_run: bool = False,
+                 progress: Optional[Callable[[str, int], None]] = None, now: Optional[float] = None) -> int:
+    """删除早于指定天数的记录
+
+    Returns:
+        int: 删除（dry_run 时为将要删除）的记录数
+    """
+    if target['time_format'] is None:
+        return 0
+    table, time_column = quote_identifier(target['table']), quote_identifier(target['time_column'])
+    cutoff = get_cutoff_value(target['time_format'], max_age_days, now)
+    if dry_run:
+        return conn.execute(f"SELECT COUNT(*) FROM {table} WHERE {time_column} < ?", (cutoff,)).fetchone()[0]
+    select_sql = f"SELECT rowid FROM {table} WHERE {time_column} < ? LIMIT ?"
+    return _drain(conn, target, select_sql, (cutoff,), batch_size, sleep, progress)
+
+
+def prune_by_cap(conn: sqlite3.Connection, target: dict, per_chat_cap: int, batch_size: int = DEFAULT_BATCH_SIZE,
+                 sleep: float = DEFAULT_BATCH_SLEEP, dry_run: bool = False,
+                 progress: Optional[Callable[[str, int], None]] = None) -> int:
+    """每个聊天只保留最新的 per_chat_cap 条记录
+
+    Returns:
+        int: 删除（dry_run 时为将要删除）的记录数
+    """
+    if not target['chat_column']:
+        logger.warning(f"表 {target['table']} 没有聊天列，无法按聊天限制条数")
+        return 0
+    table, time_column, chat_column = (quote_identifier(target['table']), quote_identifier(target['time_column']),
+                                       quote_identifier(target['chat_column']))
+    over_cap = conn.execute(
+        f"SELECT {chat_column}, COUNT(*) FROM {table} GROUP BY {chat_column} HAVING COUNT(*) > ?",
+        (per_chat_cap,)).fetchall()
+    if dry_run:
+        return sum(count - per_chat_cap for _, count in over_cap)
+    # 跳过最新的 per_chat_cap 条，删除之后的记录；删除后剩余记录前移，每批都从同一偏移开始
+    select_sql = (f"SELECT rowid FROM {table} WHERE {chat_column} IS ? "
+                  f"ORDER BY {time_column} DESC, rowid DESC LIMIT ? OFFSET {int(per_chat_cap)}")
+    total = 0
+    for chat, _ in over_cap:
+        # 进度按整张表累计
+        chat_progress = (lambda table, count, base=total: progress(table, base + count)) if progress else None
+        total += _drain(conn, target, select_sql, (chat,), batch_size, sleep, chat_progress)
+    return total
+
+
+def apply_retention(db_path: Path, max_age_days: Optional[float] = None, per_chat_cap: Optional[int] = None,
+                    tables: Optional[list[str]] = None, batch_size: int = DEFAULT_BATCH_SIZE,
+                    sleep: float = DEFAULT_BATCH_SLEEP, dry_run: bool = False, vacuum: bool = False,
+                    backup: bool = False) -> Optional[dict]:
+    """执行保留策略
+
+    Args:
+        db_path: 数据库路径
+        max_age_days: 删除早于该天数的记录，None 表示不按时间清理
+        per_chat_cap: 每个聊天最多保留的记录数，None 表示不限制
+        tables: 指定表名，None 表示自动识别
+        batch_size: 每批删除的记录数
+        sleep: 批间休眠秒数
+        dry_run: 只统计不删除
+        vacuum: 清理后执行增量 VACUUM
+        backup: 清理前先备份数据库
+
+    Returns:
+        Optional[dict]: 各表删除数量，失败时返回 None
+    """
+    if max_age_days is None and per_chat_cap is None:
+        logger.error("请至少指定 --days 或 --per-chat 中的一项")
+        return None
+    if not db_path.exists():
+        logger.error(f"数据库文件不存在: {db_path}")
+        return None
+    if backup and not dry_run:
+        from db_backup import create_backup
+        if not create_backup(db_path, reason='清理聊天记录前的快照', pinned=True):
+            logger.error("备份失败，已取消清理")
+            return None
+
+    def progress(table: str, count: int) -> None:
+        print(f"\r{table}: 已删除 {count} 条", end='', flush=True)
+
+    summary = {}
+    start = time.perf_counter()
+    try:
+        with closing(connect_db(db_path)) as conn:
+            targets = discover_targets(conn, tables)
+            if not targets:
+                logger.warning("没有找到可清理的表")
+                return summary
+            for target in targets:
+                deleted = 0
+                if max_age_days is not None:
+                    deleted += prune_by_age(conn, target, max_age_days, batch_size, sleep, dry_run, progress)
+                if per_chat_cap is not None:
+                    deleted += prune_by_cap(conn, target, per_chat_cap, batch_size, sleep, dry_run, progress)
+                if deleted and not dry_run:
+                    print()
+                summary[target['table']] = deleted
+    except sqlite3.OperationalError as e:
+        print()
+        logger.error(f"清理失败: {e}")
+        return None
+
+    action = '将删除' if dry_run else '已删除'
+    for table, deleted in summary.items():
+        logger.info(f"{table}: {action} {deleted} 条")
+    logger.info(f"共{action} {sum(summary.values())} 条记录，耗时 {time.perf_counter() - start:.2f} 秒")
+    if vacuum and not dry_run and any(summary.values()):
+        incremental_vacuum_db(db_path)
+    return summary
+
+
+def print_targets(db_path: Path, tables: Optional[list[str]] = None) -> None:
+    with closing(connect_db(db_path, readonly=True)) as conn:
+        targets = discover_targets(conn, tables)
+    if not targets:
+        print("没有找到可清理的表")
+        return
+    print(f"{'表名':<28}{'时间列':<16}{'时间格式':<12}{'聊天列':<16}关联表")
+    for target in targets:
+        references = ', '.join(f"{ref['table']}.{ref['column']}" for ref in target['references']) or '-'
+        print(f"{target['table']:<28}{target['time_column']:<16}{target['time_format'] or '空表':<12}"
+              f"{target['chat_column'] or '-':<16}{references}")
+
+
+def interactive_retention_menu() -> bool:
+    """聊天记录清理交互菜单（默认实例）"""
+    db_path = resolve_db_path()
+    if not db_path.exists():
+        logger.error(f"数据库文件不存在: {db_path}")
+        return False
+    print("\n=== 聊天记录清理 ===")
+    print_targets(db_path)
+    days = input("删除多少天前的记录（直接回车表示不按时间清理）: ").strip()
+    cap = input("每个聊天最多保留多少条（直接回车表示不限制）: ").strip()
+    if (days and not days.replace('.', '', 1).isdigit()) or (cap and not cap.isdigit()):
+        logger.error("请输入数字")
+        return False
+    max_age_days = float(days) if days else None
+    per_chat_cap = int(cap) if cap else None
+    preview = apply_retention(db_path, max_age_days, per_chat_cap, dry_run=True)
+    if not preview or not any(preview.values()):
+        return preview is not None
+    confirm = input("确定删除以上记录吗？删除前会自动备份 (y/N): ").strip().lower()
+    if confirm != 'y':
+        logger.info("操作已取消")
+        return True
+    summary = apply_retention(db_path, max_age_days, per_chat_cap, backup=True)
+    if summary is None:
+        return False
+    if any(summary.values()):
+        _reclaim_space(db_path)
+    return True
+
+
+def _reclaim_space(db_path: Path) -> None:
+    """清理后释放空闲页：开启了增量整理时在线整理，否则询问是否执行完整 VACUUM"""
+    with closing(connect_db(db_path, readonly=True)) as conn:
+        auto_vacuum = conn.execute("PRAGMA auto_vacuum").fetchone()[0]
+    if auto_vacuum == 2:
+        incremental_vacuum_db(db_path)
+        return
+    if auto_vacuum == 1:
+        return  # auto_vacuum=FULL 在提交时已自动释放空闲页
+    confirm = input("数据库未开启增量整理，删除的记录占用的空间需要完整 VACUUM 才能释放。\n"
+                    "完整 VACUUM 会重写整个数据库文件，需先停止麦麦，是否现在执行？(y/N): ").strip().lower()
+    if confirm == 'y':
+        run_maintenance(db_path, ['vacuum'])
+    else:
+        logger.info("已跳过整理，之后可在数据库维护菜单中执行 VACUUM")
+
+
+def main() -> int:
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description="麦麦聊天记录保留策略")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    subparsers.add_parser('targets', help="查看会被清理的表")
+    run_parser = subparsers.add_parser('run', help="执行清理")
+    run_parser.add_argument('--days', type=float, help="删除早于该天数的记录")
+    run_parser.add_argument('--per-chat', type=int, help="每个聊天最多保留的记录数")
+    run_parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help="每批删除的记录数")
+    run_parser.add_argument('--sleep', type=float, default=DEFAULT_BATCH_SLEEP, help="批间休眠秒数")
+    run_parser.add_argument('--dry-run', action='store_true', help="只统计不删除")
+    run_parser.add_argument('--vacuum', action='store_true', help="清理后执行增量 VACUUM")
+    run_parser.add_argument('--backup', action='store_true', help="清理前先备份数据库")
+    for sub in subparsers.choices.values():
+        sub.add_argument('--table', action='append', help="指定表名，可重复；不指定时自动识别")
+        sub.add_argument('--instance', help="实例名称，不指定表示默认实例")
+        sub.add_argument('--db', help="直接指定数据库文件路径")
+    args = parser.parse_args()
+
+    db_path = resolve_db_path(args.db, args.instance)
+    if args.command == 'targets':
+        if not db_path.exists():
+            logger.error(f"数据库文件不存在: {db_path}")
+            return 1
+        print_targets(db_path, args.table)
+        return 0
+    summary = apply_retention(db_path, args.days, args.per_chat, args.table, args.batch_size, args.sleep,
+                              args.dry_run, args.vacuum, args.backup)
+    return 0 if summary is not None else 1
+
+
+if __name__ == "__main__":
+    try:
+        sys.exit(main())
+    except KeyboardInterrupt:
+        print("\n用户取消操作")
+        sys.exit(1)
@@ -0,0 +1,237 @@
+# -*- coding: utf-8 -*-
+"""
+导入耗时分析
+功能：用 python -X importtime 分析启动器和 MaiBot bot.py 的模块导入耗时，并检查启动器显示菜单前的冷启动预算
+
+- 每次分析都启动新的解释器，结果反映冷启动时的导入开销
+- bot.py 以 import 方式加载（不执行 __main__ 部分），超时后结束进程并分析已完成的导入
+- check 子命令多次测量导入 start.py 并构建菜单的耗时，取中位数与预算比较，超出预算时返回非零退出码
+  （tests/test_cold_start.py 以宽松的预算运行同样的检查，并确认菜单显示前没有导入重型依赖）
+
+用法：
+    python import_profile.py                      # 分析启动器和 bot.py
+    python import_profile.py profile launcher     # 只分析启动器
+    python import_profile.py check --budget-ms 200
+    python start.py --profile-imports             # 同 python import_profile.py profile
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+from typing import Optional
+
+try:
+    from modules.MaiBot.src.common.logger import get_logger
+    logger = get_logger("import_profile")
+except ImportError:
+    import logging as logger
+    logger.basicConfig(level=logger.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    logger = logger.getLogger("import_profile")
+
+from toolchain import SCRIPT_DIR, get_python_path
+
+MAIBOT_DIR = SCRIPT_DIR / 'modules' / 'MaiBot'
+
+# 分析目标：名称 -> (工作目录, 执行的代码)
+TARGETS = {
+    'launcher': (SCRIPT_DIR, "import main, start; start.initialize_menu()"),
+    'bot': (MAIBOT_DIR, "import bot"),
+}
+TARGET_LABELS = {'launcher': '启动器 (main.py + start.py)', 'bot': 'MaiBot (bot.py)'}
+
+DEFAULT_TIMEOUT = 120
+DEFAULT_BUDGET_MS = 200.0
+DEFAULT_RUNS = 5
+
+STARTUP_PROBE = (
+    "import time; started = time.perf_counter(); "
+    "import start; start.initialize_menu(); "
+    "print((time.perf_counter() - started) * 1000)"
+)
+
+
+def parse_importtime(text: str) -> list[dict]:
+    """解析 -X importtime 的输出
+
+    Args:
+        text: 解释器的标准错误输出
+
+    Returns:
+        list: 每个导入一项，包含 module、self_us、cumulative_us、depth，顺序与输出一致
+    """
+    entries = []
+    for line in text.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        parts = line[len('import time:'):].split('|')
+        if len(parts) != 3 or not parts[0].strip().isdigit():
+            continue  # 表头
+        name = parts[2][1:] if parts[2].startswith(' ') else parts[2]
+        entries.append({
+            'module': name.strip(),
+            'self_us': int(parts[0]),
+            'cumulative_us': int(parts[1]),
+            'depth': (len(name) - len(name.lstrip(' '))) // 2,
+        })
+    return entries
+
+
+def run_importtime(cwd: Path, code: str, timeout: float = DEFAULT_TIMEOUT) -> dict:
+    """在新的解释器中带 -X importtime 执行代码
+
+    Returns:
+        dict: entries、returncode、timed_out、stderr_tail
+    """
+    env = dict(os.environ, PYTHONIOENCODING='utf-8')
+    process = subprocess.Popen(
+        [get_python_path(), '-X', 'importtime', '-c', code],
+        cwd=str(cwd), stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, env=env,
+    )
+    timed_out = False
+    try:
+        _, stderr = process.communicate(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        # bot.py 可能在导入阶段就开始运行，超时后结束进程，已完成的导入记录仍然有效
+        timed_out = True
+        process.kill()
+        _, stderr = process.communicate()
+    text = stderr.decode('utf-8', errors='replace')
+    errors = [line for line in text.splitlines() if not line.startswith('import time:')]
+    return {
+        'entries': parse_importtime(text),
+        'returncode': process.returncode,
+        'timed_out': timed_out,
+        'stderr_tail': errors[-5:],
+    }
+
+
+def summarize(entries: list[dict], top: int = 15) -> dict:
+    """汇总导入耗时
+
+    Returns:
+        dict: total_ms、top_level（顶层导入按累计耗时排序）、top_self（按自身耗时排序）
+    """
+    top_level = [entry for entry in entries if entry['depth'] == 0]
+    # 进程被结束时，正在导入的模块没有自己的记录，把它已完成的子导入当作顶层导入
+    last_root = max((index for index, entry in enumerate(entries) if entry['depth'] == 0), default=-1)
+    trailing = entries[last_root + 1:]
+    if trailing:
+        min_depth = min(entry['depth'] for entry in trailing)
+        top_level.extend(entry for entry in trailing if entry['depth'] == min_depth)
+    return {
+        'total_ms': sum(entry['cumulative_us'] for entry in top_level) / 1000,
+        'module_count': len(entries),
+        'top_level': sorted(top_level, key=lambda entry: entry['cumulative_us'], reverse=True)[:top],
+        'top_self': sorted(entries, key=lambda entry: entry['self_us'], reverse=True)[:top],
+    }
+
+
+def profile_target(name: str, top: int = 15, timeout: float = DEFAULT_TIMEOUT) -> Optional[dict]:
+    """分析一个目标的导入耗时，目标不存在时返回None"""
+    cwd, code = TARGETS[name]
+    if name == 'bot' and not (cwd / 'bot.py').exists():
+        logger.warning(f"未找到 {cwd / 'bot.py'}，跳过 MaiBot 导入分析")
+        return None
+    result = run_importtime(cwd, code, timeout)
+    summary = summarize(result['entries'], top)
+    summary.update(target=name, returncode=result['returncode'], timed_out=result['timed_out'],
+                   stderr_tail=result['stderr_tail'])
+    return summary
+
+
+def print_summary(summary: dict) -> None:
+    print(f"\n=== {TARGET_LABELS[summary['target']]} ===")
+    print(f"导入 {summary['module_count']} 个模块，共 {summary['total_ms']:.1f} ms")
+    if summary['timed_out']:
+        print("（进程在超时后被结束，只统计了超时前完成的导入）")
+    elif summary['returncode'] != 0:
+        print(f"（进程退出码 {summary['returncode']}，导入可能未全部完成）")
+        for line in summary['stderr_tail']:
+            print(f"  {line}")
+
+    print("\n累计耗时最多的顶层导入：")
+    for entry in summary['top_level']:
+        print(f"  {entry['cumulative_us'] / 1000:>9.1f} ms  {entry['module']}")
+    print("\n自身耗时最多的模块：")
+    for entry in summary['top_self']:
+        print(f"  {entry['self_us'] / 1000:>9.1f} ms  {entry['module']}")
+
+
+def measure_startup(runs: int = DEFAULT_RUNS) -> list[float]:
+    """多次测量导入 start.py 并构建菜单的耗时（毫秒），每次使用新的解释器"""
+    timings = []
+    for _ in range(runs):
+        result = subprocess.run(
+            [get_python_path(), '-c', STARTUP_PROBE],
+            cwd=str(SCRIPT_DIR), stdin=subprocess.DEVNULL, capture_output=True, text=True,
+            encoding='utf-8', errors='replace', timeout=DEFAULT_TIMEOUT,
+        )
+        if result.returncode != 0:
+            raise RuntimeError(f"启动器导入失败: {result.stderr.strip()[-500:]}")
+        timings.append(float(result.stdout.strip().splitlines()[-1]))
+    return timings
+
+
+def check_budget(budget_ms: float = DEFAULT_BUDGET_MS, runs: int = DEFAULT_RUNS) -> bool:
+    """检查启动器显示菜单前的耗时是否在预算内
+
+    Returns:
+        bool: 中位数不超过预算时返回 True
+    """
+    timings = measure_startup(runs)
+    median = statistics.median(timings)
+    detail = ', '.join(f"{timing:.1f}" for timing in timings)
+    if median > budget_ms:
+        logger.error(f"启动器冷启动耗时 {median:.1f} ms 超出预算 {budget_ms:.0f} ms（各次: {detail}）")
+        logger.error("请运行 python import_profile.py profile launcher 查看导入耗时最多的模块")
+        return False
+    logger.info(f"启动器冷启动耗时 {median:.1f} ms，预算 {budget_ms:.0f} ms（各次: {detail}）")
+    return True
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='启动器和 MaiBot 的导入耗时分析')
+    subparsers = parser.add_subparsers(dest='command')
+
+    profile_parser = subparsers.add_parser('profile', help='分析导入耗时')
+    profile_parser.add_argument('target', nargs='?', choices=['launcher', 'bot', 'all'], default='all')
+    profile_parser.add_argument('--top', type=int, default=15, help='显示耗时最多的前 N 个模块')
+    profile_parser.add_argument('--timeout', type=float, default=DEFAULT_TIMEOUT, help='单个目标的超时秒数')
+    profile_parser.add_argument('--json', action='store_true', help='以 JSON 格式输出')
+
+    check_parser = subparsers.add_parser('check', help='检查启动器冷启动耗时是否在预算内')
+    check_parser.add_argument('--budget-ms', type=float, default=DEFAULT_BUDGET_MS, help='预算（毫秒）')
+    check_parser.add_argument('--runs', type=int, default=DEFAULT_RUNS, help='测量次数，取中位数')
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'check':
+        try:
+            return 0 if check_budget(args.budget_ms, args.runs) else 1
+        except (RuntimeError, subprocess.TimeoutExpired) as e:
+            logger.error(str(e))
+            return 1
+
+    target = getattr(args, 'target', 'all')
+    names = list(TARGETS) if target == 'all' else [target]
+    summaries = [profile_target(name, getattr(args, 'top', 15), getattr(args, 'timeout', DEFAULT_TIMEOUT))
+                 for name in names]
+    summaries = [summary for summary in summaries if summary]
+    if getattr(args, 'json', False):
+        print(json.dumps(summaries, indent=2, ensure_ascii=False))
+    else:
+        for summary in summaries:
+            print_summary(summary)
+    return 0
+
+
+if __name__ == "__main__":
+    try:
+        sys.exit(main())
+    except KeyboardInterrupt:
+        print("\n用户取消操作")
+        sys.exit(1)
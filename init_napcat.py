@@ -1,7 +1,7 @@
 import re
-import json
 import tomlkit  # 替换 tomli
 from pathlib import Path
+from safe_io import atomic_write_json, atomic_write_text, config_lock
 
 def is_valid_qq(qq_str):
     # 检查是否为纯数字
@@ -58,8 +58,7 @@ def create_napcat_config(qq_number):
         config_dir_1.mkdir(parents=True, exist_ok=True)
         
         config_path_1 = config_dir_1 / f'napcat_{qq_number}.json'
-        with open(config_path_1, 'w', encoding='utf-8') as f:
-            json.dump(config, f, indent=2, ensure_ascii=False)
+        atomic_write_json(config_path_1, config, indent=2, ensure_ascii=False)
         print(f"已创建napcat配置文件：{config_path_1}")
 
         # napcatframework路径
@@ -67,31 +66,38 @@ def create_napcat_config(qq_number):
         config_dir_2.mkdir(parents=True, exist_ok=True)
 
         config_path_2 = config_dir_2 / f'napcat_{qq_number}.json'
-        with open(config_path_2, 'w', encoding='utf-8') as f:
-            json.dump(config, f, indent=2, ensure_ascii=False)
+        atomic_write_json(config_path_2, config, indent=2, ensure_ascii=False)
         print(f"已创建napcatframework配置文件：{config_path_2}")
 
-def create_onebot_config(qq_number):
-    # 创建OneBot11配置文件
+def build_websocket_client(name, ws_port):
+    # 生成一条反向WebSocket客户端配置
+    return {
+        "enable": True,
+        "name": name,
+        "url": f"ws://localhost:{ws_port}",
+        "reportSelfMessage": False,
+        "messagePostFormat": "array",
+        "token": "",
+        "debug": False,
+        "heartInterval": 30000,
+        "reconnectInterval": 30000
+    }
+
+def create_onebot_config(qq_number, ws_port=8095, ws_ports=None):
+    # 创建OneBot11配置文件，ws_port 为适配器监听的反向WebSocket端口（多实例时各不相同）
+    # ws_ports 为适配器分片的端口列表，指定时为每个分片生成一条连接，第一条仍命名为 MaiBot Main
+    ports = list(ws_ports) if ws_ports else [ws_port]
+    websocket_clients = [build_websocket_client("MaiBot Main", ports[0])]
+    websocket_clients.extend(
+        build_websocket_client(f"MaiBot Shard {index}", port) for index, port in enumerate(ports[1:], 1)
+    )
     config = {
     "network": {
         "httpServers": [],
         "httpSseServers": [],
         "httpClients": [],
         "websocketServers": [],
-        "websocketClients": [
-            {
-                "enable": True,
-                "name": "MaiBot Main",
-                "url": "ws://localhost:8095",
-                "reportSelfMessage": False,
-                "messagePostFormat": "array",
-                "token": "",
-                "debug": False,
-                "heartInterval": 30000,
-                "reconnectInterval": 30000
-            }
-        ],
+        "websocketClients": websocket_clients,
         "plugins": []
     },
     "musicSignUrl": "",
@@ -115,8 +121,7 @@ def create_onebot_config(qq_number):
         config_dir_1.mkdir(parents=True, exist_ok=True)
         
         config_path_1 = config_dir_1 / f'onebot11_{qq_number}.json'
-        with open(config_path_1, 'w', encoding='utf-8') as f:
-            json.dump(config, f, indent=2, ensure_ascii=False)
+        atomic_write_json(config_path_1, config, indent=2, ensure_ascii=False)
         print(f"已创建OneBot11配置文件：{config_path_1}")
 
         # napcatframework路径
@@ -124,8 +129,7 @@ def create_onebot_config(qq_number):
         config_dir_2.mkdir(parents=True, exist_ok=True)
 
         config_path_2 = config_dir_2 / f'onebot11_{qq_number}.json'
-        with open(config_path_2, 'w', encoding='utf-8') as f:
-            json.dump(config, f, indent=2, ensure_ascii=False)
+        atomic_write_json(config_path_2, config, indent=2, ensure_ascii=False)
         print(f"已创建OneBot11配置文件：{config_path_2}")
 
 def update_qq_in_config(path: str, qq_number: int):  # 确保 qq_number 是整数
@@ -143,22 +147,23 @@ def update_qq_in_config(path: str, qq_number: int):  # 确保 qq_number 是整
             print(f"已从模板创建配置文件: {config_path}")
     
     try:
-        # 读取原始文件内容
-        with open(config_path, 'r', encoding='utf-8') as f:
-            content = f.read()
-        
-        # 解析 TOML 内容
-        doc = tomlkit.parse(content)
-        
-        # 更新 qq 值
-        if 'bot' not in doc:
-            doc['bot'] = tomlkit.table()  # 如果 bot 表不存在则创建
-        doc['bot']['qq_account'] = qq_number  # qq_number 已经是整数
-        
-        # 写入更新后的内容
-        with open(config_path, 'w', encoding='utf-8') as f:
-            tomlkit.dump(doc, f)
-            
+        # 持有配置锁完成“读取-修改-写回”，避免多个启动器同时修改
+        with config_lock():
+            # 读取原始文件内容
+            with open(config_path, 'r', encoding='utf-8') as f:
+                content = f.read()
+
+            # 解析 TOML 内容
+            doc = tomlkit.parse(content)
+
+            # 更新 qq 值
+            if 'bot' not in doc:
+                doc['bot'] = tomlkit.table()  # 如果 bot 表不存在则创建
+            doc['bot']['qq_account'] = qq_number  # qq_number 已经是整数
+
+            # 原子写入更新后的内容，并保留一份 .bak
+            atomic_write_text(config_path, tomlkit.dumps(doc), backups=1)
+
     except FileNotFoundError:
         print(f"错误：配置文件 {config_path} 未找到。")
         raise
@@ -169,19 +174,31 @@ def update_qq_in_config(path: str, qq_number: int):  # 确保 qq_number 是整
         print(f"错误：更新配置文件 {config_path} 时发生未知错误：{e}")
         raise
 
-def main():
+def prompt_qq_number():
+    # 交互式读取QQ号，返回字符串形式
     while True:
         qq_input = input('请输入QQ号：')
-        if not is_valid_qq(qq_input):
-            print('错误：请输入有效的QQ号（纯数字）')
-            continue
-        
+        if is_valid_qq(qq_input):
+            return qq_input
+        print('错误：请输入有效的QQ号（纯数字）')
+
+def create_napcat_configs(qq_input):
+    # 为所有QQ版本生成OneBot11和napcat配置，只写 modules/napcat* 目录，可与模块更新并行执行
+    create_onebot_config(qq_input)  # create_onebot_config 和 create_napcat_config 需要字符串类型的 qq
+    create_napcat_config(qq_input)
+
+def update_bot_qq(qq_number_int):
+    # 写入MaiBot配置中的QQ号，模板位于MaiBot仓库内，需要在仓库更新完成后执行
+    update_qq_in_config('./modules/MaiBot/config/bot_config.toml', qq_number_int)
+    update_qq_in_config('./modules/MaiBot/template/bot_config_template.toml', qq_number_int)
+
+def main():
+    while True:
+        qq_input = prompt_qq_number()
         qq_number_int = int(qq_input)  # 转换为整数        
         try:
-            update_qq_in_config('./modules/MaiBot/config/bot_config.toml', qq_number_int)
-            update_qq_in_config('./modules/MaiBot/template/bot_config_template.toml', qq_number_int)
-            create_onebot_config(qq_input)  # create_onebot_config 和 create_napcat_config 需要字符串类型的 qq
-            create_napcat_config(qq_input)
+            update_bot_qq(qq_number_int)
+            create_napcat_configs(qq_input)
             print(f'成功更新QQ号为：{qq_input}并创建所有必要的配置文件')
             break
         except Exception as e:
@@ -0,0 +1,478 @@
+# -*- coding: utf-8 -*-
+"""
+实例迁移工具
+功能：把麦麦的配置、数据库、知识库、适配器配置和 NapCat 账号配置打包成一个压缩归档，在新机器上一条命令恢复
+
+- 导出：数据库通过 SQLite 在线备份 API 生成一致的快照，其余文件分块流式写入 tar.gz，内存占用与文件大小无关；
+  归档第一个成员为 manifest.json，记录每个文件的 sha256 和大小
+- 导入：先读清单，解压与校验在两个线程中流水线执行，全部校验通过后才并行放置到目标位置；
+  目标位置已有的数据库会先做快照，知识库目录会先改名保留
+
+用法：
+    python instance_archive.py export [输出文件] [--instance NAME] [--no-knowledge]
+    python instance_archive.py verify 归档文件
+    python instance_archive.py import 归档文件 [--instance NAME]
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import queue
+import shutil
+import sys
+import tarfile
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Iterator, Optional
+
+try:
+    from modules.MaiBot.src.common.logger import get_logger
+    logger = get_logger("instance_archive")
+except ImportError:
+    import logging as logger
+    logger.basicConfig(level=logger.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    logger = logger.getLogger("instance_archive")
+
+import tomlkit
+
+from db_backup import create_backup, online_copy
+from db_maintenance import format_size, is_db_in_use
+from instance_manager import ADAPTER_DIR, MAIBOT_DIR, SCRIPT_DIR, get_instance_dir, load_instance
+
+ARCHIVE_FORMAT = 1
+MANIFEST_NAME = 'manifest.json'
+CHUNK_SIZE = 1024 * 1024
+DEFAULT_COMPRESS_LEVEL = 6
+HASH_WORKERS = min(8, (os.cpu_count() or 2))
+# 麦麦目录下需要迁移的配置文件和知识库目录
+MAIBOT_CONFIG_FILES = ('config/bot_config.toml', 'config/model_config.toml', '.env')
+KNOWLEDGE_DIRS = ('data/rag', 'data/embedding')
+DB_ARCNAME = 'maibot/data/MaiBot.db'
+# NapCat 各版本的账号配置目录，相对于 napcat / napcatframework 的 versions/<版本>/
+NAPCAT_CONFIG_DIRS = {
+    'napcat': ('modules/napcat', 'resources/app/napcat/config'),
+    'napcatframework': ('modules/napcatframework', 'resources/app/LiteLoader/plugins/NapCat/config'),
+}
+
+
+def get_roots(instance: Optional[str] = None) -> dict:
+    """归档中各前缀对应的本机目录"""
+    if instance:
+        instance_dir = get_instance_dir(instance)
+        return {'maibot': instance_dir / 'MaiBot', 'adapter': instance_dir / 'MaiBot-Napcat-Adapter'}
+    return {'maibot': MAIBOT_DIR, 'adapter': ADAPTER_DIR}
+
+
+def get_napcat_config_dirs(kind: str) -> list[Path]:
+    """NapCat 所有已安装版本的账号配置目录"""
+    base, relative = NAPCAT_CONFIG_DIRS[kind]
+    versions_dir = SCRIPT_DIR / base / 'versions'
+    if not versions_dir.is_dir():
+        return []
+    return sorted(version / relative for version in versions_dir.iterdir() if version.is_dir())
+
+
+def _read_qq_account(bot_config: Path) -> Optional[str]:
+    try:
+        with open(bot_config, 'r', encoding='utf-8') as f:
+            account = tomlkit.parse(f.read()).get('bot', {}).get('qq_account')
+    except (OSError, tomlkit.exceptions.TOMLKitError):
+        return None
+    return str(account) if account else None
+
+
+def _walk_files(root: Path) -> Iterator[Path]:
+    for dirpath, _, filenames in os.walk(root):
+        for filename in filenames:
+            yield Path(dirpath) / filename
+
+
+def collect_files(instance: Optional[str] = None, include_knowledge: bool = True) -> tuple[dict, Optional[str]]:
+    """收集要导出的文件
+
+    Returns:
+        tuple: ({归档内路径: 本机路径}, QQ号)，数据库不在其中，由快照单独加入
+    """
+    roots = get_roots(instance)
+    files = {}
+    for relative in MAIBOT_CONFIG_FILES:
+        path = roots['maibot'] / relative
+        if path.is_file():
+            files[f"maibot/{relative}"] = path
+    if include_knowledge:
+        for relative in KNOWLEDGE_DIRS:
+            for path in _walk_files(roots['maibot'] / relative):
+                files[f"maibot/{path.relative_to(roots['maibot']).as_posix()}"] = path
+    adapter_config = roots['adapter'] / 'config.toml'
+    if adapter_config.is_file():
+        files['adapter/config.toml'] = adapter_config
+
+    qq_account = _read_qq_account(roots['maibot'] / 'config' / 'bot_config.toml')
+    if qq_account:
+        for kind in NAPCAT_CONFIG_DIRS:
+            # 各版本的账号配置相同，取最新版本中的一份
+            for config_dir in reversed(get_napcat_config_dirs(kind)):
+                account_files = sorted(config_dir.glob(f'*_{qq_account}.json'))
+                if account_files:
+                    for path in account_files:
+                        files[f"{kind}/config/{path.name}"] = path
+                    break
+    return files, qq_account
+
+
+def hash_file(path: Path) -> tuple[str, int]:
+    """分块计算文件 sha256"""
+    digest = hashlib.sha256()
+    size = 0
+    with open(path, 'rb') as f:
+        while chunk := f.read(CHUNK_SIZE):
+            digest.update(chunk)
+            size += len(chunk)
+    return digest.hexdigest(), size
+
+
+def export_instance(output: Optional[Path] = None, instance: Optional[str] = None, include_knowledge: bool = True,
+                    compress_level: int = DEFAULT_COMPRESS_LEVEL) -> Optional[Path]:
+    """导出实例为 tar.gz 归档
+
+    Args:
+        output: 输出文件，默认为一键包根目录下的 maibot-export-<实例>-<时间>.tar.gz
+        instance: 实例名称，None 表示默认实例
+        include_knowledge: 是否包含 data/rag 和 data/embedding
+        compress_level: gzip 压缩级别
+
+    Returns:
+        Optional[Path]: 归档路径，失败返回 None
+    """
+    if instance and not load_instance(instance):
+        logger.error(f"实例不存在: {instance}")
+        return None
+    start = time.perf_counter()
+    files, qq_account = collect_files(instance, include_knowledge)
+    label = instance or 'default'
+    output = Path(output) if output else SCRIPT_DIR / f"maibot-export-{label}-{datetime.now():%Y%m%d-%H%M%S}.tar.gz"
+
+    with tempfile.TemporaryDirectory(prefix='.export-', dir=output.parent) as tmp_dir:
+        db_path = get_roots(instance)['maibot'] / 'data' / 'MaiBot.db'
+        if db_path.exists():
+            snapshot = Path(tmp_dir) / 'MaiBot.db'
+            logger.info("正在生成数据库快照...")
+            online_copy(db_path, snapshot)
+            files[DB_ARCNAME] = snapshot
+
+        logger.info(f"正在计算 {len(files)} 个文件的校验值...")
+        with ThreadPoolExecutor(max_workers=HASH_WORKERS) as pool:
+            hashes = dict(zip(files, pool.map(hash_file, files.values())))
+        manifest = {
+            'format': ARCHIVE_FORMAT,
+            'created_at': time.time(),
+            'source_instance': label,
+            'qq_account': qq_account,
+            'files': {arcname: {'sha256': digest, 'size': size} for arcname, (digest, size) in hashes.items()},
+        }
+        manifest_bytes = json.dumps(manifest, indent=2, ensure_ascii=False).encode('utf-8')
+
+        tmp_output = output.with_name(f".{output.name}.tmp")
+        total = sum(size for _, size in hashes.values())
+        written = 0
+        try:
+            with open(tmp_output, 'wb') as raw, \
+                    gzip.GzipFile(filename='', mode='wb', fileobj=raw, compresslevel=compress_level) as gz, \
+                    tarfile.open(fileobj=gz, mode='w|', copybufsize=CHUNK_SIZE) as tar:
+                info = tarfile.TarInfo(MANIFEST_NAME)
+                info.size, info.mtime = len(manifest_bytes), int(manifest['created_at'])
+                tar.addfile(info, fileobj=_BytesReader(manifest_bytes))
+                for arcname, path in files.items():
+                    info = tar.gettarinfo(str(path), arcname=arcname)
+                    info.size = hashes[arcname][1]
+                    with open(path, 'rb') as f:
+                        tar.addfile(info, fileobj=f)
+                    written += info.size
+                    print(f"\r正在打包: {format_size(written)}/{format_size(total)}", end='', flush=True)
+                print()
+            os.replace(tmp_output, output)
+        except OSError as e:
+            print()
+            logger.error(f"导出失败: {e}")
+            tmp_output.unlink(missing_ok=True)
+            return None
+
+    logger.info(f"已导出到 {output}（{len(files)} 个文件，{format_size(total)} → "
+                f"{format_size(output.stat().st_size)}，耗时 {time.perf_counter() - start:.1f} 秒）")
+    return output
+
+
+class _BytesReader:
+    """供 tarfile.addfile 读取内存中的小文件"""
+
+    def __init__(self, data: bytes):
+        self._data = memoryview(data)
+        self._pos = 0
+
+    def read(self, size: int = -1) -> bytes:
+        end = len(self._data) if size < 0 else self._pos + size
+        chunk = self._data[self._pos:end].tobytes()
+        self._pos += len(chunk)
+        return chunk
+
+
+def _open_archive(archive: Path) -> tarfile.TarFile:
+    return tarfile.open(str(archive), mode='r|gz', copybufsize=CHUNK_SIZE)
+
+
+def _read_manifest(tar: tarfile.TarFile) -> dict:
+    member = tar.next()
+    if member is None or member.name != MANIFEST_NAME:
+        raise ValueError("归档缺少 manifest.json，不是一键包导出的文件")
+    manifest = json.load(tar.extractfile(member))
+    if manifest.get('format') != ARCHIVE_FORMAT:
+        raise ValueError(f"不支持的归档格式版本: {manifest.get('format')}")
+    return manifest
+
+
+def _safe_arcname(name: str) -> bool:
+    parts = Path(name).parts
+    return bool(parts) and not Path(name).is_absolute() and '..' not in parts and parts[0] in (
+        'maibot', 'adapter', *NAPCAT_CONFIG_DIRS)
+
+
+def _extract_verified(archive: Path, staging: Optional[Path]) -> dict:
+    """流式解压并校验归档
+
+    主线程解压，后台线程计算哈希并写入暂存目录，两者通过有界队列衔接
+
+    Args:
+        archive: 归档文件
+        staging: 暂存目录，None 表示只校验不写文件
+
+    Returns:
+        dict: 清单
+
+    Raises:
+        ValueError: 归档损坏、缺少文件或校验失败
+    """
+    chunks: queue.Queue = queue.Queue(maxsize=16)
+    results = {}
+    errors = []
+
+    def writer():
+        current = None
+        while True:
+            item = chunks.get()
+            if item is None:
+                return
+            kind, name, data = item
+            try:
+                if kind == 'begin':
+                    current = (hashlib.sha256(), None, 0)
+                    if staging:
+                        target = staging / name
+                        target.parent.mkdir(parents=True, exist_ok=True)
+                        current = (current[0], open(target, 'wb'), 0)
+                elif kind == 'data':
+                    digest, handle, size = current
+                    digest.update(data)
+                    if handle:
+                        handle.write(data)
+                    current = (digest, handle, size + len(data))
+                else:
+                    digest, handle, size = current
+                    if handle:
+                        handle.close()
+                    results[name] = (digest.hexdigest(), size)
+            except OSError as e:
+                errors.append(f"{name}: {e}")
+
+    thread = threading.Thread(target=writer, daemon=True)
+    thread.start()
+    try:
+        with _open_archive(archive) as tar:
+            manifest = _read_manifest(tar)
+            done = 0
+            for member in tar:
+                # 流式模式下遍历会重新给出已读取的清单成员
+                if member.name == MANIFEST_NAME:
+                    continue
+                if not member.isfile() or not _safe_arcname(member.name):
+                    raise ValueError(f"归档中有不安全的路径: {member.name}")
+                if member.name not in manifest['files']:
+                    raise ValueError(f"归档中有清单之外的文件: {member.name}")
+                source = tar.extractfile(member)
+                chunks.put(('begin', member.name, None))
+                while chunk := source.read(CHUNK_SIZE):
+                    chunks.put(('data', member.name, chunk))
+                chunks.put(('end', member.name, None))
+                done += 1
+                print(f"\r正在解压并校验: {done}/{len(manifest['files'])}", end='', flush=True)
+            print()
+    except (tarfile.TarError, EOFError, OSError) as e:
+        print()
+        raise ValueError(f"归档已损坏: {e}") from e
+    finally:
+        chunks.put(None)
+        thread.join()
+
+    if errors:
+        raise ValueError("写入暂存文件失败: " + '; '.join(errors))
+    missing = manifest['files'].keys() - results.keys()
+    if missing:
+        raise ValueError(f"归档缺少 {len(missing)} 个文件，例如 {sorted(missing)[0]}")
+    for name, expected in manifest['files'].items():
+        if results[name] != (expected['sha256'], expected['size']):
+            raise ValueError(f"文件校验失败: {name}")
+    return manifest
+
+
+def verify_archive(archive: Path) -> bool:
+    """只校验归档，不写任何文件"""
+    try:
+        manifest = _extract_verified(Path(archive), None)
+    except ValueError as e:
+        logger.error(str(e))
+        return False
+    total = sum(entry['size'] for entry in manifest['files'].values())
+    logger.info(f"归档校验通过：{len(manifest['files'])} 个文件，共 {format_size(total)}，"
+                f"来源实例 {manifest['source_instance']}，QQ {manifest.get('qq_account') or '未知'}")
+    return True
+
+
+def _destinations(arcname: str, roots: dict) -> list[Path]:
+    prefix, relative = arcname.split('/', 1)
+    if prefix in NAPCAT_CONFIG_DIRS:
+        # NapCat 账号配置写入本机每个已安装版本
+        return [config_dir / Path(relative).name for config_dir in get_napcat_config_dirs(prefix)]
+    return [roots[prefix] / relative]
+
+
+def _place(staged: Path, targets: list[Path]) -> None:
+    for index, target in enumerate(targets):
+        target.parent.mkdir(parents=True, exist_ok=True)
+        if index == len(targets) - 1:
+            os.replace(staged, target)
+        else:
+            shutil.copy2(staged, target)
+
+
+def import_instance(archive: Path, instance: Optional[str] = None, force: bool = False) -> bool:
+    """从归档恢复到本机实例
+
+    Args:
+        archive: 归档文件
+        instance: 目标实例名称（需先用 instance_manager 创建），None 表示默认实例
+        force: 数据库正被使用时也强制导入
+
+    Returns:
+        bool: 是否成功
+    """
+    archive = Path(archive)
+    if not archive.is_file():
+        logger.error(f"找不到归档文件: {archive}")
+        return False
+    if instance and not load_instance(instance):
+        logger.error(f"实例不存在: {instance}，请先创建实例再导入")
+        return False
+    roots = get_roots(instance)
+    db_path = roots['maibot'] / 'data' / 'MaiBot.db'
+    if db_path.exists() and is_db_in_use(db_path) and not force:
+        logger.error("麦麦正在运行，请先停止麦麦再导入")
+        return False
+
+    start = time.perf_counter()
+    roots['maibot'].mkdir(parents=True, exist_ok=True)
+    with tempfile.TemporaryDirectory(prefix='.import-', dir=roots['maibot']) as tmp_dir:
+        staging = Path(tmp_dir)
+        try:
+            manifest = _extract_verified(archive, staging)
+        except ValueError as e:
+            logger.error(f"{e}，未修改任何文件")
+            return False
+
+        # 覆盖前保留现有数据：数据库做快照，知识库目录整体改名
+        if DB_ARCNAME in manifest['files'] and db_path.exists():
+            if not create_backup(db_path, reason=f"导入 {archive.name} 前的快照", pinned=True):
+                logger.error("备份现有数据库失败，已取消导入")
+                return False
+            for suffix in ('-wal', '-shm'):
+                Path(str(db_path) + suffix).unlink(missing_ok=True)
+        stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+        for relative in KNOWLEDGE_DIRS:
+            existing = roots['maibot'] / relative
+            if any(name.startswith(f"maibot/{relative}/") for name in manifest['files']) and existing.exists():
+                existing.rename(existing.with_name(f"{existing.name}.before-import-{stamp}"))
+                logger.info(f"原有 {relative} 已保留为 {existing.name}.before-import-{stamp}")
+
+        with ThreadPoolExecutor(max_workers=HASH_WORKERS) as pool:
+            futures = [pool.submit(_place, staging / name, _destinations(name, roots)) for name in manifest['files']]
+            for future in futures:
+                future.result()
+
+    if manifest.get('qq_account') and not any(name.split('/', 1)[0] in NAPCAT_CONFIG_DIRS
+                                              for name in manifest['files']):
+        logger.warning("归档中没有 NapCat 账号配置，请在菜单中重新添加QQ号")
+    logger.info(f"导入完成：{len(manifest['files'])} 个文件，耗时 {time.perf_counter() - start:.1f} 秒")
+    return True
+
+
+def interactive_archive_menu() -> bool:
+    """实例迁移交互菜单（默认实例）"""
+    while True:
+        print("\n=== 实例迁移（导出/导入） ===")
+        print("1. 导出当前麦麦")
+        print("2. 校验归档文件")
+        print("3. 从归档导入")
+        print("0. 返回主菜单")
+        choice = input("请选择操作: ").strip()
+        if choice == '0':
+            return True
+        if choice == '1':
+            include = input("是否包含知识库 (data/rag、data/embedding)？(Y/n): ").strip().lower() != 'n'
+            export_instance(include_knowledge=include)
+        elif choice in ('2', '3'):
+            path = input("请输入归档文件路径: ").strip().strip('"').strip("'")
+            if not path:
+                continue
+            if choice == '2':
+                verify_archive(Path(path))
+            elif input("导入会覆盖当前配置和数据（数据库会先自动备份），确定吗？(y/N): ").strip().lower() == 'y':
+                import_instance(Path(path))
+        else:
+            logger.error("无效选择")
+
+
+def main() -> int:
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description="麦麦实例导出与导入")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    export_parser = subparsers.add_parser('export', help="导出为 tar.gz 归档")
+    export_parser.add_argument('output', nargs='?', help="输出文件路径")
+    export_parser.add_argument('--no-knowledge', action='store_true', help="不包含知识库")
+    export_parser.add_argument('--level', type=int, default=DEFAULT_COMPRESS_LEVEL, choices=range(1, 10),
+                               help="gzip 压缩级别，1 最快")
+    verify_parser = subparsers.add_parser('verify', help="校验归档")
+    verify_parser.add_argument('archive')
+    import_parser = subparsers.add_parser('import', help="从归档导入")
+    import_parser.add_argument('archive')
+    import_parser.add_argument('--force', action='store_true', help="数据库正被使用时也强制导入")
+    for name in ('export', 'import'):
+        subparsers.choices[name].add_argument('--instance', help="实例名称，不指定表示默认实例")
+    args = parser.parse_args()
+
+    if args.command == 'export':
+        return 0 if export_instance(args.output, args.instance, not args.no_knowledge, args.level) else 1
+    if args.command == 'verify':
+        return 0 if verify_archive(Path(args.archive)) else 1
+    return 0 if import_instance(Path(args.archive), args.instance, args.force) else 1
+
+
+if __name__ == "__main__":
+    try:
+        sys.exit(main())
+    except KeyboardInterrupt:
+        print("\n用户取消操作")
+        sys.exit(1)
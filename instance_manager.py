@@ -0,0 +1,766 @@
+# -*- coding: utf-8 -*-
+"""
+多实例管理脚本
+功能：在同一套运行时、同一份MaiBot和适配器代码上运行多个麦麦实例
+每个实例拥有独立的配置目录、数据目录和端口组，无需再整体复制一键包
+
+实例目录结构 (instances/<名称>/)：
+- instance.toml: 实例信息（QQ号、端口组）
+- MaiBot/: 共享 modules/MaiBot 的链接目录，config、data、.env 为实例私有
+- MaiBot-Napcat-Adapter/: 共享适配器的链接目录，config.toml、data 为实例私有
+- logs/: 非Windows平台下各服务的输出日志
+- run.json: 正在运行的服务进程信息
+
+用法：
+- python instance_manager.py create <名称> --qq <QQ号>
+- python instance_manager.py list
+- python instance_manager.py start|stop|status [名称 ...]  (不指定名称表示全部实例)
+- python instance_manager.py sync [名称 ...]  (代码更新后刷新链接)
+- python instance_manager.py remove <名称>
+"""
+
+import argparse
+import json
+import os
+import re
+import shutil
+import socket
+import subprocess
+import sys
+import time
+from contextlib import suppress
+from pathlib import Path
+from typing import Optional
+
+import tomlkit
+
+from init_napcat import create_napcat_config, create_onebot_config
+from safe_io import atomic_write_json, atomic_write_text, config_lock
+from toolchain import find_tool, get_python_path
+from tracing import child_env, span
+
+try:
+    from modules.MaiBot.src.common.logger import get_logger
+    logger = get_logger("instance")
+except ImportError:
+    import logging as logger
+    logger.basicConfig(level=logger.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    logger = logger.getLogger("instance")
+
+
+SCRIPT_DIR = Path(__file__).parent.absolute()
+INSTANCES_DIR = SCRIPT_DIR / 'instances'
+MAIBOT_DIR = SCRIPT_DIR / 'modules' / 'MaiBot'
+ADAPTER_DIR = SCRIPT_DIR / 'modules' / 'MaiBot-Napcat-Adapter'
+NAPCAT_DIR = SCRIPT_DIR / 'modules' / 'napcat'
+
+# 默认实例（modules/ 下的原始布局）占用的端口
+# napcat_ws: 适配器监听的反向WebSocket端口，maibot: 麦麦主程序端口，webui: 麦麦WebUI端口
+# NapCat 自身的 WebUI 端口(6099)写在各版本共享的 webui.json 中，被占用时由 NapCat 自动顺延
+DEFAULT_PORTS = {
+    'napcat_ws': 8095,
+    'maibot': 8000,
+    'webui': 8001,
+}
+
+# 实例私有的条目，不链接到共享代码
+MAIBOT_PRIVATE_ENTRIES = {'config', 'data', 'logs', '.env', '.git'}
+ADAPTER_PRIVATE_ENTRIES = {'config.toml', 'data', 'logs', '.git'}
+
+INSTANCE_NAME_PATTERN = re.compile(r'^[A-Za-z0-9_-]{1,32}$')
+SERVICES = ('napcat', 'adapter', 'bot')
+
+
+def get_instance_dir(name: str) -> Path:
+    """获取实例目录"""
+    return INSTANCES_DIR / name
+
+
+def load_instance(name: str) -> Optional[dict]:
+    """读取实例信息
+
+    Args:
+        name: 实例名称
+
+    Returns:
+        dict: 实例信息，实例不存在时返回None
+    """
+    profile_path = get_instance_dir(name) / 'instance.toml'
+    if not profile_path.exists():
+        return None
+    try:
+        with open(profile_path, 'r', encoding='utf-8') as f:
+            return tomlkit.load(f).unwrap()
+    except Exception as e:
+        logger.error(f"读取实例 {name} 信息失败: {e}")
+        return None
+
+
+def save_instance(profile: dict) -> None:
+    """保存实例信息到 instance.toml"""
+    instance_dir = get_instance_dir(profile['name'])
+    instance_dir.mkdir(parents=True, exist_ok=True)
+    doc = tomlkit.document()
+    doc.add(tomlkit.comment("由 instance_manager.py 生成，端口修改后请执行 sync 以重新写入配置"))
+    doc['name'] = profile['name']
+    doc['qq_account'] = int(profile['qq_account'])
+    doc['created_at'] = profile.get('created_at', time.strftime('%Y-%m-%d %H:%M:%S'))
+    ports = tomlkit.table()
+    for kind in DEFAULT_PORTS:
+        ports[kind] = int(profile['ports'][kind])
+    doc['ports'] = ports
+    atomic_write_text(instance_dir / 'instance.toml', tomlkit.dumps(doc))
+
+
+def list_instances() -> list[dict]:
+    """列出所有实例信息"""
+    if not INSTANCES_DIR.exists():
+        return []
+    profiles = []
+    for entry in sorted(INSTANCES_DIR.iterdir()):
+        if entry.is_dir():
+            profile = load_instance(entry.name)
+            if profile:
+                profiles.append(profile)
+    return profiles
+
+
+def get_used_ports(exclude: Optional[str] = None) -> set[int]:
+    """获取默认实例、所有已登记实例以及适配器分片占用的端口
+
+    Args:
+        exclude: 不计入的实例名称（重新分配该实例端口时使用）
+    """
+    from adapter_shards import get_all_shard_ports
+
+    used = set(DEFAULT_PORTS.values())
+    for profile in list_instances():
+        if profile['name'] == exclude:
+            continue
+        used.update(int(port) for port in profile.get('ports', {}).values())
+    used.update(get_all_shard_ports())
+    return used
+
+
+def is_port_free(port: int) -> bool:
+    """检查本机端口当前是否可以绑定"""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        try:
+            s.bind(('127.0.0.1', port))
+            return True
+        except OSError:
+            return False
+
+
+def allocate_port(base: int, used: set[int]) -> int:
+    """从 base 之后查找一个未登记且本机未占用的端口
+
+    Args:
+        base: 起始端口（不含）
+        used: 已被占用的端口集合（会被原地更新）
+    """
+    port = base + 1
+    while port in used or not is_port_free(port):
+        port += 1
+        if port > 65535:
+            raise RuntimeError(f"无法在 {base} 之后分配可用端口")
+    used.add(port)
+    return port
+
+
+def allocate_ports(used: set[int]) -> dict[str, int]:
+    """为新实例分配一组不冲突的端口
+
+    每类端口从默认端口开始向上查找，跳过已登记的端口和本机正在使用的端口
+
+    Args:
+        used: 已被占用的端口集合（会被原地更新）
+
+    Returns:
+        dict: 端口类型 -> 端口号
+    """
+    return {kind: allocate_port(base, used) for kind, base in DEFAULT_PORTS.items()}
+
+
+def _link_entry(src: Path, dst: Path) -> None:
+    """将共享代码中的条目链接到实例目录
+
+    目录：Windows 使用目录联接(junction，无需管理员权限)，其他平台使用符号链接
+    文件：优先符号链接，失败时退回硬链接或复制（每次启动前 sync 会刷新）
+    """
+    if src.is_dir():
+        if os.name == 'nt':
+            import _winapi
+            _winapi.CreateJunction(str(src), str(dst))
+        else:
+            os.symlink(src, dst, target_is_directory=True)
+        return
+    try:
+        os.symlink(src, dst)
+    except (OSError, NotImplementedError):
+        try:
+            os.link(src, dst)
+        except OSError:
+            shutil.copy2(src, dst)
+
+
+def remove_entry(path: Path) -> None:
+    """删除链接或文件（不会跟随链接删除共享代码）"""
+    if path.is_symlink() or path.is_file():
+        path.unlink()
+    elif _is_link(path):
+        # Windows 目录联接：rmdir 只删除联接本身
+        os.rmdir(path)
+
+
+def _is_link(path: Path) -> bool:
+    """检查路径是否为符号链接或 Windows 目录联接"""
+    if path.is_symlink():
+        return True
+    try:
+        os.readlink(path)
+        return True
+    except (OSError, ValueError):
+        return False
+
+
+def _is_linked_to(dst: Path, src: Path) -> bool:
+    """检查实例中的条目是否仍然指向共享代码中的对应条目"""
+    try:
+        if dst.is_symlink():
+            return Path(os.readlink(dst)) == src
+        if src.is_dir():
+            return dst.is_dir() and os.path.samefile(dst, src)
+        # 硬链接/复制的文件，在代码更新后会失效，比较 inode 和修改时间
+        return os.path.samefile(dst, src) or (
+            dst.stat().st_mtime == src.stat().st_mtime and dst.stat().st_size == src.stat().st_size
+        )
+    except OSError:
+        return False
+
+
+def sync_overlay(shared_dir: Path, overlay_dir: Path, private_entries: set[str]) -> int:
+    """同步实例链接目录，使其与共享代码的顶层条目一致
+
+    Args:
+        shared_dir: 共享代码目录
+        overlay_dir: 实例中的链接目录
+        private_entries: 实例私有的条目名称
+
+    Returns:
+        int: 新建或刷新的链接数量
+    """
+    overlay_dir.mkdir(parents=True, exist_ok=True)
+    refreshed = 0
+    shared_names = set()
+    for src in shared_dir.iterdir():
+        if src.name in private_entries:
+            continue
+        shared_names.add(src.name)
+        dst = overlay_dir / src.name
+        if dst.exists() or dst.is_symlink():
+            if _is_linked_to(dst, src):
+                continue
+            if dst.is_dir() and not _is_link(dst):
+                logger.warning(f"实例目录中存在同名的普通目录，跳过链接: {dst}")
+                continue
+            remove_entry(dst)
+        _link_entry(src, dst)
+        refreshed += 1
+
+    # 清理共享代码中已被删除的条目
+    for dst in overlay_dir.iterdir():
+        if dst.name not in private_entries and dst.name not in shared_names and _is_link(dst):
+            remove_entry(dst)
+            refreshed += 1
+    return refreshed
+
+
+def _set_env_value(env_path: Path, key: str, value: str, append_missing: bool = True) -> bool:
+    """修改 .env 文件中的键值，保留其余内容
+
+    Returns:
+        bool: 是否写入了该键
+    """
+    lines = env_path.read_text(encoding='utf-8').splitlines() if env_path.exists() else []
+    pattern = re.compile(rf'^\s*{re.escape(key)}\s*=')
+    found = False
+    for i, line in enumerate(lines):
+        if pattern.match(line):
+            lines[i] = f'{key}={value}'
+            found = True
+    if not found:
+        if not append_missing:
+            return False
+        lines.append(f'{key}={value}')
+    atomic_write_text(env_path, '\n'.join(lines) + '\n')
+    return True
+
+
+def _copy_first_existing(target: Path, candidates: list[Path]) -> bool:
+    """从候选文件中复制第一个存在的文件到目标位置（目标已存在时不覆盖）"""
+    if target.exists():
+        return True
+    for candidate in candidates:
+        if candidate.exists():
+            target.parent.mkdir(parents=True, exist_ok=True)
+            shutil.copy2(candidate, target)
+            return True
+    return False
+
+
+def write_maibot_config(profile: dict) -> bool:
+    """生成实例私有的麦麦配置（bot_config.toml、model_config.toml、.env）"""
+    overlay = get_instance_dir(profile['name']) / 'MaiBot'
+    config_dir = overlay / 'config'
+    (overlay / 'data').mkdir(parents=True, exist_ok=True)
+
+    # 以默认实例的配置为蓝本（沿用人设和模型密钥），不存在时使用模板
+    bot_config = config_dir / 'bot_config.toml'
+    if not _copy_first_existing(bot_config, [
+        MAIBOT_DIR / 'config' / 'bot_config.toml',
+        MAIBOT_DIR / 'template' / 'bot_config_template.toml',
+    ]):
+        logger.error("找不到 bot_config.toml 或其模板，无法创建实例配置")
+        return False
+    _copy_first_existing(config_dir / 'model_config.toml', [
+        MAIBOT_DIR / 'config' / 'model_config.toml',
+        MAIBOT_DIR / 'template' / 'model_config_template.toml',
+    ])
+
+    with open(bot_config, 'r', encoding='utf-8') as f:
+        doc = tomlkit.parse(f.read())
+    if 'bot' not in doc:
+        doc['bot'] = tomlkit.table()
+    doc['bot']['qq_account'] = int(profile['qq_account'])
+    atomic_write_text(bot_config, tomlkit.dumps(doc), backups=1)
+
+    env_path = overlay / '.env'
+    _copy_first_existing(env_path, [MAIBOT_DIR / '.env', MAIBOT_DIR / 'template' / 'template.env'])
+    _set_env_value(env_path, 'PORT', str(profile['ports']['maibot']))
+    # 仅当模板中存在 WebUI 端口项时才修改，避免写入麦麦不认识的配置
+    _set_env_value(env_path, 'WEBUI_PORT', str(profile['ports']['webui']), append_missing=False)
+    return True
+
+
+def write_adapter_config(profile: dict) -> bool:
+    """生成实例私有的适配器配置，写入该实例的端口"""
+    config_path = get_instance_dir(profile['name']) / 'MaiBot-Napcat-Adapter' / 'config.toml'
+    if not _copy_first_existing(config_path, [
+        ADAPTER_DIR / 'config.toml',
+        ADAPTER_DIR / 'template' / 'template_config.toml',
+    ]):
+        logger.error("找不到适配器 config.toml 或其模板，无法创建实例配置")
+        return False
+
+    with open(config_path, 'r', encoding='utf-8') as f:
+        doc = tomlkit.parse(f.read())
+    for section, port in (('napcat_server', profile['ports']['napcat_ws']),
+                          ('maibot_server', profile['ports']['maibot'])):
+        if section not in doc:
+            doc[section] = tomlkit.table()
+        doc[section]['port'] = int(port)
+    atomic_write_text(config_path, tomlkit.dumps(doc), backups=1)
+    return True
+
+
+def sync_instance(name: str) -> bool:
+    """刷新实例的代码链接并重新写入端口相关配置"""
+    profile = load_instance(name)
+    if not profile:
+        logger.error(f"实例不存在: {name}")
+        return False
+    instance_dir = get_instance_dir(name)
+    try:
+        with config_lock():
+            for shared, private in ((MAIBOT_DIR, MAIBOT_PRIVATE_ENTRIES), (ADAPTER_DIR, ADAPTER_PRIVATE_ENTRIES)):
+                if not shared.exists():
+                    logger.error(f"共享代码目录不存在: {shared}")
+                    return False
+                count = sync_overlay(shared, instance_dir / shared.name, private)
+                if count:
+                    logger.info(f"实例 {name}: 已刷新 {shared.name} 的 {count} 个链接")
+            if not (write_maibot_config(profile) and write_adapter_config(profile)):
+                return False
+            # NapCat 的 OneBot11 配置按QQ号区分，直接写入该实例的反向WebSocket端口（启用分片时写入全部分片端口）
+            from adapter_shards import get_shard_ports
+            create_onebot_config(str(profile['qq_account']), ws_port=profile['ports']['napcat_ws'],
+                                 ws_ports=get_shard_ports(name))
+        return True
+    except Exception as e:
+        logger.error(f"同步实例 {name} 失败: {e}")
+        return False
+
+
+def create_instance(name: str, qq_number: str) -> Optional[dict]:
+    """创建新实例
+
+    Args:
+        name: 实例名称（字母、数字、下划线、连字符）
+        qq_number: 实例使用的QQ号
+
+    Returns:
+        dict: 新实例信息，失败时返回None
+    """
+    if not INSTANCE_NAME_PATTERN.match(name):
+        logger.error("实例名称只能包含字母、数字、下划线和连字符，且不超过32个字符")
+        return None
+    if not re.match(r'^\d+$', str(qq_number)):
+        logger.error("QQ号必须为纯数字")
+        return None
+    # 检查、分配端口和写入实例信息期间持有配置锁，避免两个启动器分配到相同端口
+    with config_lock():
+        if load_instance(name):
+            logger.error(f"实例已存在: {name}")
+            return None
+        for profile in list_instances():
+            if str(profile['qq_account']) == str(qq_number):
+                logger.error(f"QQ号 {qq_number} 已被实例 {profile['name']} 使用")
+                return None
+
+        profile = {
+            'name': name,
+            'qq_account': int(qq_number),
+            'created_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'ports': allocate_ports(get_used_ports()),
+        }
+        save_instance(profile)
+        if not sync_instance(name):
+            return None
+    create_napcat_config(str(qq_number))
+    ports = profile['ports']
+    logger.info(f"实例 {name} 创建成功 (QQ: {qq_number}, 适配器: {ports['napcat_ws']}, "
+                f"麦麦: {ports['maibot']}, WebUI: {ports['webui']})")
+    return profile
+
+
+def get_python_interpreter() -> str:
+    """获取用于启动实例服务的Python解释器"""
+    return get_python_path()
+
+
+def _read_run_state(name: str) -> dict:
+    run_file = get_instance_dir(name) / 'run.json'
+    if not run_file.exists():
+        return {}
+    try:
+        return json.loads(run_file.read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_run_state(name: str, state: dict) -> None:
+    run_file = get_instance_dir(name) / 'run.json'
+    atomic_write_json(run_file, state, ensure_ascii=False, indent=2)
+
+
+def is_pid_alive(pid: int) -> bool:
+    """检查进程是否仍在运行"""
+    try:
+        import psutil
+        return psutil.pid_exists(pid) and psutil.Process(pid).status() != psutil.STATUS_ZOMBIE
+    except ImportError:
+        pass
+    except Exception:
+        return False
+    if os.name == 'nt':
+        result = subprocess.run(['tasklist', '/FI', f'PID eq {pid}', '/NH'],
+                                capture_output=True, text=True, errors='ignore')
+        return str(pid) in result.stdout
+    try:
+        os.kill(pid, 0)
+        return True
+    except OSError:
+        return False
+
+
+def _terminate_pid(pid: int) -> None:
+    """结束进程及其子进程"""
+    if os.name == 'nt':
+        subprocess.run(['taskkill', '/PID', str(pid), '/T', '/F'], capture_output=True)
+        return
+    import signal
+    try:
+        # 服务以独立会话启动，结束整个进程组
+        os.killpg(pid, signal.SIGTERM)
+    except OSError:
+        with suppress(OSError):
+            os.kill(pid, signal.SIGTERM)
+
+
+def _launch_service(name: str, service: str, command: list[str], cwd: Path) -> Optional[int]:
+    """启动单个服务进程
+
+    Windows 下为每个服务打开独立的控制台窗口，其他平台输出写入实例 logs 目录
+
+    Returns:
+        int: 进程PID，失败时返回None
+    """
+    with span(f"启动 {service}", kind='launch', instance=name,
+              command=subprocess.list2cmdline([str(arg) for arg in command]), cwd=str(cwd)) as current:
+        try:
+            if os.name == 'nt':
+                process = subprocess.Popen(command, cwd=str(cwd), env=child_env(),
+                                           creationflags=subprocess.CREATE_NEW_CONSOLE)
+            else:
+                log_dir = get_instance_dir(name) / 'logs'
+                log_dir.mkdir(parents=True, exist_ok=True)
+                with open(log_dir / f'{service}.log', 'ab') as log_file:
+                    process = subprocess.Popen(command, cwd=str(cwd), stdout=log_file, env=child_env(),
+                                               stderr=subprocess.STDOUT, stdin=subprocess.DEVNULL,
+                                               start_new_session=True)
+            current.set(child_pid=process.pid)
+            logger.info(f"实例 {name}: 已启动 {service} (PID: {process.pid})")
+            return process.pid
+        except Exception as e:
+            current.set(status='failed', error=str(e))
+            logger.error(f"实例 {name}: 启动 {service} 失败: {e}")
+            return None
+
+
+def start_instance(name: str, services: Optional[list[str]] = None) -> bool:
+    """启动实例的服务
+
+    Args:
+        name: 实例名称
+        services: 要启动的服务（napcat/adapter/bot），默认全部
+
+    Returns:
+        bool: 是否全部启动成功
+    """
+    profile = load_instance(name)
+    if not profile:
+        logger.error(f"实例不存在: {name}")
+        return False
+    if not sync_instance(name):
+        return False
+
+    from adapter_shards import get_shard_dirs
+
+    instance_dir = get_instance_dir(name)
+    python_path = get_python_interpreter()
+    napcat_path = find_tool('napcat') or str(NAPCAT_DIR / 'NapCatWinBootMain.exe')
+    commands = {
+        'napcat': [([napcat_path, str(profile['qq_account'])], NAPCAT_DIR)],
+        'adapter': [([python_path, 'main.py'], instance_dir / 'MaiBot-Napcat-Adapter')],
+        'bot': [([python_path, 'bot.py'], instance_dir / 'MaiBot')],
+    }
+    from napcat_stub import stub_command, stub_enabled
+    if stub_enabled():
+        # 测试环境中用不登录 QQ 的替身代替 NapCat
+        commands['napcat'] = [(stub_command(profile['qq_account'], python_path), SCRIPT_DIR)]
+    # 启用适配器分片时，由各分片目录代替单个适配器
+    shard_dirs = get_shard_dirs(name)
+    if shard_dirs:
+        commands['adapter'] = [([python_path, 'main.py'], shard_dir) for shard_dir in shard_dirs]
+
+    state = _read_run_state(name)
+    all_success = True
+    for service in services or SERVICES:
+        for index, (command, cwd) in enumerate(commands[service]):
+            # 分片进程记为 adapter.1、adapter.2 ……
+            key = f'{service}.{index}' if index else service
+            running = state.get(key)
+            if running and is_pid_alive(running['pid']):
+                logger.info(f"实例 {name}: {key} 已在运行 (PID: {running['pid']})")
+                continue
+            if service == 'napcat' and not stub_enabled() and not Path(command[0]).exists():
+                logger.warning(f"实例 {name}: 找不到NapCat可执行文件 {command[0]}，跳过NapCat")
+                continue
+            pid = _launch_service(name, key, command, cwd)
+            if pid is None:
+                all_success = False
+                continue
+            state[key] = {'pid': pid, 'started_at': time.time()}
+    _write_run_state(name, state)
+    return all_success
+
+
+def stop_instance(name: str, services: Optional[list[str]] = None) -> bool:
+    """停止实例的服务"""
+    state = _read_run_state(name)
+    for service in services or SERVICES:
+        keys = [key for key in state if key == service or key.startswith(f'{service}.')]
+        for key in keys:
+            running = state.pop(key)
+            if is_pid_alive(running['pid']):
+                _terminate_pid(running['pid'])
+                logger.info(f"实例 {name}: 已停止 {key} (PID: {running['pid']})")
+    _write_run_state(name, state)
+    return True
+
+
+def get_instance_status(name: str) -> Optional[dict]:
+    """获取实例运行状态
+
+    Returns:
+        dict: 包含实例信息、各服务进程状态（含 adapter.1 等分片进程）及端口监听情况，实例不存在时返回None
+    """
+    profile = load_instance(name)
+    if not profile:
+        return None
+    state = _read_run_state(name)
+    services = {}
+    shard_keys = sorted((key for key in state if key.startswith('adapter.')), key=lambda key: int(key.split('.')[1]))
+    # 分片进程排在 adapter 之后
+    for service in [*SERVICES[:2], *shard_keys, *SERVICES[2:]]:
+        running = state.get(service)
+        alive = bool(running) and is_pid_alive(running['pid'])
+        services[service] = {
+            'pid': running['pid'] if running else None,
+            'running': alive,
+            'uptime': int(time.time() - running['started_at']) if alive else 0,
+        }
+    ports = {kind: {'port': port, 'listening': not is_port_free(port)}
+             for kind, port in profile['ports'].items()}
+    return {'name': name, 'qq_account': profile['qq_account'], 'services': services, 'ports': ports}
+
+
+def remove_instance(name: str) -> bool:
+    """停止并删除实例（只删除实例目录，共享代码不受影响）"""
+    if not load_instance(name):
+        logger.error(f"实例不存在: {name}")
+        return False
+    stop_instance(name)
+    instance_dir = get_instance_dir(name)
+    # 先移除链接，防止 rmtree 跟随目录联接删除共享代码
+    overlays = [(instance_dir / 'MaiBot', MAIBOT_PRIVATE_ENTRIES),
+                (instance_dir / 'MaiBot-Napcat-Adapter', ADAPTER_PRIVATE_ENTRIES)]
+    overlays.extend((shard_dir, ADAPTER_PRIVATE_ENTRIES)
+                    for shard_dir in instance_dir.glob('adapter_shards/shard_*'))
+    for overlay, private in overlays:
+        if overlay.is_dir():
+            for entry in overlay.iterdir():
+                if entry.name not in private:
+                    remove_entry(entry)
+    shutil.rmtree(instance_dir)
+    logger.info(f"实例 {name} 已删除")
+    return True
+
+
+def select_instances(names: Optional[list[str]]) -> list[str]:
+    """解析实例名称列表，为空时返回全部实例"""
+    all_names = [profile['name'] for profile in list_instances()]
+    if not names:
+        return all_names
+    selected = []
+    for name in names:
+        if name in all_names:
+            selected.append(name)
+        else:
+            logger.warning(f"忽略不存在的实例: {name}")
+    return selected
+
+
+def print_instance_status(names: list[str]) -> None:
+    """打印实例状态表"""
+    if not names:
+        print("当前没有任何实例，可通过 create 创建")
+        return
+    print(f"{'实例':<16}{'QQ号':<14}{'NapCat':<10}{'Adapter':<10}{'MaiBot':<10}端口(适配器/麦麦/WebUI)")
+    for name in names:
+        status = get_instance_status(name)
+        if not status:
+            continue
+        flags = ['运行中' if status['services'][s]['running'] else '已停止' for s in SERVICES]
+        adapters = [service for key, service in status['services'].items() if key.split('.')[0] == 'adapter']
+        if len(adapters) > 1:
+            # 启用分片时显示正在运行的适配器进程数
+            flags[1] = f"{sum(service['running'] for service in adapters)}/{len(adapters)}运行"
+        ports = '/'.join(
+            f"{p['port']}{'*' if p['listening'] else ''}" for p in status['ports'].values()
+        )
+        print(f"{name:<16}{status['qq_account']:<14}{flags[0]:<10}{flags[1]:<10}{flags[2]:<10}{ports}")
+    print("(* 表示端口正在监听)")
+
+
+def interactive_instance_menu() -> bool:
+    """多实例管理交互菜单"""
+    while True:
+        print("\n=== 多实例管理 ===")
+        print_instance_status(select_instances(None))
+        print("1. 创建实例")
+        print("2. 启动实例")
+        print("3. 停止实例")
+        print("4. 删除实例")
+        print("0. 返回主菜单")
+        choice = input("请选择操作: ").strip()
+        if choice == '0':
+            return True
+        if choice == '1':
+            name = input("请输入实例名称: ").strip()
+            qq = input("请输入该实例的QQ号: ").strip()
+            create_instance(name, qq)
+        elif choice in ('2', '3'):
+            names = input("请输入实例名称（多个用空格分隔，直接回车表示全部）: ").split()
+            for name in select_instances(names):
+                if choice == '2':
+                    start_instance(name)
+                else:
+                    stop_instance(name)
+        elif choice == '4':
+            name = input("请输入要删除的实例名称: ").strip()
+            confirm = input(f"⚠️  警告：此操作将删除实例 {name} 的全部配置和数据，无法恢复！\n确定要继续吗？(输入 'YES' 确认): ").strip()
+            if confirm.upper() == 'YES':
+                remove_instance(name)
+            else:
+                logger.info("操作已取消")
+        else:
+            logger.error("无效选择")
+
+
+def main() -> int:
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description="麦麦多实例管理")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    create_parser = subparsers.add_parser('create', help="创建实例")
+    create_parser.add_argument('name')
+    create_parser.add_argument('--qq', required=True, help="实例使用的QQ号")
+
+    subparsers.add_parser('list', help="列出所有实例")
+    for command, help_text in (('start', "启动实例"), ('stop', "停止实例"),
+                               ('status', "查看实例状态"), ('sync', "刷新实例链接和配置")):
+        sub = subparsers.add_parser(command, help=help_text)
+        sub.add_argument('names', nargs='*', help="实例名称，不指定表示全部")
+        if command in ('start', 'stop'):
+            sub.add_argument('--services', nargs='+', choices=SERVICES, help="只操作指定的服务")
+        if command == 'status':
+            sub.add_argument('--json', action='store_true', help="以JSON格式输出")
+
+    remove_parser = subparsers.add_parser('remove', help="删除实例")
+    remove_parser.add_argument('name')
+
+    args = parser.parse_args()
+    # init_napcat 使用相对路径，统一以一键包根目录为工作目录
+    os.chdir(SCRIPT_DIR)
+
+    if args.command == 'create':
+        return 0 if create_instance(args.name, args.qq) else 1
+    if args.command == 'remove':
+        return 0 if remove_instance(args.name) else 1
+    if args.command in ('list', 'status'):
+        names = select_instances(getattr(args, 'names', None))
+        if getattr(args, 'json', False):
+            print(json.dumps([get_instance_status(n) for n in names], ensure_ascii=False, indent=2))
+        else:
+            print_instance_status(names)
+        return 0
+
+    results = []
+    for name in select_instances(args.names):
+        if args.command == 'start':
+            results.append(start_instance(name, args.services))
+        elif args.command == 'stop':
+            results.append(stop_instance(name, args.services))
+        else:
+            results.append(sync_instance(name))
+    return 0 if all(results) else 1
+
+
+if __name__ == "__main__":
+    try:
+        sys.exit(main())
+    except KeyboardInterrupt:
+        print("\n用户取消操作")
+        sys.exit(1)
@@ -0,0 +1,464 @@
+# -*- coding: utf-8 -*-
+"""
+后台任务队列
+功能：把学习、迁移、pip 安装等耗时操作作为子进程提交到后台执行，控制台菜单保持可用
+
+- 最多同时运行 DEFAULT_MAX_WORKERS 个任务，其余排队等待
+- 记录每个任务的状态、进度（解析输出中的 45/100、45%）、退出码和耗时
+- 输出写入 runtime/jobs/<编号>.log，单个文件超过 MAX_LOG_BYTES 时轮转，只保留最近两份
+- 任务历史保存在 runtime/jobs/history.json，启动器重启后仍可查看；上次未结束的任务标记为已中断
+- 多个启动器共用同一份历史：编号在文件锁内按磁盘上的历史分配，保存时只覆盖本进程提交的任务，其他启动器的任务以磁盘为准
+
+用法：
+    python jobs.py list [--json]
+    python jobs.py attach 编号      跟随任务输出（Ctrl+C 退出跟随，不影响任务）
+    python jobs.py cancel 编号
+"""
+
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+try:
+    from modules.MaiBot.src.common.logger import get_logger
+    logger = get_logger("jobs")
+except ImportError:
+    import logging as logger
+    logger.basicConfig(level=logger.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    logger = logger.getLogger("jobs")
+
+from instance_manager import SCRIPT_DIR, _terminate_pid, is_pid_alive
+from safe_io import atomic_write_json, config_lock
+from tracing import child_env, span
+
+JOBS_DIR = SCRIPT_DIR / 'runtime' / 'jobs'
+HISTORY_PATH = JOBS_DIR / 'history.json'
+HISTORY_LOCK_PATH = JOBS_DIR / '.lock'
+MAX_HISTORY = 100
+MAX_LOG_BYTES = 2 * 1024 * 1024
+DEFAULT_MAX_WORKERS = 3
+SAVE_INTERVAL = 1.0
+FINISHED = ('succeeded', 'failed', 'cancelled', 'interrupted')
+STATUS_LABELS = {'queued': '排队中', 'running': '运行中', 'succeeded': '成功', 'failed': '失败',
+                 'cancelled': '已取消', 'interrupted': '已中断'}
+
+_RATIO_PATTERN = re.compile(r'(\d+)\s*/\s*(\d+)')
+_PERCENT_PATTERN = re.compile(r'(\d{1,3}(?:\.\d+)?)\s*%')
+
+_lock = threading.RLock()
+_jobs: dict[int, dict] = {}
+_processes: dict[int, subprocess.Popen] = {}
+_executor: Optional[ThreadPoolExecutor] = None
+_loaded = False
+_last_save = 0.0
+
+
+def parse_progress(line: str) -> Optional[dict]:
+    """从一行输出中解析进度，支持 tqdm / rich 风格的 "45/100" 与 "45%" """
+    for done, total in reversed(_RATIO_PATTERN.findall(line)):
+        done, total = int(done), int(total)
+        if 0 < total and done <= total:
+            return {'done': done, 'total': total, 'percent': round(done * 100 / total, 1)}
+    match = _PERCENT_PATTERN.search(line)
+    if match and float(match.group(1)) <= 100:
+        return {'percent': float(match.group(1))}
+    return None
+
+
+def _read_history() -> list[dict]:
+    try:
+        with open(HISTORY_PATH, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return []
+
+
+def load_history() -> list[dict]:
+    """读取任务历史；提交任务的启动器已退出时，未结束的任务视为已中断"""
+    jobs = _read_history()
+    for job in jobs:
+        if job['status'] in ('queued', 'running') and not is_pid_alive(job.get('owner_pid') or 0):
+            job['status'] = 'interrupted'
+    return jobs
+
+
+def _is_own(job: dict) -> bool:
+    return job.get('owner_pid') == os.getpid()
+
+
+def _merge_others(jobs: list[dict]) -> None:
+    """用磁盘上的记录更新其他启动器（或已退出的启动器）的任务，本进程的任务以内存为准"""
+    with _lock:
+        for job in jobs:
+            current = _jobs.get(job['id'])
+            if current is None or not _is_own(current):
+                _jobs[job['id']] = job
+
+
+def _ensure_loaded() -> None:
+    global _loaded
+    with _lock:
+        if not _loaded:
+            for job in load_history():
+                _jobs.setdefault(job['id'], job)
+            _loaded = True
+
+
+def _refresh() -> None:
+    """重新读取其他启动器提交的任务"""
+    _ensure_loaded()
+    _merge_others(load_history())
+
+
+def _save(force: bool = False) -> None:
+    """保存任务历史，进度更新最多每 SAVE_INTERVAL 秒写一次
+
+    在文件锁内读取磁盘上的历史，只写入本进程任务的最新状态，不覆盖其他启动器的记录
+    """
+    global _last_save
+    now = time.monotonic()
+    if not force and now - _last_save < SAVE_INTERVAL:
+        return
+    _last_save = now
+    try:
+        with config_lock(HISTORY_LOCK_PATH, timeout=5):
+            merged = {job['id']: job for job in _read_history()}
+            with _lock:
+                merged.update((job_id, dict(job)) for job_id, job in _jobs.items() if _is_own(job))
+            snapshot = sorted(merged.values(), key=lambda job: job['id'])[-MAX_HISTORY:]
+            atomic_write_json(HISTORY_PATH, snapshot, ensure_ascii=False, indent=2)
+    except (OSError, TimeoutError) as e:
+        logger.warning(f"保存任务历史失败: {e}")
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=DEFAULT_MAX_WORKERS, thread_name_prefix='job')
+        return _executor
+
+
+def submit_job(title: str, command: list[str], cwd: Optional[Path] = None, env: Optional[dict] = None) -> int:
+    """提交后台任务
+
+    Args:
+        title: 任务名称
+        command: 命令参数列表（不经过 shell）
+        cwd: 工作目录，默认为一键包根目录
+        env: 额外的环境变量
+
+    Returns:
+        int: 任务编号
+    """
+    _ensure_loaded()
+    JOBS_DIR.mkdir(parents=True, exist_ok=True)
+
+    def add_job() -> int:
+        # 编号按磁盘上的历史分配，其他启动器刚提交的任务也会被计入
+        _merge_others(_read_history())
+        with _lock:
+            job_id = max(_jobs, default=0) + 1
+            _jobs[job_id] = {
+                'id': job_id, 'title': title, 'command': [str(part) for part in command],
+                'cwd': str(cwd or SCRIPT_DIR), 'status': 'queued', 'submitted_at': time.time(),
+                'started_at': None, 'finished_at': None, 'exit_code': None, 'pid': None,
+                'progress': None, 'last_output': '', 'log': str(JOBS_DIR / f"{job_id}.log"),
+                'owner_pid': os.getpid(),
+            }
+        _save(force=True)
+        return job_id
+
+    try:
+        # 分配编号和写入历史在同一次加锁内完成，多个启动器同时提交也不会得到相同的编号
+        with config_lock(HISTORY_LOCK_PATH, timeout=5):
+            job_id = add_job()
+    except TimeoutError:
+        logger.warning("等待任务历史文件锁超时，任务编号可能与其他启动器重复")
+        job_id = add_job()
+    _get_executor().submit(_run_job, job_id, env)
+    logger.info(f"已提交后台任务 #{job_id}: {title}")
+    return job_id
+
+
+def _write_log(log_file, log_path: Path, chunk: bytes):
+    """写入任务日志，超过上限时轮转为 .1，返回当前日志文件对象"""
+    if log_file.tell() + len(chunk) > MAX_LOG_BYTES:
+        log_file.close()
+        os.replace(log_path, log_path.with_name(log_path.name + '.1'))
+        log_file = open(log_path, 'wb')
+    log_file.write(chunk)
+    return log_file
+
+
+def _run_job(job_id: int, env: Optional[dict]) -> None:
+    with _lock:
+        job = _jobs[job_id]
+        if job['status'] != 'queued':
+            return
+        job['status'] = 'running'
+        job['started_at'] = time.time()
+    with span(f"后台任务 {job['title']}", kind='job', job_id=job_id,
+              command=subprocess.list2cmdline([str(arg) for arg in job['command']]), cwd=job['cwd']) as current:
+        log_path = Path(job['log'])
+        process_env = dict(child_env(), PYTHONUNBUFFERED='1', PYTHONIOENCODING='utf-8', **(env or {}))
+        # 独立进程组：菜单里按 Ctrl+C 不会误伤后台任务，取消时也能结束整个进程树
+        if os.name == 'nt':
+            options = {'creationflags': subprocess.CREATE_NEW_PROCESS_GROUP | subprocess.CREATE_NO_WINDOW}
+        else:
+            options = {'start_new_session': True}
+        log_file = open(log_path, 'wb')
+        try:
+            process = subprocess.Popen(job['command'], cwd=job['cwd'], stdin=subprocess.DEVNULL,
+                                       stdout=subprocess.PIPE, stderr=subprocess.STDOUT, env=process_env, **options)
+        except OSError as e:
+            log_file.write(f"启动失败: {e}\n".encode('utf-8'))
+            log_file.close()
+            current.set(status='failed', error=str(e))
+            with _lock:
+                job.update(status='failed', finished_at=time.time(), last_output=f"启动失败: {e}")
+            _save(force=True)
+            logger.error(f"后台任务 #{job_id} 启动失败: {e}")
+            return
+        with _lock:
+            _processes[job_id] = process
+            job['pid'] = process.pid
+        _save(force=True)
+
+        buffer = b''
+        try:
+            # 进度条用 \r 刷新同一行，按 \r 和 \n 切分
+            for chunk in iter(lambda: process.stdout.read1(65536), b''):
+                current.add_bytes(out=len(chunk))
+                log_file = _write_log(log_file, log_path, chunk)
+                log_file.flush()
+                buffer += chunk
+                *lines, buffer = re.split(rb'[\r\n]', buffer)
+                with _lock:
+                    # 未换行的尾部通常是正在刷新的进度条，一并解析
+                    for raw in lines + [buffer]:
+                        line = raw.decode('utf-8', errors='replace').strip()
+                        if not line:
+                            continue
+                        job['last_output'] = line[-200:]
+                        progress = parse_progress(line)
+                        if progress:
+                            job['progress'] = progress
+                _save()
+            exit_code = process.wait()
+        finally:
+            log_file.close()
+        with _lock:
+            _processes.pop(job_id, None)
+            job['exit_code'] = exit_code
+            job['finished_at'] = time.time()
+            if job['status'] == 'running':
+                job['status'] = 'succeeded' if exit_code == 0 else 'failed'
+            status = job['status']
+        current.set(exit_code=exit_code, status='ok' if status == 'succeeded' else status)
+        _save(force=True)
+        label = STATUS_LABELS[status]
+        if status == 'succeeded':
+            logger.info(f"后台任务 #{job_id} {job['title']} {label}")
+        else:
+            logger.warning(f"后台任务 #{job_id} {job['title']} {label}（退出码 {exit_code}），日志: {log_path}")
+
+
+def get_job(job_id: int) -> Optional[dict]:
+    _refresh()
+    with _lock:
+        job = _jobs.get(job_id)
+        return dict(job) if job else None
+
+
+def list_jobs() -> list[dict]:
+    """当前进程中的任务、其他启动器的任务与历史任务，从新到旧"""
+    _refresh()
+    with _lock:
+        return [dict(job) for job in sorted(_jobs.values(), key=lambda job: job['id'], reverse=True)]
+
+
+def active_jobs() -> list[dict]:
+    return [job for job in list_jobs() if job['status'] in ('queued', 'running')]
+
+
+def cancel_job(job_id: int) -> bool:
+    """取消任务：排队中的直接移出队列，运行中的结束整个进程树
+
+    在另一个控制台中取消启动器的任务时只结束进程，状态由启动器记录
+    """
+    _refresh()
+    with _lock:
+        job = _jobs.get(job_id)
+        if not job or job['status'] in FINISHED:
+            logger.error(f"没有可取消的任务 #{job_id}")
+            return False
+        if not _is_own(job):
+            if job['status'] != 'running' or not job.get('pid'):
+                logger.error(f"任务 #{job_id} 还在排队，请在启动器中取消")
+                return False
+            _terminate_pid(job['pid'])
+            logger.info(f"已结束任务 #{job_id} 的进程")
+            return True
+        previous = job['status']
+        job['status'] = 'cancelled'
+        if previous == 'queued':
+            job['finished_at'] = time.time()
+        pid = job.get('pid')
+    if previous == 'running' and pid:
+        _terminate_pid(pid)
+    _save(force=True)
+    logger.info(f"已取消任务 #{job_id}")
+    return True
+
+
+def _read_log_tail(log_path: Path, lines: int) -> list[str]:
+    if not log_path.exists():
+        return []
+    with open(log_path, 'rb') as f:
+        f.seek(max(0, log_path.stat().st_size - 64 * 1024))
+        text = f.read().decode('utf-8', errors='replace')
+    return [line for line in re.split(r'[\r\n]', text) if line.strip()][-lines:]
+
+
+def attach_job(job_id: int, lines: int = 30) -> None:
+    """跟随任务输出，Ctrl+C 或任务结束时返回（不影响任务本身）"""
+    job = get_job(job_id)
+    if not job:
+        logger.error(f"找不到任务 #{job_id}")
+        return
+    print(f"=== 任务 #{job_id} {job['title']}（Ctrl+C 退出跟随）===")
+    log_path = Path(job['log'])
+    for line in _read_log_tail(log_path, lines):
+        print(line)
+    position = log_path.stat().st_size if log_path.exists() else 0
+    try:
+        while True:
+            if log_path.exists():
+                size = log_path.stat().st_size
+                if size < position:
+                    position = 0  # 日志已轮转
+                if size > position:
+                    with open(log_path, 'rb') as f:
+                        f.seek(position)
+                        sys.stdout.write(f.read().decode('utf-8', errors='replace'))
+                        sys.stdout.flush()
+                        position = f.tell()
+            job = get_job(job_id) if _is_own(job) else _reload_job(job_id)
+            if not job or job['status'] in FINISHED:
+                break
+            time.sleep(0.3)
+    except KeyboardInterrupt:
+        print()
+        return
+    print(f"\n任务 #{job_id} {STATUS_LABELS.get(job['status'], job['status']) if job else ''}")
+
+
+def _reload_job(job_id: int) -> Optional[dict]:
+    """从历史文件重新读取任务（在另一个控制台中跟随启动器的任务时使用）"""
+    return next((job for job in load_history() if job['id'] == job_id), None)
+
+
+def shutdown(cancel: bool = True) -> None:
+    """退出前结束所有任务"""
+    if cancel:
+        for job in active_jobs():
+            cancel_job(job['id'])
+    with _lock:
+        executor = _executor
+    if executor:
+        executor.shutdown(wait=False, cancel_futures=True)
+    _save(force=True)
+
+
+def _format_duration(job: dict) -> str:
+    if not job.get('started_at'):
+        return '-'
+    end = job.get('finished_at') or time.time()
+    seconds = end - job['started_at']
+    return f"{seconds / 60:.1f} 分钟" if seconds >= 60 else f"{seconds:.0f} 秒"
+
+
+def print_jobs(jobs: list[dict], limit: int = 20) -> None:
+    """以表格形式打印任务列表"""
+    if not jobs:
+        print("暂无后台任务")
+        return
+    print(f"{'编号':<6}{'状态':<10}{'开始时间':<21}{'耗时':<10}{'进度':<10}任务")
+    for job in jobs[:limit]:
+        started = datetime.fromtimestamp(job['started_at']).strftime('%m-%d %H:%M:%S') if job['started_at'] else '-'
+        progress = job.get('progress') or {}
+        progress_text = f"{progress['percent']}%" if 'percent' in progress else '-'
+        status = STATUS_LABELS.get(job['status'], job['status'])
+        if job['status'] in ('failed', 'cancelled') and job.get('exit_code') is not None:
+            status += f"({job['exit_code']})"
+        print(f"#{job['id']:<5}{status:<12}{started:<21}{_format_duration(job):<10}{progress_text:<10}{job['title']}")
+        if job['status'] == 'running' and job.get('last_output'):
+            print(f"       {job['last_output'][:100]}")
+
+
+def interactive_jobs_menu() -> bool:
+    """后台任务交互菜单"""
+    while True:
+        print("\n=== 后台任务 ===")
+        print_jobs(list_jobs())
+        print("\n1. 跟随任务输出")
+        print("2. 取消任务")
+        print("3. 刷新")
+        print("0. 返回主菜单")
+        choice = input("请选择操作: ").strip()
+        if choice == '0':
+            return True
+        if choice in ('1', '2'):
+            job_id = input("请输入任务编号: ").strip().lstrip('#')
+            if not job_id.isdigit():
+                logger.error("请输入数字编号")
+                continue
+            if choice == '1':
+                attach_job(int(job_id))
+            else:
+                cancel_job(int(job_id))
+        elif choice != '3':
+            logger.error("无效选择")
+
+
+def main() -> int:
+    """命令行入口（可在另一个控制台中查看启动器提交的任务）"""
+    parser = argparse.ArgumentParser(description="麦麦一键包后台任务")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    list_parser = subparsers.add_parser('list', help="查看任务")
+    list_parser.add_argument('--json', action='store_true', help="以 JSON 格式输出")
+    attach_parser = subparsers.add_parser('attach', help="跟随任务输出")
+    attach_parser.add_argument('job_id', type=int)
+    cancel_parser = subparsers.add_parser('cancel', help="取消任务")
+    cancel_parser.add_argument('job_id', type=int)
+    args = parser.parse_args()
+
+    if args.command == 'list':
+        jobs = list_jobs()
+        if args.json:
+            print(json.dumps(jobs, indent=2, ensure_ascii=False))
+        else:
+            print_jobs(jobs, limit=MAX_HISTORY)
+        return 0
+    if args.command == 'attach':
+        attach_job(args.job_id)
+        return 0
+    return 0 if cancel_job(args.job_id) else 1
+
+
+if __name__ == "__main__":
+    try:
+        sys.exit(main())
+    except KeyboardInterrupt:
+        print("\n用户取消操作")
+        sys.exit(1)
@@ -0,0 +1,458 @@
+# -*- coding: utf-8 -*-
+"""
+知识库管理工具
+功能：统计麦麦知识库（data/rag、data/embedding）的内容，并在删除前生成可快速恢复的快照
+
+- inventory: 多线程并行 os.scandir 扫描两个目录，统计文件数、大小、最大的文件和最后修改时间；
+  扫描结果按目录缓存到 runtime/kb_inventory.json，目录修改时间未变时复用其中的文件名列表，
+  只重新读取各文件的大小和修改时间，不再列目录
+- snapshot: 三种方式
+    copy     独立副本（默认，支持写时复制的文件系统上由系统自动完成 CoW 复制）
+    link     硬链接，不占用额外空间且秒级完成；与原文件共享数据，只适合紧接着删除原目录的场景
+             （删除知识库前自动使用），文件系统不支持硬链接时退回复制
+    compress 打包为 tar.gz，占用空间最小
+- restore: 从快照恢复，目录快照直接改名放回（秒级完成，快照随之消耗），压缩快照解压恢复
+
+用法：
+    python knowledge_base.py inventory [--refresh] [--top 10] [--json]
+    python knowledge_base.py snapshot [--mode copy|link|compress]
+    python knowledge_base.py list
+    python knowledge_base.py restore 快照名 [--force]
+    python knowledge_base.py remove 快照名
+    以上命令均支持 --instance NAME（多实例）
+"""
+
+import argparse
+import heapq
+import io
+import json
+import os
+import shutil
+import sys
+import tarfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+try:
+    from modules.MaiBot.src.common.logger import get_logger
+    logger = get_logger("knowledge_base")
+except ImportError:
+    import logging as logger
+    logger.basicConfig(level=logger.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    logger = logger.getLogger("knowledge_base")
+
+from db_maintenance import format_size
+from instance_manager import MAIBOT_DIR, SCRIPT_DIR, get_instance_dir
+from safe_io import atomic_write_json
+
+KNOWLEDGE_DIRS = ('rag', 'embedding')
+SNAPSHOT_DIR_NAME = 'kb_snapshots'
+SNAPSHOT_INFO = 'snapshot.json'
+CACHE_PATH = SCRIPT_DIR / 'runtime' / 'kb_inventory.json'
+SCAN_WORKERS = min(16, (os.cpu_count() or 2) * 2)
+SNAPSHOT_MODES = ('copy', 'link', 'compress')
+DEFAULT_TOP = 10
+
+
+def get_data_dir(instance: Optional[str] = None) -> Path:
+    """麦麦 data 目录"""
+    maibot_dir = get_instance_dir(instance) / 'MaiBot' if instance else MAIBOT_DIR
+    return maibot_dir / 'data'
+
+
+def get_snapshot_root(instance: Optional[str] = None) -> Path:
+    return get_data_dir(instance) / SNAPSHOT_DIR_NAME
+
+
+def _load_cache() -> dict:
+    try:
+        with open(CACHE_PATH, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _scan_tree(root: Path, cached: dict, refresh: bool) -> dict:
+    """并行扫描目录树
+
+    Args:
+        root: 根目录
+        cached: 上次扫描的目录缓存 {相对路径: {mtime_ns, files, dirs}}
+        refresh: 是否忽略缓存
+
+    Returns:
+        dict: 本次扫描的目录缓存，同时标记每个目录是否复用了缓存
+    """
+    result = {}
+    lock = threading.Lock()
+    pending = []
+    pending_lock = threading.Lock()
+
+    def scan(relative: str) -> list[str]:
+        path = root / relative if relative else root
+        try:
+            mtime_ns = os.stat(path).st_mtime_ns
+        except OSError:
+            return []
+        entry = cached.get(relative)
+        # 目录修改时间未变说明其中没有增删文件，复用文件名和子目录列表；
+        # 原地改写文件不会改变目录的修改时间，因此文件大小和修改时间仍要重新读取
+        if not refresh and entry and entry['mtime_ns'] == mtime_ns:
+            files = []
+            for file in entry['files']:
+                try:
+                    stat = os.stat(path / file[0], follow_symlinks=False)
+                except OSError:
+                    continue
+                files.append([file[0], stat.st_size, stat.st_mtime])
+            entry = dict(entry, files=files, reused=True)
+        else:
+            files, dirs = [], []
+            try:
+                with os.scandir(path) as it:
+                    for item in it:
+                        if item.is_dir(follow_symlinks=False):
+                            dirs.append(item.name)
+                        elif item.is_file(follow_symlinks=False):
+                            stat = item.stat(follow_symlinks=False)
+                            files.append([item.name, stat.st_size, stat.st_mtime])
+            except OSError as e:
+                logger.warning(f"扫描目录失败 {path}: {e}")
+            entry = {'mtime_ns': mtime_ns, 'files': files, 'dirs': dirs, 'reused': False}
+        with lock:
+            result[relative] = entry
+        return [f"{relative}/{name}" if relative else name for name in entry['dirs']]
+
+    with ThreadPoolExecutor(max_workers=SCAN_WORKERS) as pool:
+        pending.append(pool.submit(scan, ''))
+        while pending:
+            with pending_lock:
+                future = pending.pop()
+            for child in future.result():
+                pending.append(pool.submit(scan, child))
+    return result
+
+
+def build_inventory(instance: Optional[str] = None, refresh: bool = False, top: int = DEFAULT_TOP) -> dict:
+    """统计知识库目录
+
+    Returns:
+        dict: {目录名: {path, exists, files, size, dirs, newest, largest, cached_dirs}}
+    """
+    data_dir = get_data_dir(instance)
+    cache = _load_cache()
+    inventory = {}
+    for name in KNOWLEDGE_DIRS:
+        root = data_dir / name
+        key = str(root)
+        if not root.is_dir():
+            inventory[name] = {'path': key, 'exists': False, 'files': 0, 'size': 0, 'dirs': 0,
+                               'newest': None, 'largest': []}
+            cache.pop(key, None)
+            continue
+        tree = _scan_tree(root, cache.get(key, {}), refresh)
+        all_files = [(f"{relative}/{file[0]}" if relative else file[0], file[1], file[2])
+                     for relative, entry in tree.items() for file in entry['files']]
+        inventory[name] = {
+            'path': key,
+            'exists': True,
+            'files': len(all_files),
+            'size': sum(file[1] for file in all_files),
+            'dirs': len(tree) - 1,
+            'newest': max((file[2] for file in all_files), default=None),
+            'largest': [{'file': file[0], 'size': file[1]}
+                        for file in heapq.nlargest(top, all_files, key=lambda file: file[1])],
+            'cached_dirs': sum(1 for entry in tree.values() if entry['reused']),
+        }
+        cache[key] = {relative: {k: v for k, v in entry.items() if k != 'reused'} for relative, entry in tree.items()}
+    try:
+        atomic_write_json(CACHE_PATH, cache, ensure_ascii=False)
+    except OSError as e:
+        logger.warning(f"保存知识库扫描缓存失败: {e}")
+    return inventory
+
+
+def print_inventory(inventory: dict) -> None:
+    for name, info in inventory.items():
+        print(f"\n[{name}] {info['path']}")
+        if not info['exists']:
+            print("  目录不存在")
+            continue
+        newest = datetime.fromtimestamp(info['newest']).strftime('%Y-%m-%d %H:%M:%S') if info['newest'] else '-'
+        print(f"  文件数: {info['files']}    子目录: {info['dirs']}    总大小: {format_size(info['size'])}    "
+              f"最后修改: {newest}")
+        for item in info['largest']:
+            print(f"  {format_size(item['size']):>10}  {item['file']}")
+
+
+def _link_or_copy(source: Path, target: Path, link: bool) -> bool:
+    """link 为 True 时优先硬链接，不支持时复制；返回是否使用了硬链接"""
+    target.parent.mkdir(parents=True, exist_ok=True)
+    if link:
+        try:
+            os.link(source, target)
+            return True
+        except OSError:
+            pass
+    shutil.copy2(source, target)
+    return False
+
+
+def _mirror_tree(source: Path, target: Path, link: bool) -> tuple[int, int]:
+    """用硬链接或复制镜像目录树
+
+    Returns:
+        tuple: (文件数, 其中硬链接的数量)
+    """
+    jobs = []
+    for dirpath, _, filenames in os.walk(source):
+        for filename in filenames:
+            path = Path(dirpath) / filename
+            jobs.append((path, target / path.relative_to(source)))
+    target.mkdir(parents=True, exist_ok=True)
+    with ThreadPoolExecutor(max_workers=SCAN_WORKERS) as pool:
+        linked = sum(pool.map(lambda job: _link_or_copy(*job, link), jobs))
+    return len(jobs), linked
+
+
+def create_snapshot(instance: Optional[str] = None, mode: str = 'copy', reason: str = 'manual') -> Optional[Path]:
+    """为知识库生成快照
+
+    Args:
+        instance: 实例名称，None 表示默认实例
+        mode: copy / link / compress，见模块说明
+        reason: 快照说明
+
+    Returns:
+        Optional[Path]: 快照路径，知识库为空或失败时返回 None
+    """
+    data_dir = get_data_dir(instance)
+    sources = [name for name in KNOWLEDGE_DIRS if (data_dir / name).is_dir()]
+    if not sources:
+        logger.warning("知识库为空，无需快照")
+        return None
+    start = time.perf_counter()
+    snapshot_root = get_snapshot_root(instance)
+    snapshot_root.mkdir(parents=True, exist_ok=True)
+    name = datetime.now().strftime('%Y%m%d-%H%M%S')
+    suffix = 1
+    while (snapshot_root / name).exists() or (snapshot_root / f"{name}.tar.gz").exists():
+        suffix += 1
+        name = f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{suffix}"
+    info = {'created_at': time.time(), 'reason': reason, 'mode': mode, 'dirs': sources}
+    try:
+        if mode == 'compress':
+            path = snapshot_root / f"{name}.tar.gz"
+            tmp_path = path.with_name(f".{path.name}.tmp")
+            with tarfile.open(tmp_path, 'w:gz', compresslevel=6) as tar:
+                info_bytes = json.dumps(info, ensure_ascii=False).encode('utf-8')
+                tarinfo = tarfile.TarInfo(SNAPSHOT_INFO)
+                tarinfo.size = len(info_bytes)
+                tar.addfile(tarinfo, io.BytesIO(info_bytes))
+                for source in sources:
+                    tar.add(data_dir / source, arcname=source)
+            os.replace(tmp_path, path)
+            detail = f"压缩后 {format_size(path.stat().st_size)}"
+        else:
+            path = snapshot_root / name
+            total = linked = 0
+            for source in sources:
+                count, hard = _mirror_tree(data_dir / source, path / source, mode == 'link')
+                total, linked = total + count, linked + hard
+            atomic_write_json(path / SNAPSHOT_INFO, info, ensure_ascii=False, indent=2)
+            detail = f"{total} 个文件" + (f"，其中 {linked} 个为硬链接" if mode == 'link' else "")
+    except OSError as e:
+        logger.error(f"生成知识库快照失败: {e}")
+        return None
+    logger.info(f"已生成知识库快照 {path.name}（{detail}，耗时 {time.perf_counter() - start:.2f} 秒）")
+    return path
+
+
+def list_snapshots(instance: Optional[str] = None) -> list[dict]:
+    """列出快照，从新到旧"""
+    snapshot_root = get_snapshot_root(instance)
+    if not snapshot_root.is_dir():
+        return []
+    snapshots = []
+    for path in snapshot_root.iterdir():
+        if path.name.startswith('.'):
+            continue
+        info = {}
+        if path.is_dir():
+            try:
+                with open(path / SNAPSHOT_INFO, 'r', encoding='utf-8') as f:
+                    info = json.load(f)
+            except (OSError, ValueError):
+                pass
+        elif path.name.endswith('.tar.gz'):
+            try:
+                with tarfile.open(path, 'r:gz') as tar:
+                    member = tar.next()
+                    if member and member.name == SNAPSHOT_INFO:
+                        info = json.load(tar.extractfile(member))
+            except (tarfile.TarError, OSError, ValueError):
+                pass
+        else:
+            continue
+        snapshots.append({'name': path.name, 'path': str(path), 'compressed': path.is_file(),
+                          'created_at': info.get('created_at', path.stat().st_mtime),
+                          'mode': info.get('mode', 'compress' if path.is_file() else 'copy'),
+                          'reason': info.get('reason', ''), 'dirs': info.get('dirs', [])})
+    return sorted(snapshots, key=lambda s: s['created_at'], reverse=True)
+
+
+def restore_snapshot(name: str, instance: Optional[str] = None, force: bool = False) -> bool:
+    """从快照恢复知识库
+
+    Args:
+        name: 快照名，latest 表示最新一份
+        instance: 实例名称
+        force: 知识库目录已存在时，先改名保留再恢复
+
+    Returns:
+        bool: 是否成功
+    """
+    snapshots = list_snapshots(instance)
+    snapshot = snapshots[0] if name == 'latest' and snapshots else next(
+        (s for s in snapshots if s['name'] == name), None)
+    if not snapshot:
+        logger.error(f"找不到知识库快照: {name}")
+        return False
+    data_dir = get_data_dir(instance)
+    existing = [d for d in KNOWLEDGE_DIRS if (data_dir / d).exists()]
+    if existing and not force:
+        logger.error(f"知识库目录已存在: {', '.join(existing)}，如需覆盖请使用 --force（原目录会改名保留）")
+        return False
+    stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+    for d in existing:
+        (data_dir / d).rename(data_dir / f"{d}.before-restore-{stamp}")
+        logger.info(f"原有 {d} 已保留为 {d}.before-restore-{stamp}")
+
+    start = time.perf_counter()
+    path = Path(snapshot['path'])
+    try:
+        if snapshot['compressed']:
+            with tarfile.open(path, 'r:gz') as tar:
+                members = [m for m in tar.getmembers()
+                           if m.name != SNAPSHOT_INFO and m.name.split('/', 1)[0] in KNOWLEDGE_DIRS]
+                tar.extractall(data_dir, members=members, filter='data')
+        else:
+            # 改名放回而不是再链接一次：硬链接会让恢复后的写入同时改动快照
+            for d in KNOWLEDGE_DIRS:
+                if (path / d).is_dir():
+                    os.replace(path / d, data_dir / d)
+            shutil.rmtree(path)
+    except (OSError, tarfile.TarError) as e:
+        logger.error(f"恢复知识库失败: {e}")
+        return False
+    logger.info(f"已从快照 {snapshot['name']} 恢复知识库，耗时 {time.perf_counter() - start:.2f} 秒")
+    if not snapshot['compressed']:
+        logger.info("目录快照已改名放回知识库目录，该快照随之移除")
+    return True
+
+
+def remove_snapshot(name: str, instance: Optional[str] = None) -> bool:
+    """删除快照"""
+    path = get_snapshot_root(instance) / name
+    if not path.exists() or name.startswith('.') or '/' in name or '\\' in name:
+        logger.error(f"找不到知识库快照: {name}")
+        return False
+    if path.is_dir():
+        shutil.rmtree(path)
+    else:
+        path.unlink()
+    logger.info(f"已删除知识库快照 {name}")
+    return True
+
+
+def print_snapshots(snapshots: list[dict]) -> None:
+    if not snapshots:
+        print("暂无知识库快照")
+        return
+    for snapshot in snapshots:
+        created = datetime.fromtimestamp(snapshot['created_at']).strftime('%Y-%m-%d %H:%M:%S')
+        kind = {'copy': '副本', 'link': '硬链接', 'compress': '压缩包'}.get(snapshot['mode'], snapshot['mode'])
+        print(f"{snapshot['name']:<28}{created:<22}{kind:<8}{snapshot['reason']}")
+
+
+def interactive_knowledge_menu() -> bool:
+    """知识库清单与快照交互菜单（默认实例）"""
+    while True:
+        print("\n=== 知识库清单与快照 ===")
+        print("1. 查看知识库清单")
+        print("2. 生成快照（独立副本）")
+        print("3. 生成压缩快照")
+        print("4. 查看快照列表")
+        print("5. 从快照恢复")
+        print("6. 删除快照")
+        print("0. 返回主菜单")
+        choice = input("请选择操作: ").strip()
+        if choice == '0':
+            return True
+        if choice == '1':
+            print_inventory(build_inventory())
+        elif choice in ('2', '3'):
+            create_snapshot(mode='compress' if choice == '3' else 'copy')
+        elif choice == '4':
+            print_snapshots(list_snapshots())
+        elif choice in ('5', '6'):
+            print_snapshots(list_snapshots())
+            name = input("请输入快照名: ").strip()
+            if not name:
+                continue
+            if choice == '5':
+                restore_snapshot(name, force=True)
+            else:
+                remove_snapshot(name)
+        else:
+            logger.error("无效选择")
+
+
+def main() -> int:
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description="麦麦知识库清单与快照")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    inventory_parser = subparsers.add_parser('inventory', help="查看知识库清单")
+    inventory_parser.add_argument('--refresh', action='store_true', help="忽略缓存重新扫描")
+    inventory_parser.add_argument('--top', type=int, default=DEFAULT_TOP, help="显示最大的文件数量")
+    inventory_parser.add_argument('--json', action='store_true', help="以 JSON 格式输出")
+    snapshot_parser = subparsers.add_parser('snapshot', help="生成快照")
+    snapshot_parser.add_argument('--mode', choices=SNAPSHOT_MODES, default='copy',
+                                 help="copy 独立副本 / link 硬链接（仅适合随后删除原目录）/ compress 打包为 tar.gz")
+    subparsers.add_parser('list', help="查看快照列表")
+    restore_parser = subparsers.add_parser('restore', help="从快照恢复")
+    restore_parser.add_argument('name', nargs='?', default='latest')
+    restore_parser.add_argument('--force', action='store_true', help="知识库已存在时改名保留后恢复")
+    remove_parser = subparsers.add_parser('remove', help="删除快照")
+    remove_parser.add_argument('name')
+    for sub in subparsers.choices.values():
+        sub.add_argument('--instance', help="实例名称，不指定表示默认实例")
+    args = parser.parse_args()
+
+    if args.command == 'inventory':
+        inventory = build_inventory(args.instance, args.refresh, args.top)
+        if args.json:
+            print(json.dumps(inventory, indent=2, ensure_ascii=False))
+        else:
+            print_inventory(inventory)
+        return 0
+    if args.command == 'snapshot':
+        return 0 if create_snapshot(args.instance, args.mode) else 1
+    if args.command == 'list':
+        print_snapshots(list_snapshots(args.instance))
+        return 0
+    if args.command == 'restore':
+        return 0 if restore_snapshot(args.name, args.instance, args.force) else 1
+    return 0 if remove_snapshot(args.name, args.instance) else 1
+
+
+if __name__ == "__main__":
+    try:
+        sys.exit(main())
+    except KeyboardInterrupt:
+        print("\n用户取消操作")
+        sys.exit(1)
@@ -0,0 +1,447 @@
+# -*- coding: utf-8 -*-
+"""
+麦麦学习流程（LPMM）分阶段执行工具
+功能：把"信息提取 → OpenIE检查 → OpenIE导入"建模为有检查点的阶段，中断后重新运行时跳过已完成的阶段
+
+- OpenIE检查阶段在导入前去重合并 OpenIE 文件并跳过已导入的段落（见 openie_precheck.py）
+- 每个阶段完成后把输入文件哈希、输出产物、耗时写入 runtime/learning_pipeline.json
+- 输入未变化且产物仍在的阶段直接跳过；上次中断或失败的阶段从该阶段重新开始
+- 运行时实时解析脚本输出中的进度（如 45/100、45%），可随时查看
+- 启动器中作为后台任务运行（见 jobs.py），菜单可继续使用；运行日志写入 runtime/logs/learning-<阶段>.log
+
+用法：
+    python learning_pipeline.py run [--force] [--stage extract]
+    python learning_pipeline.py status [--json]
+    python learning_pipeline.py stop
+    python learning_pipeline.py reset [--stage extract]
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+try:
+    from modules.MaiBot.src.common.logger import get_logger
+    logger = get_logger("learning_pipeline")
+except ImportError:
+    import logging as logger
+    logger.basicConfig(level=logger.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    logger = logger.getLogger("learning_pipeline")
+
+from instance_manager import MAIBOT_DIR, SCRIPT_DIR, _terminate_pid, is_pid_alive
+from jobs import parse_progress, submit_job
+from openie_precheck import OPENIE_DIR, ORIGINALS_DIR
+from safe_io import atomic_write_json, config_lock
+from toolchain import get_python_path
+from tracing import child_env, span
+
+STATE_PATH = SCRIPT_DIR / 'runtime' / 'learning_pipeline.json'
+LOCK_PATH = SCRIPT_DIR / 'runtime' / '.learning.lock'
+LOG_DIR = SCRIPT_DIR / 'runtime' / 'logs'
+RAW_DATA_DIR = MAIBOT_DIR / 'data' / 'lpmm_raw_data'
+KNOWLEDGE_DIRS = (MAIBOT_DIR / 'data' / 'rag', MAIBOT_DIR / 'data' / 'embedding')
+PROGRESS_INTERVAL = 1.0
+# 学习脚本会询问是否继续，后台运行时统一回答 y
+SCRIPT_ANSWERS = b"y\n" * 8
+
+
+def _list_files(directory: Path, pattern: str) -> list[Path]:
+    return sorted(directory.glob(pattern)) if directory.is_dir() else []
+
+
+def _list_tree(directories: tuple[Path, ...]) -> list[Path]:
+    return sorted(p for d in directories if d.is_dir() for p in d.rglob('*') if p.is_file())
+
+
+STAGES: list[dict] = [
+    {
+        'name': 'extract',
+        'title': '信息提取',
+        'script': 'scripts/info_extraction.py',
+        'inputs': lambda: _list_files(RAW_DATA_DIR, '*.txt'),
+        'outputs': lambda: _list_files(OPENIE_DIR, '*.json'),
+        # OpenIE检查阶段会把合并过的原文件移入 originals 目录
+        'artifact_fallback': ORIGINALS_DIR,
+        'missing_inputs': f"没有找到待学习的原始语料，请把 txt 文件放入 {RAW_DATA_DIR}",
+    },
+    {
+        'name': 'clean',
+        'title': 'OpenIE检查',
+        'script': str(SCRIPT_DIR / 'openie_precheck.py'),
+        'args': ['clean', '--replace'],
+        'inputs': lambda: _list_files(OPENIE_DIR, '*.json'),
+        'outputs': lambda: _list_files(OPENIE_DIR, '*.json'),
+        'skip_if_empty': True,
+        'missing_inputs': "没有需要检查的 OpenIE 文件",
+    },
+    {
+        'name': 'import',
+        'title': 'OpenIE导入',
+        'script': 'scripts/import_openie.py',
+        'inputs': lambda: _list_files(OPENIE_DIR, '*.json'),
+        'outputs': lambda: _list_tree(KNOWLEDGE_DIRS),
+        'skip_if_empty': True,
+        'missing_inputs': "没有需要导入的新段落",
+    },
+]
+STAGE_NAMES = [stage['name'] for stage in STAGES]
+
+
+def load_state() -> dict:
+    """读取检查点；记录的执行进程已退出时，把运行中的阶段标记为已中断"""
+    try:
+        with open(STATE_PATH, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        state = {}
+    state.setdefault('stages', {})
+    state.setdefault('file_hashes', {})
+    pid = state.get('runner_pid')
+    if pid and not is_pid_alive(pid):
+        state['runner_pid'] = None
+        for record in state['stages'].values():
+            if record.get('status') == 'running':
+                record['status'] = 'interrupted'
+    return state
+
+
+def save_state(state: dict) -> None:
+    atomic_write_json(STATE_PATH, state, ensure_ascii=False, indent=2)
+
+
+def _relative(path: Path) -> str:
+    try:
+        return path.relative_to(MAIBOT_DIR).as_posix()
+    except ValueError:
+        return str(path)
+
+
+def hash_inputs(paths: list[Path], file_hashes: dict) -> str:
+    """计算一组输入文件的总哈希
+
+    单个文件的哈希按 (大小, 修改时间) 缓存在 file_hashes 中，未变化的大文件不必重新读取
+
+    Returns:
+        str: sha256 十六进制字符串
+    """
+    total = hashlib.sha256()
+    for path in paths:
+        stat = path.stat()
+        key = _relative(path)
+        signature = [stat.st_size, stat.st_mtime_ns]
+        cached = file_hashes.get(key)
+        if cached and cached['signature'] == signature:
+            digest = cached['sha256']
+        else:
+            file_hash = hashlib.sha256()
+            with open(path, 'rb') as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                    file_hash.update(chunk)
+            digest = file_hash.hexdigest()
+            file_hashes[key] = {'signature': signature, 'sha256': digest}
+        total.update(f"{key}\0{digest}\n".encode('utf-8'))
+    return total.hexdigest()
+
+
+def collect_artifacts(paths: list[Path]) -> dict:
+    return {_relative(p): p.stat().st_size for p in paths}
+
+
+def artifacts_present(artifacts: dict, fallback_dir: Optional[Path] = None) -> bool:
+    """检查阶段产物是否仍然存在且大小未变，fallback_dir 为产物可能被移入的目录"""
+    if not artifacts:
+        return False
+    for relative, size in artifacts.items():
+        path = MAIBOT_DIR / relative
+        if not path.is_file() and fallback_dir:
+            path = fallback_dir / path.name
+        if not path.is_file() or path.stat().st_size != size:
+            return False
+    return True
+
+
+def _run_script(stage: dict, record: dict, state: dict) -> int:
+    """执行阶段脚本，把输出写入日志并实时更新进度
+
+    Returns:
+        int: 脚本退出码
+    """
+    LOG_DIR.mkdir(parents=True, exist_ok=True)
+    log_path = LOG_DIR / f"learning-{stage['name']}.log"
+    record['log'] = str(log_path)
+    command = [get_python_path(), stage['script'], *stage.get('args', [])]
+    with span(f"学习阶段 {stage['title']}", kind='learning',
+              command=subprocess.list2cmdline([str(arg) for arg in command]), cwd=str(MAIBOT_DIR)) as current:
+        env = dict(child_env(), PYTHONUNBUFFERED='1', PYTHONIOENCODING='utf-8')
+        with open(log_path, 'ab') as log_file:
+            log_file.write(f"\n==== {datetime.now():%Y-%m-%d %H:%M:%S} 开始{stage['title']} ====\n".encode('utf-8'))
+            process = subprocess.Popen(command, cwd=str(MAIBOT_DIR),
+                                       stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                       stderr=subprocess.STDOUT, env=env)
+            record['pid'] = process.pid
+            save_state(state)
+            try:
+                process.stdin.write(SCRIPT_ANSWERS)
+                process.stdin.close()
+            except OSError:
+                pass
+
+            buffer = b''
+            last_save = 0.0
+            # 进度条用 \r 刷新同一行，按 \r 和 \n 切分才能拿到最新进度
+            for chunk in iter(lambda: process.stdout.read1(65536), b''):
+                current.add_bytes(out=len(chunk))
+                log_file.write(chunk)
+                buffer += chunk
+                *lines, buffer = re.split(rb'[\r\n]', buffer)
+                # 未换行的尾部通常就是正在刷新的进度条，一并解析但保留在缓冲区
+                for raw in lines + [buffer]:
+                    line = raw.decode('utf-8', errors='replace').strip()
+                    if not line:
+                        continue
+                    record['last_output'] = line[-200:]
+                    progress = parse_progress(line)
+                    if progress:
+                        record['progress'] = progress
+                now = time.monotonic()
+                if now - last_save >= PROGRESS_INTERVAL:
+                    log_file.flush()
+                    record['progress_updated_at'] = time.time()
+                    save_state(state)
+                    last_save = now
+            exit_code = process.wait()
+            current.set(exit_code=exit_code)
+            return exit_code
+
+
+def run_pipeline(force: bool = False, only: Optional[str] = None) -> bool:
+    """按顺序执行学习阶段
+
+    Args:
+        force: 忽略检查点，全部重新执行
+        only: 只执行指定阶段
+
+    Returns:
+        bool: 全部阶段是否成功
+    """
+    try:
+        with config_lock(LOCK_PATH, timeout=0):
+            return _run_locked(force, only)
+    except TimeoutError:
+        logger.error("已有学习流程在运行，可使用 status 查看进度")
+        return False
+
+
+def _run_locked(force: bool, only: Optional[str]) -> bool:
+    state = load_state()
+    state['runner_pid'] = os.getpid()
+    state['started_at'] = time.time()
+    state.pop('finished_at', None)
+    save_state(state)
+    try:
+        for stage in STAGES:
+            if only and stage['name'] != only:
+                continue
+            name, title = stage['name'], stage['title']
+            inputs = stage['inputs']()
+            if not inputs:
+                if stage.get('skip_if_empty'):
+                    logger.info(f"[{title}] {stage['missing_inputs']}，跳过")
+                    continue
+                logger.error(stage['missing_inputs'])
+                return False
+            input_hash = hash_inputs(inputs, state['file_hashes'])
+            record = state['stages'].get(name, {})
+            # OpenIE检查阶段的输出就是它下一次的输入，所以运行后的输入哈希同样视为未变化
+            if (not force and record.get('status') == 'done'
+                    and input_hash in (record.get('input_hash'), record.get('settled_hash'))
+                    and artifacts_present(record.get('artifacts', {}), stage.get('artifact_fallback'))):
+                logger.info(f"[{title}] 输入未变化且产物完整，跳过（上次耗时 {record.get('duration', 0):.0f} 秒）")
+                continue
+            if record.get('status') in ('interrupted', 'failed', 'running'):
+                logger.info(f"[{title}] 上次未完成（{record['status']}），从该阶段继续")
+
+            before = set(stage['outputs']())
+            record = {'status': 'running', 'input_hash': input_hash, 'inputs': len(inputs),
+                      'started_at': time.time(), 'attempts': record.get('attempts', 0) + 1}
+            state['stages'][name] = record
+            save_state(state)
+            logger.info(f"[{title}] 开始执行，共 {len(inputs)} 个输入文件")
+
+            start = time.monotonic()
+            try:
+                returncode = _run_script(stage, record, state)
+            except KeyboardInterrupt:
+                record['status'] = 'interrupted'
+                raise
+            finally:
+                record['duration'] = time.monotonic() - start
+                record.pop('pid', None)
+
+            record['returncode'] = returncode
+            record['finished_at'] = time.time()
+            if returncode != 0:
+                record['status'] = 'failed'
+                save_state(state)
+                logger.error(f"[{title}] 执行失败（退出码 {returncode}），详见 {record['log']}")
+                return False
+            outputs = stage['outputs']()
+            # 信息提取每次生成新的 OpenIE 文件，只记录本次新增或改动的；导入阶段记录整个知识库
+            new_outputs = [p for p in outputs if p not in before] if name == 'extract' else outputs
+            record['artifacts'] = collect_artifacts(new_outputs or outputs)
+            record['settled_hash'] = hash_inputs(stage['inputs'](), state['file_hashes'])
+            record['status'] = 'done'
+            save_state(state)
+            logger.info(f"[{title}] 完成，耗时 {record['duration']:.0f} 秒，产物 {len(record['artifacts'])} 个文件")
+        return True
+    finally:
+        state['runner_pid'] = None
+        state['finished_at'] = time.time()
+        save_state(state)
+
+
+def start_background(force: bool = False) -> Optional[int]:
+    """把学习流程提交为后台任务，菜单可以继续使用
+
+    Returns:
+        Optional[int]: 后台任务编号，已在运行时返回 None
+    """
+    state = load_state()
+    if state.get('runner_pid'):
+        logger.warning(f"学习流程已在后台运行 (PID: {state['runner_pid']})")
+        return None
+    command = [get_python_path(), str(SCRIPT_DIR / 'learning_pipeline.py'), 'run']
+    if force:
+        command.append('--force')
+    return submit_job('麦麦学习', command)
+
+
+def stop_pipeline() -> bool:
+    """结束后台学习流程，被中断的阶段下次运行时从头继续"""
+    state = load_state()
+    pid = state.get('runner_pid')
+    if not pid:
+        logger.info("没有正在运行的学习流程")
+        return True
+    for record in state['stages'].values():
+        if record.get('pid'):
+            _terminate_pid(record['pid'])
+    _terminate_pid(pid)
+    logger.info(f"已结束学习流程 (PID: {pid})")
+    return True
+
+
+def reset_pipeline(only: Optional[str] = None) -> None:
+    """清除检查点，下次运行时重新执行"""
+    state = load_state()
+    if state.get('runner_pid'):
+        logger.error("学习流程正在运行，请先停止")
+        return
+    for name in [only] if only else STAGE_NAMES:
+        state['stages'].pop(name, None)
+    save_state(state)
+    logger.info("已清除学习检查点")
+
+
+def _format_time(timestamp: Optional[float]) -> str:
+    return datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d %H:%M:%S') if timestamp else '-'
+
+
+def print_status(state: dict) -> None:
+    labels = {'done': '已完成', 'running': '运行中', 'failed': '失败', 'interrupted': '已中断'}
+    running = f"运行中 (PID: {state['runner_pid']})" if state.get('runner_pid') else '未运行'
+    print(f"\n学习流程: {running}    最近开始: {_format_time(state.get('started_at'))}    "
+          f"最近结束: {_format_time(state.get('finished_at'))}")
+    for stage in STAGES:
+        record = state['stages'].get(stage['name'], {})
+        status = labels.get(record.get('status'), '未执行')
+        line = f"  {stage['title']:<10}{status:<6}"
+        if record.get('status') == 'running':
+            elapsed = time.time() - record['started_at']
+            progress = record.get('progress', {})
+            if 'total' in progress:
+                line += f"  {progress['done']}/{progress['total']} ({progress['percent']}%)"
+                if progress['done']:
+                    remaining = elapsed * (progress['total'] - progress['done']) / progress['done']
+                    line += f"  预计剩余 {remaining / 60:.1f} 分钟"
+            elif 'percent' in progress:
+                line += f"  {progress['percent']}%"
+            line += f"  已运行 {elapsed / 60:.1f} 分钟"
+        elif 'duration' in record:
+            line += f"  耗时 {record['duration'] / 60:.1f} 分钟  第 {record.get('attempts', 1)} 次执行"
+        print(line)
+        if record.get('status') in ('running', 'failed') and record.get('last_output'):
+            print(f"      最新输出: {record['last_output']}")
+
+
+def interactive_learning_menu() -> bool:
+    """学习流程交互菜单"""
+    while True:
+        print("\n=== 麦麦学习流程 ===")
+        print_status(load_state())
+        print("\n1. 后台开始/继续学习")
+        print("2. 刷新进度")
+        print("3. 停止学习")
+        print("4. 全部重新学习（忽略检查点）")
+        print("5. 清除检查点")
+        print("0. 返回主菜单")
+        choice = input("请选择操作: ").strip()
+        if choice == '0':
+            return True
+        if choice == '1':
+            start_background()
+        elif choice == '2':
+            continue
+        elif choice == '3':
+            stop_pipeline()
+        elif choice == '4':
+            start_background(force=True)
+        elif choice == '5':
+            reset_pipeline()
+        else:
+            logger.error("无效选择")
+
+
+def main() -> int:
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description="麦麦学习流程（可断点续跑）")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    run_parser = subparsers.add_parser('run', help="在前台执行学习流程")
+    run_parser.add_argument('--force', action='store_true', help="忽略检查点全部重新执行")
+    run_parser.add_argument('--stage', choices=STAGE_NAMES, help="只执行指定阶段")
+    status_parser = subparsers.add_parser('status', help="查看进度")
+    status_parser.add_argument('--json', action='store_true', help="以 JSON 格式输出")
+    subparsers.add_parser('stop', help="结束后台学习流程")
+    reset_parser = subparsers.add_parser('reset', help="清除检查点")
+    reset_parser.add_argument('--stage', choices=STAGE_NAMES, help="只清除指定阶段")
+    args = parser.parse_args()
+
+    if args.command == 'run':
+        return 0 if run_pipeline(args.force, args.stage) else 1
+    if args.command == 'status':
+        state = load_state()
+        if args.json:
+            print(json.dumps(state['stages'], indent=2, ensure_ascii=False))
+        else:
+            print_status(state)
+        return 0
+    if args.command == 'stop':
+        return 0 if stop_pipeline() else 1
+    reset_pipeline(args.stage)
+    return 0
+
+
+if __name__ == "__main__":
+    try:
+        sys.exit(main())
+    except KeyboardInterrupt:
+        print("\n用户取消操作")
+        sys.exit(1)
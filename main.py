@@ -1,19 +1,22 @@
 # -*- coding: utf-8 -*-
+import hashlib
+import json
 import os
 import re
 import sys
-import subprocess
 import shutil
-try:
-    from modules.MaiBot.src.common.logger import get_logger
-    logger = get_logger("init")
-except ImportError:
-    import logging as logger
-    logger.basicConfig(level=logger.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
-    logger = logger.getLogger("init")
+import threading
+import time
+# 启动器只使用标准库日志：MaiBot 的日志模块会加载整套日志依赖，菜单显示前不需要它
+import logging as logger
+logger.basicConfig(level=logger.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logger.getLogger("init")
 
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Optional
+
+from safe_io import atomic_write_json, atomic_write_text
+from tracing import span
 
 def get_absolute_path(relative_path: str) -> str:
     """获取绝对路径
@@ -104,34 +107,11 @@ def check_and_create_config_files() -> bool:
         logger.warning("部分配置文件处理失败，请检查上述错误信息")
     
     return all_success
-# 配置日志
-
-def get_python_interpreter() -> Optional[Path]:
-    """获取Python解释器路径"""
-    try:
-        # 尝试多个可能的路径
-        possible_paths = [
-            Path(__file__).parent / "runtime" / "python31211" / "bin" / "python.exe",
-            Path(__file__).parent / "runtime" / "python31211" / "python.exe",
-            Path(sys.executable),  # 当前Python解释器
-        ]
-        
-        for python_path in possible_paths:
-            if python_path.exists() and python_path.is_file():
-                logger.info(f"找到Python解释器: {python_path}")
-                return python_path
-        
-        logger.error("未找到可用的Python解释器")
-        return None
-        
-    except Exception as e:
-        logger.error(f"获取Python解释器路径时出错: {e}")
-        return None
-
 def is_first_run() -> bool:
     """检查是否是首次运行
     
-    通过检查 runtime/.initialized 或 runtime/.gitkeep 文件是否存在来判断
+    通过检查 runtime/.initialized 或 runtime/.gitkeep 文件是否存在来判断；
+    初始化中断时标记文件不存在，下次启动会根据 runtime/first_run.json 中的步骤记录继续
     """
     runtime_dir = Path(__file__).parent / "runtime"
     new_marker = runtime_dir / ".initialized"
@@ -145,87 +125,234 @@ def is_first_run() -> bool:
     logger.info("首次运行检测: 未找到初始化标记文件")
     return True
 
-def run_python_script(script_name: str) -> bool:
-    """运行同一目录下的Python脚本"""
+def collect_first_run_input() -> dict:
+    """在初始化开始前收集所有需要用户输入的信息，之后的步骤可以无人值守地并行执行
+    
+    Returns:
+        dict: 步骤上下文，包含 qq、group_list、private_list、force_update
+    """
+    from config_qq_adapter import input_qq_list
+    from init_napcat import prompt_qq_number
+    from update_modules import confirm_force_reset
+
+    print("======================")
+    print("请先填写初始化所需的信息，填写完成后将自动执行全部初始化步骤")
+    print("======================")
+    qq_number = prompt_qq_number()
+
+    print("=" * 50)
+    print("QQ适配器配置向导")
+    print("=" * 50)
+    print("\n本向导将帮助您配置群聊和私聊白名单")
+    print("白名单模式: 只有在名单中的群组/用户可以与机器人聊天")
+    group_list = input_qq_list("【群聊白名单配置】", 'group')
+    private_list = input_qq_list("【私聊白名单配置】", 'private')
+
+    print("=" * 50)
+    print("接下来将更新一键包、MaiBot和适配器的代码")
+    force_update = confirm_force_reset()
+    return {'qq': qq_number, 'group_list': group_list, 'private_list': private_list, 'force_update': force_update}
+
+def _step_update_modules(context: dict) -> bool:
+    import update_modules
+    # 与其他步骤并行执行，不能在这里询问用户，使用开始前收集的确认结果
+    return update_modules.main(confirmed=context['force_update']) == 0
+
+def _check_update_modules(context: dict) -> bool:
+    return all((Path('modules') / name / '.git').exists() for name in ('MaiBot', 'MaiBot-Napcat-Adapter'))
+
+def _step_napcat_config(context: dict) -> bool:
+    from init_napcat import create_napcat_configs
+    create_napcat_configs(context['qq'])
+    return True
+
+def _check_napcat_config(context: dict) -> bool:
+    from init_napcat import get_available_versions
+    versions = get_available_versions()
+    return bool(versions) and all(
+        Path(f"./modules/napcat/versions/{version}/resources/app/napcat/config/onebot11_{context['qq']}.json").exists()
+        for version in versions
+    )
+
+def _step_adapter_whitelist(context: dict) -> bool:
+    from config_qq_adapter import save_qq_lists
+    return save_qq_lists(context['group_list'], context['private_list'])
+
+def _check_adapter_whitelist(context: dict) -> bool:
+    return Path('modules/MaiBot-Napcat-Adapter/config.toml').exists()
+
+def _step_bot_qq(context: dict) -> bool:
+    from init_napcat import update_bot_qq
+    update_bot_qq(int(context['qq']))
+    return True
+
+def _check_bot_qq(context: dict) -> bool:
+    return Path('modules/MaiBot/config/bot_config.toml').exists()
+
+# 首次运行初始化步骤，depends 中的步骤成功后才会执行，没有依赖关系的步骤并行执行
+# NapCat配置和适配器白名单只写入不受git管理的文件，可以与耗时的模块更新同时进行；
+# MaiBot的配置模板位于仓库内，会被更新时的强制重置覆盖，因此必须等待更新完成
+# version: 步骤逻辑变化时递增，使已完成的记录失效；inputs: 参与输入哈希的上下文；
+# check: 步骤已完成时的快速校验，产物缺失时重新执行
+FIRST_RUN_STEPS: list[dict] = [
+    {'name': 'update_modules', 'title': '更新模块并安装依赖', 'version': 1, 'depends': [],
+     'run': _step_update_modules, 'inputs': lambda context: None, 'check': _check_update_modules},
+    {'name': 'napcat_config', 'title': '生成NapCat配置', 'version': 1, 'depends': [],
+     'run': _step_napcat_config, 'inputs': lambda context: context['qq'], 'check': _check_napcat_config},
+    {'name': 'adapter_whitelist', 'title': '写入适配器白名单', 'version': 1, 'depends': [],
+     'run': _step_adapter_whitelist, 'inputs': lambda context: [context['group_list'], context['private_list']],
+     'check': _check_adapter_whitelist},
+    {'name': 'bot_qq', 'title': '写入MaiBot QQ号', 'version': 1, 'depends': ['update_modules'],
+     'run': _step_bot_qq, 'inputs': lambda context: context['qq'], 'check': _check_bot_qq},
+]
+
+STEP_STATUS_LABELS = {'succeeded': '成功', 'cached': '已完成', 'failed': '失败', 'skipped': '跳过'}
+
+LEDGER_PATH = Path(__file__).parent / "runtime" / "first_run.json"
+LEDGER_VERSION = 1
+
+def load_ledger() -> dict:
+    """读取初始化步骤记录，不存在或格式不兼容时返回空记录"""
     try:
-        # 获取当前脚本目录
-        current_dir = Path(__file__).parent
-        
-        # 构建目标脚本路径
-        target_script = current_dir / script_name
-        
-        # 检查目标脚本是否存在
-        if not target_script.exists():
-            logger.error(f"目标脚本不存在: {target_script}")
-            return False
-        
-        # 获取Python解释器路径
-        python_path = get_python_interpreter()
-        if python_path is None:
-            logger.error("无法找到Python解释器")
-            return False
-        
-        logger.info(f"开始执行脚本: {script_name}")
-        
-        # 执行目标脚本
-        result = subprocess.run(
-            [str(python_path), str(target_script)],
-            capture_output=False,  # 保持输出到控制台
-            text=True,
-            timeout=30000,  # 5分钟超时
-            cwd=str(current_dir)  # 设置工作目录
-        )
-        
-        if result.returncode == 0:
-            logger.info(f"脚本执行成功: {script_name}")
-            return True
-        else:
-            logger.error(f"脚本执行失败: {script_name}, 返回码: {result.returncode}")
-            return False
-            
-    except subprocess.TimeoutExpired:
-        logger.error(f"脚本执行超时: {script_name}")
-        return False
-    except FileNotFoundError as e:
-        logger.error(f"文件未找到: {e}")
-        return False
-    except Exception as e:
-        logger.error(f"执行脚本时出错: {script_name}, 错误: {e}")
-        return False
+        with open(LEDGER_PATH, 'r', encoding='utf-8') as f:
+            ledger = json.load(f)
+        if ledger.get('version') == LEDGER_VERSION:
+            return ledger
+        logger.warning("初始化记录版本不兼容，将重新执行初始化")
+    except FileNotFoundError:
+        pass
+    except (OSError, ValueError) as e:
+        logger.warning(f"读取初始化记录失败，将重新执行初始化: {e}")
+    return {'version': LEDGER_VERSION, 'context': None, 'steps': {}}
+
+def save_ledger(ledger: dict) -> None:
+    """保存初始化步骤记录"""
+    atomic_write_json(LEDGER_PATH, ledger, indent=2, ensure_ascii=False)
+
+def step_input_hash(step: dict, context: dict, ledger: dict) -> str:
+    """计算步骤的输入哈希
+    
+    包含步骤版本、相关上下文以及前置步骤的完成时间，前置步骤重新执行后依赖它的步骤也会失效
+    """
+    payload = {
+        'version': step['version'],
+        'inputs': step['inputs'](context),
+        'depends': {name: ledger['steps'].get(name, {}).get('finished_at') for name in step['depends']},
+    }
+    encoded = json.dumps(payload, sort_keys=True, ensure_ascii=False).encode('utf-8')
+    return hashlib.sha256(encoded).hexdigest()[:16]
 
-def safe_system_command(command: str, timeout: int = 30) -> bool:
-    """安全地执行系统命令
+def run_steps(steps: list[dict], context: dict, ledger: dict, parent=None) -> dict[str, dict]:
+    """按依赖关系执行步骤，互不依赖的步骤在线程池中并行执行
+    
+    记录中已成功、输入哈希未变且产物校验通过的步骤直接跳过，每个步骤结束后立即写入记录
     
     Args:
-        command: 要执行的命令
-        timeout: 超时时间（秒）
+        steps: 步骤定义列表
+        context: 传给每个步骤的上下文
+        ledger: 初始化步骤记录，会被原地更新
+        parent: 追踪记录中的父操作，步骤在线程池中执行，需要显式传入
         
     Returns:
-        bool: 命令执行是否成功
+        dict: 步骤名 -> {'status': succeeded/cached/failed/skipped, 'duration': 秒}
     """
-    try:
-        logger.info(f"执行系统命令: {command}")
-        result = subprocess.run(
-            command,
-            shell=True,
-            timeout=timeout,
-            capture_output=False,
-            text=True
-        )
-        
-        if result.returncode == 0:
-            logger.info(f"系统命令执行成功: {command}")
-            return True
-        else:
-            logger.warning(f"系统命令执行失败: {command}, 返回码: {result.returncode}")
-            return False
-            
-    except subprocess.TimeoutExpired:
-        logger.error(f"系统命令执行超时: {command}")
-        return False
-    except Exception as e:
-        logger.error(f"执行系统命令时出错: {command}, 错误: {e}")
+    results: dict[str, dict] = {}
+    finished = {step['name']: threading.Event() for step in steps}
+    ledger_lock = threading.Lock()
+
+    def execute(step: dict) -> None:
+        result = {'status': 'skipped', 'duration': 0.0}
+        try:
+            for name in step['depends']:
+                finished[name].wait()
+            if not all(results[name]['status'] in ('succeeded', 'cached') for name in step['depends']):
+                logger.warning(f"前置步骤未成功，跳过: {step['title']}")
+                return
+            with ledger_lock:
+                input_hash = step_input_hash(step, context, ledger)
+                record = ledger['steps'].get(step['name'], {})
+            if record.get('status') == 'succeeded' and record.get('input_hash') == input_hash and step['check'](context):
+                logger.info(f"步骤已完成，跳过: {step['title']}")
+                result = {'status': 'cached', 'duration': 0.0}
+                return
+
+            logger.info(f"开始步骤: {step['title']}")
+            started = time.perf_counter()
+            with span(f"初始化 {step['title']}", parent=parent, kind='first_run_step') as current:
+                try:
+                    ok = step['run'](context)
+                except Exception as e:
+                    logger.error(f"步骤 {step['title']} 出错: {e}")
+                    ok = False
+                current.set(status='ok' if ok else 'failed')
+            result = {'status': 'succeeded' if ok else 'failed', 'duration': time.perf_counter() - started}
+            logger.info(f"步骤 {step['title']} {STEP_STATUS_LABELS[result['status']]}，耗时 {result['duration']:.1f} 秒")
+            with ledger_lock:
+                ledger['steps'][step['name']] = {
+                    'status': result['status'],
+                    'version': step['version'],
+                    'input_hash': input_hash,
+                    'duration': round(result['duration'], 3),
+                    'finished_at': time.time(),
+                }
+                save_ledger(ledger)
+        finally:
+            results[step['name']] = result
+            finished[step['name']].set()
+
+    with ThreadPoolExecutor(max_workers=len(steps)) as pool:
+        list(pool.map(execute, steps))
+    return results
+
+def print_step_report(steps: list[dict], results: dict[str, dict], elapsed: float) -> None:
+    """打印各步骤的状态和耗时"""
+    print("======================")
+    print("初始化步骤耗时：")
+    for step in steps:
+        record = results[step['name']]
+        print(f"  {step['title']}: {STEP_STATUS_LABELS[record['status']]}，{record['duration']:.1f} 秒")
+    serial = sum(record['duration'] for record in results.values())
+    print(f"  总耗时 {elapsed:.1f} 秒（串行执行约需 {serial:.1f} 秒）")
+    print("======================")
+
+def run_first_run_pipeline() -> bool:
+    """在当前进程内执行首次运行初始化，上次中断时从第一个未完成或已失效的步骤继续
+    
+    Returns:
+        bool: 所有步骤是否成功
+    """
+    # 初始化脚本使用相对于一键包根目录的路径
+    os.chdir(Path(__file__).parent)
+    ledger = load_ledger()
+    if ledger['context']:
+        context = ledger['context']
+        print(f"检测到未完成的初始化，将使用上次填写的信息（QQ号 {context['qq']}）继续")
+        print(f"如需重新填写，请删除 {LEDGER_PATH} 后重新启动")
+        if not context.get('force_update'):
+            # 上次拒绝了强制覆盖（或记录来自旧版本），更新步骤开始前重新询问
+            from update_modules import confirm_force_reset
+            context['force_update'] = confirm_force_reset()
+            save_ledger(ledger)
+    else:
+        context = collect_first_run_input()
+        ledger['context'] = context
+        save_ledger(ledger)
+
+    started = time.perf_counter()
+    with span('首次运行初始化', kind='first_run') as current:
+        results = run_steps(FIRST_RUN_STEPS, context, ledger, current)
+    print_step_report(FIRST_RUN_STEPS, results, time.perf_counter() - started)
+
+    failed = [step['title'] for step in FIRST_RUN_STEPS if results[step['name']]['status'] not in ('succeeded', 'cached')]
+    if failed:
+        logger.error(f"初始化未完成: {', '.join(failed)}，下次启动将从未完成的步骤继续")
         return False
+    return True
+
+def launch_main_program() -> None:
+    """在当前进程内进入 start.py 主菜单"""
+    import start
+    start.main()
 
 def setup_webui_dependencies() -> bool:
     """(弃用) 保留占位以兼容旧代码调用，直接返回 True"""
@@ -280,54 +407,28 @@ def main() -> None:
             logger.info("首次运行一键包，执行初始化操作")
             print("首次运行一键包，执行初始化操作……")
             
-            if not run_python_script("update_modules.py"):
-                logger.error("模块更新失败")
-                return
-            
-            # (已移除) 旧版 WebUI 依赖安装步骤已废弃
-            
-            print("======================")
-            print("正在执行NapCat初始化脚本...")
-            print("======================")
-            
-            if not run_python_script("init_napcat.py"):
-                logger.error("NapCat初始化失败")
-                return
-            
-            print("======================")
-            print("正在配置QQ适配器...")
-            print("======================")
-            
-            if not run_python_script("config_qq_adapter.py"):
-                logger.error("QQ适配器配置失败")
+            if not run_first_run_pipeline():
+                logger.error("初始化失败，请根据上方日志排查后重新启动")
                 return
             
             # 所有初始化步骤完成,创建标记文件
             try:
                 runtime_dir = Path(__file__).parent / "runtime"
                 init_marker = runtime_dir / ".initialized"
-                runtime_dir.mkdir(parents=True, exist_ok=True)
-                init_marker.write_text('initialized', encoding='utf-8')
+                atomic_write_text(init_marker, 'initialized')
                 logger.info("初始化完成,已创建标记文件: .initialized")
             except Exception as e:
                 logger.warning(f"创建初始化标记文件失败: {e}")
             
             print("3秒后启动MaiBot Client...")
-            safe_system_command("timeout /t 3 /nobreak > nul")
-            safe_system_command("cls")
-            
-            # 首次初始化后直接进入 start.py（主菜单/主逻辑）
-            if not run_python_script("start.py"):
-                logger.error("首次运行后启动主程序失败")
-                return
+            time.sleep(3)
         else:
             # 非首次运行
             logger.info("检测到不是首次运行，正在跳过向导启动 MaiBot Core")
             print("检测到不是首次运行，正在跳过向导启动 MaiBot Core...")
-            
-            if not run_python_script("start.py"):
-                logger.error("启动主程序失败")
-                return
+        
+        # 直接在当前进程进入 start.py（主菜单/主逻辑）
+        launch_main_program()
                 
         logger.info("程序执行完成")
         
@@ -0,0 +1,433 @@
+# -*- coding: utf-8 -*-
+"""
+消息延迟追踪
+功能：解析 NapCat、适配器和麦麦的日志，按消息编号把同一条消息在各服务中的事件对应起来，
+统计每个阶段的延迟，找出"回复慢"到底慢在哪一段
+
+阶段：接收（NapCat 收到消息）→ 适配器（适配器收到）→ 麦麦（麦麦收到）→ 回复（NapCat 发出引用该消息的回复）
+- 日志来自多实例管理记录的 instances/<名称>/logs/{napcat,adapter,bot}.log，也可以用 --log 指定任意文件
+- 消息从最靠前的有日志的阶段开始追踪（通常是 NapCat 的接收），其他日志中出现的未知编号不会被追踪
+- 每个阶段用正则表达式识别，命名分组 msg_id 为消息编号，同一阶段只记录第一次出现的时间；
+  各服务的日志格式随版本变化，可在 runtime/latency_patterns.json 中覆盖默认规则
+- 延迟保存在固定大小的对数分桶直方图（HDR 风格）中，内存占用与消息数量无关；未完成的消息超过时限后丢弃
+- report 一次性分析已有日志；watch 跟随日志实时刷新最慢的消息和仍在等待回复的消息
+
+用法：
+    python message_latency.py report [--instance 名称] [--top 10] [--json]
+    python message_latency.py report --log napcat=napcat.log --log bot=bot.log
+    python message_latency.py watch [--instance 名称] [--interval 5] [--top 10]
+"""
+
+import argparse
+import heapq
+import json
+import re
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Iterator, Optional
+
+try:
+    from modules.MaiBot.src.common.logger import get_logger
+    logger = get_logger("message_latency")
+except ImportError:
+    import logging as logger
+    logger.basicConfig(level=logger.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    logger = logger.getLogger("message_latency")
+
+from instance_manager import SCRIPT_DIR, get_instance_dir
+
+PATTERNS_PATH = SCRIPT_DIR / 'runtime' / 'latency_patterns.json'
+SERVICES = ('napcat', 'adapter', 'bot')
+STAGES = ('ingress', 'adapter', 'bot', 'reply')
+STAGE_LABELS = {'ingress': '接收', 'adapter': '适配器', 'bot': '麦麦', 'reply': '回复'}
+# 统计的区间：相邻阶段之间，以及接收到回复的总延迟
+SEGMENTS = tuple(zip(STAGES, STAGES[1:])) + (('ingress', 'reply'),)
+
+_ID = r"""(?:message_id|msg_id|消息ID|消息id)["']?\s*[:：=]\s*["']?(?P<msg_id>-?\d+)"""
+# 阶段 -> (服务, 正则列表)
+DEFAULT_PATTERNS = {
+    'ingress': ('napcat', [r'接收\s*<-.*?\[' + _ID + r'\]', r'(?:recv|received?)\b.*?' + _ID]),
+    'adapter': ('adapter', [_ID]),
+    'bot': ('bot', [_ID]),
+    'reply': ('napcat', [r'发送\s*->.*?\[回复[:：]\s*(?P<msg_id>-?\d+)\]',
+                         r'(?:send|sent)\b.*?(?:reply_to|quote)["\']?\s*[:：=]\s*["\']?(?P<msg_id>-?\d+)']),
+}
+
+_TIMESTAMP = re.compile(
+    r'(?:(?P<year>\d{4})-)?(?P<month>\d{2})-(?P<day>\d{2})[ T](?P<clock>\d{2}:\d{2}:\d{2})(?:[.,](?P<frac>\d{1,6}))?'
+    r'|(?<![\d:])(?P<bare_clock>\d{2}:\d{2}:\d{2})(?:[.,](?P<bare_frac>\d{1,6}))?'
+)
+
+DEFAULT_TOP = 10
+DEFAULT_TTL = 600.0
+MAX_PENDING = 100000
+# 收到回复后再等待这么多秒才结算，让同一轮读取到的适配器、麦麦日志先补齐
+FINALIZE_GRACE = 2.0
+
+
+class LatencyHistogram:
+    """固定大小的对数分桶直方图
+
+    以微秒记录，64 以下逐一计数，之上每个 2 的幂区间再分 32 个桶，相对误差约 3%；
+    共 1024 个桶，可记录到约 19 小时
+    """
+    SUB_BUCKET_BITS = 6
+    BUCKETS = 1024
+
+    def __init__(self):
+        self.counts = [0] * self.BUCKETS
+        self.count = 0
+        self.total_us = 0
+        self.max_us = 0
+
+    def _index(self, value: int) -> int:
+        if value < 1 << self.SUB_BUCKET_BITS:
+            return value
+        shift = value.bit_length() - self.SUB_BUCKET_BITS
+        half = 1 << (self.SUB_BUCKET_BITS - 1)
+        return min(self.BUCKETS - 1, half * shift + (value >> shift))
+
+    def _value(self, index: int) -> int:
+        """桶的中点"""
+        if index < 1 << self.SUB_BUCKET_BITS:
+            return index
+        half = 1 << (self.SUB_BUCKET_BITS - 1)
+        shift = index // half - 1
+        return ((index - half * shift) << shift) + (1 << shift) // 2
+
+    def record(self, value_ms: float) -> None:
+        value = max(0, int(value_ms * 1000))
+        self.counts[self._index(value)] += 1
+        self.count += 1
+        self.total_us += value
+        self.max_us = max(self.max_us, value)
+
+    def percentile(self, q: float) -> Optional[float]:
+        """第 q 百分位（毫秒），没有数据时返回None"""
+        if not self.count:
+            return None
+        target = max(1, int(self.count * q / 100 + 0.5))
+        seen = 0
+        for index, bucket in enumerate(self.counts):
+            seen += bucket
+            if seen >= target:
+                return min(self._value(index), self.max_us) / 1000
+        return self.max_us / 1000
+
+    def summary(self) -> dict:
+        return {
+            'count': self.count,
+            'mean_ms': round(self.total_us / self.count / 1000, 1) if self.count else None,
+            'p50_ms': self.percentile(50), 'p90_ms': self.percentile(90), 'p99_ms': self.percentile(99),
+            'max_ms': self.max_us / 1000 if self.count else None,
+        }
+
+
+def load_patterns(path: Path = PATTERNS_PATH) -> dict[str, tuple[str, list[re.Pattern]]]:
+    """读取阶段识别规则，runtime/latency_patterns.json 中的同名阶段覆盖默认规则
+
+    覆盖文件格式：{"bot": {"service": "bot", "patterns": ["收到消息.*?id=(?P<msg_id>\\d+)"]}}
+    """
+    patterns = {stage: (service, list(regexes)) for stage, (service, regexes) in DEFAULT_PATTERNS.items()}
+    if path.exists():
+        try:
+            overrides = json.loads(path.read_text(encoding='utf-8'))
+            for stage, rule in overrides.items():
+                if stage in STAGES:
+                    patterns[stage] = (rule.get('service', patterns[stage][0]), list(rule['patterns']))
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.warning(f"读取 {path} 失败，使用默认规则: {e}")
+    compiled = {}
+    for stage, (service, regexes) in patterns.items():
+        compiled[stage] = (service, [re.compile(regex) for regex in regexes])
+    return compiled
+
+
+def parse_timestamp(line: str, now: Optional[datetime] = None) -> Optional[float]:
+    """解析日志行开头的时间，只有时刻没有日期时按当天计算"""
+    match = _TIMESTAMP.search(line, 0, 48)
+    if not match:
+        return None
+    now = now or datetime.now()
+    clock = match.group('clock') or match.group('bare_clock')
+    frac = match.group('frac') or match.group('bare_frac') or '0'
+    hour, minute, second = map(int, clock.split(':'))
+    try:
+        if match.group('month'):
+            moment = datetime(int(match.group('year') or now.year), int(match.group('month')), int(match.group('day')),
+                              hour, minute, second, int(frac.ljust(6, '0')))
+        else:
+            moment = now.replace(hour=hour, minute=minute, second=second, microsecond=int(frac.ljust(6, '0')))
+            if moment - now > timedelta(minutes=1):
+                moment -= timedelta(days=1)  # 跨过午夜的日志
+    except ValueError:
+        return None
+    return moment.timestamp()
+
+
+class LatencyTracker:
+    """按消息编号对应各服务的日志事件并统计延迟"""
+
+    def __init__(self, patterns: Optional[dict] = None, top: int = DEFAULT_TOP, ttl: float = DEFAULT_TTL,
+                 entry_stage: str = 'ingress'):
+        self.patterns = patterns or load_patterns()
+        self.entry_stage = entry_stage
+        self.top = top
+        self.ttl = ttl
+        self.histograms = {segment: LatencyHistogram() for segment in SEGMENTS}
+        # 消息编号 -> {阶段: 时间}，按首次出现的顺序排列
+        self.pending: dict[str, dict[str, float]] = {}
+        self.replied_at: dict[str, float] = {}
+        self.slowest: list[tuple[float, str, dict]] = []
+        self.completed = 0
+        self.expired = 0
+        self.lines = 0
+        self.last_seen = 0.0
+
+    def feed(self, service: str, line: str, fallback: Optional[float] = None) -> None:
+        """处理一行日志
+
+        Args:
+            service: 日志来源（napcat / adapter / bot）
+            line: 日志内容
+            fallback: 日志行没有时间时使用的时间，None 表示跳过这样的行
+        """
+        self.lines += 1
+        for stage, (stage_service, regexes) in self.patterns.items():
+            if stage_service != service:
+                continue
+            for regex in regexes:
+                match = regex.search(line)
+                if not match:
+                    continue
+                timestamp = parse_timestamp(line) or fallback
+                if timestamp is None:
+                    return
+                self._record(match.group('msg_id'), stage, timestamp)
+                return
+
+    def _record(self, msg_id: str, stage: str, timestamp: float) -> None:
+        stages = self.pending.get(msg_id)
+        if stages is None:
+            if stage != self.entry_stage:
+                return  # 不在追踪范围内的消息（例如回复本身的编号）
+            if len(self.pending) >= MAX_PENDING:
+                self.pending.pop(next(iter(self.pending)))
+                self.expired += 1
+            stages = self.pending[msg_id] = {}
+        stages.setdefault(stage, timestamp)
+        self.last_seen = max(self.last_seen, timestamp)
+        if stage == 'reply':
+            self.replied_at.setdefault(msg_id, time.monotonic())
+
+    def finalize(self, force: bool = False, now: Optional[float] = None) -> None:
+        """结算已收到回复的消息，丢弃超过时限仍未回复的消息
+
+        Args:
+            force: 不等待 FINALIZE_GRACE，用于一次性分析
+            now: 判断超时使用的当前时间，默认为最新的日志时间
+        """
+        ready = [msg_id for msg_id, replied in self.replied_at.items()
+                 if force or time.monotonic() - replied >= FINALIZE_GRACE]
+        for msg_id in ready:
+            del self.replied_at[msg_id]
+            self._complete(msg_id, self.pending.pop(msg_id))
+        if not self.pending:
+            return
+        if now is None:
+            now = self.last_seen
+        for msg_id in [msg_id for msg_id, stages in self.pending.items()
+                       if msg_id not in self.replied_at and now - min(stages.values()) > self.ttl]:
+            del self.pending[msg_id]
+            self.expired += 1
+
+    def _complete(self, msg_id: str, stages: dict[str, float]) -> None:
+        self.completed += 1
+        for start, end in SEGMENTS:
+            if start in stages and end in stages:
+                self.histograms[(start, end)].record(max(0.0, stages[end] - stages[start]) * 1000)
+        total = (stages['reply'] - min(stages.values())) * 1000
+        entry = (total, msg_id, stages)
+        if len(self.slowest) < self.top:
+            heapq.heappush(self.slowest, entry)
+        elif total > self.slowest[0][0]:
+            heapq.heapreplace(self.slowest, entry)
+
+    def waiting(self, now: float, top: Optional[int] = None) -> list[tuple[float, str, dict]]:
+        """仍在等待回复的消息，按已等待时间从长到短"""
+        entries = [((now - min(stages.values())) * 1000, msg_id, stages)
+                   for msg_id, stages in self.pending.items() if 'reply' not in stages]
+        return heapq.nlargest(top or self.top, entries, key=lambda entry: entry[0])
+
+    def report(self, now: Optional[float] = None) -> dict:
+        """统计结果，now 为计算等待时间的当前时间，默认为最新的日志时间"""
+        return {
+            'lines': self.lines,
+            'completed': self.completed,
+            'pending': len(self.pending),
+            'expired': self.expired,
+            'segments': {f"{start}->{end}": self.histograms[(start, end)].summary() for start, end in SEGMENTS},
+            'slowest': [_entry_dict(entry) for entry in sorted(self.slowest, reverse=True)],
+            'waiting': [_entry_dict(entry) for entry in self.waiting(now or self.last_seen)],
+        }
+
+
+def _entry_dict(entry: tuple[float, str, dict]) -> dict:
+    total, msg_id, stages = entry
+    first = min(stages.values())
+    return {'msg_id': msg_id, 'total_ms': round(total, 1),
+            'started_at': datetime.fromtimestamp(first).isoformat(timespec='seconds'),
+            'stages_ms': {stage: round((stages[stage] - first) * 1000, 1) for stage in STAGES if stage in stages}}
+
+
+# ---------------------------------------------------------------------------
+# 日志来源
+# ---------------------------------------------------------------------------
+
+def instance_logs(instance: str) -> dict[str, list[Path]]:
+    """实例各服务的日志文件（适配器分片为 adapter.1.log 等）"""
+    log_dir = get_instance_dir(instance) / 'logs'
+    logs = {}
+    for service in SERVICES:
+        paths = sorted(log_dir.glob(f"{service}.log")) + sorted(log_dir.glob(f"{service}.*.log"))
+        if paths:
+            logs[service] = paths
+    return logs
+
+
+def parse_log_args(values: Optional[list[str]]) -> dict[str, list[Path]]:
+    """解析 --log 服务=路径"""
+    logs: dict[str, list[Path]] = {}
+    for value in values or []:
+        service, _, path = value.partition('=')
+        if service not in SERVICES or not path:
+            raise ValueError(f"--log 格式应为 服务=路径，服务为 {'/'.join(SERVICES)}: {value}")
+        logs.setdefault(service, []).append(Path(path))
+    return logs
+
+
+def read_lines(path: Path, offset: int = 0) -> tuple[list[str], int]:
+    """从 offset 开始读取完整的行，返回 (行列表, 新的 offset)；文件被截断或轮换时从头读取"""
+    try:
+        size = path.stat().st_size
+    except OSError:
+        return [], offset
+    if size < offset:
+        offset = 0
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        data = f.read()
+    end = data.rfind(b'\n') + 1  # 最后一行可能还没写完，留到下次
+    return data[:end].decode('utf-8', errors='replace').splitlines(), offset + end
+
+
+def analyze(logs: dict[str, list[Path]], tracker: LatencyTracker) -> LatencyTracker:
+    """一次性分析日志文件"""
+    for service, paths in logs.items():
+        for path in paths:
+            lines, _ = read_lines(path)
+            for line in lines:
+                tracker.feed(service, line)
+    tracker.finalize(force=True)
+    return tracker
+
+
+def follow(logs: dict[str, list[Path]], tracker: LatencyTracker, interval: float,
+           from_start: bool = False) -> Iterator[LatencyTracker]:
+    """跟随日志文件，每 interval 秒产出一次更新后的统计"""
+    offsets = {path: 0 if from_start or not path.exists() else path.stat().st_size
+               for paths in logs.values() for path in paths}
+    while True:
+        for service, paths in logs.items():
+            for path in paths:
+                lines, offsets[path] = read_lines(path, offsets[path])
+                now = time.time()
+                for line in lines:
+                    tracker.feed(service, line, fallback=now)
+        tracker.finalize(now=time.time())
+        yield tracker
+        time.sleep(interval)
+
+
+# ---------------------------------------------------------------------------
+# 输出
+# ---------------------------------------------------------------------------
+
+def _ms(value: Optional[float]) -> str:
+    return '-' if value is None else f"{value:.0f}"
+
+
+def print_report(report: dict) -> None:
+    print(f"分析 {report['lines']} 行日志，完成 {report['completed']} 条消息，"
+          f"等待中 {report['pending']} 条，超时丢弃 {report['expired']} 条")
+    # 表头中的中文占两列宽度，按显示宽度手工对齐
+    print("阶段                      次数      p50      p90      p99     最大     平均  (ms)")
+    for name, summary in report['segments'].items():
+        start, end = name.split('->')
+        label = f"{STAGE_LABELS[start]} → {STAGE_LABELS[end]}"
+        width = 24 - sum(1 for char in label if ord(char) > 0x2000)
+        print(f"{label:<{width}}{summary['count']:>8}{_ms(summary['p50_ms']):>9}{_ms(summary['p90_ms']):>9}"
+              f"{_ms(summary['p99_ms']):>9}{_ms(summary['max_ms']):>9}{_ms(summary['mean_ms']):>9}")
+    for title, entries in (('最慢的消息', report['slowest']), ('仍在等待回复的消息', report['waiting'])):
+        if not entries:
+            continue
+        print(f"\n{title}：")
+        for entry in entries:
+            stages = '  '.join(f"{STAGE_LABELS[stage]}+{offset:.0f}" for stage, offset in entry['stages_ms'].items())
+            print(f"  {entry['total_ms']:>9.0f} ms  {entry['started_at']}  #{entry['msg_id']}  {stages}")
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='NapCat、适配器和麦麦之间的消息延迟分析')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    for command, help_text in (('report', '分析已有日志'), ('watch', '跟随日志实时显示')):
+        sub = subparsers.add_parser(command, help=help_text)
+        sub.add_argument('--instance', help='实例名称')
+        sub.add_argument('--log', action='append', metavar='服务=路径', help='指定日志文件，可重复')
+        sub.add_argument('--top', type=int, default=DEFAULT_TOP, help='显示最慢的前 N 条消息')
+        sub.add_argument('--ttl', type=float, default=DEFAULT_TTL, help='未回复的消息保留的秒数')
+        if command == 'report':
+            sub.add_argument('--json', action='store_true', help='以 JSON 格式输出')
+        else:
+            sub.add_argument('--interval', type=float, default=5.0, help='刷新间隔（秒）')
+            sub.add_argument('--from-start', action='store_true', help='从日志开头读取，默认只看新产生的日志')
+    args = parser.parse_args(argv)
+
+    try:
+        logs = parse_log_args(args.log) or (instance_logs(args.instance) if args.instance else {})
+    except ValueError as e:
+        logger.error(str(e))
+        return 1
+    if not logs:
+        logger.error("没有找到日志文件，请用 --instance 指定实例或用 --log 指定日志")
+        return 1
+    patterns = load_patterns()
+    # 按阶段顺序读取，保证消息先在起始阶段出现
+    logs = {service: logs[service] for service in SERVICES if service in logs}
+    entry_stage = next((stage for stage in STAGES if patterns[stage][0] in logs), 'ingress')
+    tracker = LatencyTracker(patterns, args.top, args.ttl, entry_stage)
+
+    if args.command == 'report':
+        report = analyze(logs, tracker).report()
+        if args.json:
+            print(json.dumps(report, indent=2, ensure_ascii=False))
+        else:
+            print_report(report)
+        return 0
+
+    for service, paths in logs.items():
+        logger.info(f"跟随 {service}: {', '.join(str(path) for path in paths)}")
+    for tracker in follow(logs, tracker, args.interval, args.from_start):
+        print(f"\n===== {datetime.now():%H:%M:%S} =====")
+        print_report(tracker.report(time.time()))
+    return 0
+
+
+if __name__ == "__main__":
+    try:
+        sys.exit(main())
+    except KeyboardInterrupt:
+        print("\n用户取消操作")
+        sys.exit(1)
@@ -0,0 +1,347 @@
+# -*- coding: utf-8 -*-
+"""
+NapCat 替身
+功能：不登录 QQ 的本地 NapCat 替代进程，用于在 Linux CI 上测试启动流程、长时间挂机测试和压力测试
+
+- 读取与真实 NapCat 相同的配置：各版本目录下 init_napcat 生成的 onebot11_<QQ号>.json 和 webui.json
+- 在 webui.json 指定的端口（默认 6099，被占用时顺延）提供最小的 WebUI：token 登录、登录状态和账号信息
+- 按 onebot11 配置中启用的反向 WebSocket 客户端连接适配器（适配器分片时为多条连接），
+  发送生命周期和心跳事件，对适配器调用的接口返回固定的模拟数据，断线后按 reconnectInterval 重连
+- 可选按固定间隔向每条连接发送模拟消息（--chatter），让麦麦在挂机测试中持续有消息可处理
+- 设置环境变量 ONEKEY_NAPCAT_STUB=1 后，启动器和多实例管理会用本脚本代替 NapCatWinBootMain.exe
+
+用法：
+    python napcat_stub.py QQ号                       # 与 NapCatWinBootMain.exe QQ号 相同
+    python napcat_stub.py QQ号 --chatter 30          # 每 30 秒向每条连接发送一条模拟消息
+    python napcat_stub.py QQ号 --root 一键包目录 --webui-port 6199
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import secrets
+import signal
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Optional
+from urllib.parse import parse_qs, urlparse
+
+try:
+    from modules.MaiBot.src.common.logger import get_logger
+    logger = get_logger("napcat_stub")
+except ImportError:
+    import logging as logger
+    logger.basicConfig(level=logger.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    logger = logger.getLogger("napcat_stub")
+
+from onebot_loadgen import (FIRST_GROUP_ID, FIRST_USER_ID, SAMPLE_TEXTS, action_response, make_message_event,
+                            make_meta_event, reply_target)
+
+SCRIPT_DIR = Path(__file__).parent.absolute()
+ENV_STUB = 'ONEKEY_NAPCAT_STUB'
+# 与 start.load_napcat_token 相同的两种目录布局
+CONFIG_LAYOUTS = (
+    ('napcat', ('resources', 'app', 'napcat', 'config')),
+    ('napcatframework', ('resources', 'app', 'LiteLoader', 'plugins', 'NapCat', 'config')),
+)
+DEFAULT_WEBUI = {'host': '0.0.0.0', 'port': 6099, 'token': 'napcat'}
+WEBUI_PORT_ATTEMPTS = 10
+DEFAULT_HEARTBEAT_MS = 30000
+DEFAULT_RECONNECT_MS = 30000
+# 重连间隔不超过该值，避免配置中的 30 秒在测试中显得过长
+MAX_RECONNECT_SECONDS = 5.0
+
+
+def stub_enabled() -> bool:
+    """是否用替身代替真实 NapCat"""
+    return os.environ.get(ENV_STUB, '0') not in ('', '0')
+
+
+def stub_command(qq_number: str, python_path: str) -> list[str]:
+    """启动替身的命令行，与 NapCatWinBootMain.exe QQ号 的参数一致"""
+    return [python_path, str(SCRIPT_DIR / 'napcat_stub.py'), str(qq_number)]
+
+
+def find_config_files(root: Path, file_name: str) -> list[Path]:
+    """在所有版本目录中查找配置文件，按修改时间从新到旧排序"""
+    found = []
+    for module, parts in CONFIG_LAYOUTS:
+        versions = root / 'modules' / module / 'versions'
+        if not versions.is_dir():
+            continue
+        for version in versions.iterdir():
+            path = version.joinpath(*parts, file_name)
+            if path.is_file():
+                found.append(path)
+    return sorted(found, key=lambda path: path.stat().st_mtime, reverse=True)
+
+
+def load_json_config(root: Path, file_name: str) -> tuple[Optional[Path], Optional[dict]]:
+    """读取最新的一份配置文件，损坏的文件跳过"""
+    for path in find_config_files(root, file_name):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return path, json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"读取 {path} 失败: {e}")
+    return None, None
+
+
+def websocket_clients(onebot_config: dict) -> list[dict]:
+    """onebot11 配置中启用的反向 WebSocket 客户端"""
+    network = onebot_config.get('network') or {}
+    return [client for client in network.get('websocketClients') or [] if client.get('enable') and client.get('url')]
+
+
+# ---------------------------------------------------------------------------
+# WebUI
+# ---------------------------------------------------------------------------
+
+def _webui_handler(token: str, qq_number: int, status: dict):
+    credentials = set()
+
+    class Handler(BaseHTTPRequestHandler):
+        server_version = 'NapCat-Stub'
+
+        def log_message(self, format, *args):
+            logger.debug(f"WebUI {self.address_string()} {format % args}")
+
+        def _send(self, code: int, body, content_type: str = 'application/json') -> None:
+            data = body.encode('utf-8') if isinstance(body, str) else json.dumps(body, ensure_ascii=False).encode('utf-8')
+            self.send_response(code)
+            self.send_header('Content-Type', f"{content_type}; charset=utf-8")
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _authorized(self) -> bool:
+            header = self.headers.get('Authorization', '')
+            return header.startswith('Bearer ') and header[len('Bearer '):] in credentials
+
+        def _api(self, path: str, body: dict) -> None:
+            if path == '/api/auth/login':
+                if body.get('token') != token:
+                    self._send(200, {'code': -1, 'message': 'token is invalid', 'data': None})
+                    return
+                credential = secrets.token_hex(16)
+                credentials.add(credential)
+                self._send(200, {'code': 0, 'message': 'success', 'data': {'Credential': credential}})
+                return
+            if not self._authorized():
+                self._send(401, {'code': -1, 'message': 'Unauthorized', 'data': None})
+                return
+            if path == '/api/QQLogin/CheckLoginStatus':
+                self._send(200, {'code': 0, 'message': 'success', 'data': {'isLogin': True, 'qrcodeurl': ''}})
+            elif path == '/api/QQLogin/GetQQLoginInfo':
+                self._send(200, {'code': 0, 'message': 'success',
+                                 'data': {'uin': str(qq_number), 'nick': '麦麦', 'online': True}})
+            elif path == '/api/base/GetNapCatVersion':
+                self._send(200, {'code': 0, 'message': 'success', 'data': {'version': 'stub'}})
+            elif path == '/api/stub/status':
+                # 连接状态由事件循环线程更新，复制一份再序列化
+                clients = {name: dict(state) for name, state in list(status['clients'].items())}
+                self._send(200, {'code': 0, 'message': 'success', 'data': dict(status, clients=clients)})
+            else:
+                self._send(404, {'code': -1, 'message': 'Not Found', 'data': None})
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            if url.path.startswith('/webui'):
+                if parse_qs(url.query).get('token', [''])[0] != token:
+                    self._send(401, '<h1>token 错误</h1>', 'text/html')
+                else:
+                    self._send(200, f"<h1>NapCat 替身</h1><p>QQ: {qq_number}，已登录</p>", 'text/html')
+            elif url.path.startswith('/api/'):
+                self._api(url.path, {})
+            else:
+                self._send(404, {'code': -1, 'message': 'Not Found', 'data': None})
+
+        def do_POST(self):
+            length = int(self.headers.get('Content-Length') or 0)
+            try:
+                body = json.loads(self.rfile.read(length) or b'{}')
+            except ValueError:
+                body = {}
+            self._api(urlparse(self.path).path, body if isinstance(body, dict) else {})
+
+    return Handler
+
+
+def start_webui(webui: dict, qq_number: int, status: dict, port: Optional[int] = None) -> ThreadingHTTPServer:
+    """在后台线程中启动 WebUI，端口被占用时顺延
+
+    Raises:
+        OSError: 连续 WEBUI_PORT_ATTEMPTS 个端口都被占用
+    """
+    host = webui.get('host') or DEFAULT_WEBUI['host']
+    first_port = port or int(webui.get('port') or DEFAULT_WEBUI['port'])
+    handler = _webui_handler(str(webui.get('token') or DEFAULT_WEBUI['token']), qq_number, status)
+    for candidate in range(first_port, first_port + WEBUI_PORT_ATTEMPTS):
+        try:
+            server = ThreadingHTTPServer((host, candidate), handler)
+        except OSError:
+            logger.warning(f"WebUI 端口 {candidate} 被占用，尝试下一个端口")
+            continue
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, name='napcat-stub-webui', daemon=True).start()
+        logger.info(f"WebUI 已启动: http://127.0.0.1:{candidate}/webui/web_login?token={webui.get('token')}")
+        status['webui_port'] = candidate
+        return server
+    raise OSError(f"端口 {first_port}-{first_port + WEBUI_PORT_ATTEMPTS - 1} 都被占用")
+
+
+# ---------------------------------------------------------------------------
+# 反向 WebSocket
+# ---------------------------------------------------------------------------
+
+async def _chatter_loop(ws, qq_number: int, interval: float, message_ids: itertools.count, messages: dict) -> None:
+    rng = random.Random()
+    while True:
+        await asyncio.sleep(interval)
+        chat = ('group', FIRST_GROUP_ID + rng.randrange(5), FIRST_USER_ID + rng.randrange(20))
+        event = make_message_event(qq_number, next(message_ids), chat, rng.choice(SAMPLE_TEXTS))
+        messages[event['message_id']] = event
+        # 与 message_latency 默认规则一致的接收日志
+        logger.info(f"接收 <- 群聊 [测试群({chat[1]})] [测试用户({chat[2]})] [消息ID: {event['message_id']}] "
+                    f"{event['message'][-1]['data']['text']}")
+        # 只保留最近的消息供 get_msg 查询，长时间运行时不无限增长
+        if len(messages) > 1000:
+            messages.pop(next(iter(messages)))
+        await ws.send(json.dumps(event, ensure_ascii=False))
+
+
+def _log_reply(request: dict) -> None:
+    """记录发送消息请求，引用了某条消息时带上其编号，供 message_latency 统计回复延迟"""
+    target = reply_target(request)
+    if target is None:
+        return
+    (message_type, target_id), quoted = target
+    label = '群聊' if message_type == 'group' else '私聊'
+    suffix = f" [回复: {quoted}]" if quoted is not None else ''
+    logger.info(f"发送 -> {label} [{target_id}]{suffix}")
+
+
+async def _heartbeat_loop(ws, qq_number: int, interval: float) -> None:
+    while True:
+        await asyncio.sleep(interval)
+        await ws.send(json.dumps(make_meta_event(qq_number, 'heartbeat')))
+
+
+async def run_client(client: dict, qq_number: int, status: dict, chatter: float = 0) -> None:
+    """保持一条反向 WebSocket 连接，断线后重连，直到任务被取消"""
+    import websockets
+    name = client.get('name') or client['url']
+    state = status['clients'].setdefault(name, {'url': client['url'], 'connected': False, 'connects': 0,
+                                                'actions': 0, 'last_error': None})
+    heartbeat = max(1.0, (client.get('heartInterval') or DEFAULT_HEARTBEAT_MS) / 1000)
+    reconnect = min(MAX_RECONNECT_SECONDS, (client.get('reconnectInterval') or DEFAULT_RECONNECT_MS) / 1000)
+    headers = {'X-Self-ID': str(qq_number), 'X-Client-Role': 'Universal'}
+    if client.get('token'):
+        headers['Authorization'] = f"Bearer {client['token']}"
+    message_ids = itertools.count(int(time.time()) % 1000000 * 1000)
+    messages: dict = {}
+
+    while True:
+        try:
+            async with websockets.connect(client['url'], additional_headers=headers, max_size=None) as ws:
+                state.update(connected=True, last_error=None)
+                state['connects'] += 1
+                logger.info(f"已连接 {name}: {client['url']}")
+                await ws.send(json.dumps(make_meta_event(qq_number, 'lifecycle')))
+                background = [asyncio.create_task(_heartbeat_loop(ws, qq_number, heartbeat))]
+                if chatter:
+                    background.append(asyncio.create_task(_chatter_loop(ws, qq_number, chatter, message_ids, messages)))
+                try:
+                    async for raw in ws:
+                        try:
+                            request = json.loads(raw)
+                        except ValueError:
+                            continue
+                        if not isinstance(request, dict) or 'action' not in request:
+                            continue
+                        state['actions'] += 1
+                        _log_reply(request)
+                        response = action_response(request, qq_number, messages, message_ids)
+                        await ws.send(json.dumps(response, ensure_ascii=False))
+                finally:
+                    for task in background:
+                        task.cancel()
+            state['last_error'] = '连接被关闭'
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            state['last_error'] = str(e)
+        if state['connected']:
+            logger.warning(f"{name} 连接断开: {state['last_error']}，{reconnect:.0f} 秒后重连")
+        else:
+            logger.debug(f"{name} 连接失败: {state['last_error']}")
+        state['connected'] = False
+        await asyncio.sleep(reconnect)
+
+
+async def serve(clients: list[dict], qq_number: int, status: dict, chatter: float = 0) -> None:
+    """运行所有连接，收到 SIGTERM / Ctrl+C 时退出"""
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        try:
+            loop.add_signal_handler(signum, stop.set)
+        except (NotImplementedError, RuntimeError):
+            pass  # Windows 不支持，由 KeyboardInterrupt 处理
+    tasks = [asyncio.create_task(run_client(client, qq_number, status, chatter)) for client in clients]
+    await stop.wait()
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='本地 NapCat 替身，不登录 QQ')
+    parser.add_argument('qq', help='QQ号，用于查找 onebot11_<QQ号>.json')
+    parser.add_argument('--root', type=Path, default=SCRIPT_DIR, help='一键包根目录')
+    parser.add_argument('--webui-port', type=int, help='WebUI 端口，默认读取 webui.json')
+    parser.add_argument('--no-webui', action='store_true', help='不启动 WebUI')
+    parser.add_argument('--chatter', type=float, default=0, help='每隔多少秒向每条连接发送一条模拟消息，0 表示不发送')
+    args = parser.parse_args(argv)
+
+    if not args.qq.isdigit():
+        parser.error('QQ号必须是纯数字')
+    qq_number = int(args.qq)
+    onebot_path, onebot_config = load_json_config(args.root, f"onebot11_{args.qq}.json")
+    if onebot_config is None:
+        logger.error(f"找不到 onebot11_{args.qq}.json，请先运行 init_napcat.py 或在启动器中添加QQ号")
+        return 1
+    clients = websocket_clients(onebot_config)
+    logger.info(f"使用配置 {onebot_path}，{len(clients)} 个反向 WebSocket 连接")
+
+    status = {'qq': qq_number, 'pid': os.getpid(), 'started_at': time.time(), 'clients': {}}
+    if not args.no_webui:
+        _, webui = load_json_config(args.root, 'webui.json')
+        if webui is None:
+            logger.warning(f"找不到 webui.json，使用默认 token '{DEFAULT_WEBUI['token']}'")
+            webui = DEFAULT_WEBUI
+        try:
+            start_webui(webui, qq_number, status, args.webui_port)
+        except OSError as e:
+            logger.error(f"WebUI 启动失败: {e}")
+            return 1
+    if not clients:
+        logger.warning("onebot11 配置中没有启用的反向 WebSocket 连接，只提供 WebUI")
+
+    asyncio.run(serve(clients, qq_number, status, args.chatter))
+    logger.info("NapCat 替身已退出")
+    return 0
+
+
+if __name__ == "__main__":
+    try:
+        sys.exit(main())
+    except KeyboardInterrupt:
+        print("\n用户取消操作")
+        sys.exit(1)
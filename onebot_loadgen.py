@@ -0,0 +1,462 @@
+# -*- coding: utf-8 -*-
+"""
+OneBot11 压力测试
+功能：模拟 NapCat，以 OneBot11 反向 WebSocket 客户端的身份连接适配器（默认 ws://localhost:8095，
+即 create_onebot_config 写入的地址），按固定速率向大量模拟群聊/私聊发送消息，测量麦麦回复的端到端延迟
+
+- 按计划时间开环发送：某条消息发晚了，延迟仍从它的计划发送时间算起，不会因为发送端被拖慢而低估延迟
+- 回复与消息的对应：回复中带引用（reply 段）时按被引用的消息编号对应，否则对应同一会话中最早未回复的消息
+- 麦麦调用的 get_login_info、get_group_info、get_msg 等接口返回固定的模拟数据
+- 可以用 --replay 回放记录下来的消息事件（JSONL，每行一个 OneBot11 message 事件）
+- 与 NapCat 一样，每个事件都发给所有连接；适配器分片按各自的白名单过滤，只有负责该群（私聊只在第一个分片）的分片处理
+- 只在本机运行，不需要 QQ 登录；测试时请停止真正的 NapCat，避免两者同时连接适配器
+- 适配器默认使用白名单：压测前需要把模拟群号（700000000 起，共 --groups 个）加入 group_list、
+  模拟私聊 QQ 号（800000000 起，共 --private 个）加入 private_list，或把名单类型改为 blacklist，否则消息都会被适配器丢弃
+
+用法：
+    python onebot_loadgen.py --rate 10 --duration 60 --groups 50 --private 10
+    python onebot_loadgen.py --url ws://localhost:8095 --url ws://localhost:8096   # 适配器分片，每个地址一个连接
+    python onebot_loadgen.py --replay messages.jsonl --rate 5 --count 500
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import math
+import random
+import sys
+import time
+from collections import Counter, OrderedDict
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+try:
+    from modules.MaiBot.src.common.logger import get_logger
+    logger = get_logger("onebot_loadgen")
+except ImportError:
+    import logging as logger
+    logger.basicConfig(level=logger.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    logger = logger.getLogger("onebot_loadgen")
+
+from safe_io import atomic_write_json
+from toolchain import RUNTIME_DIR, SCRIPT_DIR
+
+REPORT_DIR = RUNTIME_DIR / 'loadtest'
+DEFAULT_URL = 'ws://localhost:8095'
+DEFAULT_SELF_ID = 10001
+HEARTBEAT_INTERVAL = 30
+FIRST_GROUP_ID = 700000000
+FIRST_USER_ID = 800000000
+SEND_ACTIONS = ('send_msg', 'send_group_msg', 'send_private_msg')
+
+SAMPLE_TEXTS = [
+    '麦麦在吗', '今天吃什么好呢', '有人玩游戏吗', '这个问题怎么解决啊', '哈哈哈哈哈',
+    '晚上好', '刚下班，累死了', '你觉得这首歌怎么样', '明天要下雨吗', '帮我想个名字',
+    '周末有什么安排', '推荐一本书吧', '我又来了', '今天的作业好难', '早点休息哦',
+]
+
+
+# ---------------------------------------------------------------------------
+# OneBot11 数据
+# ---------------------------------------------------------------------------
+
+def make_message_event(self_id: int, message_id: int, chat: tuple, text: str, mention: bool = True) -> dict:
+    """构造一条 OneBot11 消息事件
+
+    Args:
+        self_id: 机器人QQ号
+        message_id: 消息编号
+        chat: ('group', 群号, 发送者QQ号) 或 ('private', 发送者QQ号)
+        text: 消息文本
+        mention: 群消息是否 @机器人
+    """
+    segments = [{'type': 'text', 'data': {'text': text}}]
+    if chat[0] == 'group' and mention:
+        segments.insert(0, {'type': 'at', 'data': {'qq': str(self_id)}})
+    user_id = chat[2] if chat[0] == 'group' else chat[1]
+    event = {
+        'time': int(time.time()),
+        'self_id': self_id,
+        'post_type': 'message',
+        'message_type': chat[0],
+        'sub_type': 'normal' if chat[0] == 'group' else 'friend',
+        'message_id': message_id,
+        'user_id': user_id,
+        'message': segments,
+        'message_format': 'array',
+        'raw_message': ''.join(f"[CQ:at,qq={self_id}]" if seg['type'] == 'at' else seg['data']['text']
+                               for seg in segments),
+        'font': 14,
+        'sender': {'user_id': user_id, 'nickname': f"测试用户{user_id % 10000}", 'card': '', 'role': 'member'},
+    }
+    if chat[0] == 'group':
+        event['group_id'] = chat[1]
+    return event
+
+
+def make_meta_event(self_id: int, meta_type: str) -> dict:
+    """构造生命周期（lifecycle）或心跳（heartbeat）事件"""
+    event = {'time': int(time.time()), 'self_id': self_id, 'post_type': 'meta_event', 'meta_event_type': meta_type}
+    if meta_type == 'lifecycle':
+        event['sub_type'] = 'connect'
+    else:
+        event['status'] = {'online': True, 'good': True}
+        event['interval'] = HEARTBEAT_INTERVAL * 1000
+    return event
+
+
+def action_response(request: dict, self_id: int, messages: Optional[dict] = None,
+                    next_message_id: Optional[itertools.count] = None) -> dict:
+    """为适配器调用的 OneBot11 接口返回固定的模拟数据
+
+    Args:
+        request: 适配器发来的 {"action", "params", "echo"}
+        self_id: 机器人QQ号
+        messages: 已发送的消息事件（message_id -> 事件），用于 get_msg
+        next_message_id: 发送消息接口返回的消息编号生成器
+    """
+    action = request.get('action', '')
+    params = request.get('params') or {}
+    data = None
+    if action == 'get_login_info':
+        data = {'user_id': self_id, 'nickname': '麦麦'}
+    elif action in SEND_ACTIONS:
+        data = {'message_id': next(next_message_id) if next_message_id else int(time.time() * 1000) % 2 ** 31}
+    elif action == 'get_group_info':
+        group_id = int(params.get('group_id', 0))
+        data = {'group_id': group_id, 'group_name': f"测试群{group_id % 10000}", 'member_count': 100,
+                'max_member_count': 500}
+    elif action == 'get_group_member_info':
+        user_id = int(params.get('user_id', 0))
+        data = {'group_id': int(params.get('group_id', 0)), 'user_id': user_id,
+                'nickname': f"测试用户{user_id % 10000}", 'card': '', 'role': 'member'}
+    elif action == 'get_stranger_info':
+        user_id = int(params.get('user_id', 0))
+        data = {'user_id': user_id, 'nickname': f"测试用户{user_id % 10000}", 'sex': 'unknown', 'age': 0}
+    elif action == 'get_msg':
+        data = (messages or {}).get(int(params.get('message_id', 0)))
+    elif action == 'get_status':
+        data = {'online': True, 'good': True}
+    elif action == 'get_version_info':
+        data = {'app_name': 'NapCat.Onebot', 'app_version': 'loadtest', 'protocol_version': 'v11'}
+    elif action in ('get_group_list', 'get_friend_list'):
+        data = []
+    response = {'status': 'ok', 'retcode': 0, 'data': data, 'message': '', 'wording': ''}
+    if 'echo' in request:
+        response['echo'] = request['echo']
+    return response
+
+
+def reply_target(request: dict) -> Optional[tuple[tuple, Optional[int]]]:
+    """解析发送消息请求的目标会话和引用的消息编号，不是发送消息请求时返回None"""
+    action = request.get('action')
+    if action not in SEND_ACTIONS:
+        return None
+    params = request.get('params') or {}
+    message_type = params.get('message_type') or ('group' if action == 'send_group_msg' or 'group_id' in params
+                                                  else 'private')
+    chat = ('group', int(params.get('group_id', 0))) if message_type == 'group' else ('private', int(params.get('user_id', 0)))
+    quoted = None
+    message = params.get('message')
+    if isinstance(message, list):
+        for segment in message:
+            if isinstance(segment, dict) and segment.get('type') == 'reply':
+                try:
+                    quoted = int(segment.get('data', {}).get('id'))
+                except (TypeError, ValueError):
+                    pass
+                break
+    return chat, quoted
+
+
+def load_replay(path: Path) -> list[dict]:
+    """读取记录的消息事件，跳过非消息事件和损坏的行"""
+    events = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                event = json.loads(line)
+            except ValueError:
+                continue
+            if isinstance(event, dict) and event.get('post_type') == 'message':
+                events.append(event)
+    return events
+
+
+def percentile(values: list[float], q: float) -> Optional[float]:
+    """最近秩百分位数，values 需已排序"""
+    if not values:
+        return None
+    rank = math.ceil(q / 100 * len(values))
+    return values[min(len(values), max(rank, 1)) - 1]
+
+
+# ---------------------------------------------------------------------------
+# 压测
+# ---------------------------------------------------------------------------
+
+def _chat_key(chat: tuple) -> tuple:
+    return chat[:2]
+
+
+def _new_stats() -> dict:
+    return {
+        'sent': 0, 'send_errors': 0, 'late_sends': 0, 'replies': 0, 'extra_replies': 0,
+        'connect_errors': 0, 'disconnects': 0, 'actions': Counter(), 'latencies': [],
+        # 会话 -> {消息编号: 计划发送时间}，按发送顺序排列
+        'pending': {},
+        'messages': {},
+    }
+
+
+def _record_reply(stats: dict, request: dict, received: float) -> None:
+    target = reply_target(request)
+    if target is None:
+        return
+    chat, quoted = target
+    pending = stats['pending'].get(chat)
+    if not pending:
+        stats['extra_replies'] += 1  # 同一条消息的后续回复，或回复了不是压测发出的消息
+        return
+    if quoted is not None and quoted in pending:
+        scheduled = pending.pop(quoted)
+    else:
+        _, scheduled = pending.popitem(last=False)
+    stats['replies'] += 1
+    stats['latencies'].append((received - scheduled) * 1000)
+
+
+async def _receive_loop(ws, stats: dict, self_id: int, message_ids: itertools.count) -> None:
+    async for raw in ws:
+        received = time.perf_counter()
+        try:
+            request = json.loads(raw)
+        except ValueError:
+            continue
+        if not isinstance(request, dict) or 'action' not in request:
+            continue
+        stats['actions'][request['action']] += 1
+        _record_reply(stats, request, received)
+        await ws.send(json.dumps(action_response(request, self_id, stats['messages'], message_ids), ensure_ascii=False))
+
+
+async def _heartbeat_loop(ws, self_id: int) -> None:
+    while True:
+        await asyncio.sleep(HEARTBEAT_INTERVAL)
+        await ws.send(json.dumps(make_meta_event(self_id, 'heartbeat')))
+
+
+def _message_source(args: argparse.Namespace, self_id: int):
+    """按发送顺序生成 (会话, 文本或回放事件)"""
+    rng = random.Random(args.seed)
+    chats = [('group', FIRST_GROUP_ID + index) for index in range(args.groups)]
+    chats.extend(('private', FIRST_USER_ID + index) for index in range(args.private))
+    if args.replay:
+        events = load_replay(args.replay)
+        if not events:
+            raise ValueError(f"{args.replay} 中没有消息事件")
+        # 记录中的消息循环回放
+        for event in itertools.cycle(events):
+            if event.get('message_type') == 'group':
+                yield ('group', int(event['group_id']), int(event.get('user_id', FIRST_USER_ID))), event
+            else:
+                yield ('private', int(event.get('user_id', FIRST_USER_ID))), event
+    while True:
+        chat = rng.choice(chats)
+        if chat[0] == 'group':
+            chat = chat + (FIRST_USER_ID + rng.randrange(args.users_per_group),)
+        yield chat, rng.choice(SAMPLE_TEXTS)
+
+
+async def _connect(url: str, token: Optional[str], self_id: int):
+    import websockets
+    headers = {'X-Self-ID': str(self_id), 'X-Client-Role': 'Universal'}
+    if token:
+        headers['Authorization'] = f"Bearer {token}"
+    return await websockets.connect(url, additional_headers=headers, max_size=None)
+
+
+async def run_load(args: argparse.Namespace) -> dict:
+    """连接适配器、按速率发送消息并收集回复
+
+    Returns:
+        dict: 压测报告
+    """
+    self_id = args.qq
+    stats = _new_stats()
+    message_ids = itertools.count(1)
+    connections = []
+    receivers = []
+    heartbeats = []
+    for url in args.url:
+        try:
+            ws = await _connect(url, args.token, self_id)
+        except Exception as e:
+            stats['connect_errors'] += 1
+            logger.error(f"无法连接 {url}: {e}")
+            continue
+        await ws.send(json.dumps(make_meta_event(self_id, 'lifecycle')))
+        connections.append(ws)
+        receivers.append(asyncio.create_task(_receive_loop(ws, stats, self_id, message_ids)))
+        heartbeats.append(asyncio.create_task(_heartbeat_loop(ws, self_id)))
+        logger.info(f"已连接 {url}")
+    if not connections:
+        return build_report(args, stats, 0.0)
+
+    if args.warmup:
+        logger.info(f"等待适配器完成连接初始化（{args.warmup} 秒）...")
+        await asyncio.sleep(args.warmup)
+
+    source = _message_source(args, self_id)
+    total = args.count if args.count else int(args.rate * args.duration)
+    logger.info(f"开始发送：{total} 条消息，{args.rate} 条/秒，{args.groups} 个群聊，{args.private} 个私聊")
+    if not args.replay:
+        logger.info(f"请确认适配器白名单包含群号 {FIRST_GROUP_ID}-{FIRST_GROUP_ID + max(args.groups - 1, 0)}"
+                    + (f"、私聊 {FIRST_USER_ID}-{FIRST_USER_ID + args.private - 1}" if args.private else ''))
+    started = time.perf_counter()
+    for index in range(total):
+        scheduled = started + index / args.rate
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        elif delay < -0.1:
+            stats['late_sends'] += 1
+        chat, content = next(source)
+        message_id = next(message_ids)
+        if isinstance(content, dict):
+            event = dict(content, time=int(time.time()), self_id=self_id, message_id=message_id)
+        else:
+            event = make_message_event(self_id, message_id, chat, content, not args.no_mention)
+        stats['pending'].setdefault(_chat_key(chat), OrderedDict())[message_id] = scheduled
+        stats['messages'][message_id] = event
+        # 和 NapCat 一样发给所有连接，由适配器分片按白名单决定谁处理
+        payload = json.dumps(event, ensure_ascii=False)
+        results = await asyncio.gather(*(ws.send(payload) for ws in connections), return_exceptions=True)
+        errors = [result for result in results if isinstance(result, Exception)]
+        if len(errors) < len(connections):
+            stats['sent'] += 1
+        else:
+            stats['send_errors'] += 1
+            stats['pending'][_chat_key(chat)].pop(message_id, None)
+            logger.debug(f"发送失败: {errors[0]}")
+        if (index + 1) % max(1, int(args.rate * 10)) == 0:
+            logger.info(f"已发送 {index + 1}/{total}，已收到 {stats['replies']} 条回复")
+    send_duration = time.perf_counter() - started
+
+    # 等待剩余的回复
+    deadline = time.perf_counter() + args.reply_timeout
+    while any(stats['pending'].values()) and time.perf_counter() < deadline:
+        if all(task.done() for task in receivers):
+            break  # 所有连接都已断开
+        await asyncio.sleep(0.2)
+
+    for task in receivers + heartbeats:
+        if task in receivers and task.done() and not task.cancelled() and task.exception():
+            stats['disconnects'] += 1
+        task.cancel()
+    for ws in connections:
+        await ws.close()
+    return build_report(args, stats, send_duration)
+
+
+def build_report(args: argparse.Namespace, stats: dict, send_duration: float) -> dict:
+    latencies = sorted(stats['latencies'])
+    timeouts = sum(len(pending) for pending in stats['pending'].values())
+    return {
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'urls': args.url,
+        'target_rate': args.rate,
+        'groups': args.groups,
+        'private': args.private,
+        'replay': str(args.replay) if args.replay else None,
+        'sent': stats['sent'],
+        'achieved_rate': round(stats['sent'] / send_duration, 2) if send_duration else 0.0,
+        'late_sends': stats['late_sends'],
+        'replies': stats['replies'],
+        'reply_ratio': round(stats['replies'] / stats['sent'], 4) if stats['sent'] else 0.0,
+        'extra_replies': stats['extra_replies'],
+        'no_reply': timeouts,
+        'errors': {'connect': stats['connect_errors'], 'send': stats['send_errors'], 'disconnect': stats['disconnects']},
+        'actions': dict(stats['actions']),
+        'latency_ms': {
+            'p50': percentile(latencies, 50), 'p90': percentile(latencies, 90), 'p99': percentile(latencies, 99),
+            'max': latencies[-1] if latencies else None,
+            'mean': sum(latencies) / len(latencies) if latencies else None,
+        },
+    }
+
+
+def print_report(report: dict) -> None:
+    print(f"\n发送 {report['sent']} 条消息，实际速率 {report['achieved_rate']} 条/秒（目标 {report['target_rate']}）")
+    if report['late_sends']:
+        print(f"  其中 {report['late_sends']} 条晚于计划时间 100ms 以上发出，发送端可能已成为瓶颈")
+    print(f"收到回复 {report['replies']} 条（{report['reply_ratio']:.1%}），"
+          f"超时未回复 {report['no_reply']} 条，额外回复 {report['extra_replies']} 条")
+    errors = report['errors']
+    print(f"错误：连接失败 {errors['connect']}，发送失败 {errors['send']}，连接中断 {errors['disconnect']}")
+    latency = report['latency_ms']
+    if latency['p50'] is not None:
+        print(f"回复延迟(ms)：p50 {latency['p50']:.0f}  p90 {latency['p90']:.0f}  p99 {latency['p99']:.0f}  "
+              f"最大 {latency['max']:.0f}  平均 {latency['mean']:.0f}")
+    if report['actions']:
+        print("适配器调用的接口：" + '，'.join(f"{action} {count}" for action, count in
+                                          sorted(report['actions'].items(), key=lambda item: -item[1])))
+
+
+def default_self_id() -> int:
+    """优先使用 MaiBot 配置中的QQ号，适配器会校验消息中的 self_id"""
+    if not (SCRIPT_DIR / 'modules' / 'MaiBot' / 'config' / 'bot_config.toml').exists():
+        return DEFAULT_SELF_ID
+    try:
+        from start import read_qq_from_config
+        qq = read_qq_from_config()
+    except Exception:
+        qq = None
+    return int(qq) if qq and qq.isdigit() else DEFAULT_SELF_ID
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='模拟 NapCat 向适配器发送消息，测量麦麦的回复延迟')
+    parser.add_argument('--url', action='append', help=f"适配器反向 WebSocket 地址，可重复指定，默认 {DEFAULT_URL}")
+    parser.add_argument('--token', help='适配器要求的访问令牌')
+    parser.add_argument('--qq', type=int, help='机器人QQ号，默认读取 MaiBot 配置')
+    parser.add_argument('--rate', type=float, default=5.0, help='每秒发送的消息数')
+    parser.add_argument('--duration', type=float, default=60.0, help='发送持续的秒数')
+    parser.add_argument('--count', type=int, help='发送的消息总数，指定后忽略 --duration')
+    parser.add_argument('--groups', type=int, default=20, help='模拟的群聊数量')
+    parser.add_argument('--users-per-group', type=int, default=30, help='每个群中的发言人数')
+    parser.add_argument('--private', type=int, default=5, help='模拟的私聊数量')
+    parser.add_argument('--no-mention', action='store_true', help='群消息不 @机器人')
+    parser.add_argument('--replay', type=Path, help='回放记录的消息事件（JSONL）')
+    parser.add_argument('--reply-timeout', type=float, default=60.0, help='发送结束后等待回复的秒数')
+    parser.add_argument('--warmup', type=float, default=2.0, help='连接后开始发送前等待的秒数')
+    parser.add_argument('--seed', type=int, default=0, help='随机种子，相同种子生成相同的消息序列')
+    parser.add_argument('--output', type=Path, help='报告保存路径，默认保存到 runtime/loadtest')
+    args = parser.parse_args(argv)
+
+    args.url = args.url or [DEFAULT_URL]
+    if args.qq is None:
+        args.qq = default_self_id()
+    if args.rate <= 0 or (args.groups <= 0 and args.private <= 0 and not args.replay):
+        parser.error('--rate 必须大于 0，且至少需要一个群聊或私聊')
+
+    try:
+        report = asyncio.run(run_load(args))
+    except (OSError, ValueError) as e:
+        logger.error(f"压测失败: {e}")
+        return 1
+    print_report(report)
+    path = args.output or REPORT_DIR / f"{datetime.now():%Y%m%d-%H%M%S}.json"
+    atomic_write_json(path, report, indent=2, ensure_ascii=False)
+    logger.info(f"报告已保存: {path}")
+    return 0 if report['sent'] and not report['errors']['connect'] else 1
+
+
+if __name__ == "__main__":
+    try:
+        sys.exit(main())
+    except KeyboardInterrupt:
+        print("\n用户取消操作")
+        sys.exit(1)
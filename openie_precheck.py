@@ -0,0 +1,441 @@
+# -*- coding: utf-8 -*-
+"""
+OpenIE 文件导入前检查工具
+功能：在 import_openie.py 之前校验、去重并合并 OpenIE 文件，减少导入耗时和重复的向量化
+
+- 多进程并行处理多个文件，每个文件流式解析（内存只保留单个段落），不会整份载入
+- 校验段落结构，丢弃格式错误的段落和三元组，统一用段落内容的 sha256 作为 idx
+- 按内容哈希跨文件去重段落，重复段落的实体和三元组合并到首次出现的段落中
+- 跳过已经导入过的段落（读取 data/embedding/paragraph.parquet，需要 pyarrow 或 pandas）
+- 输出一份清洗合并后的文件；--replace 时把原文件移入 data/openie/originals/，导入脚本只会看到合并结果
+
+用法：
+    python openie_precheck.py check [文件...]
+    python openie_precheck.py clean [文件...] [--output 路径] [--replace] [--keep-imported] [--workers N]
+    不指定文件时处理 data/openie/*.json
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Iterator, Optional
+
+try:
+    from modules.MaiBot.src.common.logger import get_logger
+    logger = get_logger("openie_precheck")
+except ImportError:
+    import logging as logger
+    logger.basicConfig(level=logger.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    logger = logger.getLogger("openie_precheck")
+
+from instance_manager import MAIBOT_DIR
+
+OPENIE_DIR = MAIBOT_DIR / 'data' / 'openie'
+ORIGINALS_DIR = OPENIE_DIR / 'originals'
+PARAGRAPH_STORE = MAIBOT_DIR / 'data' / 'embedding' / 'paragraph.parquet'
+PARAGRAPH_KEY_PREFIX = 'paragraph-'
+READ_CHUNK_CHARS = 1024 * 1024
+MAX_DOC_CHARS = 64 * 1024 * 1024
+DEFAULT_WORKERS = max(1, min(8, os.cpu_count() or 1))
+
+
+class _JsonStream:
+    """只解析顶层对象结构的流式读取器，docs 数组逐个元素产出"""
+
+    def __init__(self, f):
+        self.f = f
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def _fill(self) -> bool:
+        if self.eof:
+            return False
+        chunk = self.f.read(READ_CHUNK_CHARS)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in ' \t\r\n':
+                self.pos += 1
+            if self.pos < len(self.buffer) or not self._fill():
+                return self.buffer[self.pos:self.pos + 1]
+
+    def expect(self, char: str) -> None:
+        found = self.peek()
+        if found != char:
+            raise ValueError(f"期望 '{char}'，实际为 '{found or '文件结尾'}'")
+        self.pos += 1
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                obj, end = self.decoder.raw_decode(self.buffer, self.pos)
+                # 数字可能恰好被截断在缓冲区末尾，读到更多内容后再确认
+                if end < len(self.buffer) or self.eof:
+                    self.pos = end
+                    return obj
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            if len(self.buffer) - self.pos > MAX_DOC_CHARS:
+                raise ValueError("单个条目过大，文件可能已损坏")
+            self._fill()
+
+
+def iter_openie(path: Path) -> Iterator:
+    """流式读取 OpenIE 文件中的段落
+
+    Args:
+        path: OpenIE JSON 文件
+
+    Yields:
+        docs 数组中的每个元素（未校验）
+
+    Raises:
+        ValueError: 文件结构不是 {"docs": [...]}
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        stream = _JsonStream(f)
+        stream.expect('{')
+        if stream.peek() == '}':
+            return
+        while True:
+            key = stream.value()
+            stream.expect(':')
+            if key == 'docs':
+                stream.expect('[')
+                if stream.peek() == ']':
+                    stream.pos += 1
+                else:
+                    while True:
+                        yield stream.value()
+                        if stream.peek() == ']':
+                            stream.pos += 1
+                            break
+                        stream.expect(',')
+            else:
+                # avg_ent_chars 等统计字段在输出时重新计算
+                stream.value()
+            if stream.peek() == '}':
+                return
+            stream.expect(',')
+
+
+def paragraph_hash(passage: str) -> str:
+    return hashlib.sha256(passage.encode('utf-8')).hexdigest()
+
+
+def normalize_doc(doc, stats: Counter) -> Optional[dict]:
+    """校验并规范化单个段落
+
+    Returns:
+        Optional[dict]: 规范化后的段落，无效时返回 None，原因计入 stats
+    """
+    if not isinstance(doc, dict):
+        stats['invalid:不是对象'] += 1
+        return None
+    passage = doc.get('passage')
+    if not isinstance(passage, str) or not passage.strip():
+        stats['invalid:缺少段落内容'] += 1
+        return None
+    entities = doc.get('extracted_entities')
+    triples = doc.get('extracted_triples')
+    if not isinstance(entities, list) or not isinstance(triples, list):
+        stats['invalid:缺少实体或三元组'] += 1
+        return None
+
+    clean_triples, seen = [], set()
+    for triple in triples:
+        if (not isinstance(triple, list) or len(triple) != 3
+                or not all(isinstance(item, str) and item.strip() for item in triple)):
+            stats['dropped_triples'] += 1
+            continue
+        triple = [item.strip() for item in triple]
+        key = tuple(triple)
+        if key in seen:
+            stats['duplicate_triples'] += 1
+            continue
+        seen.add(key)
+        clean_triples.append(triple)
+    if not clean_triples:
+        stats['invalid:没有有效三元组'] += 1
+        return None
+
+    entity_list = list(dict.fromkeys(e.strip() for e in entities if isinstance(e, str) and e.strip()))
+    # 三元组中出现但未列入实体的主语和宾语补进实体列表，导入时不会因找不到实体而报错
+    for subject, _, obj in clean_triples:
+        for entity in (subject, obj):
+            if entity not in entity_list:
+                entity_list.append(entity)
+                stats['added_entities'] += 1
+
+    idx = paragraph_hash(passage)
+    if doc.get('idx') != idx:
+        stats['fixed_idx'] += 1
+    stats['triples'] += len(clean_triples)
+    return {'idx': idx, 'passage': passage, 'extracted_entities': entity_list, 'extracted_triples': clean_triples}
+
+
+def clean_file(path: str, output: str) -> dict:
+    """处理单个文件（在子进程中运行），有效段落逐行写入 output（JSONL）
+
+    Returns:
+        dict: 统计信息 {file, docs, valid, error, counters}
+    """
+    stats = Counter()
+    result = {'file': path, 'docs': 0, 'valid': 0, 'error': None}
+    with open(output, 'w', encoding='utf-8') as out:
+        try:
+            for doc in iter_openie(Path(path)):
+                result['docs'] += 1
+                doc = normalize_doc(doc, stats)
+                if doc is None:
+                    continue
+                out.write(json.dumps(doc, ensure_ascii=False))
+                out.write('\n')
+                result['valid'] += 1
+        except (ValueError, UnicodeDecodeError) as e:
+            # 已读出的有效段落保留，文件其余部分放弃
+            result['error'] = f"第 {result['docs'] + 1} 个段落附近格式错误: {getattr(e, 'msg', e)}"
+    result['counters'] = dict(stats)
+    return result
+
+
+def load_imported_hashes(store: Path = PARAGRAPH_STORE) -> Optional[set]:
+    """读取已导入段落的哈希，没有向量库或缺少 parquet 支持时返回 None"""
+    if not store.is_file():
+        return None
+    try:
+        import pyarrow.parquet as pq
+        keys = pq.read_table(store, columns=['hash']).column('hash').to_pylist()
+    except ImportError:
+        try:
+            import pandas as pd
+            keys = pd.read_parquet(store, columns=['hash'])['hash'].tolist()
+        except ImportError:
+            logger.warning("未安装 pyarrow 或 pandas，无法跳过已导入的段落")
+            return None
+    except Exception as e:
+        logger.warning(f"读取已导入段落失败: {e}")
+        return None
+    return {key[len(PARAGRAPH_KEY_PREFIX):] for key in keys if isinstance(key, str)
+            and key.startswith(PARAGRAPH_KEY_PREFIX)}
+
+
+def _iter_jsonl(path: Path) -> Iterator[dict]:
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            yield json.loads(line)
+
+
+def precheck(files: list[Path], output: Optional[Path] = None, skip_imported: bool = True,
+             workers: int = DEFAULT_WORKERS, write: bool = True) -> dict:
+    """校验、去重并合并 OpenIE 文件
+
+    Args:
+        files: 输入文件
+        output: 合并结果路径，默认 data/openie/<时间>-cleaned-openie.json
+        skip_imported: 是否跳过向量库中已有的段落
+        workers: 并行进程数
+        write: False 时只统计不输出
+
+    Returns:
+        dict: {files: [每个文件的统计], totals: 汇总, output: 输出路径或 None}
+    """
+    start = time.perf_counter()
+    with tempfile.TemporaryDirectory(prefix='openie-') as tmp:
+        parts = [str(Path(tmp) / f"{i}.jsonl") for i in range(len(files))]
+        with ProcessPoolExecutor(max_workers=max(1, min(workers, len(files)))) as pool:
+            results = list(pool.map(clean_file, [str(f) for f in files], parts))
+
+        # 第一遍：记录每个段落首次出现的位置，重复段落的实体和三元组暂存待合并
+        first_seen: dict[str, tuple[int, int]] = {}
+        merged: dict[str, dict] = {}
+        cross_file = 0
+        for file_index, part in enumerate(parts):
+            for line_index, doc in enumerate(_iter_jsonl(Path(part))):
+                location = first_seen.setdefault(doc['idx'], (file_index, line_index))
+                if location != (file_index, line_index):
+                    results[file_index]['duplicates'] = results[file_index].get('duplicates', 0) + 1
+                    if location[0] != file_index:
+                        cross_file += 1
+                    extra = merged.setdefault(doc['idx'], {'entities': [], 'triples': []})
+                    extra['entities'].extend(doc['extracted_entities'])
+                    extra['triples'].extend(doc['extracted_triples'])
+
+        imported = load_imported_hashes() if skip_imported else None
+        totals = Counter()
+        for result in results:
+            totals['docs'] += result['docs']
+            totals['valid'] += result['valid']
+            totals.update(result['counters'])
+        totals['unique'] = len(first_seen)
+        totals['duplicates_across_files'] = cross_file
+        totals['duplicates_in_file'] = totals['valid'] - len(first_seen) - cross_file
+        totals['already_imported'] = len(first_seen.keys() & imported) if imported else 0
+
+        output_path = None
+        if write:
+            output_path = output or OPENIE_DIR / f"{datetime.now():%Y%m%d-%H%M%S}-cleaned-openie.json"
+            output_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_output = output_path.with_name(f".{output_path.name}.tmp")
+            written = entity_chars = entity_words = entity_count = 0
+            # 第二遍：只写出首次出现且尚未导入的段落，逐个写入，不在内存中拼接整个文件
+            with open(tmp_output, 'w', encoding='utf-8') as out:
+                out.write('{"docs": [')
+                for file_index, part in enumerate(parts):
+                    for line_index, doc in enumerate(_iter_jsonl(Path(part))):
+                        if first_seen[doc['idx']] != (file_index, line_index):
+                            continue
+                        if imported and doc['idx'] in imported:
+                            continue
+                        extra = merged.get(doc['idx'])
+                        if extra:
+                            doc['extracted_entities'] = list(dict.fromkeys(
+                                doc['extracted_entities'] + extra['entities']))
+                            triples = {tuple(t): t for t in doc['extracted_triples'] + extra['triples']}
+                            doc['extracted_triples'] = list(triples.values())
+                        for entity in doc['extracted_entities']:
+                            entity_chars += len(entity)
+                            entity_words += len(entity.split())
+                        entity_count += len(doc['extracted_entities'])
+                        out.write(',\n' if written else '\n')
+                        out.write(json.dumps(doc, ensure_ascii=False))
+                        written += 1
+                out.write('\n], ')
+                out.write(f'"avg_ent_chars": {entity_chars / entity_count if entity_count else 0}, ')
+                out.write(f'"avg_ent_words": {entity_words / entity_count if entity_count else 0}}}\n')
+                out.flush()
+                os.fsync(out.fileno())
+            totals['written'] = written
+            if written:
+                os.replace(tmp_output, output_path)
+            else:
+                os.remove(tmp_output)
+                output_path = None
+    totals['seconds'] = round(time.perf_counter() - start, 2)
+    return {'files': results, 'totals': dict(totals), 'output': str(output_path) if output_path else None}
+
+
+def archive_originals(files: list[Path]) -> None:
+    """把已合并的原文件移入 originals 目录，不直接删除"""
+    ORIGINALS_DIR.mkdir(parents=True, exist_ok=True)
+    for path in files:
+        target = ORIGINALS_DIR / path.name
+        if target.exists():
+            target = ORIGINALS_DIR / f"{path.stem}-{datetime.now():%Y%m%d-%H%M%S}{path.suffix}"
+        shutil.move(str(path), str(target))
+    logger.info(f"原文件已移入 {ORIGINALS_DIR}")
+
+
+def default_inputs() -> list[Path]:
+    return sorted(OPENIE_DIR.glob('*.json')) if OPENIE_DIR.is_dir() else []
+
+
+def print_report(report: dict) -> None:
+    for result in report['files']:
+        print(f"\n{Path(result['file']).name}")
+        print(f"  段落 {result['docs']}，有效 {result['valid']}，与前面重复 {result.get('duplicates', 0)}")
+        for key, count in sorted(result['counters'].items()):
+            if key.startswith('invalid:'):
+                print(f"  无效（{key[8:]}）: {count}")
+        if result['error']:
+            print(f"  ⚠️  {result['error']}")
+    totals = report['totals']
+    print("\n汇总:")
+    print(f"  段落总数 {totals.get('docs', 0)}，有效 {totals.get('valid', 0)}，去重后 {totals.get('unique', 0)}")
+    print(f"  文件内重复 {totals.get('duplicates_in_file', 0)}，跨文件重复 {totals.get('duplicates_across_files', 0)}，"
+          f"已导入过 {totals.get('already_imported', 0)}")
+    print(f"  三元组 {totals.get('triples', 0)}，丢弃格式错误 {totals.get('dropped_triples', 0)}，"
+          f"重复 {totals.get('duplicate_triples', 0)}")
+    print(f"  修正 idx {totals.get('fixed_idx', 0)}，补充实体 {totals.get('added_entities', 0)}")
+    if 'written' in totals:
+        print(f"  写出段落 {totals['written']}")
+    print(f"  耗时 {totals.get('seconds', 0)} 秒")
+    if report['output']:
+        print(f"  输出文件: {report['output']}")
+
+
+def replace_originals(files: list[Path], report: dict) -> None:
+    """合并完成后移走原文件，导入脚本只会看到合并结果；没有有效段落时保留原文件"""
+    if not report['totals'].get('valid'):
+        return
+    if not report['output']:
+        logger.info("所有段落均已导入过，无需再次导入")
+    output = Path(report['output']).resolve() if report['output'] else None
+    archive_originals([f for f in files if f.resolve() != output])
+
+
+def run_precheck(files: Optional[list[Path]] = None, replace: bool = True, skip_imported: bool = True,
+                 workers: int = DEFAULT_WORKERS) -> Optional[dict]:
+    """清洗并合并 OpenIE 文件，供启动器在导入前调用
+
+    Returns:
+        Optional[dict]: 统计报告，没有输入文件时返回 None
+    """
+    files = files or default_inputs()
+    if not files:
+        logger.warning(f"没有找到 OpenIE 文件: {OPENIE_DIR}")
+        return None
+    logger.info(f"正在检查 {len(files)} 个 OpenIE 文件...")
+    report = precheck(files, skip_imported=skip_imported, workers=workers)
+    print_report(report)
+    if replace:
+        replace_originals(files, report)
+    return report
+
+
+def main() -> int:
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description="OpenIE 文件导入前检查")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    check_parser = subparsers.add_parser('check', help="只校验并统计，不输出文件")
+    clean_parser = subparsers.add_parser('clean', help="校验、去重并输出合并文件")
+    clean_parser.add_argument('--output', type=Path, help="输出路径")
+    clean_parser.add_argument('--replace', action='store_true', help="把原文件移入 data/openie/originals/")
+    for sub in (check_parser, clean_parser):
+        sub.add_argument('files', nargs='*', type=Path, help="OpenIE 文件，默认 data/openie/*.json")
+        sub.add_argument('--keep-imported', action='store_true', help="不跳过已导入的段落")
+        sub.add_argument('--workers', type=int, default=DEFAULT_WORKERS, help="并行进程数")
+        sub.add_argument('--json', action='store_true', help="以 JSON 格式输出统计")
+    args = parser.parse_args()
+
+    files = args.files or default_inputs()
+    if not files:
+        logger.error(f"没有找到 OpenIE 文件: {OPENIE_DIR}")
+        return 1
+    if args.command == 'check':
+        report = precheck(files, skip_imported=not args.keep_imported, workers=args.workers, write=False)
+    else:
+        report = precheck(files, args.output, not args.keep_imported, args.workers)
+    if args.json:
+        print(json.dumps(report, indent=2, ensure_ascii=False))
+    else:
+        print_report(report)
+    if args.command == 'clean' and args.replace:
+        replace_originals(files, report)
+    return 0
+
+if __name__ == "__main__":
+    try:
+        sys.exit(main())
+    except KeyboardInterrupt:
+        print("\n用户取消操作")
+        sys.exit(1)
@@ -0,0 +1,580 @@
+# -*- coding: utf-8 -*-
+"""
+本地运维接口
+功能：为启动器提供可选的本地 HTTP 接口，供监控系统采集状态和指标，并支持远程启停实例
+
+- GET  /health                        存活检查
+- GET  /metrics                       Prometheus 格式指标
+- GET  /api/status                    各实例服务的 PID、运行时长、重启次数、CPU/内存，以及数据库大小
+- GET  /api/history                   最近的模块更新（来自操作追踪）和后台任务记录
+- POST /api/instances/{名称}/{start|stop|restart}?services=bot   需要 Authorization: Bearer <token>
+
+默认实例（modules/ 下的原始布局）记为 default：启动器通过命令行窗口启动它，没有记录 PID，
+因此按工作目录和命令行在进程列表中识别 NapCat、适配器（含分片）和麦麦，找齐后只检查已知进程，
+有服务未运行时每 30 秒重新扫描一次；启停操作调用启动器菜单中的同名功能
+
+采集方式：后台线程每隔 interval 秒采集一次并生成指标文本，请求只读取缓存结果，抓取频率不影响主机负载；
+run.json 和任务历史按修改时间缓存，追踪文件从上次读到的位置继续读取，进程对象复用以增量计算 CPU 占用
+
+监听地址、端口和 token 保存在 runtime/ops_api.json（首次启动时生成 token）
+依赖 fastapi 和 uvicorn（已在 requirements.txt 中），CPU/内存采样需要 psutil
+
+用法：
+    python ops_api.py serve [--host 127.0.0.1] [--port 8765] [--interval 5]
+    python ops_api.py token [--reset]     # 查看或重新生成 token
+    python ops_api.py metrics             # 采集一次并输出指标，用于排查
+"""
+
+import argparse
+import json
+import secrets
+import sys
+import threading
+import time
+from collections import Counter, deque
+from pathlib import Path
+from typing import Optional
+
+try:
+    from modules.MaiBot.src.common.logger import get_logger
+    logger = get_logger("ops_api")
+except ImportError:
+    import logging as logger
+    logger.basicConfig(level=logger.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    logger = logger.getLogger("ops_api")
+
+from db_maintenance import DB_RELATIVE_PATH
+from adapter_shards import DEFAULT_SHARD_ROOT
+from instance_manager import (ADAPTER_DIR, INSTANCES_DIR, MAIBOT_DIR, SCRIPT_DIR, get_instance_dir, is_pid_alive,
+                              start_instance, stop_instance, _terminate_pid, SERVICES)
+from jobs import HISTORY_PATH as JOB_HISTORY_PATH
+from safe_io import atomic_write_json
+from tracing import TRACE_PATH
+
+SETTINGS_PATH = SCRIPT_DIR / 'runtime' / 'ops_api.json'
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+DEFAULT_INTERVAL = 5.0
+MAX_UPDATES = 20
+ACTIONS = ('start', 'stop', 'restart')
+DEFAULT_INSTANCE = 'default'
+DEFAULT_RESCAN_INTERVAL = 30.0
+
+_lock = threading.Lock()
+_snapshot: dict = {}
+_metrics_text = ''
+_json_cache: dict[Path, tuple[tuple[int, int], object]] = {}
+_processes: dict[int, object] = {}
+_last_pids: dict[tuple[str, str], int] = {}
+_restarts: Counter = Counter()
+_updates: deque = deque(maxlen=MAX_UPDATES)
+_trace_offset = 0
+# 默认实例的服务进程 {服务: {pid, started_at}}，started_at 为进程创建时间，用于排除 PID 复用
+_default_state: dict[str, dict] = {}
+_default_scanned = 0.0
+_sampler: Optional[threading.Thread] = None
+_sampler_stop = threading.Event()
+_server = None
+
+
+# ---------------------------------------------------------------------------
+# 配置
+# ---------------------------------------------------------------------------
+
+def load_settings(reset_token: bool = False) -> dict:
+    """读取接口配置，没有 token 时生成一个并保存"""
+    try:
+        with open(SETTINGS_PATH, 'r', encoding='utf-8') as f:
+            settings = json.load(f)
+    except (OSError, ValueError):
+        settings = {}
+    settings.setdefault('host', DEFAULT_HOST)
+    settings.setdefault('port', DEFAULT_PORT)
+    if reset_token or not settings.get('token'):
+        settings['token'] = secrets.token_urlsafe(24)
+        atomic_write_json(SETTINGS_PATH, settings, indent=2, ensure_ascii=False)
+    return settings
+
+
+# ---------------------------------------------------------------------------
+# 采集
+# ---------------------------------------------------------------------------
+
+def _read_json_cached(path: Path, default):
+    """按修改时间和大小缓存 JSON 文件，文件未变化时不重新解析"""
+    try:
+        stat = path.stat()
+    except OSError:
+        _json_cache.pop(path, None)
+        return default
+    key = (stat.st_mtime_ns, stat.st_size)
+    cached = _json_cache.get(path)
+    if cached and cached[0] == key:
+        return cached[1]
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return cached[1] if cached else default
+    _json_cache[path] = (key, data)
+    return data
+
+
+def _instance_names() -> list[str]:
+    if not INSTANCES_DIR.exists():
+        return []
+    return sorted(entry.name for entry in INSTANCES_DIR.iterdir() if (entry / 'instance.toml').exists())
+
+
+def _sample_process(pid: int) -> dict:
+    """采样进程的 CPU 和内存；复用进程对象，CPU 占用按两次采样之间计算"""
+    try:
+        import psutil
+    except ImportError:
+        return {}
+    process = _processes.get(pid)
+    try:
+        if process is None:
+            process = _processes[pid] = psutil.Process(pid)
+            process.cpu_percent(None)  # 第一次调用只建立基准
+        with process.oneshot():
+            return {'cpu_percent': process.cpu_percent(None), 'rss_bytes': process.memory_info().rss}
+    except (psutil.Error, OSError):
+        _processes.pop(pid, None)
+        return {}
+
+
+def _db_size(maibot_dir: Path) -> Optional[int]:
+    size = None
+    for suffix in ('', '-wal'):
+        try:
+            size = (size or 0) + (maibot_dir / f"{DB_RELATIVE_PATH}{suffix}").stat().st_size
+        except OSError:
+            continue
+    return size
+
+
+def _match_default_service(info: dict) -> Optional[str]:
+    """根据进程名、命令行和工作目录判断是否为默认实例的服务，返回 run.json 风格的服务名"""
+    cmdline = info.get('cmdline') or []
+    process_name = (info.get('name') or '').lower()
+    arguments = [Path(arg).name.lower() for arg in cmdline[1:3]]
+    if process_name.startswith('napcatwinbootmain') or 'napcat_stub.py' in arguments:
+        return 'napcat'
+    if not process_name.startswith('python') or not info.get('cwd'):
+        return None
+    cwd = Path(info['cwd'])
+    if 'bot.py' in arguments and cwd == MAIBOT_DIR:
+        return 'bot'
+    if 'main.py' in arguments:
+        if cwd == ADAPTER_DIR:
+            return 'adapter'
+        # 分片目录 runtime/adapter_shards/shard_N，与实例一样记为 adapter、adapter.1 ……
+        if cwd.parent == DEFAULT_SHARD_ROOT and cwd.name.startswith('shard_') and cwd.name[6:].isdigit():
+            index = int(cwd.name[6:])
+            return f'adapter.{index}' if index else 'adapter'
+    return None
+
+
+def _collect_default(now: float, excluded: set[int]) -> dict[str, dict]:
+    """识别默认实例的服务进程；已知进程仍在运行且服务齐全时不扫描进程列表
+
+    Args:
+        now: 当前时间
+        excluded: 各实例 run.json 中记录的 PID，它们的 NapCat 不算默认实例的
+    """
+    global _default_scanned
+    try:
+        import psutil
+    except ImportError:
+        return {}
+    for key, running in list(_default_state.items()):
+        try:
+            if psutil.Process(running['pid']).create_time() != running['started_at']:
+                raise psutil.NoSuchProcess(running['pid'])
+        except psutil.Error:
+            del _default_state[key]
+    if set(SERVICES) <= set(_default_state) or now - _default_scanned < DEFAULT_RESCAN_INTERVAL:
+        return dict(_default_state)
+    _default_scanned = now
+    for process in psutil.process_iter(['name', 'cmdline', 'cwd', 'create_time']):
+        if process.pid in excluded:
+            continue
+        key = _match_default_service(process.info)
+        # 只记录最早的进程，忽略由它派生的同名子进程
+        if key and (key not in _default_state or process.info['create_time'] < _default_state[key]['started_at']):
+            _default_state[key] = {'pid': process.pid, 'started_at': process.info['create_time']}
+    return dict(_default_state)
+
+
+def _service_keys(state: dict) -> list[str]:
+    """基础服务加上 run.json 中的分片进程，按 napcat、adapter、bot 的顺序排列"""
+    return sorted(set(SERVICES) | set(state), key=lambda key: (SERVICES.index(key.split('.')[0]), key)
+                  if key.split('.')[0] in SERVICES else (len(SERVICES), key))
+
+
+def _service_entry(name: str, key: str, running: Optional[dict], now: float) -> dict:
+    pid = running['pid'] if running else None
+    alive = bool(pid) and is_pid_alive(pid)
+    previous = _last_pids.get((name, key))
+    if alive and previous is not None and previous != pid:
+        _restarts[(name, key)] += 1  # PID 变化说明服务被重新启动过
+    if alive:
+        _last_pids[(name, key)] = pid
+    return {
+        'instance': name, 'service': key, 'pid': pid if alive else None, 'running': alive,
+        'uptime': int(now - running['started_at']) if alive else 0,
+        'restarts': _restarts[(name, key)],
+        **(_sample_process(pid) if alive else {}),
+    }
+
+
+def _collect_services(now: float) -> list[dict]:
+    states = {name: _read_json_cached(get_instance_dir(name) / 'run.json', {}) for name in _instance_names()}
+    tracked = {running['pid'] for state in states.values() for running in state.values()}
+    states = {DEFAULT_INSTANCE: _collect_default(now, tracked), **states}
+    services = [_service_entry(name, key, state.get(key), now)
+                for name, state in states.items() for key in _service_keys(state)]
+    # 清理已退出进程的缓存
+    alive_pids = {service['pid'] for service in services if service['pid']}
+    for pid in list(_processes):
+        if pid not in alive_pids:
+            _processes.pop(pid, None)
+    return services
+
+
+def _collect_updates() -> list[dict]:
+    """从追踪文件中增量读取模块更新记录"""
+    global _trace_offset
+    try:
+        size = TRACE_PATH.stat().st_size
+    except OSError:
+        return list(_updates)
+    if size < _trace_offset:
+        _trace_offset = 0  # 追踪文件已轮换
+    with open(TRACE_PATH, 'rb') as f:
+        f.seek(_trace_offset)
+        data = f.read()
+    end = data.rfind(b'\n') + 1
+    _trace_offset += end
+    for line in data[:end].splitlines():
+        try:
+            record = json.loads(line)
+        except ValueError:
+            continue
+        if record.get('kind') == 'update':
+            _updates.append({'run_id': record['run_id'], 'start': record['start'], 'duration': record['duration'],
+                             'status': record['status']})
+    return list(_updates)
+
+
+def collect_snapshot() -> dict:
+    """采集一次状态"""
+    started = time.perf_counter()
+    now = time.time()
+    databases = [{'instance': DEFAULT_INSTANCE, 'size_bytes': _db_size(MAIBOT_DIR)}]
+    databases.extend({'instance': name, 'size_bytes': _db_size(get_instance_dir(name) / 'MaiBot')}
+                     for name in _instance_names())
+    jobs = [{**job, 'status': 'interrupted'}
+            if job['status'] in ('queued', 'running') and not is_pid_alive(job.get('owner_pid') or 0) else job
+            for job in _read_json_cached(JOB_HISTORY_PATH, [])]  # 与 jobs.load_history 一致，提交者已退出视为中断
+    host = {}
+    try:
+        import psutil
+        host = {'cpu_percent': psutil.cpu_percent(None), 'memory_used_bytes': psutil.virtual_memory().used}
+    except ImportError:
+        pass
+    snapshot = {
+        'timestamp': now,
+        'services': _collect_services(now),
+        'databases': [database for database in databases if database['size_bytes'] is not None],
+        'updates': _collect_updates(),
+        'jobs': jobs[-MAX_UPDATES:],
+        'job_counts': dict(Counter(job['status'] for job in jobs)),
+        'host': host,
+    }
+    snapshot['sample_seconds'] = round(time.perf_counter() - started, 4)
+    return snapshot
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def render_metrics(snapshot: dict) -> str:
+    """生成 Prometheus 文本格式的指标"""
+    lines = []
+
+    def metric(name: str, kind: str, help_text: str, samples: list[tuple[dict, float]]) -> None:
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, value in samples:
+            label_text = ','.join(f'{key}="{_escape(label)}"' for key, label in labels.items())
+            lines.append(f"{name}{{{label_text}}} {value}" if label_text else f"{name} {value}")
+
+    services = snapshot['services']
+    labels = [{'instance': service['instance'], 'service': service['service']} for service in services]
+    metric('onekey_service_up', 'gauge', '服务进程是否在运行',
+           [(label, int(service['running'])) for label, service in zip(labels, services)])
+    metric('onekey_service_uptime_seconds', 'gauge', '服务运行时长',
+           [(label, service['uptime']) for label, service in zip(labels, services)])
+    metric('onekey_service_restarts_total', 'counter', '运维接口启动后观察到的服务重启次数',
+           [(label, service['restarts']) for label, service in zip(labels, services)])
+    metric('onekey_service_cpu_percent', 'gauge', '服务进程 CPU 占用（两次采样之间）',
+           [(label, service['cpu_percent']) for label, service in zip(labels, services) if 'cpu_percent' in service])
+    metric('onekey_service_memory_rss_bytes', 'gauge', '服务进程常驻内存',
+           [(label, service['rss_bytes']) for label, service in zip(labels, services) if 'rss_bytes' in service])
+    metric('onekey_database_size_bytes', 'gauge', '麦麦数据库大小（含 WAL）',
+           [({'instance': database['instance']}, database['size_bytes']) for database in snapshot['databases']])
+    metric('onekey_jobs', 'gauge', '后台任务历史中各状态的任务数',
+           [({'status': status}, count) for status, count in sorted(snapshot['job_counts'].items())])
+    if snapshot['updates']:
+        last = snapshot['updates'][-1]
+        metric('onekey_last_update_timestamp_seconds', 'gauge', '最近一次模块更新的开始时间', [({}, last['start'])])
+        metric('onekey_last_update_duration_seconds', 'gauge', '最近一次模块更新的耗时', [({}, last['duration'])])
+        metric('onekey_last_update_success', 'gauge', '最近一次模块更新是否成功',
+               [({}, int(last['status'] == 'ok'))])
+    host = snapshot['host']
+    if host:
+        metric('onekey_host_cpu_percent', 'gauge', '主机 CPU 占用', [({}, host['cpu_percent'])])
+        metric('onekey_host_memory_used_bytes', 'gauge', '主机已用内存', [({}, host['memory_used_bytes'])])
+    metric('onekey_sample_timestamp_seconds', 'gauge', '最近一次采集的时间', [({}, round(snapshot['timestamp'], 3))])
+    metric('onekey_sample_duration_seconds', 'gauge', '最近一次采集的耗时', [({}, snapshot['sample_seconds'])])
+    return '\n'.join(lines) + '\n'
+
+
+def refresh() -> dict:
+    """采集一次并更新缓存"""
+    global _snapshot, _metrics_text
+    with _lock:
+        snapshot = collect_snapshot()
+        _snapshot, _metrics_text = snapshot, render_metrics(snapshot)
+    return snapshot
+
+
+def _sample_loop(interval: float) -> None:
+    while not _sampler_stop.is_set():
+        try:
+            refresh()
+        except Exception as e:
+            logger.warning(f"采集状态失败: {e}")
+        _sampler_stop.wait(interval)
+
+
+def start_sampler(interval: float = DEFAULT_INTERVAL) -> None:
+    """启动后台采集线程"""
+    global _sampler
+    if _sampler and _sampler.is_alive():
+        return
+    _sampler_stop.clear()
+    refresh()
+    _sampler = threading.Thread(target=_sample_loop, args=(interval,), name='ops-api-sampler', daemon=True)
+    _sampler.start()
+
+
+# ---------------------------------------------------------------------------
+# HTTP 接口
+# ---------------------------------------------------------------------------
+
+def _stop_default(services: list[str]) -> None:
+    with _lock:
+        stopping = {key: _default_state.pop(key) for key in list(_default_state) if key.split('.')[0] in services}
+    for key, running in stopping.items():
+        _terminate_pid(running['pid'])
+        logger.info(f"默认实例: 已停止 {key} (PID: {running['pid']})")
+
+
+def _start_default(services: list[str]) -> bool:
+    """通过启动器菜单中的功能启动默认实例尚未运行的服务"""
+    import start
+    launchers = {'napcat': start.launch_napcat, 'adapter': start.launch_adapter, 'bot': start.launch_main_bot}
+    with _lock:
+        running = dict(_default_state)
+    ok = True
+    for service in services:
+        if service in running:
+            logger.info(f"默认实例: {service} 已在运行 (PID: {running[service]['pid']})")
+            continue
+        ok = launchers[service]() and ok
+    return ok
+
+
+def run_action(name: str, action: str, services: Optional[list[str]] = None) -> bool:
+    """启动、停止或重启实例（含默认实例），重启会计入重启次数"""
+    global _default_scanned
+    services = services or list(SERVICES)
+    ok = True
+    if action in ('stop', 'restart'):
+        if name == DEFAULT_INSTANCE:
+            _stop_default(services)
+        else:
+            stop_instance(name, services)
+        if action == 'restart':
+            with _lock:
+                for key in [key for instance, key in _last_pids
+                            if instance == name and key.split('.')[0] in services]:
+                    _restarts[(name, key)] += 1
+                    _last_pids.pop((name, key))  # 新 PID 不再被当作一次额外的重启
+    if action in ('start', 'restart'):
+        ok = start_instance(name, services) if name != DEFAULT_INSTANCE else _start_default(services)
+    with _lock:
+        _default_scanned = 0.0  # 下次采集时重新识别默认实例的进程
+    refresh()
+    return ok
+
+
+def create_app(token: str):
+    """创建 FastAPI 应用
+
+    Raises:
+        ImportError: 未安装 fastapi
+    """
+    from fastapi import Depends, FastAPI, Header, HTTPException, Query
+    from fastapi.responses import PlainTextResponse
+
+    app = FastAPI(title='MaiBot 一键包运维接口', docs_url=None, redoc_url=None, openapi_url=None)
+
+    def require_token(authorization: str = Header('')) -> None:
+        scheme, _, value = authorization.partition(' ')
+        if scheme.lower() != 'bearer' or not secrets.compare_digest(value.encode(), token.encode()):
+            raise HTTPException(status_code=401, detail='token 无效')
+
+    @app.get('/health')
+    def health():
+        return {'status': 'ok', 'sampled_at': _snapshot.get('timestamp')}
+
+    @app.get('/metrics', response_class=PlainTextResponse)
+    def metrics():
+        return PlainTextResponse(_metrics_text, media_type='text/plain; version=0.0.4')
+
+    @app.get('/api/status')
+    def status():
+        snapshot = _snapshot
+        return {key: snapshot.get(key) for key in ('timestamp', 'services', 'databases', 'host', 'sample_seconds')}
+
+    @app.get('/api/history')
+    def history():
+        snapshot = _snapshot
+        return {'updates': snapshot.get('updates', []), 'jobs': snapshot.get('jobs', []),
+                'job_counts': snapshot.get('job_counts', {})}
+
+    @app.post('/api/instances/{name}/{action}', dependencies=[Depends(require_token)])
+    def instance_action(name: str, action: str, services: Optional[list[str]] = Query(None)):
+        if action not in ACTIONS:
+            raise HTTPException(status_code=404, detail=f"未知操作: {action}")
+        if name != DEFAULT_INSTANCE and name not in _instance_names():
+            raise HTTPException(status_code=404, detail=f"实例不存在: {name}")
+        if services and any(service not in SERVICES for service in services):
+            raise HTTPException(status_code=400, detail=f"服务只能是 {'/'.join(SERVICES)}")
+        logger.info(f"运维接口: {action} {name} {services or '全部服务'}")
+        ok = run_action(name, action, services)
+        return {'ok': ok, 'instance': name, 'action': action, 'services': services or list(SERVICES)}
+
+    return app
+
+
+def start_server(host: Optional[str] = None, port: Optional[int] = None,
+                 interval: float = DEFAULT_INTERVAL) -> Optional[str]:
+    """在后台线程中启动接口，返回访问地址；缺少依赖或已在运行时返回None"""
+    global _server
+    if _server is not None:
+        logger.info("运维接口已在运行")
+        return None
+    try:
+        import uvicorn
+    except ImportError:
+        logger.error("缺少 uvicorn，请先安装: pip install fastapi uvicorn")
+        return None
+    settings = load_settings()
+    host, port = host or settings['host'], port or settings['port']
+    try:
+        app = create_app(settings['token'])
+    except ImportError:
+        logger.error("缺少 fastapi，请先安装: pip install fastapi uvicorn")
+        return None
+    start_sampler(interval)
+    _server = uvicorn.Server(uvicorn.Config(app, host=host, port=port, log_level='warning', access_log=False))
+    threading.Thread(target=_server.run, name='ops-api-server', daemon=True).start()
+    return f"http://{host}:{port}"
+
+
+def stop_server() -> None:
+    """停止接口和采集线程"""
+    global _server
+    if _server is not None:
+        _server.should_exit = True
+        _server = None
+    _sampler_stop.set()
+
+
+def interactive_ops_menu() -> bool:
+    """运维接口交互菜单"""
+    while True:
+        settings = load_settings()
+        running = _server is not None
+        print("\n=== 运维接口 ===")
+        print(f"状态: {'运行中' if running else '未启动'}  地址: http://{settings['host']}:{settings['port']}")
+        print("1. 停止接口" if running else "1. 启动接口")
+        print("2. 查看 token")
+        print("3. 重新生成 token（需重新启动接口）")
+        print("0. 返回主菜单")
+        choice = input("请选择操作: ").strip()
+        if choice == '0':
+            return True
+        if choice == '1':
+            if running:
+                stop_server()
+                logger.info("运维接口已停止")
+            else:
+                url = start_server()
+                if url:
+                    logger.info(f"运维接口已启动: {url}/metrics  {url}/api/status")
+        elif choice == '2':
+            print(f"token: {settings['token']}")
+            print(f"示例: curl -X POST -H \"Authorization: Bearer {settings['token']}\" "
+                  f"http://{settings['host']}:{settings['port']}/api/instances/<实例>/restart")
+        elif choice == '3':
+            print(f"新的 token: {load_settings(reset_token=True)['token']}")
+        else:
+            logger.error("无效选择")
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='一键包本地运维接口')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    serve_parser = subparsers.add_parser('serve', help='启动接口')
+    serve_parser.add_argument('--host', help=f"监听地址，默认 {DEFAULT_HOST}")
+    serve_parser.add_argument('--port', type=int, help=f"端口，默认 {DEFAULT_PORT}")
+    serve_parser.add_argument('--interval', type=float, default=DEFAULT_INTERVAL, help='采集间隔（秒）')
+    token_parser = subparsers.add_parser('token', help='查看 token')
+    token_parser.add_argument('--reset', action='store_true', help='重新生成 token')
+    subparsers.add_parser('metrics', help='采集一次并输出指标')
+    args = parser.parse_args(argv)
+
+    if args.command == 'token':
+        print(load_settings(reset_token=args.reset)['token'])
+        return 0
+    if args.command == 'metrics':
+        print(render_metrics(refresh()), end='')
+        return 0
+
+    try:
+        import uvicorn
+        settings = load_settings()
+        app = create_app(settings['token'])
+    except ImportError:
+        logger.error("缺少 fastapi 或 uvicorn，请先安装: pip install fastapi uvicorn")
+        return 1
+    start_sampler(args.interval)
+    host, port = args.host or settings['host'], args.port or settings['port']
+    logger.info(f"运维接口: http://{host}:{port}/metrics")
+    uvicorn.run(app, host=host, port=port, log_level='warning', access_log=False)
+    return 0
+
+
+if __name__ == "__main__":
+    try:
+        sys.exit(main())
+    except KeyboardInterrupt:
+        print("\n用户取消操作")
+        sys.exit(1)
@@ -0,0 +1,308 @@
+# -*- coding: utf-8 -*-
+"""
+字节码预编译
+功能：模块更新后预先编译 MaiBot、适配器和运行时 site-packages 的字节码，避免更新后第一次启动 bot.py 时逐个编译
+
+- 使用运行 bot.py 的解释器执行 compileall，生成的 .pyc 与实际运行环境一致
+- 使用 checked-hash 失效模式：git 检出会改变文件修改时间，按源码哈希校验可以避免缓存被误判为过期
+- 每棵目录树记录 .py 文件的路径、大小和修改时间签名，未变化的目录树直接跳过；编译后确认 .pyc 确实生成才记录签名
+- 编译前后各测量一次 bot.py 的导入耗时（不写入字节码缓存），用于对比效果
+
+用法：
+    python precompile.py                 # 编译有变化的目录树并对比 bot.py 启动耗时
+    python precompile.py run --force     # 忽略签名全部重新编译
+    python precompile.py run --workers 4 --no-measure
+    python precompile.py status          # 查看上次编译记录
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+try:
+    from modules.MaiBot.src.common.logger import get_logger
+    logger = get_logger("precompile")
+except ImportError:
+    import logging as logger
+    logger.basicConfig(level=logger.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    logger = logger.getLogger("precompile")
+
+from safe_io import atomic_write_json
+from toolchain import RUNTIME_DIR, SCRIPT_DIR, get_python_path
+from tracing import traced_run
+
+STATE_PATH = RUNTIME_DIR / 'precompile.json'
+MAIBOT_DIR = SCRIPT_DIR / 'modules' / 'MaiBot'
+ADAPTER_DIR = SCRIPT_DIR / 'modules' / 'MaiBot-Napcat-Adapter'
+
+# 仓库中不需要编译的目录（数据、日志、虚拟环境等）
+REPO_EXCLUDED_DIRS = {'.git', '__pycache__', 'node_modules', 'data', 'logs', 'venv', '.venv'}
+SITE_EXCLUDED_DIRS = {'__pycache__'}
+
+COMPILE_TIMEOUT = 1800
+MEASURE_TIMEOUT = 60
+
+STARTUP_PROBE = (
+    "import time; started = time.perf_counter(); "
+    "import bot; "
+    "print((time.perf_counter() - started) * 1000)"
+)
+
+INTERPRETER_PROBE = (
+    "import json, sys, sysconfig; paths = sysconfig.get_paths(); "
+    "print(json.dumps({'cache_tag': sys.implementation.cache_tag, "
+    "'site_packages': sorted({paths['purelib'], paths['platlib']})}))"
+)
+
+
+def get_interpreter_info(python: str) -> dict:
+    """查询目标解释器的字节码标签和 site-packages 路径"""
+    result = traced_run([python, '-c', INTERPRETER_PROBE], name='查询解释器信息', kind='probe',
+                        capture_output=True, text=True, timeout=60)
+    if result.returncode != 0:
+        raise RuntimeError(f"无法查询解释器信息: {result.stderr.strip()}")
+    return json.loads(result.stdout)
+
+
+def get_trees(info: dict) -> list[dict]:
+    """需要预编译的目录树"""
+    trees = [
+        {'name': 'maibot', 'label': 'MaiBot', 'path': MAIBOT_DIR, 'exclude': REPO_EXCLUDED_DIRS},
+        {'name': 'adapter', 'label': 'NapCat适配器', 'path': ADAPTER_DIR, 'exclude': REPO_EXCLUDED_DIRS},
+    ]
+    for path in info['site_packages']:
+        trees.append({'name': f"site:{path}", 'label': f"site-packages ({path})", 'path': Path(path),
+                      'exclude': SITE_EXCLUDED_DIRS})
+    return [tree for tree in trees if tree['path'].is_dir()]
+
+
+def _iter_sources(root: Path, exclude: set[str]):
+    """按固定顺序遍历目录树中的 .py 文件（DirEntry），跳过排除的目录，不跟随符号链接"""
+    stack = [root]
+    while stack:
+        directory = stack.pop()
+        try:
+            with os.scandir(directory) as it:
+                entries = sorted(it, key=lambda entry: entry.name)
+        except OSError:
+            continue
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                if entry.name not in exclude:
+                    stack.append(entry.path)
+            elif entry.name.endswith('.py'):
+                yield entry
+
+
+def tree_signature(root: Path, exclude: set[str], cache_tag: str) -> tuple[str, int]:
+    """计算目录树中 .py 文件的签名
+
+    只读取目录项的 stat 信息，不读取文件内容
+
+    Returns:
+        tuple: (签名, 文件数)
+    """
+    digest = hashlib.sha256(cache_tag.encode('utf-8'))
+    count = 0
+    for entry in _iter_sources(root, exclude):
+        stat = entry.stat()
+        digest.update(f"{entry.path}\0{stat.st_size}\0{stat.st_mtime_ns}\n".encode('utf-8', 'surrogateescape'))
+        count += 1
+    return digest.hexdigest(), count
+
+
+def count_bytecode(root: Path, exclude: set[str], cache_tag: str) -> int:
+    """统计目录树中已有对应 __pycache__/*.{cache_tag}.pyc 的 .py 文件数"""
+    compiled = 0
+    caches: dict[str, set[str]] = {}
+    for entry in _iter_sources(root, exclude):
+        directory = os.path.dirname(entry.path)
+        names = caches.get(directory)
+        if names is None:
+            try:
+                names = caches[directory] = set(os.listdir(os.path.join(directory, '__pycache__')))
+            except OSError:
+                names = caches[directory] = set()
+        if f"{entry.name[:-3]}.{cache_tag}.pyc" in names:
+            compiled += 1
+    return compiled
+
+
+def compile_tree(python: str, tree: dict, workers: int = 0) -> tuple[bool, float]:
+    """用目标解释器编译目录树
+
+    Args:
+        python: 解释器路径
+        tree: 目录树定义
+        workers: 并行进程数，0 表示使用全部 CPU 核心
+
+    Returns:
+        tuple: (是否全部编译成功, 耗时秒数)
+    """
+    # compileall 用 -x 匹配完整路径，需锚定到目录树根部，否则安装路径中的 data、logs 等目录名会排除所有文件
+    exclude = '|'.join(re.escape(name) for name in sorted(tree['exclude']))
+    command = [
+        python, '-m', 'compileall', '-q',
+        '-j', str(workers),
+        '--invalidation-mode', 'checked-hash',
+        '-x', re.escape(str(tree['path'])) + rf"[\\/](?:.*[\\/])?(?:{exclude})[\\/]",
+        str(tree['path']),
+    ]
+    started = time.perf_counter()
+    result = traced_run(command, name=f"编译 {tree['label']}", kind='compile', stdin=subprocess.DEVNULL,
+                        capture_output=True, text=True, encoding='utf-8', errors='replace', timeout=COMPILE_TIMEOUT)
+    duration = time.perf_counter() - started
+    if result.returncode != 0:
+        # site-packages 中常有只用于其他 Python 版本的文件，编译失败不影响使用
+        errors = [line for line in result.stdout.splitlines() if line.strip()]
+        logger.warning(f"{tree['label']} 中有 {sum(1 for line in errors if line.startswith('***'))} 个文件编译失败")
+        for line in errors[:5]:
+            logger.debug(line)
+    return result.returncode == 0, duration
+
+
+def measure_bot_startup(python: str) -> Optional[float]:
+    """测量导入 bot.py 的耗时（毫秒），不写入字节码缓存；失败或超时返回None"""
+    if not (MAIBOT_DIR / 'bot.py').exists():
+        return None
+    try:
+        result = traced_run([python, '-B', '-c', STARTUP_PROBE], name='测量 bot.py 导入耗时', kind='probe',
+                            cwd=str(MAIBOT_DIR), stdin=subprocess.DEVNULL, capture_output=True, text=True,
+                            encoding='utf-8', errors='replace', timeout=MEASURE_TIMEOUT)
+    except subprocess.TimeoutExpired:
+        logger.warning(f"导入 bot.py 超过 {MEASURE_TIMEOUT} 秒，跳过启动耗时测量")
+        return None
+    lines = result.stdout.strip().splitlines()
+    if result.returncode != 0 or not lines:
+        logger.warning(f"导入 bot.py 失败，跳过启动耗时测量: {result.stderr.strip()[-300:]}")
+        return None
+    try:
+        return float(lines[-1])
+    except ValueError:
+        return None
+
+
+def load_state() -> dict:
+    try:
+        with open(STATE_PATH, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {'trees': {}}
+
+
+def precompile(workers: int = 0, force: bool = False, measure: bool = True) -> bool:
+    """预编译有变化的目录树
+
+    Args:
+        workers: 并行进程数，0 表示使用全部 CPU 核心
+        force: 忽略签名重新编译全部目录树
+        measure: 是否在编译前后测量 bot.py 的导入耗时
+
+    Returns:
+        bool: 是否没有出现错误（个别文件编译失败不算错误）
+    """
+    python = get_python_path()
+    try:
+        info = get_interpreter_info(python)
+    except (OSError, RuntimeError, ValueError, subprocess.TimeoutExpired) as e:
+        logger.error(f"预编译失败: {e}")
+        return False
+
+    state = load_state()
+    pending = []
+    for tree in get_trees(info):
+        signature, count = tree_signature(tree['path'], tree['exclude'], info['cache_tag'])
+        record = state['trees'].get(tree['name'], {})
+        if not force and record.get('signature') == signature:
+            logger.info(f"{tree['label']} 没有变化，跳过（{count} 个文件）")
+            continue
+        pending.append((tree, signature, count))
+
+    if not pending:
+        logger.info("所有目录树的字节码都是最新的")
+        return True
+
+    before = measure_bot_startup(python) if measure else None
+    failed = False
+    for tree, signature, count in pending:
+        logger.info(f"正在编译 {tree['label']}（{count} 个文件）...")
+        try:
+            ok, duration = compile_tree(python, tree, workers)
+        except (OSError, subprocess.TimeoutExpired) as e:
+            logger.error(f"编译 {tree['label']} 失败: {e}")
+            failed = True
+            continue
+        # compileall 在所有文件都被排除时同样返回成功，确认字节码确实生成后才记录签名
+        compiled = count_bytecode(tree['path'], tree['exclude'], info['cache_tag'])
+        if count and (compiled == 0 or (ok and compiled < count)):
+            logger.error(f"{tree['label']} 编译后只有 {compiled}/{count} 个文件生成了字节码，不记录本次编译")
+            failed = True
+            continue
+        logger.info(f"{tree['label']} 编译完成，耗时 {duration:.1f} 秒")
+        # 个别文件的编译失败是确定性的，同样记录签名，避免每次更新都重复编译
+        state['trees'][tree['name']] = {
+            'label': tree['label'],
+            'signature': signature,
+            'files': count,
+            'complete': ok,
+            'duration': round(duration, 2),
+            'compiled_at': datetime.now().isoformat(timespec='seconds'),
+        }
+        atomic_write_json(STATE_PATH, state, indent=2, ensure_ascii=False)
+
+    if measure:
+        after = measure_bot_startup(python)
+        if before is not None and after is not None:
+            logger.info(f"bot.py 导入耗时: 编译前 {before:.0f} ms，编译后 {after:.0f} ms")
+            state['last_measurement'] = {'before_ms': round(before, 1), 'after_ms': round(after, 1),
+                                         'measured_at': datetime.now().isoformat(timespec='seconds')}
+            atomic_write_json(STATE_PATH, state, indent=2, ensure_ascii=False)
+    return not failed
+
+
+def print_status() -> None:
+    state = load_state()
+    if not state['trees']:
+        print("尚未执行过预编译")
+        return
+    for record in state['trees'].values():
+        suffix = '' if record.get('complete', True) else '，部分文件编译失败'
+        print(f"{record['label']}: {record['files']} 个文件，{record['compiled_at']} 编译，耗时 {record['duration']} 秒{suffix}")
+    measurement = state.get('last_measurement')
+    if measurement:
+        print(f"bot.py 导入耗时: 编译前 {measurement['before_ms']:.0f} ms，编译后 {measurement['after_ms']:.0f} ms"
+              f"（{measurement['measured_at']}）")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='预编译 MaiBot、适配器和运行时依赖的字节码')
+    subparsers = parser.add_subparsers(dest='command')
+    run_parser = subparsers.add_parser('run', help='编译有变化的目录树（默认）')
+    run_parser.add_argument('--workers', type=int, default=0, help='并行进程数，0 表示使用全部 CPU 核心')
+    run_parser.add_argument('--force', action='store_true', help='忽略签名全部重新编译')
+    run_parser.add_argument('--no-measure', action='store_true', help='不测量 bot.py 的导入耗时')
+    subparsers.add_parser('status', help='查看上次编译记录')
+    args = parser.parse_args()
+
+    if args.command == 'status':
+        print_status()
+        return 0
+    ok = precompile(getattr(args, 'workers', 0), getattr(args, 'force', False),
+                    not getattr(args, 'no_measure', False))
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    try:
+        sys.exit(main())
+    except KeyboardInterrupt:
+        print("\n用户取消操作")
+        sys.exit(1)
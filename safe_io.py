@@ -0,0 +1,184 @@
+# -*- coding: utf-8 -*-
+"""
+安全写入工具
+功能：为一键包生成的配置文件和标记文件提供防崩溃的原子写入，以及多个启动器之间的配置修改互斥
+
+- atomic_write_text / atomic_write_json: 先写入同目录临时文件并 fsync，再用 rename 原子替换目标文件，
+  中途崩溃时目标文件要么是旧内容要么是新内容，不会出现写了一半的 TOML/JSON
+- backups 参数：替换前把旧文件保留为 <文件名>.bak（更早的依次为 .bak.1、.bak.2 ……）
+- config_lock: 基于锁文件的进程间咨询锁，同一进程内可重入；
+  “读取-修改-写回”配置时持有该锁，多个启动器同时运行也会排队执行
+"""
+
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, Optional, Union
+
+PathLike = Union[str, os.PathLike]
+
+DEFAULT_LOCK_PATH = Path(__file__).parent.absolute() / 'runtime' / '.config.lock'
+# Windows 下目标文件被杀毒软件或编辑器短暂占用时，重试替换的次数
+REPLACE_RETRIES = 10
+
+_lock_state = threading.local()
+_thread_lock = threading.RLock()
+
+
+def _backup_path(path: Path, index: int) -> Path:
+    suffix = '.bak' if index == 0 else f'.bak.{index}'
+    return path.with_name(path.name + suffix)
+
+
+def _rotate_backups(path: Path, backups: int) -> None:
+    """轮换备份文件，把当前文件保留为 .bak"""
+    if backups <= 0 or not path.exists():
+        return
+    for index in range(backups - 1, 0, -1):
+        older = _backup_path(path, index - 1)
+        if older.exists():
+            os.replace(older, _backup_path(path, index))
+    newest = _backup_path(path, 0)
+    if newest.exists():
+        newest.unlink()
+    try:
+        # 硬链接保留旧文件内容，替换后旧内容仍在 .bak 中
+        os.link(path, newest)
+    except OSError:
+        shutil.copy2(path, newest)
+
+
+def _fsync_directory(directory: Path) -> None:
+    """同步目录项，保证 rename 本身落盘（Windows 不支持也不需要）"""
+    if os.name == 'nt':
+        return
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def _replace(src: str, dst: Path) -> None:
+    for attempt in range(REPLACE_RETRIES):
+        try:
+            os.replace(src, dst)
+            return
+        except PermissionError:
+            if os.name != 'nt' or attempt == REPLACE_RETRIES - 1:
+                raise
+            time.sleep(0.05 * (attempt + 1))
+
+
+def atomic_write_bytes(path: PathLike, data: bytes, backups: int = 0) -> None:
+    """原子写入二进制内容
+
+    Args:
+        path: 目标文件路径，父目录不存在时自动创建
+        data: 文件内容
+        backups: 保留的旧版本数量，0 表示不备份
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix=f'.{path.name}.', suffix='.tmp', dir=path.parent)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        if path.exists():
+            # 保留原文件权限
+            shutil.copymode(path, tmp_path)
+        _rotate_backups(path, backups)
+        _replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+    _fsync_directory(path.parent)
+
+
+def atomic_write_text(path: PathLike, text: str, encoding: str = 'utf-8', backups: int = 0) -> None:
+    """原子写入文本内容（按原样写入，不做换行符转换）"""
+    atomic_write_bytes(path, text.encode(encoding), backups=backups)
+
+
+def atomic_write_json(path: PathLike, data, backups: int = 0, **json_kwargs) -> None:
+    """原子写入 JSON，json_kwargs 透传给 json.dumps（如 indent、ensure_ascii）"""
+    atomic_write_text(path, json.dumps(data, **json_kwargs), backups=backups)
+
+
+def _acquire_file_lock(f, timeout: Optional[float]) -> None:
+    deadline = None if timeout is None else time.monotonic() + timeout
+    while True:
+        try:
+            if os.name == 'nt':
+                import msvcrt
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+            else:
+                import fcntl
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return
+        except OSError:
+            if deadline is not None and time.monotonic() >= deadline:
+                raise TimeoutError(f"等待配置锁超时，可能有其他启动器正在修改配置: {f.name}")
+            time.sleep(0.05)
+
+
+def _release_file_lock(f) -> None:
+    if os.name == 'nt':
+        import msvcrt
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+    else:
+        import fcntl
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+@contextmanager
+def config_lock(lock_path: Optional[PathLike] = None, timeout: Optional[float] = 60) -> Iterator[None]:
+    """配置修改锁
+
+    同一进程内可嵌套使用；进程间通过锁文件互斥，进程退出（包括崩溃）时操作系统自动释放
+
+    Args:
+        lock_path: 锁文件路径，默认为 runtime/.config.lock
+        timeout: 最长等待秒数，None 表示一直等待
+
+    Raises:
+        TimeoutError: 超时仍未获得锁
+    """
+    lock_path = Path(lock_path) if lock_path else DEFAULT_LOCK_PATH
+    key = str(lock_path)
+    held = getattr(_lock_state, 'held', None)
+    if held is None:
+        held = _lock_state.held = {}
+    if key in held:
+        # 本线程已持有该锁，直接进入
+        yield
+        return
+
+    lock_path.parent.mkdir(parents=True, exist_ok=True)
+    with _thread_lock:
+        f = open(lock_path, 'a+b')
+        try:
+            _acquire_file_lock(f, timeout)
+            held[key] = f
+            try:
+                yield
+            finally:
+                del held[key]
+                _release_file_lock(f)
+        finally:
+            f.close()
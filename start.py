@@ -1,20 +1,73 @@
+import importlib
 import os
 import subprocess
-import tomlkit  # 替换 tomli
+import sys
+import threading
 from typing import Optional, List, Callable
 import re
 import shutil
 from contextlib import suppress
-from init_napcat import create_napcat_config, create_onebot_config
-try:
-    from modules.MaiBot.src.common.logger import get_logger  # 确保路径正确
-    logger = get_logger("init")
-except ImportError:
-    from loguru import logger
-import requests
+from safe_io import atomic_write_json, atomic_write_text, config_lock
+
+# 启动器只使用标准库日志：MaiBot 的日志模块会加载整套日志依赖，菜单显示前不需要它
+import logging as logger
+logger.basicConfig(level=logger.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logger.getLogger("init")
+
+
+def lazy_import(module_name: str, attr: str) -> Callable:
+    """返回一个首次调用时才导入目标模块的函数
+
+    菜单功能模块（以及它们依赖的 tomlkit、psutil 等）只在用户选择对应功能时加载，
+    使用 python start.py --profile-imports 查看各模块的导入耗时
+    """
+    def wrapper(*args, **kwargs):
+        return getattr(importlib.import_module(module_name), attr)(*args, **kwargs)
+    wrapper.__name__ = attr
+    return wrapper
+
+
+find_tool = lazy_import('toolchain', 'find_tool')
+get_python_path = lazy_import('toolchain', 'get_python_path')
+create_napcat_config = lazy_import('init_napcat', 'create_napcat_config')
+create_onebot_config = lazy_import('init_napcat', 'create_onebot_config')
+interactive_instance_menu = lazy_import('instance_manager', 'interactive_instance_menu')
+get_shard_dirs = lazy_import('adapter_shards', 'get_shard_dirs')
+get_shard_ports = lazy_import('adapter_shards', 'get_shard_ports')
+interactive_shard_menu = lazy_import('adapter_shards', 'interactive_shard_menu')
+interactive_db_maintenance_menu = lazy_import('db_maintenance', 'interactive_db_maintenance_menu')
+create_backup = lazy_import('db_backup', 'create_backup')
+interactive_backup_menu = lazy_import('db_backup', 'interactive_backup_menu')
+interactive_retention_menu = lazy_import('db_retention', 'interactive_retention_menu')
+interactive_analytics_menu = lazy_import('db_analytics', 'interactive_analytics_menu')
+interactive_migration_menu = lazy_import('db_migration', 'interactive_migration_menu')
+interactive_archive_menu = lazy_import('instance_archive', 'interactive_archive_menu')
+interactive_jobs_menu = lazy_import('jobs', 'interactive_jobs_menu')
+submit_job = lazy_import('jobs', 'submit_job')
+interactive_learning_menu = lazy_import('learning_pipeline', 'interactive_learning_menu')
+start_background = lazy_import('learning_pipeline', 'start_background')
+build_inventory = lazy_import('knowledge_base', 'build_inventory')
+create_snapshot = lazy_import('knowledge_base', 'create_snapshot')
+interactive_knowledge_menu = lazy_import('knowledge_base', 'interactive_knowledge_menu')
+print_inventory = lazy_import('knowledge_base', 'print_inventory')
+interactive_ops_menu = lazy_import('ops_api', 'interactive_ops_menu')
+
+
+def active_jobs() -> list:
+    """当前进程内未结束的后台任务，未使用过后台任务时不加载 jobs 模块"""
+    jobs = sys.modules.get('jobs')
+    return jobs.active_jobs() if jobs else []
+
+
+def shutdown_jobs() -> None:
+    """取消当前进程内未结束的后台任务"""
+    jobs = sys.modules.get('jobs')
+    if jobs:
+        jobs.shutdown()
 
 
 ONEKEY_VERSION = "6.0.0" 
+PIP_MIRROR = "https://mirrors.aliyun.com/pypi/simple/"
 
 def get_absolute_path(relative_path: str) -> str:
     """获取绝对路径
@@ -86,6 +139,7 @@ def read_qq_from_config() -> Optional[str]:
         shutil.copy2(template_path, config_path)
         logger.info(f"已从模板创建配置文件: {config_path}")
     
+    import tomlkit
     try:
         if not os.path.exists(config_path):
             logger.error(f"错误：找不到配置文件 {config_path}")
@@ -134,7 +188,7 @@ def create_cmd_window(cwd: str, command: str) -> bool:
             return False
             
         # 使用项目自带的 Python 环境
-        python_path = get_absolute_path('runtime/python31211/bin/python.exe')
+        python_path = get_python_path()
         
         # 如果命令中包含 python，则替换为完整路径
         if command.startswith('python '):
@@ -143,7 +197,8 @@ def create_cmd_window(cwd: str, command: str) -> bool:
             command = f'"{python_path}"'
         
         full_command = f'start cmd /k "cd /d "{cwd}" && {command}"'
-        subprocess.run(full_command, shell=True, check=True)
+        from tracing import traced_run
+        traced_run(full_command, name=f"打开窗口: {command}", kind='window', cwd=cwd, shell=True, check=True)
         return True
     except subprocess.CalledProcessError as e:
         logger.error(f"错误：命令执行失败：{str(e)}")
@@ -153,10 +208,8 @@ def create_cmd_window(cwd: str, command: str) -> bool:
         return False
 
 def check_napcat() -> bool:
-    napcat_path = get_absolute_path('modules/napcat')
-    napcat_exe = os.path.join(napcat_path, 'NapCatWinBootMain.exe')
-    if not os.path.exists(napcat_exe):
-        logger.error(f"错误：找不到NapCat可执行文件 {napcat_exe}")
+    if not find_tool('napcat'):
+        logger.error(f"错误：找不到NapCat可执行文件 {get_absolute_path('modules/napcat')}")
         return False
     return True
 
@@ -184,7 +237,7 @@ def add_qq_number():
             
             # 创建NapCat相关配置
             create_napcat_config(qq)
-            create_onebot_config(qq)
+            create_onebot_config(qq, ws_ports=get_shard_ports())
             
             logger.info(f"QQ号 {qq} 配置已更新并创建必要文件！")
             return
@@ -215,6 +268,100 @@ def install_vc_redist():
         logger.warning(f"警告：VC运行库安装异常：{str(e)}")
         print(f"请手动运行以下文件进行安装：\n{vc_path}")
 
+def load_napcat_token(root: Optional[str] = None) -> str:
+    """动态获取 NapCat WebUI token，找不到 webui.json 时为最新版本创建一个
+
+    Args:
+        root: 一键包根目录，默认为脚本所在目录
+
+    Returns:
+        str: WebUI token，无法获取时返回占位 token 'napcat'
+    """
+    import json
+    import secrets
+    resolve = (lambda path: os.path.join(root, path)) if root else get_absolute_path
+    base_new_headed = resolve('modules/napcatframework/versions')
+    base_new_headless = resolve('modules/napcat/versions')
+    candidates = []
+    # 收集所有 versions/* 目录下的 webui.json 两种可能路径
+    for base in [base_new_headless, base_new_headed]:
+        if not os.path.isdir(base):
+            continue
+        try:
+            for ver in os.listdir(base):
+                ver_dir = os.path.join(base, ver)
+                if not os.path.isdir(ver_dir):
+                    continue
+                # 两种实际文件路径
+                path1 = os.path.join(ver_dir, 'resources', 'app', 'napcat', 'config', 'webui.json')
+                path2 = os.path.join(ver_dir, 'resources', 'app', 'LiteLoader', 'plugins', 'NapCat', 'config', 'webui.json')
+                candidates.extend([path1, path2])
+        except Exception as _e:
+            logger.debug(f"遍历 {base} 出错: {_e}")
+
+    # 过滤存在的文件并按修改时间排序
+    existing = [p for p in candidates if os.path.exists(p)]
+    existing.sort(key=lambda p: os.path.getmtime(p), reverse=True)
+    for file in existing:
+        try:
+            with open(file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            token = data.get('token')
+            if token:
+                logger.info(f"已从 {file} 读取 NapCat WebUI token")
+                return str(token)
+        except Exception as _e:
+            logger.warning(f"读取 token 失败 {file}: {_e}")
+
+    # 没有任何 webui.json：尝试为最新版本目录创建一个
+    version_roots = [b for b in [base_new_headless, base_new_headed] if os.path.isdir(b)]
+    chosen_version_dir = None
+    latest_mtime = -1
+    for root in version_roots:
+        try:
+            for ver in os.listdir(root):
+                ver_dir = os.path.join(root, ver)
+                if os.path.isdir(ver_dir):
+                    mtime = os.path.getmtime(ver_dir)
+                    if mtime > latest_mtime:
+                        latest_mtime = mtime
+                        chosen_version_dir = ver_dir
+        except Exception as _e:
+            logger.debug(f"扫描版本目录 {root} 出错: {_e}")
+
+    if chosen_version_dir:
+        # 优先 napcat/config 路径，其次 LiteLoader 路径
+        create_paths = [
+            os.path.join(chosen_version_dir, 'resources', 'app', 'napcat', 'config'),
+            os.path.join(chosen_version_dir, 'resources', 'app', 'LiteLoader', 'plugins', 'NapCat', 'config')
+        ]
+        # 生成 12 位 hex token
+        token = secrets.token_hex(6)
+        default_json = {
+            "host": "0.0.0.0",
+            "port": 6099,
+            "token": token,
+            "loginRate": 10,
+            "autoLoginAccount": "",
+            "theme": {"dark": {}, "light": {}},  # 为减小体积，这里不写全部主题，NapCat 启动后会补全或忽略
+            "disableWebUI": False,
+            "disableNonLANAccess": False
+        }
+        for cfg_dir in create_paths:
+            try:
+                os.makedirs(cfg_dir, exist_ok=True)
+                target_file = os.path.join(cfg_dir, 'webui.json')
+                if not os.path.exists(target_file):
+                    atomic_write_json(target_file, default_json, ensure_ascii=False, indent=4)
+                    logger.info(f"已创建缺失的 NapCat webui.json 并生成 token({token[:4]}***): {target_file}")
+                    return token
+            except Exception as _e:
+                logger.warning(f"创建默认 webui.json 失败 {cfg_dir}: {_e}")
+
+    logger.warning("未找到或创建 NapCat webui.json，将回退使用占位 token 'napcat'")
+    return 'napcat'
+
+
 def launch_napcat(qq_number: Optional[str] = None, headed_mode: bool = False) -> bool:
     """启动NapCat
     
@@ -231,99 +378,17 @@ def launch_napcat(qq_number: Optional[str] = None, headed_mode: bool = False) ->
     if not qq_number:
         return False
 
-    # 动态获取 webui token
-    def _load_napcat_token() -> Optional[str]:
-        import json
-        import secrets
-        base_new_headed = get_absolute_path('modules/napcatframework/versions')
-        base_new_headless = get_absolute_path('modules/napcat/versions')
-        candidates = []
-        # 收集所有 versions/* 目录下的 webui.json 两种可能路径
-        for base in [base_new_headless, base_new_headed]:
-            if not os.path.isdir(base):
-                continue
-            try:
-                for ver in os.listdir(base):
-                    ver_dir = os.path.join(base, ver)
-                    if not os.path.isdir(ver_dir):
-                        continue
-                    # 两种实际文件路径
-                    path1 = os.path.join(ver_dir, 'resources', 'app', 'napcat', 'config', 'webui.json')
-                    path2 = os.path.join(ver_dir, 'resources', 'app', 'LiteLoader', 'plugins', 'NapCat', 'config', 'webui.json')
-                    candidates.extend([path1, path2])
-            except Exception as _e:
-                logger.debug(f"遍历 {base} 出错: {_e}")
-
-        # 过滤存在的文件并按修改时间排序
-        existing = [p for p in candidates if os.path.exists(p)]
-        existing.sort(key=lambda p: os.path.getmtime(p), reverse=True)
-        for file in existing:
-            try:
-                with open(file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                token = data.get('token')
-                if token:
-                    logger.info(f"已从 {file} 读取 NapCat WebUI token")
-                    return str(token)
-            except Exception as _e:
-                logger.warning(f"读取 token 失败 {file}: {_e}")
+    webui_token = load_napcat_token()
 
-        # 没有任何 webui.json：尝试为最新版本目录创建一个
-        version_roots = [b for b in [base_new_headless, base_new_headed] if os.path.isdir(b)]
-        chosen_version_dir = None
-        latest_mtime = -1
-        for root in version_roots:
-            try:
-                for ver in os.listdir(root):
-                    ver_dir = os.path.join(root, ver)
-                    if os.path.isdir(ver_dir):
-                        mtime = os.path.getmtime(ver_dir)
-                        if mtime > latest_mtime:
-                            latest_mtime = mtime
-                            chosen_version_dir = ver_dir
-            except Exception as _e:
-                logger.debug(f"扫描版本目录 {root} 出错: {_e}")
-
-        if chosen_version_dir:
-            # 优先 napcat/config 路径，其次 LiteLoader 路径
-            create_paths = [
-                os.path.join(chosen_version_dir, 'resources', 'app', 'napcat', 'config'),
-                os.path.join(chosen_version_dir, 'resources', 'app', 'LiteLoader', 'plugins', 'NapCat', 'config')
-            ]
-            # 生成 12 位 hex token
-            token = secrets.token_hex(6)
-            default_json = {
-                "host": "0.0.0.0",
-                "port": 6099,
-                "token": token,
-                "loginRate": 10,
-                "autoLoginAccount": "",
-                "theme": {"dark": {}, "light": {}},  # 为减小体积，这里不写全部主题，NapCat 启动后会补全或忽略
-                "disableWebUI": False,
-                "disableNonLANAccess": False
-            }
-            for cfg_dir in create_paths:
-                try:
-                    os.makedirs(cfg_dir, exist_ok=True)
-                    target_file = os.path.join(cfg_dir, 'webui.json')
-                    if not os.path.exists(target_file):
-                        with open(target_file, 'w', encoding='utf-8') as f:
-                            json.dump(default_json, f, ensure_ascii=False, indent=4)
-                        logger.info(f"已创建缺失的 NapCat webui.json 并生成 token({token[:4]}***): {target_file}")
-                        return token
-                except Exception as _e:
-                    logger.warning(f"创建默认 webui.json 失败 {cfg_dir}: {_e}")
-
-        logger.warning("未找到或创建 NapCat webui.json，将回退使用占位 token 'napcat'")
-        return 'napcat'
-
-    webui_token = _load_napcat_token()
+    from napcat_stub import stub_enabled
+    if stub_enabled():
+        logger.info(f"已设置 ONEKEY_NAPCAT_STUB，启动 NapCat 替身 (QQ: {qq_number}, token:{webui_token})")
+        return create_cmd_window(get_absolute_path('.'), f'python napcat_stub.py {qq_number}')
 
     if headed_mode:
         napcat_dir = get_absolute_path('modules/napcatframework')
-        napcat_exe_path = os.path.join(napcat_dir, 'NapCatWinBootMain.exe')
-        if not os.path.exists(napcat_exe_path):
-            logger.error(f"错误：找不到有头模式 NapCat 可执行文件 {napcat_exe_path}")
+        if not find_tool('napcat_headed'):
+            logger.error(f"错误：找不到有头模式 NapCat 可执行文件 {napcat_dir}")
             return False
         cwd = napcat_dir
         command = f'CHCP 65001 & start http://127.0.0.1:6099/webui/web_login?token={webui_token} & NapCatWinBootMain.exe {qq_number}'
@@ -338,28 +403,34 @@ def launch_napcat(qq_number: Optional[str] = None, headed_mode: bool = False) ->
     return create_cmd_window(cwd, command)
 
 def launch_adapter():
+    # 启用适配器分片时，为每个分片各开一个窗口
+    shard_dirs = get_shard_dirs()
+    if shard_dirs:
+        logger.info(f"已启用适配器分片，正在启动 {len(shard_dirs)} 个适配器")
+        return all([create_cmd_window(str(shard_dir), 'python main.py') for shard_dir in shard_dirs])
     adapter_path = get_absolute_path('modules/MaiBot-Napcat-Adapter')
     return create_cmd_window(adapter_path, 'python main.py')
 
 def launch_main_bot():
     main_path = get_absolute_path('modules/MaiBot')
-    python_path = get_absolute_path('runtime/python31211/bin/python.exe')
+    python_path = get_python_path()
     command = f'start http://localhost:8001 & "{python_path}" bot.py'
     return create_cmd_window(main_path, command)
 
 def update_qq_in_config(config_path: str, qq_number: str):
+    import tomlkit
     try:
-        with open(config_path, 'r', encoding='utf-8') as f:
-            doc = tomlkit.parse(f.read())
-        
-        if 'bot' not in doc:
-            doc['bot'] = tomlkit.table()  # 如果 bot 表不存在则创建
-        
-        doc['bot']['qq_account'] = qq_number  # 直接赋值，tomlkit 会处理类型
-        
-        with open(config_path, 'w', encoding='utf-8') as f:
-            tomlkit.dump(doc, f)
-            
+        with config_lock():
+            with open(config_path, 'r', encoding='utf-8') as f:
+                doc = tomlkit.parse(f.read())
+
+            if 'bot' not in doc:
+                doc['bot'] = tomlkit.table()  # 如果 bot 表不存在则创建
+
+            doc['bot']['qq_account'] = qq_number  # 直接赋值，tomlkit 会处理类型
+
+            atomic_write_text(config_path, tomlkit.dumps(doc), backups=1)
+
     except Exception as e:
         logger.error(f"更新配置文件失败：{str(e)}")
         raise
@@ -390,15 +461,14 @@ def interactive_pip_install():
                 logger.error("模块名称不能为空")
                 continue
             
-            # 使用内置的python路径和阿里云镜像源
-            python_path = get_absolute_path('runtime/python31211/bin/python.exe')
-            command = f'"{python_path}" -m pip install -i https://mirrors.aliyun.com/pypi/simple/ {modules}'
+            # 使用内置的python路径和阿里云镜像源，作为后台任务安装
+            command = [get_python_path(), '-m', 'pip', 'install', '-i', PIP_MIRROR, *modules.split()]
             
             logger.info(f"正在安装模块: {modules}")
-            logger.info("使用阿里云镜像源加速下载...")
+            logger.info("使用阿里云镜像源加速下载，可在\"后台任务\"中查看安装输出")
             
-            script_dir = os.path.dirname(os.path.abspath(__file__))
-            return create_cmd_window(script_dir, command)
+            submit_job(f"pip 安装 {modules}", command)
+            return True
             
         elif choice == '2':
             # requirements.txt安装模式
@@ -418,15 +488,14 @@ def interactive_pip_install():
                 if confirm != 'y':
                     continue
             
-            # 使用内置的python路径和阿里云镜像源
-            python_path = get_absolute_path('runtime/python31211/bin/python.exe')
-            command = f'"{python_path}" -m pip install -i https://mirrors.aliyun.com/pypi/simple/ -r "{requirements_path}"'
+            # 使用内置的python路径和阿里云镜像源，作为后台任务安装
+            command = [get_python_path(), '-m', 'pip', 'install', '-i', PIP_MIRROR, '-r', requirements_path]
             
             logger.info(f"正在从requirements文件安装: {requirements_path}")
-            logger.info("使用阿里云镜像源加速下载...")
+            logger.info("使用阿里云镜像源加速下载，可在\"后台任务\"中查看安装输出")
             
-            script_dir = os.path.dirname(os.path.abspath(__file__))
-            return create_cmd_window(script_dir, command)
+            submit_job(f"pip 安装 {os.path.basename(requirements_path)}", command)
+            return True
             
         else:
             logger.error("无效选择，请输入 1、2 或 0")
@@ -479,34 +548,31 @@ def delete_maibot_memory():
     
     try:
         # 确认删除
-        confirm = input("⚠️  警告：此操作将删除麦麦的所有记忆，包括聊天记录、用户数据等，无法恢复！\n确定要继续吗？(输入 'YES' 确认): ").strip()
+        confirm = input("⚠️  警告：此操作将删除麦麦的所有记忆，包括聊天记录、用户数据等（删除前会自动备份）！\n确定要继续吗？(输入 'YES' 确认): ").strip()
         if confirm.upper() != 'YES':
             logger.info("操作已取消")
             return False
         
+        # 删库前自动快照，误删后可以通过 数据库备份与恢复 找回
+        snapshot = create_backup(db_path, reason='删除所有记忆前的快照', pinned=True)
+        if not snapshot:
+            logger.error("删除前备份数据库失败，为避免记忆无法找回，已取消删除")
+            return False
+        
         os.remove(db_path)
+        for suffix in ('-wal', '-shm'):
+            with suppress(FileNotFoundError):
+                os.remove(db_path + suffix)
         logger.info("麦麦的所有记忆已删除成功！")
+        logger.info(f"删除前的快照已保存为 {snapshot['file']}，如需找回请使用 数据库备份与恢复 功能")
         return True
     except Exception as e:
         logger.error(f"错误：删除数据库文件时出现异常：{str(e)}")
         return False
 
 def migrate_database_from_old_version():
-    """从旧版本(0.6.x)迁移数据库到0.7.x版本"""
-    migration_script = get_absolute_path('modules/MaiBot/scripts/mongodb_to_sqlite.py')
-    if not os.path.exists(migration_script):
-        logger.error(f"错误：找不到迁移脚本 {migration_script}")
-        return False
-    try:
-        logger.info("正在从旧版本迁移数据库...")
-        logger.info("请在弹出的命令行窗口中查看迁移进度")
-        return create_cmd_window(
-            get_absolute_path('modules/MaiBot/scripts'), 
-            'python mongodb_to_sqlite.py'
-        )
-    except Exception as e:
-        logger.error(f"错误：启动数据库迁移时出现异常：{str(e)}")
-        return False
+    """从旧版本(0.6.x)迁移数据库到新版，分批执行并记录检查点，中断后再次运行会继续"""
+    return interactive_migration_menu()
 
 def confirm_dangerous_operation(operation_name: str) -> bool:
     """确认危险操作
@@ -536,9 +602,16 @@ def delete_knowledge_base() -> bool:
         logger.warning("知识库原本就是空的，没有需要删除的内容")
         return True
     
+    print_inventory(build_inventory())
     if not confirm_dangerous_operation("删除麦麦的所有知识库，包括RAG数据和向量数据"):
         return False
     
+    # 删除前先用硬链接生成快照，误删后可以秒级恢复，不必重新学习
+    snapshot = create_snapshot(mode='link', reason='before-delete')
+    if not snapshot:
+        logger.error("生成知识库快照失败，已取消删除")
+        return False
+    
     try:
         deleted_items = []
         
@@ -552,6 +625,7 @@ def delete_knowledge_base() -> bool:
         
         if deleted_items:
             logger.info(f"知识库删除成功！已删除：{', '.join(deleted_items)}")
+            logger.info(f"如需恢复，请运行 python knowledge_base.py restore {snapshot.name}")
         
         return True
     except Exception as e:
@@ -566,10 +640,16 @@ def import_openie_file():
         return False
     
     try:
+        # 导入前先校验、去重并合并 OpenIE 文件，跳过已导入的段落；检查失败不影响继续导入
+        from tracing import traced_run
+        precheck = traced_run([get_python_path(), get_absolute_path('openie_precheck.py'), 'clean', '--replace'],
+                              name='OpenIE 文件预检')
+        if precheck.returncode != 0:
+            logger.warning("OpenIE 文件检查未完成，将直接导入原文件")
         logger.info("正在启动OpenIE文件导入工具...")
         logger.info("请在弹出的命令行窗口中按照提示选择要导入的文件")
         # 使用内置的 Python 解释器
-        python_path = get_absolute_path('runtime/python31211/bin/python.exe')
+        python_path = get_python_path()
         return create_cmd_window(
             get_absolute_path('modules/MaiBot'), 
             f'"{python_path}" scripts/import_openie.py')
@@ -593,26 +673,10 @@ def start_maibot_learning():
             logger.error(f"错误：找不到学习脚本 {script_path}")
             return False
     
-    try:
-        logger.info("开始麦麦学习流程...")
-        logger.info("这将依次执行：数据预处理 → 信息提取 → OpenIE导入")
-        
-        # 使用内置的 Python 解释器
-        python_path = get_absolute_path('runtime/python31211/bin/python.exe')
-        
-        # 构建批处理命令，依次执行三个脚本，工作目录在MaiBot根目录
-        learning_command = (
-            f'"{python_path}" scripts/info_extraction.py && '
-            f'"{python_path}" scripts/import_openie.py && '
-            'echo. && echo 🎉 麦麦学习流程已完成！ && pause'
-        )
-        
-        logger.info("请在弹出的命令行窗口中查看学习进度")
-        return create_cmd_window(get_absolute_path('modules/MaiBot'), learning_command)
-        
-    except Exception as e:
-        logger.error(f"错误：启动麦麦学习流程时出现异常：{str(e)}")
-        return False
+    logger.info("开始麦麦学习流程：信息提取 → OpenIE导入")
+    logger.info("已完成的阶段会自动跳过，中断后再次选择即可从中断的阶段继续")
+    # 后台运行，菜单可以继续使用；进度在"麦麦学习进度"中查看
+    return start_background() is not None
 
 def get_hitokoto() -> tuple[Optional[str], Optional[str]]:
     """获取一言内容和作者，失败返回None
@@ -621,6 +685,7 @@ def get_hitokoto() -> tuple[Optional[str], Optional[str]]:
         tuple: (一言内容, 作者信息)
     """
     with suppress(Exception):
+        import requests
         resp = requests.get('https://hitokoto.tianmoy.cn/?encode=json', timeout=3)
         if resp.status_code == 200:
             data = resp.json()
@@ -631,6 +696,32 @@ def get_hitokoto() -> tuple[Optional[str], Optional[str]]:
     return None, None
 
 
+_hitokoto_cache: dict = {}
+_hitokoto_thread: Optional[threading.Thread] = None
+
+
+def prefetch_hitokoto() -> None:
+    """在后台线程预取一言，显示菜单时不再等待网络请求"""
+    global _hitokoto_thread
+    if _hitokoto_thread is not None and _hitokoto_thread.is_alive():
+        return
+
+    def fetch():
+        _hitokoto_cache['value'] = get_hitokoto()
+
+    _hitokoto_thread = threading.Thread(target=fetch, name="hitokoto", daemon=True)
+    _hitokoto_thread.start()
+
+
+def take_hitokoto(wait: float = 0.5) -> tuple[Optional[str], Optional[str]]:
+    """取出预取的一言并开始预取下一条，最多等待 wait 秒，未取到返回None"""
+    if _hitokoto_thread is not None:
+        _hitokoto_thread.join(wait)
+    value = _hitokoto_cache.pop('value', (None, None))
+    prefetch_hitokoto()
+    return value
+
+
 def get_napcat_launch_mode() -> bool:
     """获取NapCat启动模式选择
     
@@ -773,11 +864,22 @@ class MenuManager:
             MenuItem("14", "麦麦知识忘光光（删除知识库）", lambda: log_operation_result("删除麦麦知识库", delete_knowledge_base())),
             MenuItem("15", "导入其他人的OpenIE文件", lambda: log_operation_result("启动OpenIE文件导入工具", import_openie_file())),
             MenuItem("16", "麦麦开始学习", lambda: log_operation_result("启动麦麦学习流程", start_maibot_learning())),
+            MenuItem("26", "麦麦学习进度", lambda: log_operation_result("麦麦学习进度", interactive_learning_menu())),
+            MenuItem("20", "数据库维护（报告/ANALYZE/VACUUM）", lambda: log_operation_result("数据库维护", interactive_db_maintenance_menu())),
+            MenuItem("21", "数据库备份与恢复", lambda: log_operation_result("数据库备份与恢复", interactive_backup_menu())),
+            MenuItem("22", "清理旧聊天记录", lambda: log_operation_result("清理旧聊天记录", interactive_retention_menu())),
+            MenuItem("23", "数据库统计报表", lambda: log_operation_result("数据库统计报表", interactive_analytics_menu())),
         ])
         
         # 其他功能组
         other_group = MenuGroup("其他功能：", [
             MenuItem("17", "快捷打开配置文件", lambda: log_operation_result("打开配置文件", open_config_file())),
+            MenuItem("18", "多实例管理", lambda: log_operation_result("多实例管理", interactive_instance_menu())),
+            MenuItem("19", "适配器分片管理", lambda: log_operation_result("适配器分片管理", interactive_shard_menu())),
+            MenuItem("24", "实例迁移（导出/导入）", lambda: log_operation_result("实例迁移", interactive_archive_menu())),
+            MenuItem("25", "知识库清单与快照", lambda: log_operation_result("知识库清单与快照", interactive_knowledge_menu())),
+            MenuItem("27", "后台任务（查看/跟随/取消）", lambda: log_operation_result("后台任务", interactive_jobs_menu())),
+            MenuItem("28", "运维接口（状态/指标/启停）", lambda: log_operation_result("运维接口", interactive_ops_menu())),
         ])
         
         # 退出组
@@ -804,7 +906,7 @@ class MenuManager:
         print("======================")
         
         # 显示一言
-        text, from_who = get_hitokoto()
+        text, from_who = take_hitokoto()
         if text:
             print(text)
             if from_who:
@@ -834,6 +936,12 @@ class MenuManager:
             bool: True表示继续运行，False表示退出程序
         """
         if choice == '0':
+            running = active_jobs()
+            if running:
+                confirm = input(f"还有 {len(running)} 个后台任务未完成，退出将取消它们，确定退出吗？(y/N): ").strip().lower()
+                if confirm != 'y':
+                    return True
+            shutdown_jobs()
             logger.info("程序已退出")
             return False
         
@@ -947,9 +1055,9 @@ def open_config_file() -> bool:
         logger.error("无效选择")
         return False
     name, path = config_files[int(choice) - 1]
-    code_exe = get_absolute_path('modules/vscode/Code.exe')
-    if not os.path.exists(code_exe):
-        logger.error(f"找不到VSCode可执行文件 {code_exe}")
+    code_exe = find_tool('editor')
+    if not code_exe:
+        logger.error(f"找不到VSCode可执行文件 {get_absolute_path('modules/vscode')}")
         return False
     if not os.path.exists(path):
         logger.error(f"找不到配置文件 {path}")
@@ -1045,6 +1153,9 @@ def check_and_create_config_files() -> bool:
 
 def main() -> None:
     """主程序入口"""
+    # 一言在后台获取，与配置检测同时进行
+    prefetch_hitokoto()
+    
     # 初始化菜单系统
     initialize_menu()
     
@@ -1057,8 +1168,12 @@ def main() -> None:
             if not process_menu_choice(choice):
                 break
     except KeyboardInterrupt:
+        shutdown_jobs()
         logger.info("\n程序已被用户中断")
         
 
 if __name__ == "__main__":
+    if '--profile-imports' in sys.argv[1:]:
+        from import_profile import main as profile_imports
+        sys.exit(profile_imports(['profile']))
     main()
\ No newline at end of file
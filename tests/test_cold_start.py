@@ -0,0 +1,28 @@
+import json
+import subprocess
+import sys
+
+import import_profile
+
+# 显示菜单前不应导入的重型依赖和后台功能模块，它们都应通过 lazy_import 在用到时才加载
+DEFERRED_MODULES = ('tomlkit', 'requests', 'psutil', 'jobs')
+
+MODULES_PROBE = (
+    "import json, sys; import start; start.initialize_menu(); "
+    f"print(json.dumps([name for name in {DEFERRED_MODULES!r} if name in sys.modules]))"
+)
+
+# 预算放宽到远高于正常耗时，只拦截明显的回退（例如顶层重新导入了重型依赖）
+BUDGET_MS = 1500.0
+
+
+def test_menu_cold_start_within_budget():
+    assert import_profile.check_budget(BUDGET_MS, runs=3)
+
+
+def test_menu_does_not_import_deferred_modules():
+    # 在新的解释器中检查，避免受其他测试已导入模块的影响
+    result = subprocess.run([sys.executable, '-c', MODULES_PROBE], cwd=str(import_profile.SCRIPT_DIR),
+                            stdin=subprocess.DEVNULL, capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0, result.stderr
+    assert json.loads(result.stdout.strip().splitlines()[-1]) == []
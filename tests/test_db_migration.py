@@ -0,0 +1,122 @@
+import json
+import sqlite3
+from contextlib import closing
+
+import pytest
+
+from db_migration import JsonDirSource, load_checkpoints, run_migration, verify_migration
+from db_maintenance import connect_db
+
+
+def _message(index, with_user=True):
+    """0.6.x 的消息文档（mongoexport 扩展 JSON）"""
+    doc = {
+        '_id': {'$oid': f"{index:024x}"},
+        'message_id': index,
+        'time': 1700000000 + index,
+        'chat_id': 'chat_a',
+        'chat_info': {
+            'stream_id': 'chat_a', 'platform': 'qq',
+            'user_info': {'platform': 'qq', 'user_id': 10001, 'user_nickname': '群主'},
+            'group_info': {'platform': 'qq', 'group_id': 20001, 'group_name': '测试群'},
+            'create_time': 1690000000, 'last_active_time': 1700000000,
+        },
+        'processed_plain_text': f"消息 {index}",
+        'memorized_times': {'$numberInt': '0'},
+    }
+    if with_user:
+        doc['user_info'] = {'platform': 'qq', 'user_id': 30000 + index, 'user_nickname': f"用户{index}",
+                            'user_cardname': None}
+    return doc
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    """新版 MaiBot.db 中相关表的结构"""
+    path = tmp_path / 'MaiBot.db'
+    with closing(sqlite3.connect(path)) as conn:
+        conn.executescript("""
+            CREATE TABLE messages (id INTEGER PRIMARY KEY, message_id TEXT, time REAL, chat_id TEXT,
+                chat_info_stream_id TEXT, chat_info_platform TEXT, chat_info_user_platform TEXT,
+                chat_info_user_id TEXT, chat_info_user_nickname TEXT, chat_info_user_cardname TEXT,
+                chat_info_group_platform TEXT, chat_info_group_id TEXT, chat_info_group_name TEXT,
+                chat_info_create_time REAL, chat_info_last_active_time REAL, user_platform TEXT, user_id TEXT,
+                user_nickname TEXT, user_cardname TEXT, processed_plain_text TEXT, memorized_times INTEGER);
+            CREATE TABLE chat_streams (id INTEGER PRIMARY KEY, stream_id TEXT, create_time REAL,
+                group_platform TEXT, group_id TEXT, group_name TEXT, last_active_time REAL, platform TEXT,
+                user_platform TEXT, user_id TEXT, user_nickname TEXT, user_cardname TEXT);
+        """)
+    return path
+
+
+def _export(directory, name, docs):
+    directory.mkdir(exist_ok=True)
+    with open(directory / f"{name}.json", 'w', encoding='utf-8') as f:
+        for doc in docs:
+            f.write(json.dumps(doc, ensure_ascii=False) + '\n')
+    return directory
+
+
+def test_nested_fields_map_to_maibot_columns(tmp_path, db_path):
+    source_dir = _export(tmp_path / 'export', 'messages', [_message(i) for i in range(5)])
+    _export(source_dir, 'chat_streams', [{
+        '_id': {'$oid': 'a' * 24}, 'stream_id': 'chat_a', 'platform': 'qq',
+        'create_time': {'$date': '2023-07-22T04:26:40Z'}, 'last_active_time': 1700000000,
+        'group_info': {'platform': 'qq', 'group_id': 20001, 'group_name': '测试群'},
+        'user_info': {'platform': 'qq', 'user_id': 10001, 'user_nickname': '群主'},
+    }])
+    results = run_migration(db_path, JsonDirSource(source_dir), batch_size=2, backup=False)
+    assert all(result['ok'] for result in results.values())
+    assert results['messages']['unmatched'] == []
+
+    with closing(sqlite3.connect(db_path)) as conn:
+        conn.row_factory = sqlite3.Row
+        row = conn.execute("SELECT * FROM messages WHERE message_id = '3'").fetchone()
+        stream = conn.execute("SELECT * FROM chat_streams").fetchone()
+    assert (row['user_id'], row['user_nickname'], row['user_platform']) == ('30003', '用户3', 'qq')
+    assert (row['chat_info_user_id'], row['chat_info_group_id'], row['chat_info_group_name']) == (
+        '10001', '20001', '测试群')
+    assert row['memorized_times'] == 0
+    assert (stream['group_id'], stream['user_nickname']) == ('20001', '群主')
+    assert stream['create_time'] == 1690000000
+
+
+def test_verify_fails_when_required_column_is_empty(tmp_path, db_path):
+    source_dir = _export(tmp_path / 'export', 'messages', [_message(i, with_user=False) for i in range(3)])
+    results = run_migration(db_path, JsonDirSource(source_dir), backup=False)
+    assert results['messages']['migrated'] == 3
+    assert results['messages']['empty_columns'] == ['user_id']
+    assert not results['messages']['ok']
+
+
+class _FailingSource(JsonDirSource):
+    """读到第 fail_after 批时中断"""
+
+    def __init__(self, directory, fail_after):
+        super().__init__(directory)
+        self.fail_after = fail_after
+
+    def iter_batches(self, name, position, batch_size):
+        for index, item in enumerate(super().iter_batches(name, position, batch_size)):
+            if index == self.fail_after:
+                raise KeyboardInterrupt
+            yield item
+
+
+def test_interrupted_migration_resumes_without_duplicates(tmp_path, db_path):
+    source_dir = _export(tmp_path / 'export', 'messages', [_message(i) for i in range(7)])
+    with pytest.raises(KeyboardInterrupt):
+        run_migration(db_path, _FailingSource(source_dir, fail_after=2), batch_size=2, backup=False)
+    with closing(connect_db(db_path, readonly=True)) as conn:
+        checkpoint = load_checkpoints(conn)['messages']
+    assert (checkpoint['status'], checkpoint['migrated'], checkpoint['position']) == ('running', 4, '4')
+
+    results = run_migration(db_path, JsonDirSource(source_dir), batch_size=2, backup=False)
+    assert results['messages']['ok']
+    with closing(sqlite3.connect(db_path)) as conn:
+        ids = [row[0] for row in conn.execute("SELECT message_id FROM messages ORDER BY time")]
+    assert ids == [str(i) for i in range(7)]
+
+    # 单独核对时也与源一致
+    with closing(connect_db(db_path, readonly=True)) as conn:
+        assert verify_migration(conn, JsonDirSource(source_dir))['messages']['ok']
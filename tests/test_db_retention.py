@@ -0,0 +1,134 @@
+import sqlite3
+import time
+from contextlib import closing
+
+import pytest
+
+from db_maintenance import connect_db
+from db_retention import apply_retention, discover_targets
+
+DAY = 86400
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    """按麦麦的表结构构造一个小数据库：新旧消息各半，一个创建很早但仍活跃的聊天流和一个早已不活跃的聊天流"""
+    path = tmp_path / 'MaiBot.db'
+    now = time.time()
+    with closing(sqlite3.connect(path)) as conn:
+        conn.executescript("""
+            PRAGMA foreign_keys = ON;
+            CREATE TABLE messages (id INTEGER PRIMARY KEY, message_id TEXT UNIQUE, time REAL, chat_id TEXT,
+                                   processed_plain_text TEXT);
+            CREATE TABLE message_images (id INTEGER PRIMARY KEY,
+                                         message_id TEXT REFERENCES messages(message_id), path TEXT);
+            CREATE TABLE chat_streams (id INTEGER PRIMARY KEY, stream_id TEXT, create_time REAL,
+                                       last_active_time REAL, group_id TEXT);
+            CREATE TABLE llm_usage (id INTEGER PRIMARY KEY, timestamp TEXT, model_name TEXT);
+        """)
+        for i in range(20):
+            age = 60 if i % 2 else 1
+            conn.execute("INSERT INTO messages (message_id, time, chat_id, processed_plain_text) VALUES (?, ?, ?, ?)",
+                         (f"m{i}", now - age * DAY - i, 'chat_a' if i < 14 else 'chat_b', f"消息 {i}"))
+            conn.execute("INSERT INTO message_images (message_id, path) VALUES (?, ?)", (f"m{i}", f"{i}.png"))
+        conn.execute("INSERT INTO chat_streams (stream_id, create_time, last_active_time, group_id) "
+                     "VALUES ('chat_a', ?, ?, '1001')", (now - 400 * DAY, now))
+        conn.execute("INSERT INTO chat_streams (stream_id, create_time, last_active_time, group_id) "
+                     "VALUES ('chat_old', ?, ?, '1002')", (now - 400 * DAY, now - 200 * DAY))
+        conn.commit()
+    return path
+
+
+def _count(path, sql):
+    with closing(sqlite3.connect(path)) as conn:
+        return conn.execute(sql).fetchone()[0]
+
+
+def test_discovery_skips_registry_tables(db_path):
+    with closing(connect_db(db_path, readonly=True)) as conn:
+        targets = {target['table']: target for target in discover_targets(conn)}
+    assert set(targets) == {'messages'}
+    assert targets['messages']['time_column'] == 'time'
+    assert targets['messages']['chat_column'] == 'chat_id'
+    assert targets['messages']['time_format'] == 'epoch_s'
+    assert targets['messages']['references'] == [
+        {'table': 'message_images', 'column': 'message_id', 'parent_column': 'message_id'}]
+
+
+def test_prune_by_age_keeps_recent_messages_and_active_streams(db_path):
+    summary = apply_retention(db_path, max_age_days=30, sleep=0)
+    assert summary == {'messages': 10}
+    assert _count(db_path, "SELECT COUNT(*) FROM messages") == 10
+    assert _count(db_path, "SELECT MIN(time) FROM messages") > time.time() - 2 * DAY
+    # 引用被删消息的记录一起删除
+    assert _count(db_path, "SELECT COUNT(*) FROM message_images") == 10
+    assert _count(db_path, "SELECT COUNT(*) FROM chat_streams") == 2
+
+
+def test_explicit_registry_table_uses_last_activity(db_path):
+    with closing(connect_db(db_path, readonly=True)) as conn:
+        [target] = discover_targets(conn, ['chat_streams'])
+    assert target['time_column'] == 'last_active_time'
+    assert apply_retention(db_path, max_age_days=30, tables=['chat_streams'], sleep=0) == {'chat_streams': 1}
+    with closing(sqlite3.connect(db_path)) as conn:
+        assert [row[0] for row in conn.execute("SELECT stream_id FROM chat_streams")] == ['chat_a']
+
+
+def test_prune_by_cap_keeps_newest_per_chat(db_path):
+    assert apply_retention(db_path, per_chat_cap=5, sleep=0, batch_size=3) == {'messages': 10}
+    with closing(sqlite3.connect(db_path)) as conn:
+        counts = dict(conn.execute("SELECT chat_id, COUNT(*) FROM messages GROUP BY chat_id"))
+        kept_b = {row[0] for row in conn.execute("SELECT message_id FROM messages WHERE chat_id = 'chat_b'")}
+    assert counts == {'chat_a': 5, 'chat_b': 5}
+    # chat_b 有 6 条，只删掉最旧的 m19
+    assert kept_b == {'m14', 'm15', 'm16', 'm17', 'm18'}
+
+
+def test_dry_run_does_not_delete(db_path):
+    assert apply_retention(db_path, max_age_days=30, dry_run=True) == {'messages': 10}
+    assert _count(db_path, "SELECT COUNT(*) FROM messages") == 20
+
+
+
+def _run_menu(db_path, monkeypatch, answers):
+    """以给定的输入运行交互菜单，返回清理后调用的整理操作"""
+    import db_backup
+    import db_retention
+    calls = []
+    incremental_vacuum_db, run_maintenance = db_retention.incremental_vacuum_db, db_retention.run_maintenance
+    monkeypatch.setattr(db_retention, 'resolve_db_path', lambda: db_path)
+    monkeypatch.setattr(db_retention, 'incremental_vacuum_db',
+                        lambda *args: calls.append('incremental') or incremental_vacuum_db(*args))
+    monkeypatch.setattr(db_retention, 'run_maintenance',
+                        lambda *args: calls.append(args[1]) or run_maintenance(*args))
+    monkeypatch.setattr(db_backup, 'create_backup', lambda *args, **kwargs: True)
+    replies = iter(answers)
+    monkeypatch.setattr('builtins.input', lambda prompt='': next(replies))
+    assert db_retention.interactive_retention_menu()
+    assert next(replies, None) is None
+    return calls
+
+
+def _errors(caplog):
+    return [record.getMessage() for record in caplog.records if record.levelname == 'ERROR']
+
+
+def test_menu_skips_vacuum_without_incremental_mode(db_path, monkeypatch, caplog):
+    # 麦麦默认的数据库 auto_vacuum=NONE：询问是否完整 VACUUM，拒绝后跳过且不报错
+    assert _run_menu(db_path, monkeypatch, ['30', '', 'y', 'n']) == []
+    assert _count(db_path, "SELECT COUNT(*) FROM messages") == 10
+    assert _errors(caplog) == []
+
+
+def test_menu_runs_full_vacuum_when_confirmed(db_path, monkeypatch, caplog):
+    assert _run_menu(db_path, monkeypatch, ['30', '', 'y', 'y']) == [['vacuum']]
+    assert _errors(caplog) == []
+
+
+def test_menu_uses_incremental_vacuum_when_enabled(db_path, monkeypatch, caplog):
+    with closing(sqlite3.connect(db_path)) as conn:
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        conn.execute("VACUUM")
+    # 开启了增量整理时直接在线整理，不再询问
+    assert _run_menu(db_path, monkeypatch, ['30', '', 'y']) == ['incremental']
+    assert _errors(caplog) == []
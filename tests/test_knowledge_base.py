@@ -0,0 +1,45 @@
+import os
+
+import pytest
+
+import knowledge_base
+
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    """临时的 data 目录，扫描缓存也写到临时目录"""
+    data = tmp_path / 'data'
+    (data / 'rag' / 'sub').mkdir(parents=True)
+    (data / 'embedding').mkdir()
+    monkeypatch.setattr(knowledge_base, 'CACHE_PATH', tmp_path / 'kb_inventory.json')
+    monkeypatch.setattr(knowledge_base, 'get_data_dir', lambda instance=None: data)
+    return data
+
+
+def test_inventory_restats_rewritten_files(data_dir):
+    big = data_dir / 'rag' / 'sub' / 'big.bin'
+    big.write_bytes(b'x' * 300_000)
+    (data_dir / 'rag' / 'a.txt').write_text('abc', encoding='utf-8')
+    first = knowledge_base.build_inventory()['rag']
+    assert first['size'] == 300_003 and first['cached_dirs'] == 0
+
+    # 原地改写文件，目录修改时间保持不变
+    dir_stat = os.stat(big.parent)
+    with open(big, 'r+b') as f:
+        f.truncate(100)
+    os.utime(big, (dir_stat.st_atime + 10, dir_stat.st_mtime + 10))
+    os.utime(big.parent, ns=(dir_stat.st_atime_ns, dir_stat.st_mtime_ns))
+
+    second = knowledge_base.build_inventory()['rag']
+    assert second['cached_dirs'] == 2
+    assert second['size'] == 103
+    assert second['largest'][0] == {'file': 'sub/big.bin', 'size': 100}
+    assert second['newest'] == pytest.approx(dir_stat.st_mtime + 10)
+
+
+def test_inventory_rescans_changed_directory(data_dir):
+    (data_dir / 'rag' / 'a.txt').write_text('abc', encoding='utf-8')
+    knowledge_base.build_inventory()
+    (data_dir / 'rag' / 'sub' / 'new.txt').write_text('hello', encoding='utf-8')
+    inventory = knowledge_base.build_inventory()['rag']
+    assert inventory['files'] == 2 and inventory['size'] == 8
@@ -0,0 +1,46 @@
+import sys
+
+import pytest
+
+import precompile
+
+
+@pytest.fixture
+def maibot_tree(tmp_path):
+    """安装在名为 data 的上级目录中的 MaiBot 目录树，其中自带 data 和 logs 目录"""
+    root = tmp_path / 'data' / 'pk' / 'modules' / 'MaiBot'
+    (root / 'src' / 'data').mkdir(parents=True)
+    (root / 'logs').mkdir()
+    (root / 'bot.py').write_text('print("bot")\n', encoding='utf-8')
+    (root / 'src' / 'main.py').write_text('x = 1\n', encoding='utf-8')
+    (root / 'src' / 'data' / 'skip.py').write_text('y = 2\n', encoding='utf-8')
+    (root / 'logs' / 'skip.py').write_text('z = 3\n', encoding='utf-8')
+    return {'name': 'maibot', 'label': 'MaiBot', 'path': root, 'exclude': precompile.REPO_EXCLUDED_DIRS}
+
+
+def test_exclude_is_anchored_to_tree_root(maibot_tree):
+    root = maibot_tree['path']
+    ok, _ = precompile.compile_tree(sys.executable, maibot_tree, workers=1)
+    assert ok
+    tag = sys.implementation.cache_tag
+    assert (root / '__pycache__' / f'bot.{tag}.pyc').exists()
+    assert (root / 'src' / '__pycache__' / f'main.{tag}.pyc').exists()
+    assert not (root / 'src' / 'data' / '__pycache__').exists()
+    assert not (root / 'logs' / '__pycache__').exists()
+    assert precompile.count_bytecode(root, maibot_tree['exclude'], tag) == 2
+
+
+def test_signature_not_recorded_without_bytecode(maibot_tree, tmp_path, monkeypatch):
+    monkeypatch.setattr(precompile, 'STATE_PATH', tmp_path / 'precompile.json')
+    monkeypatch.setattr(precompile, 'get_python_path', lambda: sys.executable)
+    monkeypatch.setattr(precompile, 'get_trees', lambda info: [maibot_tree])
+    compile_tree = precompile.compile_tree
+    # 模拟 compileall 什么都没编译却返回成功
+    monkeypatch.setattr(precompile, 'compile_tree', lambda python, tree, workers=0: (True, 0.1))
+    assert not precompile.precompile(measure=False)
+    assert 'maibot' not in precompile.load_state()['trees']
+
+    monkeypatch.setattr(precompile, 'compile_tree', compile_tree)
+    assert precompile.precompile(measure=False)
+    record = precompile.load_state()['trees']['maibot']
+    assert record['files'] == 2 and record['complete']
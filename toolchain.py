@@ -0,0 +1,266 @@
+# -*- coding: utf-8 -*-
+"""
+工具链注册表
+功能：统一查找一键包使用的 Python 解释器、Git、NapCat 和编辑器，并把路径和版本缓存到 runtime/toolchain.json
+
+- 首次查找时按优先级探测候选路径（内置运行时优先，其次为系统 PATH），并记录版本
+- 之后只对缓存的路径做一次 stat 校验（修改时间和大小未变即视为有效），不再启动子进程探测
+- 同时支持 Windows 一键包布局（runtime/python31211/python.exe、PortableGit）
+  和 Linux 布局（runtime/python31211/bin/python3、系统 git）
+
+用法：
+    python toolchain.py            # 显示当前工具链
+    python toolchain.py refresh    # 忽略缓存重新探测
+"""
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+from pathlib import Path
+from typing import Optional
+
+try:
+    from modules.MaiBot.src.common.logger import get_logger
+    logger = get_logger("toolchain")
+except ImportError:
+    import logging as logger
+    logger.basicConfig(level=logger.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    logger = logger.getLogger("toolchain")
+
+from safe_io import atomic_write_json
+from tracing import traced_run
+
+SCRIPT_DIR = Path(__file__).parent.absolute()
+RUNTIME_DIR = SCRIPT_DIR / 'runtime'
+CACHE_PATH = RUNTIME_DIR / 'toolchain.json'
+CACHE_VERSION = 1
+IS_WINDOWS = os.name == 'nt'
+
+TOOL_NAMES = ('python', 'git', 'napcat', 'napcat_headed', 'editor')
+TOOL_LABELS = {
+    'python': 'Python解释器',
+    'git': 'Git',
+    'napcat': 'NapCat（无头模式）',
+    'napcat_headed': 'NapCat（有头模式）',
+    'editor': 'VSCode',
+}
+
+# 进程内缓存，同一次运行只读取一次缓存文件
+_resolved: dict = {}
+_cache: Optional[dict] = None
+
+
+def get_bundled_candidates(name: str) -> list[Path]:
+    """一键包内置的候选路径，按优先级排列"""
+    python_dir = RUNTIME_DIR / 'python31211'
+    if name == 'python':
+        if IS_WINDOWS:
+            return [python_dir / 'bin' / 'python.exe', python_dir / 'python.exe']
+        return [python_dir / 'bin' / 'python3', python_dir / 'bin' / 'python']
+    if name == 'git':
+        if IS_WINDOWS:
+            return [RUNTIME_DIR / 'PortableGit' / 'bin' / 'git.exe', RUNTIME_DIR / 'PortableGit' / 'cmd' / 'git.exe']
+        return [RUNTIME_DIR / 'git' / 'bin' / 'git']
+    if name == 'napcat':
+        if IS_WINDOWS:
+            return [SCRIPT_DIR / 'modules' / 'napcat' / 'NapCatWinBootMain.exe']
+        return [SCRIPT_DIR / 'modules' / 'napcat' / 'napcat.sh']
+    if name == 'napcat_headed':
+        if IS_WINDOWS:
+            return [SCRIPT_DIR / 'modules' / 'napcatframework' / 'NapCatWinBootMain.exe']
+        return []
+    if name == 'editor':
+        if IS_WINDOWS:
+            return [SCRIPT_DIR / 'modules' / 'vscode' / 'Code.exe']
+        return [SCRIPT_DIR / 'modules' / 'vscode' / 'bin' / 'code', SCRIPT_DIR / 'modules' / 'vscode' / 'code']
+    raise ValueError(f"未知的工具: {name}")
+
+
+def _system_candidate(name: str) -> Optional[Path]:
+    """系统中的候选路径（PATH 或当前解释器）"""
+    if name == 'python':
+        return Path(sys.executable).absolute() if sys.executable else None
+    command = {'git': 'git', 'napcat': 'napcat', 'editor': 'code'}.get(name)
+    found = shutil.which(command) if command else None
+    return Path(found).absolute() if found else None
+
+
+def _read_package_version(package_json: Path) -> Optional[str]:
+    try:
+        with open(package_json, 'r', encoding='utf-8') as f:
+            return json.load(f).get('version')
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def _run_version(args: list[str]) -> Optional[str]:
+    try:
+        result = traced_run(args, name=f"探测版本 {Path(args[0]).name}", kind='probe',
+                            capture_output=True, text=True, timeout=10)
+    except (subprocess.TimeoutExpired, OSError):
+        return None
+    output = (result.stdout or result.stderr).strip()
+    if result.returncode != 0 or not output:
+        return None
+    return output.splitlines()[0].strip()
+
+
+def _probe_version(name: str, path: Path) -> Optional[str]:
+    """探测工具版本，只在发现新路径时调用"""
+    if name == 'python':
+        if Path(sys.executable).absolute() == path:
+            return sys.version.split()[0]
+        version = _run_version([str(path), '--version'])
+        return version.split()[-1] if version else None
+    if name == 'git':
+        version = _run_version([str(path), '--version'])
+        return version.split()[-1] if version else None
+    if name in ('napcat', 'napcat_headed'):
+        return _read_package_version(path.parent / 'package.json')
+    if name == 'editor':
+        version = _read_package_version(path.parent / 'resources' / 'app' / 'package.json')
+        return version or _run_version([str(path), '--version'])
+    return None
+
+
+def _stat_signature(path: Path) -> Optional[dict]:
+    try:
+        stat = path.stat()
+    except OSError:
+        return None
+    if not path.is_file():
+        return None
+    return {'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size}
+
+
+def _load_cache() -> dict:
+    global _cache
+    if _cache is None:
+        try:
+            with open(CACHE_PATH, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') != CACHE_VERSION or data.get('platform') != sys.platform:
+                data = {}
+        except (OSError, ValueError):
+            data = {}
+        _cache = {'version': CACHE_VERSION, 'platform': sys.platform, 'tools': data.get('tools', {})}
+    return _cache
+
+
+def _save_cache() -> None:
+    try:
+        atomic_write_json(CACHE_PATH, _load_cache(), indent=2, ensure_ascii=False)
+    except OSError as e:
+        logger.warning(f"保存工具链缓存失败: {e}")
+
+
+def _is_entry_valid(name: str, entry: dict) -> bool:
+    """用 stat 校验缓存项：文件未变化，且系统路径项没有被新装的内置运行时取代"""
+    path = Path(entry.get('path', ''))
+    if _stat_signature(path) != entry.get('signature'):
+        return False
+    if entry.get('source') == 'system':
+        return not any(candidate.is_file() for candidate in get_bundled_candidates(name))
+    return True
+
+
+def _discover(name: str) -> Optional[dict]:
+    for candidate in get_bundled_candidates(name):
+        signature = _stat_signature(candidate)
+        if signature:
+            return {'path': str(candidate), 'source': 'bundled', 'signature': signature,
+                    'version': _probe_version(name, candidate)}
+    candidate = _system_candidate(name)
+    signature = _stat_signature(candidate) if candidate else None
+    if signature:
+        return {'path': str(candidate), 'source': 'system', 'signature': signature,
+                'version': _probe_version(name, candidate)}
+    return None
+
+
+def resolve_tool(name: str, refresh: bool = False) -> Optional[dict]:
+    """查找工具，返回缓存项
+
+    Args:
+        name: 工具名称，见 TOOL_NAMES
+        refresh: 是否忽略缓存重新探测
+
+    Returns:
+        Optional[dict]: 包含 path、source（bundled/system）、version 的字典，未找到返回 None
+    """
+    if name not in TOOL_NAMES:
+        raise ValueError(f"未知的工具: {name}")
+    if not refresh and name in _resolved:
+        return _resolved[name]
+
+    tools = _load_cache()['tools']
+    entry = tools.get(name)
+    if refresh or not entry or not _is_entry_valid(name, entry):
+        previous, entry = entry, _discover(name)
+        if entry:
+            tools[name] = entry
+        else:
+            tools.pop(name, None)
+        if entry != previous:
+            _save_cache()
+    _resolved[name] = entry
+    return entry
+
+
+def find_tool(name: str, refresh: bool = False) -> Optional[str]:
+    """查找工具路径，未找到返回 None"""
+    entry = resolve_tool(name, refresh)
+    return entry['path'] if entry else None
+
+
+def get_tool_version(name: str) -> Optional[str]:
+    """获取工具版本，未知返回 None"""
+    entry = resolve_tool(name)
+    return entry.get('version') if entry else None
+
+
+def get_python_path() -> str:
+    """获取用于启动各模块的 Python 解释器，找不到内置运行时时使用当前解释器"""
+    return find_tool('python') or sys.executable
+
+
+def refresh_toolchain() -> dict:
+    """重新探测全部工具"""
+    return {name: resolve_tool(name, refresh=True) for name in TOOL_NAMES}
+
+
+def print_toolchain(entries: dict) -> None:
+    for name in TOOL_NAMES:
+        entry = entries.get(name)
+        label = TOOL_LABELS[name]
+        if entry:
+            source = '内置' if entry['source'] == 'bundled' else '系统'
+            print(f"{label:<16} {entry.get('version') or '未知版本':<12} [{source}] {entry['path']}")
+        else:
+            print(f"{label:<16} 未找到")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='工具链查找与缓存')
+    parser.add_argument('command', nargs='?', choices=['show', 'refresh'], default='show',
+                        help='show: 显示当前工具链；refresh: 忽略缓存重新探测')
+    parser.add_argument('--json', action='store_true', help='以 JSON 格式输出')
+    args = parser.parse_args()
+
+    if args.command == 'refresh':
+        entries = refresh_toolchain()
+    else:
+        entries = {name: resolve_tool(name) for name in TOOL_NAMES}
+
+    if args.json:
+        print(json.dumps(entries, indent=2, ensure_ascii=False))
+    else:
+        print_toolchain(entries)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,310 @@
+# -*- coding: utf-8 -*-
+"""
+操作追踪
+功能：把启动器、更新脚本和后台任务中的每个操作（尤其是子进程）记录为一个 span，写入 runtime/traces/spans.jsonl
+
+- span 记录名称、命令、工作目录、开始时间、耗时、退出码和输出字节数，并通过 parent_id 嵌套
+  （例如 "更新 MaiBot主仓库" → "git fetch origin"）
+- 同一进程内按线程维护当前 span；启动子进程时通过环境变量 ONEKEY_TRACE_PARENT 传递父 span，
+  子进程中的 span 会挂在父进程的 span 下面
+- 设置环境变量 ONEKEY_TRACE=0 可关闭记录
+
+用法：
+    python tracing.py summary [--runs 5] [--top 20]   # 按操作名汇总，找出总耗时最多的操作
+    python tracing.py slowest [--runs 5] [--top 20]   # 最慢的单次操作
+    python tracing.py tree [RUN_ID]                   # 显示一次运行的嵌套结构，默认最近一次
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Iterator, Optional
+
+SCRIPT_DIR = Path(__file__).parent.absolute()
+TRACE_DIR = SCRIPT_DIR / 'runtime' / 'traces'
+TRACE_PATH = TRACE_DIR / 'spans.jsonl'
+MAX_TRACE_BYTES = 5 * 1024 * 1024  # 超过后轮换为 spans.jsonl.1
+ENV_PARENT = 'ONEKEY_TRACE_PARENT'
+ENABLED = os.environ.get('ONEKEY_TRACE', '1') != '0'
+
+# 由父进程传入的 "<run_id>:<span_id>"，没有时本进程开始一次新的运行
+_inherited_run, _, _inherited_parent = os.environ.get(ENV_PARENT, '').partition(':')
+RUN_ID = _inherited_run or uuid.uuid4().hex[:12]
+ROOT_PARENT = _inherited_parent or None
+
+_local = threading.local()
+_write_lock = threading.Lock()
+
+
+class Span:
+    """一个进行中的操作，结束时写入追踪文件"""
+
+    def __init__(self, name: str, parent_id: Optional[str], attrs: dict):
+        self.span_id = uuid.uuid4().hex[:12]
+        self.parent_id = parent_id
+        self.name = name
+        self.attrs = attrs
+        self.bytes_out = 0
+        self.bytes_err = 0
+
+    def set(self, **attrs) -> None:
+        """设置附加字段，例如 exit_code"""
+        self.attrs.update(attrs)
+
+    def add_bytes(self, out: int = 0, err: int = 0) -> None:
+        """累加子进程输出的字节数"""
+        self.bytes_out += out
+        self.bytes_err += err
+
+
+def _stack() -> list[Span]:
+    stack = getattr(_local, 'stack', None)
+    if stack is None:
+        stack = _local.stack = []
+    return stack
+
+
+def current_span() -> Optional[Span]:
+    """当前线程正在进行的 span"""
+    stack = _stack()
+    return stack[-1] if stack else None
+
+
+def _write(record: dict) -> None:
+    if not ENABLED:
+        return
+    line = json.dumps(record, ensure_ascii=False) + '\n'
+    with _write_lock:
+        try:
+            TRACE_DIR.mkdir(parents=True, exist_ok=True)
+            if TRACE_PATH.exists() and TRACE_PATH.stat().st_size > MAX_TRACE_BYTES:
+                os.replace(TRACE_PATH, TRACE_PATH.with_name(TRACE_PATH.name + '.1'))
+            with open(TRACE_PATH, 'a', encoding='utf-8') as f:
+                f.write(line)
+        except OSError:
+            pass  # 追踪失败不影响实际操作
+
+
+@contextmanager
+def span(name: str, parent: Optional[Span] = None, **attrs) -> Iterator[Span]:
+    """记录一个操作
+
+    Args:
+        name: 操作名称，相同名称在汇总时合并统计
+        parent: 父 span，默认为当前线程正在进行的 span（在线程池中执行时需要显式传入）
+        **attrs: 附加字段，例如 kind、command、cwd
+
+    Yields:
+        Span: 可通过 set() 补充退出码等字段
+    """
+    stack = _stack()
+    if parent is not None:
+        parent_id = parent.span_id
+    else:
+        parent_id = stack[-1].span_id if stack else ROOT_PARENT
+    current = Span(name, parent_id, attrs)
+    stack.append(current)
+    started_at = time.time()
+    started = time.perf_counter()
+    try:
+        yield current
+    except BaseException as e:
+        current.attrs.setdefault('status', 'error')
+        current.attrs['error'] = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        stack.remove(current)
+        exit_code = current.attrs.get('exit_code')
+        status = current.attrs.pop('status', None) or ('failed' if exit_code not in (None, 0) else 'ok')
+        _write({
+            'run_id': RUN_ID,
+            'span_id': current.span_id,
+            'parent_id': parent_id,
+            'name': name,
+            'start': round(started_at, 3),
+            'duration': round(time.perf_counter() - started, 4),
+            'status': status,
+            'bytes_out': current.bytes_out,
+            'bytes_err': current.bytes_err,
+            'pid': os.getpid(),
+            'script': Path(sys.argv[0]).name if sys.argv and sys.argv[0] else None,
+            **current.attrs,
+        })
+
+
+def child_env(env: Optional[dict] = None) -> dict:
+    """返回带有当前 span 信息的环境变量，传给子进程后其中的 span 会挂在当前 span 下面"""
+    env = dict(os.environ if env is None else env)
+    parent = current_span()
+    parent_id = parent.span_id if parent else ROOT_PARENT
+    env[ENV_PARENT] = f"{RUN_ID}:{parent_id or ''}"
+    return env
+
+
+def _command_text(command) -> str:
+    return command if isinstance(command, str) else subprocess.list2cmdline([str(arg) for arg in command])
+
+
+def traced_run(command, name: Optional[str] = None, kind: str = 'command', **kwargs) -> subprocess.CompletedProcess:
+    """带追踪的 subprocess.run，记录命令、工作目录、退出码和捕获的输出字节数
+
+    Args:
+        command: 同 subprocess.run
+        name: span 名称，默认为命令本身
+        kind: span 类型
+        **kwargs: 传给 subprocess.run 的其他参数
+    """
+    text = _command_text(command)
+    cwd = kwargs.get('cwd')
+    with span(name or text, kind=kind, command=text, cwd=str(cwd) if cwd else None) as current:
+        kwargs['env'] = child_env(kwargs.get('env'))
+        result = subprocess.run(command, **kwargs)
+        current.set(exit_code=result.returncode)
+        for attr, field in (('stdout', 'out'), ('stderr', 'err')):
+            output = getattr(result, attr)
+            if output:
+                size = len(output.encode('utf-8', errors='replace')) if isinstance(output, str) else len(output)
+                current.add_bytes(**{field: size})
+        return result
+
+
+def load_spans(path: Path = TRACE_PATH) -> list[dict]:
+    """读取追踪记录（包含轮换出去的旧文件），跳过损坏的行"""
+    spans = []
+    for candidate in (path.with_name(path.name + '.1'), path):
+        try:
+            with open(candidate, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        spans.append(json.loads(line))
+                    except ValueError:
+                        continue
+        except OSError:
+            continue
+    return spans
+
+
+def select_runs(spans: list[dict], runs: Optional[int]) -> list[dict]:
+    """只保留最近 runs 次运行的记录"""
+    if not runs:
+        return spans
+    first_seen = {}
+    for record in spans:
+        first_seen.setdefault(record['run_id'], record['start'])
+    recent = set(sorted(first_seen, key=first_seen.get)[-runs:])
+    return [record for record in spans if record['run_id'] in recent]
+
+
+def summarize(spans: list[dict], top: int = 20) -> list[dict]:
+    """按操作名汇总，按总耗时排序"""
+    groups: dict[str, dict] = {}
+    for record in spans:
+        group = groups.setdefault(record['name'], {'name': record['name'], 'count': 0, 'total': 0.0,
+                                                   'max': 0.0, 'failed': 0, 'bytes': 0})
+        group['count'] += 1
+        group['total'] += record['duration']
+        group['max'] = max(group['max'], record['duration'])
+        group['failed'] += record['status'] != 'ok'
+        group['bytes'] += record.get('bytes_out', 0) + record.get('bytes_err', 0)
+    for group in groups.values():
+        group['mean'] = group['total'] / group['count']
+    return sorted(groups.values(), key=lambda group: group['total'], reverse=True)[:top]
+
+
+def _short(text: Optional[str], width: int) -> str:
+    text = text or ''
+    return text if len(text) <= width else text[:width - 3] + '...'
+
+
+def print_summary(spans: list[dict], top: int) -> None:
+    if not spans:
+        print("暂无追踪记录")
+        return
+    runs = len({record['run_id'] for record in spans})
+    print(f"共 {runs} 次运行，{len(spans)} 个操作")
+    # 表头中的中文占两列宽度，按显示宽度手工对齐
+    print("   总耗时(秒)   次数    平均(秒)    最长(秒)  失败      输出  操作")
+    for group in summarize(spans, top):
+        print(f"{group['total']:>12.2f}{group['count']:>7}{group['mean']:>12.2f}{group['max']:>12.2f}"
+              f"{group['failed']:>6}{group['bytes'] / 1024:>9.0f}K  {_short(group['name'], 60)}")
+
+
+def print_slowest(spans: list[dict], top: int) -> None:
+    if not spans:
+        print("暂无追踪记录")
+        return
+    for record in sorted(spans, key=lambda record: record['duration'], reverse=True)[:top]:
+        started = datetime.fromtimestamp(record['start']).strftime('%m-%d %H:%M:%S')
+        exit_code = record.get('exit_code')
+        status = record['status'] if exit_code is None else f"{record['status']}({exit_code})"
+        print(f"{record['duration']:>9.2f}s  {started}  {record['run_id']}  {status:<10} {_short(record['name'], 60)}")
+        if record.get('command') and record['command'] != record['name']:
+            print(f"{'':>12}{_short(record['command'], 100)}")
+
+
+def print_tree(spans: list[dict], run_id: Optional[str] = None) -> bool:
+    """打印一次运行中各操作的嵌套关系"""
+    if not spans:
+        print("暂无追踪记录")
+        return False
+    if run_id in (None, 'latest'):
+        run_id = max(spans, key=lambda record: record['start'])['run_id']
+    records = sorted((record for record in spans if record['run_id'] == run_id), key=lambda record: record['start'])
+    if not records:
+        print(f"找不到运行 {run_id}")
+        return False
+    ids = {record['span_id'] for record in records}
+    children: dict[Optional[str], list[dict]] = {}
+    for record in records:
+        parent = record['parent_id'] if record['parent_id'] in ids else None
+        children.setdefault(parent, []).append(record)
+
+    print(f"运行 {run_id}，开始于 {datetime.fromtimestamp(records[0]['start']):%Y-%m-%d %H:%M:%S}")
+
+    def show(parent: Optional[str], depth: int) -> None:
+        for record in children.get(parent, []):
+            exit_code = record.get('exit_code')
+            suffix = '' if record['status'] == 'ok' else f" [{record['status']}{'' if exit_code is None else f' {exit_code}'}]"
+            print(f"{'  ' * depth}{record['duration']:>8.2f}s  {_short(record['name'], 70)}{suffix}")
+            show(record['span_id'], depth + 1)
+
+    show(None, 0)
+    return True
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='查看操作追踪记录')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    for command, help_text in (('summary', '按操作名汇总耗时'), ('slowest', '最慢的单次操作')):
+        sub = subparsers.add_parser(command, help=help_text)
+        sub.add_argument('--runs', type=int, help='只统计最近 N 次运行')
+        sub.add_argument('--top', type=int, default=20, help='显示前 N 项')
+    tree_parser = subparsers.add_parser('tree', help='显示一次运行的嵌套结构')
+    tree_parser.add_argument('run_id', nargs='?', default='latest')
+    args = parser.parse_args()
+
+    spans = load_spans()
+    if args.command == 'tree':
+        return 0 if print_tree(spans, args.run_id) else 1
+    spans = select_runs(spans, args.runs)
+    if args.command == 'summary':
+        print_summary(spans, args.top)
+    else:
+        print_slowest(spans, args.top)
+    return 0
+
+
+if __name__ == "__main__":
+    try:
+        sys.exit(main())
+    except KeyboardInterrupt:
+        print("\n用户取消操作")
+        sys.exit(1)
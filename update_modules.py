@@ -4,12 +4,14 @@
 功能：更新所有模块的git仓库并安装依赖包
 支持参数：
 - --only-onekey: 仅更新一键包仓库
+- --yes: 不再询问，直接强制覆盖本地更改
 - 无参数: 更新所有模块
 
 特性：
 - 支持多个备用远程仓库，当一个仓库无法访问时自动尝试下一个
 - 在拉取前强制设置远程仓库为指定的仓库地址
 - 自动安装requirements.txt中的依赖包
+- 更新后预编译MaiBot、适配器和运行时依赖的字节码（见 precompile.py）
 """
 
 import os
@@ -17,51 +19,40 @@ import subprocess
 import sys
 from pathlib import Path
 
+from toolchain import get_bundled_candidates, resolve_tool
+from tracing import child_env, span, traced_run
+
 def get_git_command():
-    """获取可用的git命令路径"""
-    # 获取脚本所在目录（项目根目录）
-    script_dir = Path(__file__).parent.absolute()
-    
-    # 检查内置git
-    portable_git = script_dir / 'runtime' / 'PortableGit' / 'bin' / 'git.exe'
-    
-    if portable_git.exists():
-        print(f"✅ 找到内置Git: {portable_git}")
-        return str(portable_git)
-    
-    # 检查系统git
-    try:
-        result = subprocess.run(
-            ['git', '--version'],
-            capture_output=True,
-            text=True,
-            timeout=5
-        )
-        if result.returncode == 0:
-            print(f"✅ 找到系统Git: git")
-            return 'git'
-    except (subprocess.TimeoutExpired, FileNotFoundError, OSError):
-        pass
+    """获取可用的git命令路径（由工具链注册表查找并缓存）"""
+    entry = resolve_tool('git')
+    if entry:
+        source = '内置' if entry['source'] == 'bundled' else '系统'
+        print(f"✅ 找到{source}Git: {entry['path']} ({entry.get('version') or '未知版本'})")
+        return entry['path']
     
     # 都没找到
     print("❌ 错误: 未找到Git命令！")
     print("请确保满足以下条件之一：")
-    print(f"  1. 内置Git存在: {portable_git}")
+    print(f"  1. 内置Git存在: {get_bundled_candidates('git')[0]}")
     print("  2. 系统已安装Git并添加到PATH环境变量")
     return None
 
 # 全局变量存储git命令
 GIT_COMMAND = None
 
-def run_command(command, cwd=None, description="", realtime_output=False):
-    """执行命令"""
+def run_command(command, cwd=None, description="", realtime_output=False, name=None):
+    """执行命令，name 为追踪记录中的操作名称，默认使用 description 或命令本身"""
+    with span(name or description or command, kind='command', command=command, cwd=str(cwd) if cwd else None) as current:
+        return _run_command(command, cwd, description, realtime_output, current)
+
+def _run_command(command, cwd, description, realtime_output, current):
     try:
         if description:
             print(f"正在执行: {description}")
         print(f"命令: {command} (目录: {cwd if cwd else '当前目录'})")
         
         # 设置环境变量以确保正确的编码
-        env = os.environ.copy()
+        env = child_env()
         env['PYTHONIOENCODING'] = 'utf-8'
         env['LANG'] = 'zh_CN.UTF-8'
         
@@ -86,6 +77,7 @@ def run_command(command, cwd=None, description="", realtime_output=False):
             while True:
                 line = process.stdout.readline()
                 if line:
+                    current.add_bytes(out=len(line.encode('utf-8')))
                     line = line.rstrip('\n\r')
                     print(line)
                     output_lines.append(line)
@@ -94,6 +86,7 @@ def run_command(command, cwd=None, description="", realtime_output=False):
             
             # 等待进程完成
             return_code = process.wait()
+            current.set(exit_code=return_code)
             
             if return_code == 0:
                 print("✅ 执行完成")
@@ -113,6 +106,8 @@ def run_command(command, cwd=None, description="", realtime_output=False):
                 errors='ignore',  # 忽略编码错误
                 env=env
             )
+            current.set(exit_code=result.returncode)
+            current.add_bytes(out=len((result.stdout or '').encode('utf-8')), err=len((result.stderr or '').encode('utf-8')))
             
             if result.returncode == 0:
                 if result.stdout and result.stdout.strip():
@@ -125,6 +120,7 @@ def run_command(command, cwd=None, description="", realtime_output=False):
                 print(f"❌ 错误: {error_msg}")
                 return False
     except Exception as e:
+        current.set(status='error', error=str(e))
         print(f"❌ 执行命令时发生异常: {e}")
         return False
 
@@ -149,17 +145,18 @@ def run_git_command(repo_path, command):
     if any(cmd in command for cmd in ['fetch', 'pull', 'push', 'clone', 'remote']):
         # 设置Git配置以解决SSL证书问题
         git_config_commands = [
-            f'"{GIT_COMMAND}" config http.sslverify false',
-            f'"{GIT_COMMAND}" config http.sslbackend schannel',
-            f'"{GIT_COMMAND}" config http.schannelCheckRevoke false',
-            f'"{GIT_COMMAND}" config http.schannelUseSSLCAInfo false'
+            'config http.sslverify false',
+            'config http.sslbackend schannel',
+            'config http.schannelCheckRevoke false',
+            'config http.schannelUseSSLCAInfo false'
         ]
         
         # 先设置Git配置
         for config_cmd in git_config_commands:
-            run_command(config_cmd, repo_path)
+            run_command(f'"{GIT_COMMAND}" {config_cmd}', repo_path, name=f"git {config_cmd}")
     
-    return run_command(git_command, repo_path)
+    # 追踪记录中使用不含git路径的命令作为操作名称
+    return run_command(git_command, repo_path, name=command)
 
 def install_requirements(repo_path, repo_name):
     """安装requirements.txt中的依赖"""
@@ -186,8 +183,17 @@ def install_requirements(repo_path, repo_name):
     
     return success
 
-def update_repository(repo_path, repo_name, remote_urls=None, force_reset=False):
-    """更新单个仓库，支持多个备用远程仓库，支持强制覆盖本地更改"""
+def confirm_force_reset():
+    """提示强制覆盖的风险并询问用户是否继续"""
+    print("⚠️  一键包将强制覆盖所有本地更改（包括未提交和已暂存的修改，配置文件和数据文件夹不在这个范围），此操作不可逆！")
+    print("⚠️  如果你是第一次启动,请忽略此提示。")
+    return input("是否继续？输入 y 确认，其他键取消: ").strip().lower() == 'y'
+
+def update_repository(repo_path, repo_name, remote_urls=None, force_reset=False, confirmed=None):
+    """更新单个仓库，支持多个备用远程仓库，支持强制覆盖本地更改
+
+    confirmed 为 None 时强制覆盖前询问用户，True/False 表示已事先确认或拒绝，不再询问
+    """
     print(f"\n{'='*50}")
     print(f"正在更新 {repo_name}")
     print(f"路径: {repo_path}")
@@ -203,10 +209,9 @@ def update_repository(repo_path, repo_name, remote_urls=None, force_reset=False)
 
     # 如果需要强制覆盖本地更改，先执行 reset --hard 和 clean -fd
     if force_reset:
-        print("⚠️  一键包将强制覆盖所有本地更改（包括未提交和已暂存的修改，配置文件和数据文件夹不在这个范围），此操作不可逆！")
-        print("⚠️  如果你是第一次启动,请忽略此提示。")
-        confirm = input("是否继续？输入 y 确认，其他键取消: ").strip().lower()
-        if confirm != 'y':
+        if confirmed is None:
+            confirmed = confirm_force_reset()
+        if not confirmed:
             print("用户取消强制更新操作。")
             return False
         print("\n正在放弃所有本地更改并强制拉取最新代码...")
@@ -282,7 +287,7 @@ def update_repository(repo_path, repo_name, remote_urls=None, force_reset=False)
     
     # 获取当前分支
     print("获取当前分支...")
-    result = subprocess.run(
+    result = traced_run(
         "git branch --show-current",
         cwd=repo_path,
         shell=True,
@@ -300,10 +305,22 @@ def update_repository(repo_path, repo_name, remote_urls=None, force_reset=False)
     
     return pull_success
 
-def main():
-    """主函数"""
+def main(confirmed=None):
+    """主函数
+
+    Args:
+        confirmed: 是否已确认强制覆盖本地更改，None 表示更新每个仓库前询问（命令行 --yes 视为已确认）
+    """
+    with span('更新模块', kind='update', argv=sys.argv[1:]) as current:
+        exit_code = _main(confirmed)
+        current.set(exit_code=exit_code)
+        return exit_code
+
+def _main(confirmed=None):
     # 检查命令行参数
     only_onekey = len(sys.argv) > 1 and sys.argv[1] == "--only-onekey"
+    if "--yes" in sys.argv[1:]:
+        confirmed = True
     
     if only_onekey:
         print("开始更新一键包仓库...")
@@ -388,7 +405,11 @@ def main():
     print(f"{'='*60}")
     
     for repo in repositories:
-        if update_repository(str(repo['path']), repo['name'], repo['remote_urls'], repo['force_reset']):
+        with span(f"更新 {repo['name']}", kind='repository', path=str(repo['path'])) as current:
+            updated = update_repository(str(repo['path']), repo['name'], repo['remote_urls'], repo['force_reset'],
+                                        confirmed)
+            current.set(status='ok' if updated else 'failed')
+        if updated:
             update_success_count += 1
     
     # 第二阶段：安装依赖
@@ -397,9 +418,26 @@ def main():
     print(f"{'='*60}")
     
     for repo in repositories:
-        if install_requirements(str(repo['path']), repo['name']):
+        with span(f"安装依赖 {repo['name']}", kind='requirements', path=str(repo['path'])) as current:
+            installed = install_requirements(str(repo['path']), repo['name'])
+            current.set(status='ok' if installed else 'failed')
+        if installed:
             install_success_count += 1
     
+    # 第三阶段：预编译字节码，失败不影响更新结果
+    print(f"\n{'='*60}")
+    print("第三阶段：预编译字节码")
+    print(f"{'='*60}")
+    
+    try:
+        from precompile import precompile
+        with span('预编译字节码', kind='precompile'):
+            precompiled = precompile()
+        if not precompiled:
+            print("⚠️  字节码预编译失败，首次启动时会自动编译")
+    except Exception as e:
+        print(f"⚠️  字节码预编译出错: {e}，首次启动时会自动编译")
+    
     # 输出总结
     print(f"\n{'='*60}")
     if only_onekey: